@@ -0,0 +1,182 @@
+"""
+变更事件总线
+
+多台工作站共用一个后端时，前端只能反复轮询列表接口才能发现别人做的修改。
+路由在写操作提交之后向 change_bus 发布带类型的事件（patient.updated、note.saved、
+reminder.completed 等），GET /api/events 以 Server-Sent Events 推送给订阅的客户端，
+客户端按事件中的住院号增量刷新，不必重新加载整个列表。
+
+- 每个订阅有一个有界队列，消费跟不上时清空队列并发送 resync 事件，客户端收到后整体重新加载
+- 最近的事件保存在环形缓冲中，断线重连时按 Last-Event-ID 补发；缺口超出缓冲时同样发送 resync
+- 事件总线只在进程内有效，后端重启后事件编号从1重新开始，带重启前 Last-Event-ID 重连的客户端会收到 resync
+- 批量导入、归档等一次改动大量记录的写入不逐条发布，提交后发布一条 resync（resync 方法），
+  不论订阅的主题都会送达
+"""
+import asyncio
+import json
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable, Optional
+
+# 事件类型，点号前为主题
+EVENT_TYPES = (
+    "patient.created",
+    "patient.updated",
+    "patient.discharged",
+    "patient.deleted",
+    "note.saved",
+    "reminder.created",
+    "reminder.completed",
+    "reminder.deleted",
+)
+TOPICS = tuple(dict.fromkeys(t.split(".")[0] for t in EVENT_TYPES))
+
+RESYNC = "resync"
+HEARTBEAT_SECONDS = 15.0
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """一条变更事件"""
+    id: int
+    type: str
+    data: dict = field(default_factory=dict)
+    time: str = ""
+
+    @property
+    def topic(self) -> str:
+        return self.type.split(".")[0]
+
+    def encode(self) -> str:
+        """编码为 SSE 消息"""
+        payload = json.dumps({"type": self.type, "time": self.time, **self.data}, ensure_ascii=False)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+_CLOSED = object()
+
+
+class Subscription:
+    """单个客户端的订阅，只能在创建它的事件循环中读取"""
+
+    def __init__(self, topics: frozenset, max_queue: int, loop: asyncio.AbstractEventLoop):
+        self.topics = topics
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.closed = False
+
+    def wants(self, event: ChangeEvent) -> bool:
+        return event.type == RESYNC or event.topic in self.topics
+
+    def deliver(self, item):
+        """放入队列；队列满时丢弃积压的事件，改为一条 resync"""
+        if item is not _CLOSED and self.queue.full():
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            item = ChangeEvent(id=item.id, type=RESYNC, time=item.time)
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # 只有关闭标记会走到这里：腾出一个位置
+            self.queue.get_nowait()
+            self.queue.put_nowait(item)
+
+    async def next(self, timeout: float) -> Optional[ChangeEvent]:
+        """下一条事件；超时（应发送心跳）或总线关闭（closed 为 True）时返回 None"""
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if item is _CLOSED:
+            self.closed = True
+            return None
+        return item
+
+
+class ChangeBus:
+    """进程内的发布/订阅总线，发布可以在任意线程中调用"""
+
+    def __init__(self, history: int = 1000, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._history: deque[ChangeEvent] = deque(maxlen=history)
+        self._subscribers: set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self.published = 0
+
+    def publish(self, event_type: str, **data) -> ChangeEvent:
+        """发布事件，应在写操作提交之后调用"""
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"未知的事件类型: {event_type}")
+        return self._publish(event_type, data)
+
+    def resync(self, reason: str) -> ChangeEvent:
+        """通知所有订阅整体重新加载（批量导入、归档等大批量写入提交之后调用）"""
+        return self._publish(RESYNC, {"reason": reason})
+
+    def _publish(self, event_type: str, data: dict) -> ChangeEvent:
+        with self._lock:
+            self._last_id += 1
+            event = ChangeEvent(self._last_id, event_type, data, datetime.now().isoformat(timespec="seconds"))
+            self._history.append(event)
+            self.published += 1
+            targets = [s for s in self._subscribers if s.wants(event)]
+        for subscription in targets:
+            self._dispatch(subscription, event)
+        return event
+
+    def subscribe(self, topics: Optional[Iterable[str]] = None,
+                  last_event_id: Optional[int] = None) -> Subscription:
+        """在当前事件循环中订阅；指定 last_event_id 时先补发之后的事件"""
+        subscription = Subscription(frozenset(topics or TOPICS), self.max_queue, asyncio.get_running_loop())
+        with self._lock:
+            if last_event_id is not None and last_event_id != self._last_id:
+                missed = [e for e in self._history if e.id > last_event_id]
+                if not missed or missed[0].id != last_event_id + 1:
+                    # 缺口超出环形缓冲，或编号来自重启之前
+                    subscription.deliver(ChangeEvent(self._last_id, RESYNC))
+                else:
+                    for event in missed:
+                        if subscription.wants(event):
+                            subscription.deliver(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def close(self):
+        """通知所有订阅结束（关闭服务时调用，使 SSE 连接正常结束）"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscription in subscribers:
+            self._dispatch(subscription, _CLOSED)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "last_event_id": self._last_id,
+                "published": self.published,
+                "subscribers": len(self._subscribers),
+                "dropped": sum(s.dropped for s in self._subscribers),
+            }
+
+    @staticmethod
+    def _dispatch(subscription: Subscription, item):
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is subscription.loop:
+            subscription.deliver(item)
+        elif not subscription.loop.is_closed():
+            subscription.loop.call_soon_threadsafe(subscription.deliver, item)
+
+
+change_bus = ChangeBus()
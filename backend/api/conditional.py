@@ -0,0 +1,98 @@
+"""
+读接口的条件 GET（ETag / If-None-Match）
+
+前端每次操作后都会重新拉取患者、模板、病程记录和提醒列表，多数时候数据并没有变化。
+ConditionalGetMiddleware 按接口依赖的表取数据版本号（见 database.versions）生成 ETag：
+请求带的 If-None-Match 与当前 ETag 相同时，在路由和数据库查询之前直接返回 304；
+否则照常处理，并在 200 响应上加 ETag。
+
+ETag 由进程标识、当天日期（住院天数、今日提醒随日期变化）和各表版本号组成，
+是弱 ETag：只保证数据相同，不保证响应字节相同。版本号在处理请求之前读取，
+处理期间提交的写入会让下一次请求拿到新的 ETag，不会用旧 ETag 缓存新数据以外的内容。
+"""
+import re
+from datetime import date
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+ETAG_HEADER = "ETag"
+
+_stats = {"not_modified": 0, "served": 0}
+
+# 支持条件 GET 的路径（正则，按顺序取第一个匹配）及其依赖的表
+CONDITIONAL_ROUTES = (
+    (r"/api/patients/[^/]+/bundle", ("patients", "progress_notes", "reminders", "rehab_plans", "rehab_progress")),
+    (r"/api/patients(/.*)?", ("patients",)),
+    (r"/api/templates(/.*)?", ("templates",)),
+    (r"/api/notes/patient/.+", ("patients", "progress_notes")),
+    (r"/api/notes/gaps", ("patients", "progress_notes")),
+    (r"/api/reminders(/.*)?", ("patients", "reminders")),
+)
+_ROUTE_PATTERNS = [(re.compile(pattern), tables) for pattern, tables in CONDITIONAL_ROUTES]
+
+
+def route_tables(path: str) -> Optional[tuple]:
+    """路径依赖的表，不支持条件 GET 时返回 None"""
+    for pattern, tables in _ROUTE_PATTERNS:
+        if pattern.fullmatch(path):
+            return tables
+    return None
+
+
+def conditional_get_metrics() -> dict:
+    """304 与带 ETag 的 200 响应次数"""
+    return dict(_stats)
+
+
+def make_etag(versions, tables: tuple) -> str:
+    numbers = ".".join(str(v) for v in versions.get(tables))
+    return f'W/"{versions.epoch}-{date.today().isoformat()}-{numbers}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 比较使用弱比较，W/ 前缀不影响结果"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class ConditionalGetMiddleware:
+    """为 CONDITIONAL_ROUTES 中的 GET 请求生成 ETag 并处理 If-None-Match"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        tables = route_tables(scope["path"])
+        db_manager = getattr(scope["app"].state, "db_manager", None)
+        if tables is None or db_manager is None:
+            await self.app(scope, receive, send)
+            return
+
+        etag = make_etag(db_manager.data_versions, tables)
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            _stats["not_modified"] += 1
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [(b"etag", etag.encode()), (b"cache-control", b"no-cache")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                headers[ETAG_HEADER] = etag
+                # 每次使用缓存前都要带 If-None-Match 重新验证
+                headers["Cache-Control"] = "no-cache"
+                _stats["served"] += 1
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
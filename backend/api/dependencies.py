@@ -0,0 +1,14 @@
+"""
+API路由公共依赖
+"""
+from fastapi import Request
+
+
+async def get_async_session(request: Request):
+    """获取异步数据库会话（数据库操作在专用线程池中执行）"""
+    db_manager = request.app.state.db_manager
+    session = db_manager.get_async_session()
+    try:
+        yield session
+    finally:
+        await session.close()
@@ -0,0 +1,61 @@
+"""
+列表接口的分页参数与响应
+
+列表接口仍然返回JSON数组，下一页游标放在响应头 X-Next-Cursor 中（没有下一页时不返回该头），
+客户端带上 cursor=<游标> 请求下一页。分页与投影的实现见 database.pagination。
+"""
+import json
+from datetime import date
+from typing import Optional
+
+from fastapi import HTTPException, Query, Response
+
+from database.pagination import ListSpec, Page, PageRequest, PaginationError, validate_page_request
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 1000
+
+
+def page_params(spec: ListSpec, default_limit: Optional[int] = None):
+    """生成分页参数依赖：limit、cursor、view（full/summary）、fields（逗号分隔的列名）"""
+    def dependency(
+        limit: Optional[int] = Query(default_limit, ge=1, le=MAX_PAGE_SIZE),
+        cursor: Optional[str] = None,
+        view: str = "full",
+        fields: Optional[str] = None,
+    ) -> PageRequest:
+        request = PageRequest(
+            limit=limit,
+            cursor=cursor,
+            view=view,
+            fields=tuple(f.strip() for f in fields.split(",") if f.strip()) if fields else None,
+        )
+        try:
+            validate_page_request(request, spec)
+        except PaginationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return request
+    return dependency
+
+
+def page_response(response: Response, page: Page, items: Optional[list] = None):
+    """把一页结果转换为响应，items 为路由转换后的行（默认 page.items）
+
+    返回全部列时仍按路由的 response_model 校验；只返回部分列时直接输出JSON，
+    不再经过 response_model（否则缺少的必填列会校验失败）。
+    只读查询层返回的值只有数字、字符串、布尔值和日期，日期按ISO格式输出，与 response_model 一致。
+    """
+    items = page.items if items is None else items
+    if not page.projected:
+        if page.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = page.next_cursor
+        return items
+    headers = {NEXT_CURSOR_HEADER: page.next_cursor} if page.next_cursor else None
+    content = json.dumps(items, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
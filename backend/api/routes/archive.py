@@ -0,0 +1,26 @@
+"""
+出院患者归档API路由
+"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+from backend.api.change_feed import change_bus
+
+router = APIRouter()
+
+@router.post("/run")
+async def run_archive(request: Request, older_than_days: int = 365):
+    """把出院超过指定天数的患者及其全部记录移入归档库"""
+    db_manager = request.app.state.db_manager
+    if not db_manager.archive_path:
+        raise HTTPException(status_code=400, detail="未配置归档库")
+    if older_than_days < 0:
+        raise HTTPException(status_code=400, detail="older_than_days 不能为负数")
+
+    try:
+        result = await run_in_threadpool(db_manager.archive_discharged, older_than_days)
+        if result.patients:
+            change_bus.resync("archive")
+        return result.to_dict()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
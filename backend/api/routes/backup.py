@@ -0,0 +1,21 @@
+"""
+数据库备份API路由
+"""
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+router = APIRouter()
+
+@router.post("/run")
+async def run_backup(request: Request, keep: int = 7):
+    """立即在线备份主库（及归档库）到配置的快照目录，返回各文件的快照路径、耗时和持有源库的时间"""
+    db_manager = request.app.state.db_manager
+    directory = getattr(request.app.state, "backup_dir", "./backups")
+    if keep < 1:
+        raise HTTPException(status_code=400, detail="keep 至少为1")
+
+    try:
+        results = await run_in_threadpool(db_manager.backup, directory, keep)
+        return [result.to_dict() for result in results]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
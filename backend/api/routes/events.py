@@ -0,0 +1,61 @@
+"""
+变更事件推送API路由（Server-Sent Events）
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from backend.api import change_feed
+from backend.api.change_feed import TOPICS, change_bus
+
+router = APIRouter()
+
+
+def _parse_topics(topics: Optional[str]) -> tuple:
+    if not topics:
+        return TOPICS
+    selected = tuple(t.strip() for t in topics.split(",") if t.strip())
+    unknown = [t for t in selected if t not in TOPICS]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"未知的主题: {', '.join(unknown)}，可选 {', '.join(TOPICS)}")
+    return selected
+
+
+async def _event_stream(request: Request, subscription):
+    try:
+        # 断线后浏览器 EventSource 3秒后重连，并带上 Last-Event-ID
+        yield "retry: 3000\n\n"
+        while not subscription.closed:
+            event = await subscription.next(change_feed.HEARTBEAT_SECONDS)
+            if event is not None:
+                yield event.encode()
+            elif not subscription.closed:
+                if await request.is_disconnected():
+                    break
+                # 心跳：注释行，防止代理和客户端因空闲断开连接
+                yield ": ping\n\n"
+    finally:
+        change_bus.unsubscribe(subscription)
+
+
+@router.get("/")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """订阅变更事件（text/event-stream）；topics 为逗号分隔的主题：patient、note、reminder，默认全部"""
+    selected = _parse_topics(topics)
+    try:
+        after = int(last_event_id) if last_event_id else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID 必须是整数")
+
+    subscription = change_bus.subscribe(selected, after)
+    return StreamingResponse(
+        _event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,79 @@
+"""
+病历导出API路由
+"""
+import threading
+import weakref
+from datetime import date
+from urllib.parse import quote
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+
+from database.export import EXPORT_FORMATS, MEDIA_TYPES, export_records
+
+router = APIRouter()
+
+EXPORT_RETRY_AFTER_SECONDS = 30
+
+class _ExportSlot:
+    """一个导出名额，只归还一次：导出结束、客户端断开，或生成器未开始迭代就被回收时归还"""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self._held = True
+
+    def release(self):
+        with self._lock:
+            if self._held:
+                self._held = False
+                self._semaphore.release()
+
+def _stream_export(db_manager, slot: _ExportSlot, fmt: str, hospital_number=None, include_discharged=False):
+    """在生成器内打开导出专用的只读会话，响应发送完毕（或客户端断开）后关闭并归还名额"""
+    try:
+        with db_manager.ExportSession() as session:
+            yield from export_records(session, fmt, hospital_number, include_discharged)
+    finally:
+        slot.release()
+
+def _export_response(request: Request, fmt: str, filename: str, **kwargs) -> StreamingResponse:
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {fmt}")
+    db_manager = request.app.state.db_manager
+    # 每个导出在下载完成前一直占用一条连接和一个读快照（阻止 WAL 检查点），超过上限时直接拒绝
+    if not db_manager.export_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="正在进行的导出过多，请稍后再试",
+                            headers={"Retry-After": str(EXPORT_RETRY_AFTER_SECONDS)})
+    slot = _ExportSlot(db_manager.export_slots)
+    stream = _stream_export(db_manager, slot, fmt, **kwargs)
+    weakref.finalize(stream, slot.release)
+    # 同步生成器由 Starlette 放到线程池中逐块迭代
+    return StreamingResponse(
+        stream,
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(f'{filename}.{fmt}')}"},
+    )
+
+def _patient_exists(db_manager, hospital_number: str) -> bool:
+    """主库或归档库中是否有该患者"""
+    from database import readers
+    from database.identity_cache import lookup_patient
+
+    with db_manager.ReadSession() as session:
+        return (lookup_patient(session, hospital_number) is not None
+                or readers.find_archived_patient(session, hospital_number) is not None)
+
+@router.get("/patient/{hospital_number}")
+async def export_patient(hospital_number: str, request: Request, format: str = "txt"):
+    """导出一位患者（包括已归档患者）的病程记录、提醒和康复计划（txt / docx / jsonl）"""
+    if not await run_in_threadpool(_patient_exists, request.app.state.db_manager, hospital_number):
+        raise HTTPException(status_code=404, detail="患者不存在")
+    return _export_response(request, format, f"病历_{hospital_number}", hospital_number=hospital_number)
+
+@router.get("/ward")
+async def export_ward(request: Request, format: str = "jsonl", include_discharged: bool = False):
+    """导出全病区在院患者（include_discharged=true 时包含出院及已归档患者）的病程记录、提醒和康复计划"""
+    return _export_response(request, format, f"病区病历_{date.today().isoformat()}",
+                            include_discharged=include_discharged)
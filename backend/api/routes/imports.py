@@ -0,0 +1,59 @@
+"""
+批量导入API路由
+"""
+import io
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+
+from backend.api.change_feed import change_bus
+from database.bulk_import import IMPORT_KINDS, IMPORT_FORMATS, detect_format, import_records
+
+router = APIRouter()
+
+def _import_upload(db_manager, kind: str, file: UploadFile, fmt: str, chunk_size: int):
+    # utf-8-sig 兼容Excel导出的带BOM的CSV
+    stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+    try:
+        return import_records(db_manager, kind, stream, fmt, chunk_size=chunk_size)
+    finally:
+        stream.detach()
+
+@router.post("/{kind}")
+async def import_file(
+    kind: str,
+    request: Request,
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    chunk_size: int = 2000
+):
+    """批量导入患者（patients）或病程记录（notes），支持 CSV / JSONL
+
+    患者按住院号 upsert，病程记录按 (住院号, 记录日期) upsert；
+    单行错误记入返回结果的 errors，不影响其他行。
+    """
+    if kind not in IMPORT_KINDS:
+        raise HTTPException(status_code=404, detail=f"不支持的导入类型: {kind}")
+    if format is not None and format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的文件格式: {format}")
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size 必须大于0")
+
+    try:
+        fmt = format or detect_format(file.filename)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        db_manager = request.app.state.db_manager
+        # 解析和等待写入都是阻塞操作，放到线程池中执行
+        result = await run_in_threadpool(_import_upload, db_manager, kind, file, fmt, chunk_size)
+        # 导入的行数可能很多，不逐条发布事件（更新患者时也会刷新其提醒）
+        if result.inserted or result.updated:
+            change_bus.resync("import")
+        return result.to_dict()
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="文件编码必须为UTF-8")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,19 @@
+"""
+运行指标API路由
+"""
+from fastapi import APIRouter, Request
+
+from backend.api.change_feed import change_bus
+from backend.api.conditional import conditional_get_metrics
+
+router = APIRouter()
+
+@router.get("/")
+async def get_metrics(request: Request):
+    """获取数据库运行指标（写入队列深度、提交延迟等）、条件 GET 命中次数和变更事件订阅情况"""
+    db_manager = request.app.state.db_manager
+    return {
+        "database": db_manager.get_metrics(),
+        "conditional_get": conditional_get_metrics(),
+        "change_feed": change_bus.stats(),
+    }
@@ -1,11 +1,17 @@
 """
 病程记录API路由
 """
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date, datetime
 
+from backend.api.dependencies import get_async_session as get_session
+from backend.api.pagination import page_params, page_response
+from backend.api.change_feed import change_bus
+from database.pagination import PageRequest
+from database.readers import NOTE_LIST
+
 router = APIRouter()
 
 # Pydantic模型
@@ -21,6 +27,37 @@ class NoteUpdate(BaseModel):
     generated_content: Optional[str] = None
     is_edited: Optional[bool] = None
 
+# 批量保存每次最多条数（多行 VALUES 的参数个数受 SQLite 限制）
+MAX_BATCH_NOTES = 500
+
+class NoteBatchRequest(BaseModel):
+    notes: List[NoteCreate] = Field(min_length=1, max_length=MAX_BATCH_NOTES)
+
+class NoteBatchItem(BaseModel):
+    index: int
+    hospital_number: str
+    record_date: date
+    status: str  # created / updated / error
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class NoteBatchResponse(BaseModel):
+    created: int
+    updated: int
+    failed: int
+    results: List[NoteBatchItem]
+
+class NoteRevisionInfo(BaseModel):
+    revision: int
+    created_at: datetime
+    length: int
+    stored_bytes: int
+
+class NoteRevisionContent(BaseModel):
+    note_id: int
+    revision: int
+    generated_content: str
+
 class NoteResponse(BaseModel):
     id: int
     hospital_number: str
@@ -32,133 +69,261 @@ class NoteResponse(BaseModel):
     is_edited: bool
     created_at: datetime
 
-def get_session(request: Request):
-    """获取数据库会话"""
-    db_manager = request.app.state.db_manager
-    session = db_manager.get_session()
-    try:
-        yield session
-    finally:
-        session.close()
+def _to_response(note) -> NoteResponse:
+    """转换为响应模型"""
+    return NoteResponse(
+        id=note.id,
+        hospital_number=note.hospital_number,
+        record_date=note.record_date,
+        day_number=note.day_number,
+        record_type=note.record_type,
+        daily_condition=note.daily_condition,
+        generated_content=note.generated_content,
+        is_edited=note.is_edited,
+        created_at=note.created_at
+    )
+
+def _get_patient_notes(session, hospital_number: str, page: PageRequest):
+    from database import readers
+    from database.identity_cache import lookup_patient
+
+    # 先获取患者
+    patient = lookup_patient(session, hospital_number)
+
+    if patient is None:
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 获取病程记录
+    return readers.page_patient_notes(session, patient.id, page)
 
 @router.get("/patient/{hospital_number}", response_model=List[NoteResponse])
 async def get_patient_notes(
     hospital_number: str,
-    limit: int = 1000,  # 增加默认限制，确保返回所有记录
+    response: Response,
+    # 默认每页1000条，时间轴一次即可取到全部记录
+    page: PageRequest = Depends(page_params(NOTE_LIST, default_limit=1000)),
     session = Depends(get_session)
 ):
-    """获取患者的病程记录"""
+    """获取患者的病程记录（按记录日期倒序，支持游标分页；view=summary 时不返回病情记录和生成内容）"""
     try:
-        from database.models import ProgressNote, Patient
-
-        # 先获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
-
-        if not patient:
-            raise HTTPException(status_code=404, detail="患者不存在")
-
-        # 获取病程记录
-        notes = session.query(ProgressNote).filter(
-            ProgressNote.patient_id == patient.id
-        ).order_by(ProgressNote.record_date.desc()).limit(limit).all()
-
-        return [
-            NoteResponse(
-                id=note.id,
-                hospital_number=note.hospital_number,
-                record_date=note.record_date,
-                day_number=note.day_number,
-                record_type=note.record_type,
-                daily_condition=note.daily_condition,
-                generated_content=note.generated_content,
-                is_edited=note.is_edited,
-                created_at=note.created_at
-            )
-            for note in notes
-        ]
+        result = await session.run(_get_patient_notes, hospital_number, page)
+        return page_response(response, result)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class MissingDay(BaseModel):
+    date: date
+    day_number: int
+    expected_type: str
+
+class PatientGaps(BaseModel):
+    patient_id: int
+    hospital_number: str
+    name: Optional[str]
+    admission_date: date
+    discharge_date: Optional[date]
+    days_in_hospital: int
+    expected_records: int
+    missing_records: int
+    missing: List[MissingDay]
+
+class GapsSummary(BaseModel):
+    patient_count: int
+    patients_with_gaps: int
+    expected_records: int
+    missing_records: int
+    completion_rate: float
+
+class GapsResponse(BaseModel):
+    summary: GapsSummary
+    patients: List[PatientGaps]
+
+def _get_gaps(session, hospital_number: Optional[str], include_discharged: bool):
+    from database.gaps import find_missing_records
+
+    result = find_missing_records(session, hospital_number, include_discharged)
+    if hospital_number is not None and not result["patients"]:
+        raise HTTPException(status_code=404, detail="患者不存在")
+    return result
+
+@router.get("/gaps", response_model=GapsResponse)
+async def get_gaps(
+    hospital_number: Optional[str] = None,
+    include_discharged: bool = False,
+    session = Depends(get_session)
+):
+    """获取缺失病程记录的应记录日（指定住院号时只计算该患者，否则计算全病区在院患者）"""
+    try:
+        return await session.run(_get_gaps, hospital_number, include_discharged)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _create_note(session, note: NoteCreate):
+    from database.models import ProgressNote
+    from database.identity_cache import lookup_patient
+    from database.queries import NOTE_ON_DATE
+
+    # 获取患者
+    patient = lookup_patient(session, note.hospital_number)
+
+    if not patient:
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 计算住院天数
+    day_number = (note.record_date - patient.admission_date).days + 1
+
+    # 检查是否已有该日期的记录
+    existing_note = NOTE_ON_DATE.execute(
+        session, {"patient_id": patient.id, "record_date": note.record_date}).scalars().first()
+
+    if existing_note:
+        # 更新现有记录
+        existing_note.daily_condition = note.daily_condition
+        existing_note.generated_content = note.generated_content
+        existing_note.is_edited = True
+        session.flush()
+        session.refresh(existing_note)
+
+        return _to_response(existing_note)
+
+    # 创建新记录
+    new_note = ProgressNote(
+        patient_id=patient.id,
+        hospital_number=note.hospital_number,
+        record_date=note.record_date,
+        day_number=day_number,
+        record_type=note.record_type,
+        daily_condition=note.daily_condition,
+        generated_content=note.generated_content,
+        is_edited=False
+    )
+
+    session.add(new_note)
+    session.flush()
+    session.refresh(new_note)
+
+    return _to_response(new_note)
+
 @router.post("/", response_model=NoteResponse)
 async def create_note(note: NoteCreate, session = Depends(get_session)):
     """创建或更新病程记录（同一天只能有一条记录）"""
     try:
-        from database.models import ProgressNote, Patient
-
-        # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == note.hospital_number
-        ).first()
-
-        if not patient:
-            raise HTTPException(status_code=404, detail="患者不存在")
-
-        # 计算住院天数
-        day_number = (note.record_date - patient.admission_date).days + 1
-
-        # 检查是否已有该日期的记录
-        existing_note = session.query(ProgressNote).filter(
-            ProgressNote.patient_id == patient.id,
-            ProgressNote.record_date == note.record_date
-        ).first()
-
-        if existing_note:
-            # 更新现有记录
-            existing_note.daily_condition = note.daily_condition
-            existing_note.generated_content = note.generated_content
-            existing_note.is_edited = True
-            session.commit()
-            session.refresh(existing_note)
-
-            return NoteResponse(
-                id=existing_note.id,
-                hospital_number=existing_note.hospital_number,
-                record_date=existing_note.record_date,
-                day_number=existing_note.day_number,
-                record_type=existing_note.record_type,
-                daily_condition=existing_note.daily_condition,
-                generated_content=existing_note.generated_content,
-                is_edited=existing_note.is_edited,
-                created_at=existing_note.created_at
-            )
+        saved = await session.write(_create_note, note)
+        change_bus.publish("note.saved", id=saved.id, hospital_number=saved.hospital_number,
+                           record_date=saved.record_date.isoformat())
+        return saved
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _save_notes_batch(session, notes: List[NoteCreate]) -> NoteBatchResponse:
+    from sqlalchemy import select
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    from database.models import Patient, ProgressNote
+
+    patients = {
+        row.hospital_number: row
+        for row in session.execute(
+            select(Patient.id, Patient.hospital_number, Patient.admission_date)
+            .where(Patient.hospital_number.in_({note.hospital_number for note in notes}))
+        )
+    }
+
+    # 同一天重复出现时以最后一条为准
+    values = {}
+    for note in notes:
+        patient = patients.get(note.hospital_number)
+        if patient is None:
+            continue
+        values[(patient.id, note.record_date)] = {
+            "patient_id": patient.id,
+            "hospital_number": note.hospital_number,
+            "record_date": note.record_date,
+            "day_number": (note.record_date - patient.admission_date).days + 1,
+            "record_type": note.record_type,
+            "daily_condition": note.daily_condition,
+            "generated_content": note.generated_content,
+            "is_edited": False,
+        }
+
+    # 与单条保存一致：同一天已有记录时覆盖病情和内容并标记为已编辑，插入的记录 is_edited 为 False
+    saved = {}
+    if values:
+        stmt = sqlite_insert(ProgressNote).values(list(values.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProgressNote.patient_id, ProgressNote.record_date],
+            set_={
+                "daily_condition": stmt.excluded.daily_condition,
+                "generated_content": stmt.excluded.generated_content,
+                "is_edited": True,
+            },
+        ).returning(ProgressNote.id, ProgressNote.patient_id, ProgressNote.record_date, ProgressNote.is_edited)
+        saved = {(row.patient_id, row.record_date): row for row in session.execute(stmt)}
+
+    results = []
+    for index, note in enumerate(notes):
+        patient = patients.get(note.hospital_number)
+        item = NoteBatchItem(index=index, hospital_number=note.hospital_number,
+                             record_date=note.record_date, status="error")
+        if patient is None:
+            item.detail = "患者不存在"
         else:
-            # 创建新记录
-            new_note = ProgressNote(
-                patient_id=patient.id,
-                hospital_number=note.hospital_number,
-                record_date=note.record_date,
-                day_number=day_number,
-                record_type=note.record_type,
-                daily_condition=note.daily_condition,
-                generated_content=note.generated_content,
-                is_edited=False
-            )
-
-            session.add(new_note)
-            session.commit()
-            session.refresh(new_note)
-
-            return NoteResponse(
-                id=new_note.id,
-                hospital_number=new_note.hospital_number,
-                record_date=new_note.record_date,
-                day_number=new_note.day_number,
-                record_type=new_note.record_type,
-                daily_condition=new_note.daily_condition,
-                generated_content=new_note.generated_content,
-                is_edited=new_note.is_edited,
-                created_at=new_note.created_at
-            )
+            row = saved[(patient.id, note.record_date)]
+            item.id = row.id
+            item.status = "updated" if row.is_edited else "created"
+        results.append(item)
+
+    return NoteBatchResponse(
+        created=sum(1 for item in results if item.status == "created"),
+        updated=sum(1 for item in results if item.status == "updated"),
+        failed=sum(1 for item in results if item.status == "error"),
+        results=results,
+    )
+
+@router.post("/batch", response_model=NoteBatchResponse)
+async def save_notes_batch(batch: NoteBatchRequest, session = Depends(get_session)):
+    """批量创建或更新病程记录（补记多天时一次提交），逐条返回结果；患者不存在的条目不影响其他条目"""
+    try:
+        result = await session.write(_save_notes_batch, batch.notes)
+        for item in result.results:
+            if item.id is not None:
+                change_bus.publish("note.saved", id=item.id, hospital_number=item.hospital_number,
+                                   record_date=item.record_date.isoformat())
+        return result
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _update_note(session, note_id: int, note: NoteUpdate):
+    from database.models import ProgressNote
+
+    existing_note = session.query(ProgressNote).filter(
+        ProgressNote.id == note_id
+    ).first()
+
+    if not existing_note:
+        raise HTTPException(status_code=404, detail="病程记录不存在")
+
+    # 更新字段
+    update_data = note.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(existing_note, field, value)
+
+    # 如果修改了内容，标记为已编辑
+    if 'generated_content' in update_data:
+        existing_note.is_edited = True
+
+    session.flush()
+    session.refresh(existing_note)
+
+    return _to_response(existing_note)
+
 @router.put("/{note_id}", response_model=NoteResponse)
 async def update_note(
     note_id: int,
@@ -167,68 +332,68 @@ async def update_note(
 ):
     """更新病程记录"""
     try:
-        from database.models import ProgressNote
+        saved = await session.write(_update_note, note_id, note)
+        change_bus.publish("note.saved", id=saved.id, hospital_number=saved.hospital_number,
+                           record_date=saved.record_date.isoformat())
+        return saved
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        existing_note = session.query(ProgressNote).filter(
-            ProgressNote.id == note_id
-        ).first()
+def _get_note(session, note_id: int):
+    from database.models import ProgressNote
 
-        if not existing_note:
-            raise HTTPException(status_code=404, detail="病程记录不存在")
+    note = session.query(ProgressNote).filter(
+        ProgressNote.id == note_id
+    ).first()
 
-        # 更新字段
-        update_data = note.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(existing_note, field, value)
+    if not note:
+        raise HTTPException(status_code=404, detail="病程记录不存在")
 
-        # 如果修改了内容，标记为已编辑
-        if 'generated_content' in update_data:
-            existing_note.is_edited = True
+    return _to_response(note)
 
-        session.commit()
-        session.refresh(existing_note)
+@router.get("/{note_id}", response_model=NoteResponse)
+async def get_note(note_id: int, session = Depends(get_session)):
+    """获取单个病程记录"""
+    try:
+        return await session.run(_get_note, note_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        return NoteResponse(
-            id=existing_note.id,
-            hospital_number=existing_note.hospital_number,
-            record_date=existing_note.record_date,
-            day_number=existing_note.day_number,
-            record_type=existing_note.record_type,
-            daily_condition=existing_note.daily_condition,
-            generated_content=existing_note.generated_content,
-            is_edited=existing_note.is_edited,
-            created_at=existing_note.created_at
-        )
+def _get_note_revisions(session, note_id: int):
+    from database.revisions import list_revisions
+
+    revisions = list_revisions(session, note_id)
+    if revisions is None:
+        raise HTTPException(status_code=404, detail="病程记录不存在")
+    return revisions
+
+@router.get("/{note_id}/revisions", response_model=List[NoteRevisionInfo])
+async def get_note_revisions(note_id: int, session = Depends(get_session)):
+    """获取病程记录的修订历史（第1版为原稿，之后每次修改一版）"""
+    try:
+        return await session.run(_get_note_revisions, note_id)
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{note_id}", response_model=NoteResponse)
-async def get_note(note_id: int, session = Depends(get_session)):
-    """获取单个病程记录"""
+def _get_note_revision(session, note_id: int, revision: int):
+    from database.revisions import read_revision
+
+    content = read_revision(session, note_id, revision)
+    if content is None:
+        raise HTTPException(status_code=404, detail="版本不存在")
+    return NoteRevisionContent(note_id=note_id, revision=revision, generated_content=content)
+
+@router.get("/{note_id}/revisions/{revision}", response_model=NoteRevisionContent)
+async def get_note_revision(note_id: int, revision: int, session = Depends(get_session)):
+    """还原病程记录指定版本的内容"""
     try:
-        from database.models import ProgressNote
-
-        note = session.query(ProgressNote).filter(
-            ProgressNote.id == note_id
-        ).first()
-
-        if not note:
-            raise HTTPException(status_code=404, detail="病程记录不存在")
-
-        return NoteResponse(
-            id=note.id,
-            hospital_number=note.hospital_number,
-            record_date=note.record_date,
-            day_number=note.day_number,
-            record_type=note.record_type,
-            daily_condition=note.daily_condition,
-            generated_content=note.generated_content,
-            is_edited=note.is_edited,
-            created_at=note.created_at
-        )
+        return await session.run(_get_note_revision, note_id, revision)
     except HTTPException:
         raise
     except Exception as e:
@@ -1,11 +1,19 @@
 """
 患者管理API路由
 """
-from fastapi import APIRouter, HTTPException, Query, Depends, Request
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
 from typing import List, Optional
 from datetime import date, datetime
 from pydantic import BaseModel
-from sqlalchemy import or_
+
+from backend.api.dependencies import get_async_session as get_session
+from backend.api.pagination import page_params, page_response
+from backend.api.change_feed import change_bus
+from database.pagination import PageRequest
+from database.readers import PATIENT_LIST
+from backend.api.routes.notes import NoteResponse
+from backend.api.routes.reminders import ReminderResponse
+from backend.api.routes.rehab_plans import RehabPlanResponse, RehabProgressResponse
 
 router = APIRouter()
 
@@ -27,6 +35,7 @@ class PatientUpdate(BaseModel):
     name: Optional[str] = None
     gender: Optional[str] = None
     age: Optional[int] = None
+    admission_date: Optional[date] = None
     discharge_date: Optional[date] = None
     diagnosis: Optional[str] = None
     chief_complaint: Optional[str] = None
@@ -49,157 +58,236 @@ class PatientResponse(BaseModel):
     specialist_exam: Optional[str]
     # 计算字段：住院天数
     days_in_hospital: int
-
-def get_session(request: Request):
-    """获取数据库会话"""
-    db_manager = request.app.state.db_manager
-    session = db_manager.get_session()
-    try:
-        yield session
-    finally:
-        session.close()
+    # 是否已移入归档库
+    archived: bool = False
+
+def _days_in_hospital(admission_date: date, discharge_date: Optional[date]) -> int:
+    """计算住院天数（入院当天算第1天，所以需要 +1）"""
+    end_date = discharge_date or datetime.now().date()
+    return (end_date - admission_date).days + 1
+
+def _to_response(p) -> PatientResponse:
+    """转换为响应模型并计算住院天数"""
+    return PatientResponse(
+        id=p.id,
+        hospital_number=p.hospital_number,
+        name=p.name,
+        gender=p.gender,
+        age=p.age,
+        admission_date=p.admission_date,
+        discharge_date=p.discharge_date,
+        diagnosis=p.diagnosis,
+        chief_complaint=p.chief_complaint,
+        past_history=p.past_history,
+        allergy_history=p.allergy_history,
+        specialist_exam=p.specialist_exam,
+        days_in_hospital=_days_in_hospital(p.admission_date, p.discharge_date)
+    )
+
+def _row_to_dict(row) -> dict:
+    """把只读查询层返回的行转换为响应字典（由FastAPI按response_model校验一次）"""
+    data = row._asdict()
+    data["days_in_hospital"] = _days_in_hospital(row.admission_date, row.discharge_date)
+    return data
+
+def _with_days_in_hospital(item: dict) -> dict:
+    """分页结果的行：投影中包含入院、出院日期时才计算住院天数"""
+    if "admission_date" in item and "discharge_date" in item:
+        item["days_in_hospital"] = _days_in_hospital(item["admission_date"], item["discharge_date"])
+    return item
+
+def _query_patients(session, include_discharged: bool, search: Optional[str], page: PageRequest):
+    from database import readers
+
+    result = readers.page_patients(session, page, include_discharged, search)
+    result.items = [_with_days_in_hospital(item) for item in result.items]
+    return result
 
 @router.get("/", response_model=List[PatientResponse])
 async def get_patients(
+    response: Response,
     include_discharged: bool = False,
     search: Optional[str] = None,
+    page: PageRequest = Depends(page_params(PATIENT_LIST)),
     session = Depends(get_session)
 ):
-    """获取患者列表"""
+    """获取患者列表（支持游标分页，view=summary 时不返回主诉、既往史、专科查体等长文本）"""
     try:
-        from database.models import Patient
-
-        query = session.query(Patient)
-
-        # 过滤出院患者
-        if not include_discharged:
-            query = query.filter(Patient.discharge_date.is_(None))
-
-        # 搜索功能
-        if search:
-            search_pattern = f"%{search}%"
-            query = query.filter(
-                or_(
-                    Patient.name.like(search_pattern),
-                    Patient.hospital_number.like(search_pattern),
-                    Patient.diagnosis.like(search_pattern)
-                )
-            )
-
-        patients = query.order_by(Patient.admission_date.desc()).all()
-
-        # 计算住院天数并转换为响应模型
-        result = []
-        for p in patients:
-            # 计算住院天数（入院当天算第1天，所以需要 +1）
-            if p.discharge_date:
-                days = (p.discharge_date - p.admission_date).days + 1
-            else:
-                days = (datetime.now().date() - p.admission_date).days + 1
-
-            result.append(PatientResponse(
-                id=p.id,
-                hospital_number=p.hospital_number,
-                name=p.name,
-                gender=p.gender,
-                age=p.age,
-                admission_date=p.admission_date,
-                discharge_date=p.discharge_date,
-                diagnosis=p.diagnosis,
-                chief_complaint=p.chief_complaint,
-                past_history=p.past_history,
-                allergy_history=p.allergy_history,
-                specialist_exam=p.specialist_exam,
-                days_in_hospital=days
-            ))
-
-        return result
+        result = await session.run(_query_patients, include_discharged, search, page)
+        return page_response(response, result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _get_patient(session, hospital_number: str):
+    from database.queries import PATIENT_BY_HOSPITAL_NUMBER
+    from database import readers
+
+    patient = PATIENT_BY_HOSPITAL_NUMBER.execute(
+        session, {"hospital_number": hospital_number}).scalars().first()
+
+    if not patient:
+        # 主库中没有时查归档库
+        row = readers.find_archived_patient(session, hospital_number)
+        if row is None:
+            raise HTTPException(status_code=404, detail="患者不存在")
+        return _row_to_dict(row)
+
+    return _to_response(patient)
+
 @router.get("/{hospital_number}", response_model=PatientResponse)
 async def get_patient(hospital_number: str, session = Depends(get_session)):
     """根据住院号获取患者"""
     try:
-        from database.models import Patient
-
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
+        return await session.run(_get_patient, hospital_number)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if not patient:
+# 工作区一次取回的内容（include 参数可选的值）
+BUNDLE_SECTIONS = ("notes", "reminders", "rehab_plan", "rehab_progress")
+
+class PatientBundleResponse(BaseModel):
+    patient: PatientResponse
+    notes: Optional[List[NoteResponse]] = None
+    reminders: Optional[List[ReminderResponse]] = None
+    rehab_plan: Optional[RehabPlanResponse] = None
+    rehab_progress: Optional[List[RehabProgressResponse]] = None
+
+def _bundle_sections(include: Optional[str]) -> tuple:
+    if not include:
+        return BUNDLE_SECTIONS
+    sections = tuple(s.strip() for s in include.split(",") if s.strip())
+    unknown = [s for s in sections if s not in BUNDLE_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400,
+                            detail=f"未知的内容: {', '.join(unknown)}，可选 {', '.join(BUNDLE_SECTIONS)}")
+    return sections
+
+def _get_patient_bundle(session, hospital_number: str, sections: tuple) -> dict:
+    from sqlalchemy.orm import selectinload
+    from database.models import Patient
+    from database.queries import PATIENT_BY_HOSPITAL_NUMBER
+    from database import readers
+
+    relationships = {
+        "notes": Patient.progress_notes,
+        "reminders": Patient.reminders,
+        "rehab_plan": Patient.rehab_plan,
+        "rehab_progress": Patient.rehab_progress,
+    }
+    # 每个关系一条 WHERE patient_id IN (...) 查询，全部在同一个会话中完成
+    stmt = PATIENT_BY_HOSPITAL_NUMBER.statement.options(
+        *(selectinload(relationships[section]) for section in sections))
+    patient = PATIENT_BY_HOSPITAL_NUMBER.execute(
+        session, {"hospital_number": hospital_number}, statement=stmt).scalars().first()
+
+    if not patient:
+        # 归档患者只返回基本信息，病程记录等在归档库中
+        row = readers.find_archived_patient(session, hospital_number)
+        if row is None:
             raise HTTPException(status_code=404, detail="患者不存在")
-
-        # 计算住院天数（入院当天算第1天，所以需要 +1）
-        if patient.discharge_date:
-            days = (patient.discharge_date - patient.admission_date).days + 1
-        else:
-            days = (datetime.now().date() - patient.admission_date).days + 1
-
-        return PatientResponse(
-            id=patient.id,
-            hospital_number=patient.hospital_number,
-            name=patient.name,
-            gender=patient.gender,
-            age=patient.age,
-            admission_date=patient.admission_date,
-            discharge_date=patient.discharge_date,
-            diagnosis=patient.diagnosis,
-            chief_complaint=patient.chief_complaint,
-            past_history=patient.past_history,
-            allergy_history=patient.allergy_history,
-            specialist_exam=patient.specialist_exam,
-            days_in_hospital=days
-        )
+        bundle = {"patient": _row_to_dict(row)}
+        for section in sections:
+            bundle[section] = None if section == "rehab_plan" else []
+        return PatientBundleResponse.model_validate(bundle)
+
+    bundle = {"patient": _to_response(patient)}
+    # 排序与各自的列表接口一致
+    if "notes" in sections:
+        bundle["notes"] = sorted(patient.progress_notes, key=lambda n: (n.record_date, n.id), reverse=True)
+    if "reminders" in sections:
+        bundle["reminders"] = sorted(patient.reminders, key=lambda r: (r.reminder_date, r.id))
+    if "rehab_plan" in sections:
+        bundle["rehab_plan"] = patient.rehab_plan
+    if "rehab_progress" in sections:
+        bundle["rehab_progress"] = sorted(patient.rehab_progress, key=lambda p: (p.record_date, p.id),
+                                          reverse=True)
+    return PatientBundleResponse.model_validate(bundle, from_attributes=True)
+
+@router.get("/{hospital_number}/bundle", response_model=PatientBundleResponse)
+async def get_patient_bundle(
+    hospital_number: str,
+    include: Optional[str] = Query(None, description="逗号分隔的内容：notes、reminders、rehab_plan、rehab_progress，默认全部"),
+    session = Depends(get_session)
+):
+    """打开工作区所需的患者信息、病程记录、提醒、康复计划和康复进展（一次请求，未选择的内容为 null）"""
+    try:
+        return await session.run(_get_patient_bundle, hospital_number, _bundle_sections(include))
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _create_patient(session, patient: PatientCreate):
+    from database.models import Patient
+
+    # 检查住院号是否已存在
+    existing = session.query(Patient).filter(
+        Patient.hospital_number == patient.hospital_number
+    ).first()
+
+    if existing:
+        raise HTTPException(status_code=400, detail="住院号已存在")
+
+    # 创建新患者
+    new_patient = Patient(**patient.model_dump())
+    session.add(new_patient)
+    session.flush()
+    session.refresh(new_patient)
+
+    return _to_response(new_patient)
+
 @router.post("/", response_model=PatientResponse)
 async def create_patient(patient: PatientCreate, session = Depends(get_session)):
     """创建新患者"""
     try:
-        from database.models import Patient
-
-        # 检查住院号是否已存在
-        existing = session.query(Patient).filter(
-            Patient.hospital_number == patient.hospital_number
-        ).first()
-
-        if existing:
-            raise HTTPException(status_code=400, detail="住院号已存在")
-
-        # 创建新患者
-        new_patient = Patient(**patient.model_dump())
-        session.add(new_patient)
-        session.commit()
-        session.refresh(new_patient)
-
-        # 计算住院天数（入院当天算第1天，所以需要 +1）
-        days = (datetime.now().date() - new_patient.admission_date).days + 1
-
-        return PatientResponse(
-            id=new_patient.id,
-            hospital_number=new_patient.hospital_number,
-            name=new_patient.name,
-            gender=new_patient.gender,
-            age=new_patient.age,
-            admission_date=new_patient.admission_date,
-            discharge_date=new_patient.discharge_date,
-            diagnosis=new_patient.diagnosis,
-            chief_complaint=new_patient.chief_complaint,
-            past_history=new_patient.past_history,
-            allergy_history=new_patient.allergy_history,
-            specialist_exam=new_patient.specialist_exam,
-            days_in_hospital=days
-        )
+        created = await session.write(_create_patient, patient)
+        change_bus.publish("patient.created", hospital_number=created.hospital_number)
+        return created
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _update_patient(session, hospital_number: str, patient: PatientUpdate):
+    from database.queries import PATIENT_BY_HOSPITAL_NUMBER
+    from database import readers
+    from database.archive import belongs_in_main, restore_patient, update_archived_patient
+    from database.reminders import REFRESH_FIELDS, refresh_reminders
+
+    update_data = patient.model_dump(exclude_unset=True)
+
+    # 查找患者
+    existing_patient = PATIENT_BY_HOSPITAL_NUMBER.execute(
+        session, {"hospital_number": hospital_number}).scalars().first()
+
+    if not existing_patient:
+        # 已归档的患者：撤销出院或出院日期改到归档期限内时移回主库，否则在归档库中原地修改
+        if "discharge_date" in update_data and belongs_in_main(session, update_data["discharge_date"]):
+            if restore_patient(session, hospital_number):
+                existing_patient = PATIENT_BY_HOSPITAL_NUMBER.execute(
+                    session, {"hospital_number": hospital_number}).scalars().first()
+        elif update_archived_patient(session, hospital_number, {**update_data, "updated_at": datetime.now()}):
+            return _row_to_dict(readers.find_archived_patient(session, hospital_number))
+
+    if not existing_patient:
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 更新字段
+    for field, value in update_data.items():
+        setattr(existing_patient, field, value)
+
+    existing_patient.updated_at = datetime.now()
+    session.flush()
+    session.refresh(existing_patient)
+
+    # 入院/出院日期或姓名变化后重新计算已生成的提醒
+    if REFRESH_FIELDS & update_data.keys():
+        refresh_reminders(session, [existing_patient.hospital_number])
+
+    return _to_response(existing_patient)
+
 @router.put("/{hospital_number}", response_model=PatientResponse)
 async def update_patient(
     hospital_number: str,
@@ -208,73 +296,66 @@ async def update_patient(
 ):
     """更新患者信息"""
     try:
-        from database.models import Patient
-
-        # 查找患者
-        existing_patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
-
-        if not existing_patient:
-            raise HTTPException(status_code=404, detail="患者不存在")
-
-        # 更新字段
-        update_data = patient.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(existing_patient, field, value)
-
-        existing_patient.updated_at = datetime.now()
-        session.commit()
-        session.refresh(existing_patient)
-
-        # 计算住院天数（入院当天算第1天，所以需要 +1）
-        if existing_patient.discharge_date:
-            days = (existing_patient.discharge_date - existing_patient.admission_date).days + 1
-        else:
-            days = (datetime.now().date() - existing_patient.admission_date).days + 1
-
-        return PatientResponse(
-            id=existing_patient.id,
-            hospital_number=existing_patient.hospital_number,
-            name=existing_patient.name,
-            gender=existing_patient.gender,
-            age=existing_patient.age,
-            admission_date=existing_patient.admission_date,
-            discharge_date=existing_patient.discharge_date,
-            diagnosis=existing_patient.diagnosis,
-            chief_complaint=existing_patient.chief_complaint,
-            past_history=existing_patient.past_history,
-            allergy_history=existing_patient.allergy_history,
-            specialist_exam=existing_patient.specialist_exam,
-            days_in_hospital=days
-        )
+        updated = await session.write(_update_patient, hospital_number, patient)
+        change_bus.publish("patient.updated", hospital_number=hospital_number)
+        return updated
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/{hospital_number}")
-async def delete_patient(hospital_number: str, session = Depends(get_session)):
-    """删除患者（软删除，设置出院日期）"""
-    try:
-        from database.models import Patient
+def _discharge_patient(session, hospital_number: str):
+    from database.queries import PATIENT_BY_HOSPITAL_NUMBER
+    from database import readers
+    from database.reminders import refresh_reminders
 
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
+    patient = PATIENT_BY_HOSPITAL_NUMBER.execute(
+        session, {"hospital_number": hospital_number}).scalars().first()
 
-        if not patient:
-            raise HTTPException(status_code=404, detail="患者不存在")
+    if not patient:
+        # 归档库中的患者都已出院
+        if readers.find_archived_patient(session, hospital_number) is not None:
+            return
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 软删除：设置出院日期为今天，出院日之后已生成的提醒随之删除
+    patient.discharge_date = datetime.now().date()
+    patient.updated_at = datetime.now()
+    session.flush()
+    refresh_reminders(session, [hospital_number])
+
+
+def _remove_patient(session, hospital_number: str):
+    from database.queries import PATIENT_BY_HOSPITAL_NUMBER
+
+    patient = PATIENT_BY_HOSPITAL_NUMBER.execute(
+        session, {"hospital_number": hospital_number}).scalars().first()
+    if not patient:
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 子表记录由外键 ON DELETE CASCADE 删除，只执行一条 DELETE
+    session.delete(patient)
+    session.flush()
+
+
+@router.delete("/{hospital_number}")
+async def delete_patient(
+    hospital_number: str,
+    permanent: bool = Query(False, description="永久删除患者及其全部病程记录、提醒和康复数据"),
+    session = Depends(get_session)
+):
+    """删除患者（默认软删除，设置出院日期；permanent=true 时永久删除）"""
+    try:
+        if permanent:
+            await session.write(_remove_patient, hospital_number)
+            change_bus.publish("patient.deleted", hospital_number=hospital_number)
+            return {"message": "患者已删除", "hospital_number": hospital_number}
 
-        # 软删除：设置出院日期为今天
-        patient.discharge_date = datetime.now().date()
-        patient.updated_at = datetime.now()
-        session.commit()
+        await session.write(_discharge_patient, hospital_number)
+        change_bus.publish("patient.discharged", hospital_number=hospital_number)
 
         return {"message": "患者已出院", "hospital_number": hospital_number}
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
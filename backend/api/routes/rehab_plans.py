@@ -1,12 +1,16 @@
 """
 康复计划API路由
 """
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date, datetime
 import json
 
+from backend.api.pagination import page_params, page_response
+from database.pagination import PageRequest
+from database.readers import REHAB_PROGRESS_LIST
+
 router = APIRouter()
 
 # Pydantic模型
@@ -47,12 +51,11 @@ def get_session(request: Request):
 async def get_rehab_plan(hospital_number: str, session = Depends(get_session)):
     """获取患者康复计划"""
     try:
-        from database.models import RehabPlan, Patient
+        from database.models import RehabPlan
+        from database.identity_cache import lookup_patient
 
         # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
+        patient = lookup_patient(session, hospital_number)
 
         if not patient:
             raise HTTPException(status_code=404, detail="患者不存在")
@@ -90,12 +93,11 @@ async def create_rehab_plan(
 ):
     """创建康复计划"""
     try:
-        from database.models import RehabPlan, Patient
+        from database.models import RehabPlan
+        from database.identity_cache import lookup_patient
 
         # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
+        patient = lookup_patient(session, hospital_number)
 
         if not patient:
             raise HTTPException(status_code=404, detail="患者不存在")
@@ -137,36 +139,26 @@ async def create_rehab_plan(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{hospital_number}/progress", response_model=List[RehabProgressResponse])
-async def get_rehab_progress(hospital_number: str, session = Depends(get_session)):
-    """获取康复进展记录"""
+async def get_rehab_progress(
+    hospital_number: str,
+    response: Response,
+    page: PageRequest = Depends(page_params(REHAB_PROGRESS_LIST)),
+    session = Depends(get_session)
+):
+    """获取康复进展记录（按记录日期倒序，支持游标分页）"""
     try:
-        from database.models import RehabProgress, Patient
+        from database import readers
+        from database.identity_cache import lookup_patient
 
         # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
+        patient = lookup_patient(session, hospital_number)
 
         if not patient:
             raise HTTPException(status_code=404, detail="患者不存在")
 
         # 获取进展记录
-        progress_list = session.query(RehabProgress).filter(
-            RehabProgress.patient_id == patient.id
-        ).order_by(RehabProgress.record_date.desc()).all()
-
-        return [
-            RehabProgressResponse(
-                id=p.id,
-                patient_id=p.patient_id,
-                hospital_number=p.hospital_number,
-                record_date=p.record_date,
-                content=p.content,
-                score=p.score,
-                created_at=p.created_at
-            )
-            for p in progress_list
-        ]
+        result = readers.page_rehab_progress(session, patient.id, page)
+        return page_response(response, result)
     except HTTPException:
         raise
     except Exception as e:
@@ -180,12 +172,11 @@ async def create_rehab_progress(
 ):
     """添加康复进展记录"""
     try:
-        from database.models import RehabProgress, Patient
+        from database.models import RehabProgress
+        from database.identity_cache import lookup_patient
 
         # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
+        patient = lookup_patient(session, hospital_number)
 
         if not patient:
             raise HTTPException(status_code=404, detail="患者不存在")
@@ -1,13 +1,25 @@
 """
 提醒管理API路由
 """
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import date, datetime
 
+from backend.api.dependencies import get_async_session as get_session
+from backend.api.pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, page_params, page_response
+from backend.api.change_feed import change_bus
+from database.pagination import PageRequest, PaginationError, validate_page_request
+from database.readers import PATIENT_REMINDER_LIST, UPCOMING_REMINDER_LIST
+from database.reminders import MAX_HORIZON_DAYS, RULES, select_rules
+
 router = APIRouter()
 
+# 调试端点每页的提醒数
+DEBUG_PAGE_SIZE = 100
+# 打开患者列表时默认只生成每日病程记录提醒，其他规则按需指定
+WARD_DEFAULT_RULES = "daily_note"
+
 # Pydantic模型
 class ReminderResponse(BaseModel):
     id: int
@@ -21,112 +33,102 @@ class ReminderResponse(BaseModel):
     is_completed: bool
     completed_at: Optional[datetime]
 
-def get_session(request: Request):
-    """获取数据库会话"""
-    db_manager = request.app.state.db_manager
-    session = db_manager.get_session()
-    try:
-        yield session
-    finally:
-        session.close()
+def _to_response(reminder) -> ReminderResponse:
+    """转换为响应模型"""
+    return ReminderResponse(
+        id=reminder.id,
+        patient_id=reminder.patient_id,
+        hospital_number=reminder.hospital_number,
+        reminder_type=reminder.reminder_type,
+        reminder_date=reminder.reminder_date,
+        day_number=reminder.day_number,
+        description=reminder.description,
+        priority=reminder.priority,
+        is_completed=reminder.is_completed,
+        completed_at=reminder.completed_at
+    )
+
+def _get_today_reminders(session, priority: Optional[str], page: PageRequest):
+    from database import readers
+
+    # 今日及未来的未完成提醒，按提醒日期和优先级排序
+    return readers.page_upcoming_reminders(session, date.today(), page, priority)
 
-@router.get("/today")
+@router.get("/today", response_model=List[ReminderResponse])
 async def get_today_reminders(
+    response: Response,
     priority: Optional[str] = None,
+    page: PageRequest = Depends(page_params(UPCOMING_REMINDER_LIST)),
     session = Depends(get_session)
 ):
-    """获取今日及未来的提醒"""
+    """获取今日及未来的提醒（支持游标分页）"""
     try:
-        from database.models import Reminder, Patient
-        from sqlalchemy import and_
-
-        today = date.today()
-
-        # 构建查询 - 获取今日及未来的未完成提醒
-        query = session.query(Reminder, Patient).join(
-            Patient, Reminder.patient_id == Patient.id
-        ).filter(
-            and_(
-                Reminder.reminder_date >= today,  # 今日或未来
-                Reminder.is_completed == False
-            )
-        )
-
-        reminders = query.all()
-
-        # 优先级过滤
-        if priority:
-            query = query.filter(Reminder.priority == priority)
-
-        # 按提醒日期和优先级排序
-        priority_order = {"紧急": 0, "高": 1, "中": 2, "低": 3}
-        reminders = query.all()
-
-        # 排序
-        reminders.sort(key=lambda x: (x[0].reminder_date, priority_order.get(x[0].priority, 4)))
-
-        # 格式化返回
-        result = []
-        for reminder, patient in reminders:
-            result.append(ReminderResponse(
-                id=reminder.id,
-                patient_id=reminder.patient_id,
-                hospital_number=reminder.hospital_number,
-                reminder_type=reminder.reminder_type,
-                reminder_date=reminder.reminder_date,
-                day_number=reminder.day_number,
-                description=reminder.description,
-                priority=reminder.priority,
-                is_completed=reminder.is_completed,
-                completed_at=reminder.completed_at
-            ))
-
-        return result
+        result = await session.run(_get_today_reminders, priority, page)
+        return page_response(response, result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _get_tomorrow_reminders(session):
+    from database.queries import REMINDERS_DUE_ON
+
+    from datetime import timedelta
+    tomorrow = date.today() + timedelta(days=1)
+
+    reminders = REMINDERS_DUE_ON.execute(session, {"day": tomorrow}).scalars().all()
+
+    # 格式化返回
+    return [_to_response(reminder) for reminder in reminders]
+
 @router.get("/tomorrow")
 async def get_tomorrow_reminders(
     session = Depends(get_session)
 ):
     """获取明日提醒"""
     try:
-        from database.models import Reminder
-        from sqlalchemy import and_
-
-        from datetime import timedelta
-        tomorrow = date.today() + timedelta(days=1)
-
-        # 构建查询
-        query = session.query(Reminder).filter(
-            and_(
-                Reminder.reminder_date == tomorrow,
-                Reminder.is_completed == False
-            )
-        )
-
-        reminders = query.all()
-
-        # 格式化返回
-        result = []
-        for reminder in reminders:
-            result.append(ReminderResponse(
-                id=reminder.id,
-                patient_id=reminder.patient_id,
-                hospital_number=reminder.hospital_number,
-                reminder_type=reminder.reminder_type,
-                reminder_date=reminder.reminder_date,
-                day_number=reminder.day_number,
-                description=reminder.description,
-                priority=reminder.priority,
-                is_completed=reminder.is_completed,
-                completed_at=reminder.completed_at
-            ))
-
-        return result
+        return await session.run(_get_tomorrow_reminders)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _create_custom_reminder(session, reminder_data: dict):
+    from database.models import Reminder
+    from database.identity_cache import lookup_patient
+
+    # 获取患者
+    patient = lookup_patient(session, reminder_data.get("hospital_number"))
+
+    if not patient:
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 处理提醒日期
+    reminder_date_str = reminder_data.get("reminder_date")
+    if reminder_date_str:
+        # 如果是字符串，转换为date对象
+        if isinstance(reminder_date_str, str):
+            reminder_date = datetime.strptime(reminder_date_str, "%Y-%m-%d").date()
+        else:
+            reminder_date = reminder_date_str
+    else:
+        reminder_date = date.today()
+
+    # 计算住院天数
+    days_in_hospital = (reminder_date - patient.admission_date).days + 1
+
+    # 创建提醒（简化版：固定类型为"提醒"，优先级为"高"）
+    new_reminder = Reminder(
+        patient_id=patient.id,
+        hospital_number=patient.hospital_number,
+        reminder_type="提醒",
+        reminder_date=reminder_date,
+        day_number=days_in_hospital,
+        description=reminder_data.get("description", ""),
+        priority="高"
+    )
+
+    session.add(new_reminder)
+    session.flush()
+
+    return new_reminder.id
+
 @router.post("/custom")
 async def create_custom_reminder(
     reminder_data: dict,
@@ -134,44 +136,9 @@ async def create_custom_reminder(
 ):
     """创建自定义提醒（简化版，用于明日提醒）"""
     try:
-        from database.models import Reminder, Patient
-
-        # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == reminder_data.get("hospital_number")
-        ).first()
-
-        if not patient:
-            raise HTTPException(status_code=404, detail="患者不存在")
-
-        # 处理提醒日期
-        reminder_date_str = reminder_data.get("reminder_date")
-        if reminder_date_str:
-            # 如果是字符串，转换为date对象
-            if isinstance(reminder_date_str, str):
-                from datetime import datetime
-                reminder_date = datetime.strptime(reminder_date_str, "%Y-%m-%d").date()
-            else:
-                reminder_date = reminder_date_str
-        else:
-            reminder_date = date.today()
-
-        # 计算住院天数
-        days_in_hospital = (reminder_date - patient.admission_date).days + 1
-
-        # 创建提醒（简化版：固定类型为"提醒"，优先级为"高"）
-        new_reminder = Reminder(
-            patient_id=patient.id,
-            hospital_number=patient.hospital_number,
-            reminder_type="提醒",
-            reminder_date=reminder_date,
-            day_number=days_in_hospital,
-            description=reminder_data.get("description", ""),
-            priority="高"
-        )
-
-        session.add(new_reminder)
-        session.commit()
+        reminder_id = await session.write(_create_custom_reminder, reminder_data)
+        change_bus.publish("reminder.created", id=reminder_id,
+                           hospital_number=reminder_data.get("hospital_number"))
 
         return {
             "success": True,
@@ -180,9 +147,25 @@ async def create_custom_reminder(
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _mark_reminder_complete(session, reminder_id: int):
+    from database.models import Reminder
+
+    reminder = session.query(Reminder).filter(
+        Reminder.id == reminder_id
+    ).first()
+
+    if not reminder:
+        raise HTTPException(status_code=404, detail="提醒不存在")
+
+    reminder.is_completed = True
+    reminder.completed_at = datetime.now()
+
+    session.flush()
+
+    return reminder.hospital_number
+
 @router.put("/{reminder_id}/complete")
 async def mark_reminder_complete(
     reminder_id: int,
@@ -190,19 +173,8 @@ async def mark_reminder_complete(
 ):
     """标记提醒完成"""
     try:
-        from database.models import Reminder
-
-        reminder = session.query(Reminder).filter(
-            Reminder.id == reminder_id
-        ).first()
-
-        if not reminder:
-            raise HTTPException(status_code=404, detail="提醒不存在")
-
-        reminder.is_completed = True
-        reminder.completed_at = datetime.now()
-
-        session.commit()
+        hospital_number = await session.write(_mark_reminder_complete, reminder_id)
+        change_bus.publish("reminder.completed", id=reminder_id, hospital_number=hospital_number)
 
         return {
             "success": True,
@@ -211,58 +183,72 @@ async def mark_reminder_complete(
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/debug")
-async def debug_today_endpoint(
-    session = Depends(get_session)
-):
-    """调试今日提醒端点"""
-    from database.models import Reminder, Patient
-    from sqlalchemy import and_
+def _debug_today(session, page: PageRequest):
+    from database import readers
+    from database.models import Reminder
+    from sqlalchemy import func, select
 
     today = date.today()
 
-    # 1. 检查数据库中所有未完成提醒
-    all_incomplete = session.query(Reminder).filter(Reminder.is_completed == False).all()
-
-    # 2. 检查所有符合条件（今日及未来）的提醒
-    query = session.query(Reminder, Patient).join(
-        Patient, Reminder.patient_id == Patient.id
-    ).filter(
-        and_(
-            Reminder.reminder_date >= today,
-            Reminder.is_completed == False
-        )
-    )
-    results = query.all()
+    # 1. 未完成提醒总数，及其中今日及未来的数量（只计数，不逐条返回）
+    all_incomplete_count, filtered_count = session.execute(
+        select(func.count(), func.count().filter(Reminder.reminder_date >= today))
+        .where(Reminder.is_completed == False)
+    ).one()
+
+    # 2. 今日及未来的未完成提醒，按日期、优先级分页
+    result = readers.page_upcoming_reminders(session, today, page)
 
     return {
         "today": str(today),
-        "all_incomplete_count": len(all_incomplete),
-        "all_incomplete": [
-            {
-                "id": r.id,
-                "patient_id": r.patient_id,
-                "description": r.description,
-                "date": str(r.reminder_date),
-                "completed": r.is_completed
-            }
-            for r in all_incomplete
-        ],
-        "filtered_count": len(results),
+        "all_incomplete_count": all_incomplete_count,
+        "filtered_count": filtered_count,
         "filtered": [
             {
-                "id": r.id,
-                "patient_id": r.patient_id,
-                "hospital_number": p.hospital_number,
-                "description": r.description,
-                "date": str(r.reminder_date)
+                "id": r["id"],
+                "patient_id": r["patient_id"],
+                "hospital_number": r["hospital_number"],
+                "description": r["description"],
+                "date": str(r["reminder_date"])
             }
-            for r, p in results
+            for r in result.items
         ]
-    }
+    }, result.next_cursor
+
+@router.get("/debug")
+async def debug_today_endpoint(
+    response: Response,
+    limit: int = Query(DEBUG_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session = Depends(get_session)
+):
+    """调试今日提醒端点（今日及未来的未完成提醒按游标分页，下一页游标在 X-Next-Cursor 头中）"""
+    page = PageRequest(limit=limit, cursor=cursor)
+    try:
+        validate_page_request(page, UPCOMING_REMINDER_LIST)
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    body, next_cursor = await session.run(_debug_today, page)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return body
+
+def _delete_reminder(session, reminder_id: int):
+    from database.models import Reminder
+
+    reminder = session.query(Reminder).filter(
+        Reminder.id == reminder_id
+    ).first()
+
+    if not reminder:
+        raise HTTPException(status_code=404, detail="提醒不存在")
+
+    session.delete(reminder)
+    session.flush()
+
+    return reminder.hospital_number
 
 @router.delete("/{reminder_id}")
 async def delete_reminder(
@@ -271,17 +257,8 @@ async def delete_reminder(
 ):
     """删除提醒"""
     try:
-        from database.models import Reminder
-
-        reminder = session.query(Reminder).filter(
-            Reminder.id == reminder_id
-        ).first()
-
-        if not reminder:
-            raise HTTPException(status_code=404, detail="提醒不存在")
-
-        session.delete(reminder)
-        session.commit()
+        hospital_number = await session.write(_delete_reminder, reminder_id)
+        change_bus.publish("reminder.deleted", id=reminder_id, hospital_number=hospital_number)
 
         return {
             "success": True,
@@ -290,222 +267,113 @@ async def delete_reminder(
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/patient/{hospital_number}")
+def _get_patient_reminders(session, hospital_number: str, upcoming: bool, page: PageRequest):
+    from database import readers
+    from database.identity_cache import lookup_patient
+
+    # 获取患者
+    patient = lookup_patient(session, hospital_number)
+
+    if not patient:
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 获取提醒（upcoming 时只获取今日及以后未完成的提醒）
+    return readers.page_patient_reminders(session, patient.id, page,
+                                          upcoming_from=date.today() if upcoming else None)
+
+@router.get("/patient/{hospital_number}", response_model=List[ReminderResponse])
 async def get_patient_reminders(
     hospital_number: str,
+    response: Response,
     upcoming: bool = False,
+    page: PageRequest = Depends(page_params(PATIENT_REMINDER_LIST)),
     session = Depends(get_session)
 ):
-    """获取患者的提醒"""
+    """获取患者的提醒（按提醒日期排序，支持游标分页）"""
     try:
-        from database.models import Reminder, Patient
-
-        # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
-
-        if not patient:
-            raise HTTPException(status_code=404, detail="患者不存在")
-
-        # 获取提醒
-        query = session.query(Reminder).filter(
-            Reminder.patient_id == patient.id
-        )
-
-        if upcoming:
-            # 只获取未完成的提醒
-            query = query.filter(Reminder.is_completed == False)
-            query = query.filter(Reminder.reminder_date >= date.today())
-
-        reminders = query.order_by(Reminder.reminder_date.asc()).all()
-
-        return [
-            ReminderResponse(
-                id=r.id,
-                patient_id=r.patient_id,
-                hospital_number=r.hospital_number,
-                reminder_type=r.reminder_type,
-                reminder_date=r.reminder_date,
-                day_number=r.day_number,
-                description=r.description,
-                priority=r.priority,
-                is_completed=r.is_completed,
-                completed_at=r.completed_at
-            )
-            for r in reminders
-        ]
+        result = await session.run(_get_patient_reminders, hospital_number, upcoming, page)
+        return page_response(response, result)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _initialize_patient_reminders(session, hospital_number: str, horizon_days: int):
+    from database.identity_cache import lookup_patient
+    from database.reminders import materialize_reminders
+
+    # 获取患者
+    patient = lookup_patient(session, hospital_number)
+
+    if not patient:
+        raise HTTPException(status_code=404, detail="患者不存在")
+
+    # 按规则生成今天起 horizon_days 天内的提醒，已生成的不再重复
+    result = materialize_reminders(session, horizon_days=horizon_days, hospital_numbers=[hospital_number])
+
+    return {
+        "success": True,
+        "message": f"成功创建{result['created_count']}条提醒" if result["created_count"] else "患者提醒已是最新",
+        "created_count": result["created_count"]
+    }
+
 @router.post("/patient/{hospital_number}/initialize")
 async def initialize_patient_reminders(
     hospital_number: str,
+    horizon_days: int = Query(1, ge=1, le=MAX_HORIZON_DAYS, description="从今天起预先生成的天数"),
     session = Depends(get_session)
 ):
-    """为患者创建今日提醒（每天首次访问时调用）"""
+    """为患者按规则生成提醒（每天首次访问时调用）"""
     try:
-        from database.models import Reminder, Patient
-
-        # 获取患者
-        patient = session.query(Patient).filter(
-            Patient.hospital_number == hospital_number
-        ).first()
-
-        if not patient:
-            raise HTTPException(status_code=404, detail="患者不存在")
-
-        # 检查今天是否已有提醒（而不是检查是否已有任何提醒）
-        today = date.today()
-        existing_today = session.query(Reminder).filter(
-            Reminder.patient_id == patient.id,
-            Reminder.reminder_date == today
-        ).count()
-
-        if existing_today > 0:
-            return {
-                "success": True,
-                "message": f"患者今日已有{existing_today}条提醒",
-                "created_count": 0
-            }
-
-        # 计算住院天数（入院当天算第1天）
-        days_in_hospital = (today - patient.admission_date).days + 1
-
-        # 根据住院天数创建提醒
-        reminders_to_create = []
-
-        # 紧急提醒：住院超过85天
-        if days_in_hospital > 85:
-            reminders_to_create.append({
-                "reminder_type": "复查",
-                "reminder_date": date.today(),
-                "day_number": days_in_hospital,
-                "description": f"{patient.name or patient.hospital_number} 住院已超过85天，建议安排复查评估",
-                "priority": "紧急"
-            })
-
-        # 高优先级：住院4天内（第1-4天）
-        if days_in_hospital <= 4:
-            reminders_to_create.append({
-                "reminder_type": "评估",
-                "reminder_date": date.today(),
-                "day_number": days_in_hospital,
-                "description": f"{patient.name or patient.hospital_number} 入院第{days_in_hospital}天，完成初次康复评估",
-                "priority": "高"
-            })
-
-        # 入院第2天：查看检查
-        if days_in_hospital == 2:
-            reminders_to_create.append({
-                "reminder_type": "检查",
-                "reminder_date": date.today(),
-                "day_number": days_in_hospital,
-                "description": f"{patient.name or patient.hospital_number} 入院第2天，查看实验室检查和放射线检查结果",
-                "priority": "高"
-            })
-
-        # 每15天：评估恢复情况
-        if days_in_hospital % 15 == 0:
-            reminders_to_create.append({
-                "reminder_type": "评估",
-                "reminder_date": date.today(),
-                "day_number": days_in_hospital,
-                "description": f"{patient.name or patient.hospital_number} 入院第{days_in_hospital}天（15天周期），评估恢复情况",
-                "priority": "高"
-            })
-
-        # 常规提醒：每日病程记录
-        reminders_to_create.append({
-            "reminder_type": "病程记录",
-            "reminder_date": date.today(),
-            "day_number": days_in_hospital,
-            "description": f"完成{patient.name or patient.hospital_number}的病程记录",
-            "priority": "中"
-        })
-
-        # 批量创建提醒
-        created_count = 0
-        for reminder_data in reminders_to_create:
-            new_reminder = Reminder(
-                patient_id=patient.id,
-                hospital_number=patient.hospital_number,
-                **reminder_data
-            )
-            session.add(new_reminder)
-            created_count += 1
-
-        session.commit()
-
-        return {
-            "success": True,
-            "message": f"成功创建{created_count}条提醒",
-            "created_count": created_count
-        }
+        result = await session.write(_initialize_patient_reminders, hospital_number, horizon_days)
+        if result["created_count"]:
+            change_bus.publish("reminder.created", hospital_number=hospital_number,
+                               count=result["created_count"])
+        return result
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _initialize_all_today_reminders(session, rules: tuple, horizon_days: int = 1):
+    from database.reminders import materialize_reminders
+
+    # 所有在院患者、所选规则一次计算
+    result = materialize_reminders(session, rules=rules, horizon_days=horizon_days)
+    skipped_count = result["patient_count"] - result["changed_patients"]
+
+    return {
+        "success": True,
+        "message": f"为{result['changed_patients']}位患者创建了{result['created_count']}条提醒，"
+                   f"{skipped_count}位患者提醒已是最新",
+        "created_count": result["created_count"],
+        "skipped_count": skipped_count
+    }
+
 @router.post("/initialize-all-today")
-async def initialize_all_today_reminders(session = Depends(get_session)):
-    """为所有在院患者创建今日提醒（前端启动时或切换到患者列表时调用）"""
-    try:
-        from database.models import Reminder, Patient
-
-        today = date.today()
-
-        # 获取所有在院患者
-        patients = session.query(Patient).filter(
-            Patient.discharge_date.is_(None)
-        ).all()
-
-        total_created = 0
-        skipped_count = 0
-
-        for patient in patients:
-            # 检查今天是否已有提醒
-            existing_today = session.query(Reminder).filter(
-                Reminder.patient_id == patient.id,
-                Reminder.reminder_date == today
-            ).count()
-
-            if existing_today > 0:
-                skipped_count += 1
-                continue
-
-            # 计算住院天数
-            days_in_hospital = (today - patient.admission_date).days + 1
-
-            # 只创建每日病程记录提醒
-            new_reminder = Reminder(
-                patient_id=patient.id,
-                hospital_number=patient.hospital_number,
-                reminder_type="病程记录",
-                reminder_date=today,
-                day_number=days_in_hospital,
-                description=f"完成{patient.name or patient.hospital_number}的病程记录",
-                priority="中",
-                is_completed=False
-            )
-            session.add(new_reminder)
-            total_created += 1
-
-        session.commit()
+async def initialize_all_today_reminders(
+    rules: str = Query(WARD_DEFAULT_RULES, description="逗号分隔的规则标识，all 为全部规则"),
+    horizon_days: int = Query(1, ge=1, le=MAX_HORIZON_DAYS, description="从今天起预先生成的天数"),
+    session = Depends(get_session)
+):
+    """为所有在院患者按规则生成提醒（前端启动时或切换到患者列表时调用）
 
-        return {
-            "success": True,
-            "message": f"为{total_created}位患者创建了今日提醒，{skipped_count}位患者已有提醒",
-            "created_count": total_created,
-            "skipped_count": skipped_count
-        }
+    默认只生成每日病程记录提醒（daily_note），已有当天提醒的患者跳过；
+    rules=all 时按全部规则生成（评估、检查、复查等），也可以逗号分隔指定规则标识。
+    """
+    try:
+        keys = [key.strip() for key in rules.split(",") if key.strip()]
+        selected = RULES if keys == ["all"] else select_rules(keys)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        result = await session.write(_initialize_all_today_reminders, selected, horizon_days)
+        if result["created_count"]:
+            # 涉及多位患者，不带住院号，客户端重新加载提醒列表
+            change_bus.publish("reminder.created", count=result["created_count"])
+        return result
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
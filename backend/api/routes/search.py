@@ -0,0 +1,61 @@
+"""
+全文检索API路由
+"""
+from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import List, Optional
+from pydantic import BaseModel
+
+from backend.api.dependencies import get_async_session as get_session
+from database.pagination import PaginationError
+
+router = APIRouter()
+
+SEARCH_TYPES = ("patients", "notes", "templates")
+
+class SearchItem(BaseModel):
+    kind: str
+    id: int
+    hospital_number: Optional[str] = None
+    patient_name: Optional[str] = None
+    record_date: Optional[str] = None
+    # 已转义HTML，命中的词用 <mark> 标记
+    title: str
+    snippet: str
+    rank: float
+
+class SearchResponse(BaseModel):
+    query: str
+    items: List[SearchItem]
+    limit: int
+    # 下一页的游标（没有下一页时为 None），按 cursor 参数传回
+    next_cursor: Optional[str] = None
+    has_more: bool
+
+def _search(session, q: str, kinds: Optional[List[str]], limit: int, cursor: Optional[str]):
+    from database.search import search
+
+    return search(session, q, kinds, limit, cursor)
+
+@router.get("/", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=1),
+    type: Optional[List[str]] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    session = Depends(get_session)
+):
+    """检索患者、病程记录和模板（按类别分组、组内按相关度排序，游标分页）"""
+    if type:
+        unknown = [t for t in type if t not in SEARCH_TYPES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支持的检索类型: {', '.join(unknown)}")
+
+    try:
+        result = await session.run(_search, q, type, limit, cursor)
+        return {"query": q, "limit": limit, "has_more": result["next_cursor"] is not None, **result}
+    except PaginationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
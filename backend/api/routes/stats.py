@@ -0,0 +1,65 @@
+"""
+数据统计API路由
+"""
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
+from pydantic import BaseModel
+
+from backend.api.dependencies import get_async_session as get_session
+
+router = APIRouter()
+
+class PatientStats(BaseModel):
+    patient_id: int
+    hospital_number: str
+    name: Optional[str]
+    admission_date: str
+    discharge_date: Optional[str]
+    days_in_hospital: int
+    note_count: int
+    last_note_date: Optional[str]
+    expected_records: int
+    recorded_records: int
+    missing_records: int
+    pending_reminders: int
+
+class StatsSummary(BaseModel):
+    patient_count: int
+    in_hospital_count: int
+    note_count: int
+    expected_records: int
+    recorded_records: int
+    missing_records: int
+    completion_rate: float
+    pending_reminders: int
+
+class StatsResponse(BaseModel):
+    summary: StatsSummary
+    patients: List[PatientStats]
+
+def _get_stats(session, include_discharged: bool):
+    from database.stats import read_patient_stats
+
+    return read_patient_stats(session, include_discharged)
+
+@router.get("/", response_model=StatsResponse)
+async def get_stats(
+    include_discharged: bool = False,
+    session = Depends(get_session)
+):
+    """获取数据统计（患者数、记录完成情况、待办提醒）及每位患者的统计"""
+    try:
+        return await session.run(_get_stats, include_discharged)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/check")
+async def check_stats(request: Request, rebuild: bool = False):
+    """校验统计表与病程记录、提醒是否一致，rebuild=true 时重建统计表"""
+    db_manager = request.app.state.db_manager
+    try:
+        result = await run_in_threadpool(db_manager.check_stats, rebuild)
+        return result.to_dict()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
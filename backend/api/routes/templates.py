@@ -1,10 +1,15 @@
 """
 模板管理API路由
 """
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from typing import List, Optional
 
+from backend.api.dependencies import get_async_session as get_session
+from backend.api.pagination import page_params, page_response
+from database.pagination import PageRequest
+from database.readers import TEMPLATE_LIST
+
 router = APIRouter()
 
 # Pydantic模型
@@ -26,45 +31,46 @@ class TemplateResponse(BaseModel):
     is_system: bool
     usage_count: int
 
-def get_session(request: Request):
-    """获取数据库会话"""
-    db_manager = request.app.state.db_manager
-    session = db_manager.get_session()
-    try:
-        yield session
-    finally:
-        session.close()
+def _to_response(t) -> TemplateResponse:
+    """转换为响应模型"""
+    return TemplateResponse(
+        id=t.id,
+        category=t.category,
+        template_name=t.template_name,
+        content=t.content,
+        is_system=t.is_system,
+        usage_count=t.usage_count
+    )
+
+def _get_templates(session, category: Optional[str], page: PageRequest):
+    from database import readers
 
-@router.get("/")
+    return readers.page_templates(session, page, category)
+
+@router.get("/", response_model=List[TemplateResponse])
 async def get_templates(
+    response: Response,
     category: Optional[str] = None,
+    page: PageRequest = Depends(page_params(TEMPLATE_LIST)),
     session = Depends(get_session)
 ):
-    """获取模板列表"""
+    """获取模板列表（按使用次数倒序，支持游标分页；view=summary 时不返回模板内容）"""
     try:
-        from database.models import Template
-
-        query = session.query(Template)
-
-        if category:
-            query = query.filter(Template.category == category)
-
-        templates = query.order_by(Template.usage_count.desc()).all()
-
-        return [
-            TemplateResponse(
-                id=t.id,
-                category=t.category,
-                template_name=t.template_name,
-                content=t.content,
-                is_system=t.is_system,
-                usage_count=t.usage_count
-            )
-            for t in templates
-        ]
+        result = await session.run(_get_templates, category, page)
+        return page_response(response, result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _create_template(session, template: TemplateCreate):
+    from database.models import Template
+
+    new_template = Template(**template.model_dump())
+    session.add(new_template)
+    session.flush()
+    session.refresh(new_template)
+
+    return _to_response(new_template)
+
 @router.post("/", response_model=TemplateResponse)
 async def create_template(
     template: TemplateCreate,
@@ -72,25 +78,34 @@ async def create_template(
 ):
     """创建模板"""
     try:
-        from database.models import Template
-
-        new_template = Template(**template.model_dump())
-        session.add(new_template)
-        session.commit()
-        session.refresh(new_template)
-
-        return TemplateResponse(
-            id=new_template.id,
-            category=new_template.category,
-            template_name=new_template.template_name,
-            content=new_template.content,
-            is_system=new_template.is_system,
-            usage_count=new_template.usage_count
-        )
+        return await session.write(_create_template, template)
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _update_template(session, template_id: int, template: TemplateUpdate):
+    from database.models import Template
+
+    existing_template = session.query(Template).filter(
+        Template.id == template_id
+    ).first()
+
+    if not existing_template:
+        raise HTTPException(status_code=404, detail="模板不存在")
+
+    # 系统模板不允许修改
+    if existing_template.is_system:
+        raise HTTPException(status_code=400, detail="系统模板不允许修改")
+
+    # 更新字段
+    update_data = template.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(existing_template, field, value)
+
+    session.flush()
+    session.refresh(existing_template)
+
+    return _to_response(existing_template)
+
 @router.put("/{template_id}", response_model=TemplateResponse)
 async def update_template(
     template_id: int,
@@ -99,89 +114,63 @@ async def update_template(
 ):
     """更新模板"""
     try:
-        from database.models import Template
-
-        existing_template = session.query(Template).filter(
-            Template.id == template_id
-        ).first()
-
-        if not existing_template:
-            raise HTTPException(status_code=404, detail="模板不存在")
-
-        # 系统模板不允许修改
-        if existing_template.is_system:
-            raise HTTPException(status_code=400, detail="系统模板不允许修改")
-
-        # 更新字段
-        update_data = template.model_dump(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(existing_template, field, value)
-
-        session.commit()
-        session.refresh(existing_template)
-
-        return TemplateResponse(
-            id=existing_template.id,
-            category=existing_template.category,
-            template_name=existing_template.template_name,
-            content=existing_template.content,
-            is_system=existing_template.is_system,
-            usage_count=existing_template.usage_count
-        )
+        return await session.write(_update_template, template_id, template)
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.delete("/{template_id}")
-async def delete_template(template_id: int, session = Depends(get_session)):
-    """删除模板"""
-    try:
-        from database.models import Template
+def _delete_template(session, template_id: int):
+    from database.models import Template
 
-        template = session.query(Template).filter(
-            Template.id == template_id
-        ).first()
+    template = session.query(Template).filter(
+        Template.id == template_id
+    ).first()
 
-        if not template:
-            raise HTTPException(status_code=404, detail="模板不存在")
+    if not template:
+        raise HTTPException(status_code=404, detail="模板不存在")
 
-        # 系统模板不允许删除
-        if template.is_system:
-            raise HTTPException(status_code=400, detail="系统模板不允许删除")
+    # 系统模板不允许删除
+    if template.is_system:
+        raise HTTPException(status_code=400, detail="系统模板不允许删除")
 
-        session.delete(template)
-        session.commit()
+    session.delete(template)
+    session.flush()
+
+@router.delete("/{template_id}")
+async def delete_template(template_id: int, session = Depends(get_session)):
+    """删除模板"""
+    try:
+        await session.write(_delete_template, template_id)
 
         return {"success": True, "message": "模板已删除"}
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/{template_id}/use")
-async def use_template(template_id: int, session = Depends(get_session)):
-    """使用模板（增加使用计数）"""
-    try:
-        from database.models import Template
+def _use_template(session, template_id: int):
+    from database.usage_buffer import record_template_use
+
+    usage_count = record_template_use(session, template_id)
+    if usage_count is None:
+        raise HTTPException(status_code=404, detail="模板不存在")
 
-        template = session.query(Template).filter(
-            Template.id == template_id
-        ).first()
+    return usage_count
 
-        if not template:
-            raise HTTPException(status_code=404, detail="模板不存在")
+@router.post("/{template_id}/use")
+async def use_template(template_id: int, session = Depends(get_session)):
+    """使用模板（增加使用计数）
 
-        template.usage_count += 1
-        session.commit()
+    计数先进入写缓冲，定时或累计到阈值后批量写入；返回的 usage_count 包含尚未写入的次数。
+    """
+    try:
+        usage_count = await session.run(_use_template, template_id)
 
-        return {"success": True, "usage_count": template.usage_count}
+        return {"success": True, "usage_count": usage_count}
     except HTTPException:
         raise
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -248,6 +237,28 @@ async def extract_phrases(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"提取失败: {str(e)}")
 
+def _batch_create_templates(session, phrases: List[PhraseItem]):
+    from database.models import Template
+
+    created_count = 0
+    for phrase in phrases:
+        # 生成模板名称（取内容前20个字符）
+        template_name = phrase.content[:20] + "..." if len(phrase.content) > 20 else phrase.content
+
+        new_template = Template(
+            category=phrase.category,
+            template_name=template_name,
+            content=phrase.content,
+            is_system=False,
+            usage_count=0
+        )
+        session.add(new_template)
+        created_count += 1
+
+    session.flush()
+
+    return created_count
+
 @router.post("/batch")
 async def batch_create_templates(
     request: BatchCreateRequest,
@@ -255,24 +266,7 @@ async def batch_create_templates(
 ):
     """批量创建模板"""
     try:
-        from database.models import Template
-
-        created_count = 0
-        for phrase in request.phrases:
-            # 生成模板名称（取内容前20个字符）
-            template_name = phrase.content[:20] + "..." if len(phrase.content) > 20 else phrase.content
-
-            new_template = Template(
-                category=phrase.category,
-                template_name=template_name,
-                content=phrase.content,
-                is_system=False,
-                usage_count=0
-            )
-            session.add(new_template)
-            created_count += 1
-
-        session.commit()
+        created_count = await session.write(_batch_create_templates, request.phrases)
 
         return {
             "success": True,
@@ -280,5 +274,4 @@ async def batch_create_templates(
             "message": f"成功创建 {created_count} 条模板"
         }
     except Exception as e:
-        session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
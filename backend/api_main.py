@@ -6,6 +6,7 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
+import asyncio
 import uvicorn
 
 # 导入现有模块
@@ -14,6 +15,8 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database import DBManager
+from backend.api.conditional import ConditionalGetMiddleware
+from backend.api.change_feed import change_bus
 from ai_services import AIServiceManager
 # 知识库功能可选（需要 chromadb）
 try:
@@ -28,6 +31,45 @@ db_manager = None
 ai_manager = None
 kb_manager = None
 
+async def run_periodically(name: str, interval_seconds: float, func, *args):
+    """在后台线程中定期执行维护任务，出错只打印警告"""
+    while True:
+        try:
+            await asyncio.to_thread(func, *args)
+        except Exception as e:
+            print(f"[WARN] {name}失败: {e}")
+        await asyncio.sleep(interval_seconds)
+
+def run_backup(directory: str, backup_config: dict):
+    """定时备份：打印耗时和持有主库的时间"""
+    for result in db_manager.backup(
+        directory,
+        keep=backup_config.get("keep", 7),
+        pages_per_step=backup_config.get("pages_per_step", 256),
+        step_pause=backup_config.get("step_pause_ms", 5) / 1000,
+    ):
+        print(f"[OK] 数据库已备份到 {result.path}，耗时 {result.duration * 1000:.0f}ms，"
+              f"持有源库 {result.held * 1000:.0f}ms（单步最长 {result.max_step * 1000:.1f}ms）")
+
+def run_archive(older_than_days: int):
+    """定时归档：有患者移入归档库时通知订阅的客户端重新加载"""
+    result = db_manager.archive_discharged(older_than_days)
+    if result.patients:
+        change_bus.resync("archive")
+        print(f"[OK] 已归档 {result.patients} 位出院患者")
+
+def run_compression(batch_size: int):
+    """压缩已有的长文本，出错只打印警告"""
+    try:
+        result = db_manager.compress_text(batch_size)
+    except Exception as e:
+        print(f"[WARN] 长文本压缩失败: {e}")
+        return
+    rows = sum(result.rows.values())
+    if rows or result.trained:
+        print(f"[OK] 已压缩 {rows} 行长文本，耗时 {result.duration:.1f}s"
+              f"{'，已训练压缩字典' if result.trained else ''}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
@@ -44,9 +86,46 @@ async def lifespan(app: FastAPI):
     # 初始化数据库 - 使用项目根目录的数据库文件
     project_root = os.path.dirname(os.path.dirname(__file__))
     db_path = os.path.join(project_root, config["app"]["database_path"])
-    db_manager = DBManager(db_path)
+    db_config = config.get("database", {})
+    archive_config = db_config.get("archive")
+    archive_path = os.path.join(project_root, archive_config["path"]) if archive_config else None
+    usage_config = db_config.get("template_usage", {})
+    compression_config = db_config.get("compression", {})
+    db_manager = DBManager(db_path, db_config.get("performance"), archive_path=archive_path,
+                           usage_flush_threshold=usage_config.get("flush_threshold", 100),
+                           compress_text=compression_config.get("enabled", True),
+                           archive_after_days=(archive_config or {}).get("discharged_days"),
+                           max_exports=db_config.get("export", {}).get("max_concurrent", 2))
     print("[OK] 数据库初始化完成")
 
+    # 后台维护任务
+    background_tasks = [asyncio.create_task(run_periodically(
+        "模板使用次数写入",
+        usage_config.get("flush_interval_seconds", 2),
+        db_manager.template_usage.flush,
+    ))]
+    if archive_config and archive_config.get("discharged_days") is not None:
+        background_tasks.append(asyncio.create_task(run_periodically(
+            "出院患者归档",
+            archive_config.get("interval_hours", 24) * 3600,
+            run_archive,
+            archive_config["discharged_days"],
+        )))
+    if compression_config.get("enabled", True):
+        # 启动后在后台分批压缩已有的长文本，完成后退出
+        background_tasks.append(asyncio.create_task(asyncio.to_thread(
+            run_compression, compression_config.get("batch_size", 500))))
+    backup_config = db_config.get("backup", {})
+    app.state.backup_dir = os.path.join(project_root, backup_config.get("dir", "./backups"))
+    if backup_config.get("interval_hours"):
+        background_tasks.append(asyncio.create_task(run_periodically(
+            "数据库备份",
+            backup_config["interval_hours"] * 3600,
+            run_backup,
+            app.state.backup_dir,
+            backup_config,
+        )))
+
     # 初始化AI服务
     ai_manager = AIServiceManager(config)
     print("[OK] AI服务初始化完成")
@@ -74,6 +153,13 @@ async def lifespan(app: FastAPI):
 
     # 关闭时清理
     print("关闭FastAPI后端服务...")
+    # 结束所有 SSE 连接，否则服务要等客户端断开才能退出
+    change_bus.close()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # close() 先写入缓冲中的模板使用次数，再停止写入队列
+    db_manager.close()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -83,6 +169,10 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 患者、模板、病程记录、提醒读接口的 ETag / If-None-Match（见 backend.api.conditional）；
+# 在 CORS 之前注册，304 响应也会带上 CORS 头
+app.add_middleware(ConditionalGetMiddleware)
+
 # 配置CORS（允许Electron本地访问）
 app.add_middleware(
     CORSMiddleware,
@@ -90,10 +180,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # 列表接口的下一页游标（见 backend.api.pagination）和条件 GET 的 ETag
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # 导入路由
-from backend.api.routes import patients, notes, reminders, templates, ai, rehab_plans, knowledge
+from backend.api.routes import patients, notes, reminders, templates, ai, rehab_plans, knowledge, metrics, imports, archive, search, stats, backup, events, exports
 
 # 注册路由
 app.include_router(patients.router, prefix="/api/patients", tags=["患者管理"])
@@ -103,6 +195,14 @@ app.include_router(templates.router, prefix="/api/templates", tags=["模板管
 app.include_router(ai.router, prefix="/api/ai", tags=["AI服务"])
 app.include_router(rehab_plans.router, prefix="/api/rehab-plan", tags=["康复计划"])
 app.include_router(knowledge.router, prefix="/api/knowledge", tags=["知识库"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["运行指标"])
+app.include_router(imports.router, prefix="/api/import", tags=["批量导入"])
+app.include_router(archive.router, prefix="/api/archive", tags=["归档"])
+app.include_router(search.router, prefix="/api/search", tags=["全文检索"])
+app.include_router(stats.router, prefix="/api/stats", tags=["数据统计"])
+app.include_router(backup.router, prefix="/api/backup", tags=["数据备份"])
+app.include_router(events.router, prefix="/api/events", tags=["变更事件"])
+app.include_router(exports.router, prefix="/api/export", tags=["病历导出"])
 
 @app.get("/")
 async def root():
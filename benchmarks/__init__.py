@@ -0,0 +1,5 @@
+"""
+性能基准测试
+
+在项目根目录运行，例如: python -m benchmarks.bench_sqlite_profile
+"""
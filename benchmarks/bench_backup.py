@@ -0,0 +1,79 @@
+"""
+在线备份基准测试
+
+备份期间持续通过写入队列写入提醒，对比写入延迟：
+- 空闲：没有备份时的写入延迟
+- 在线备份（database.backup）：分步复制、固定WAL读快照
+同时输出备份总耗时、各步持有源库的时间和单步最长时间。
+
+用法: python -m benchmarks.bench_backup [--patients 2000] [--notes-per-patient 50] [--pages-per-step 256]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date
+
+from benchmarks.common import temp_database, seed_database
+from database.backup import backup_database
+
+
+def write_latencies(db, stop: threading.Event, latencies: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        db.add_reminder({"patient_id": 1, "hospital_number": "B0000000", "reminder_type": "复查",
+                         "reminder_date": date.today(), "description": "复查", "priority": "中"})
+        latencies.append(time.perf_counter() - start)
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f"  {label:<10} {len(latencies):>6} 次写入  p50 {statistics.median(latencies) * 1000:>6.2f}ms"
+          f"  p99 {p99 * 1000:>7.2f}ms  最长 {latencies[-1] * 1000:>7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在线备份基准测试")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--notes-per-patient", type=int, default=50)
+    parser.add_argument("--pages-per-step", type=int, default=256)
+    parser.add_argument("--idle-seconds", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with temp_database() as db, tempfile.TemporaryDirectory(prefix="rehab_backup_") as directory:
+        print(f"生成测试数据: {args.patients} 位患者, {args.patients * args.notes_per_patient} 条病程记录")
+        seed_database(db, args.patients, args.notes_per_patient)
+        print(f"  数据库大小 {os.path.getsize(db.db_path) / 1024 / 1024:.1f}MB")
+
+        idle = []
+        stop = threading.Event()
+        thread = threading.Thread(target=write_latencies, args=(db, stop, idle))
+        thread.start()
+        time.sleep(args.idle_seconds)
+        stop.set()
+        thread.join()
+
+        during = []
+        stop = threading.Event()
+        thread = threading.Thread(target=write_latencies, args=(db, stop, during))
+        thread.start()
+        try:
+            result = backup_database(db.db_path, directory, pages_per_step=args.pages_per_step)
+        finally:
+            stop.set()
+            thread.join()
+
+        print(f"备份: {result.pages} 页, {result.steps} 步, 重新复制 {result.restarts} 次, "
+              f"固定快照 {'是' if result.snapshot else '否'}")
+        print(f"  总耗时 {result.duration * 1000:.0f}ms, 持有源库 {result.held * 1000:.0f}ms, "
+              f"单步最长 {result.max_step * 1000:.2f}ms, 完整性 {result.integrity}")
+        print("写入延迟")
+        report("空闲", idle)
+        report("备份期间", during)
+
+
+if __name__ == "__main__":
+    main()
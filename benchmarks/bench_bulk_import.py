@@ -0,0 +1,107 @@
+"""
+批量导入基准测试
+
+生成患者CSV和病程记录JSONL，对比：
+- 逐条导入（改造前）：每条记录一次写操作、一次提交，相当于逐条调用 POST 接口
+- 批量导入（database.bulk_import）：按块校验、executemany 写入、每块一次提交
+
+用法: python -m benchmarks.bench_bulk_import [--patients 10000] [--notes-per-patient 10]
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import SAMPLE_CONDITION, SAMPLE_CONTENT, temp_database
+from database.bulk_import import import_file
+from database.models import ProgressNote
+
+
+def write_files(directory: str, patients: int, notes_per_patient: int):
+    """生成测试用的患者CSV和病程记录JSONL"""
+    today = date.today()
+    patients_path = os.path.join(directory, "patients.csv")
+    notes_path = os.path.join(directory, "notes.jsonl")
+
+    with open(patients_path, "w", encoding="utf-8", newline="") as f:
+        f.write("hospital_number,name,gender,age,admission_date,diagnosis\n")
+        for i in range(patients):
+            admission = today - timedelta(days=notes_per_patient)
+            f.write(f"I{i:07d},患者{i},{'男' if i % 2 else '女'},{40 + i % 50},{admission},脑梗死恢复期\n")
+
+    with open(notes_path, "w", encoding="utf-8") as f:
+        for i in range(patients):
+            for day in range(notes_per_patient):
+                record_date = today - timedelta(days=notes_per_patient - day - 1)
+                f.write(json.dumps({
+                    "hospital_number": f"I{i:07d}",
+                    "record_date": record_date.isoformat(),
+                    "record_type": "日常病程",
+                    "daily_condition": SAMPLE_CONDITION,
+                    "generated_content": SAMPLE_CONTENT,
+                }, ensure_ascii=False) + "\n")
+    return patients_path, notes_path
+
+
+def legacy_import_notes(db, notes_path: str, limit: int) -> int:
+    """改造前：每条病程记录单独查患者、单独提交"""
+    from backend.api.routes.notes import NoteCreate, _create_note
+
+    count = 0
+    with open(notes_path, encoding="utf-8") as f:
+        for line in f:
+            if count >= limit:
+                break
+            db.writer.execute(_create_note, NoteCreate(**json.loads(line)))
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导入基准测试")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--notes-per-patient", type=int, default=10)
+    parser.add_argument("--legacy-sample", type=int, default=2000,
+                        help="逐条导入的抽样条数（全部逐条导入太慢）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="rehab_bench_") as directory:
+        patients_path, notes_path = write_files(directory, args.patients, args.notes_per_patient)
+        total_notes = args.patients * args.notes_per_patient
+
+        with temp_database() as db:
+            import_file(db, "patients", patients_path)
+            start = time.perf_counter()
+            count = legacy_import_notes(db, notes_path, args.legacy_sample)
+            elapsed = time.perf_counter() - start
+            legacy_rate = count / elapsed
+            print(f"逐条导入: {count} 条 {elapsed:.2f}秒  {legacy_rate:,.0f} 条/秒"
+                  f"（{total_notes} 条预计 {total_notes / legacy_rate:.1f}秒）")
+
+        with temp_database() as db:
+            start = time.perf_counter()
+            patients = import_file(db, "patients", patients_path)
+            patients_elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            notes = import_file(db, "notes", notes_path)
+            notes_elapsed = time.perf_counter() - start
+            bulk_rate = notes.inserted / notes_elapsed
+
+            with db.get_session() as session:
+                assert session.query(ProgressNote).count() == total_notes
+
+            print(f"批量导入患者: {patients.inserted} 条 {patients_elapsed:.2f}秒")
+            print(f"批量导入病程记录: {notes.inserted} 条 {notes_elapsed:.2f}秒  {bulk_rate:,.0f} 条/秒")
+
+            start = time.perf_counter()
+            again = import_file(db, "notes", notes_path)
+            print(f"重复导入（全部更新）: {again.updated} 条 {time.perf_counter() - start:.2f}秒")
+            print(f"提升: {bulk_rate / legacy_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
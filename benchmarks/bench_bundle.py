@@ -0,0 +1,94 @@
+"""
+患者工作区接口基准测试
+
+打开一位患者的工作区需要患者信息、病程记录、提醒、康复计划和康复进展，对比：
+- 改造前：依次调用五个接口（每个请求各自查住院号、开会话）
+- 合并接口：GET /api/patients/{hospital_number}/bundle 一次返回（selectinload，同一会话）
+
+通过本地 uvicorn 服务测量，包含 HTTP 往返和序列化。
+
+用法: python -m benchmarks.bench_bundle [--patients 200] [--notes-per-patient 30] [--opens 100]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.common import db_table, running_api, seed_database, temp_database
+
+
+def seed_workspace_data(db, reminders_per_patient: int, progress_per_patient: int):
+    today = date.today()
+    with db.engine.begin() as conn:
+        patients = conn.exec_driver_sql("SELECT id, hospital_number FROM patients").fetchall()
+        conn.execute(db_table("reminders").insert(), [
+            {"patient_id": pid, "hospital_number": hn, "reminder_type": "复查",
+             "reminder_date": today + timedelta(days=i), "day_number": i + 1,
+             "description": "复查血常规、肝肾功能", "priority": "中", "is_completed": False}
+            for pid, hn in patients for i in range(reminders_per_patient)
+        ])
+        conn.execute(db_table("rehab_plans").insert(), [
+            {"patient_id": pid, "hospital_number": hn, "short_term_goals": "独立坐位平衡",
+             "long_term_goals": "独立步行", "training_plan": "运动疗法、作业疗法、平衡训练",
+             "created_at": today, "updated_at": today}
+            for pid, hn in patients
+        ])
+        conn.execute(db_table("rehab_progress").insert(), [
+            {"patient_id": pid, "hospital_number": hn, "record_date": today - timedelta(days=i),
+             "content": "平衡功能较前改善", "score": 40 + i, "created_at": today}
+            for pid, hn in patients for i in range(progress_per_patient)
+        ])
+
+
+def open_separately(client, hospital_number):
+    for path in (f"/api/patients/{hospital_number}",
+                 f"/api/notes/patient/{hospital_number}",
+                 f"/api/reminders/patient/{hospital_number}",
+                 f"/api/rehab-plan/patient/{hospital_number}",
+                 f"/api/rehab-plan/{hospital_number}/progress"):
+        client.get(path).raise_for_status()
+
+
+def open_bundle(client, hospital_number):
+    client.get(f"/api/patients/{hospital_number}/bundle").raise_for_status()
+
+
+def measure(label, client, func, hospital_numbers):
+    latencies = []
+    for hospital_number in hospital_numbers:
+        start = time.perf_counter()
+        func(client, hospital_number)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    avg = sum(latencies) / len(latencies) * 1000
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"  {label:<10} 平均 {avg:>7.2f}ms  P95 {p95:>7.2f}ms")
+    return avg
+
+
+def main():
+    parser = argparse.ArgumentParser(description="患者工作区接口基准测试")
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--notes-per-patient", type=int, default=30)
+    parser.add_argument("--opens", type=int, default=100, help="打开工作区的次数（随机患者）")
+    args = parser.parse_args()
+
+    with temp_database() as db:
+        hospital_numbers = seed_database(db, args.patients, args.notes_per_patient)
+        seed_workspace_data(db, reminders_per_patient=10, progress_per_patient=5)
+        sample = random.Random(1).choices(hospital_numbers, k=args.opens)
+        print(f"测试数据: {args.patients} 位患者, 每人 {args.notes_per_patient} 条病程记录、10 条提醒、5 条康复进展")
+
+        with running_api(db) as base_url, httpx.Client(base_url=base_url) as client:
+            # 预热连接和编译缓存
+            open_separately(client, hospital_numbers[0])
+            open_bundle(client, hospital_numbers[0])
+            before = measure("五次调用", client, open_separately, sample)
+            after = measure("合并接口", client, open_bundle, sample)
+        print(f"合并接口耗时为改造前的 {after / before:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+长文本压缩基准测试
+
+同样的数据分别写入三个数据库，对比数据库大小、progress_notes 占用的页数和病程记录列表接口耗时：
+- 不压缩（改造前的 TEXT 列）
+- 无字典压缩（新写入的数据，还没有训练字典）
+- 字典压缩（后台压缩迁移：训练字典后重新压缩已有数据）
+
+病程记录由常见病历短句随机组合生成，接近真实病历的重复程度。
+列表耗时为遍历全部患者调用 GET /api/notes/patient/{hospital_number} 的处理函数（含序列化）。
+
+用法: python -m benchmarks.bench_compression [--patients 500] [--notes-per-patient 30]
+"""
+import argparse
+import os
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from benchmarks.common import temp_database, seed_database
+from backend.api.routes.notes import NoteResponse, _get_patient_notes
+from database.pagination import PageRequest
+
+PHRASES = [
+    "患者神志清，精神可，饮食睡眠尚可，二便正常。",
+    "今日查房，患者一般情况可，未诉特殊不适。",
+    "患者诉右肩疼痛较前减轻，夜间睡眠改善。",
+    "查体：生命体征平稳，心肺腹查体未见明显异常。",
+    "右上肢肌力3级，右下肢肌力4级，肌张力略高。",
+    "左上肢肌力4-级，左下肢肌力4级，肌张力正常。",
+    "Brunnstrom分期上肢III期、手II期、下肢IV期。",
+    "坐位平衡2级，立位平衡1级，可在辅助下短距离步行。",
+    "改良Barthel指数评分45分，日常生活活动能力中度依赖。",
+    "继续目前康复治疗方案，加强平衡及步行训练，注意防跌倒。",
+    "予以运动疗法、作业疗法、针灸及低频电刺激治疗。",
+    "嘱家属协助患者进行床旁良肢位摆放，预防肩手综合征。",
+    "血压控制可，继续口服降压药物，监测血压变化。",
+    "复查血常规、肝肾功能未见明显异常。",
+    "患者吞咽功能较前改善，洼田饮水试验2级。",
+    "注意预防压疮、深静脉血栓及肺部感染等并发症。",
+]
+
+
+def note_text(rng):
+    condition = "".join(rng.sample(PHRASES[:4], 2))
+    content = "".join(rng.choice(PHRASES) for _ in range(rng.randint(10, 18)))
+    return condition, content
+
+
+def table_pages(db, table: str) -> int:
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql("SELECT count(*) FROM dbstat WHERE name = ?", (table,)).scalar()
+
+
+def file_size(db) -> float:
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.exec_driver_sql("VACUUM")
+    return os.path.getsize(db.db_path) / 1024 / 1024
+
+
+def list_latency(db, hospital_numbers, repeat: int) -> float:
+    adapter = TypeAdapter(List[NoteResponse])
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with db.ReadSession() as session:
+            for hospital_number in hospital_numbers:
+                notes = _get_patient_notes(session, hospital_number, PageRequest(limit=1000)).items
+                adapter.dump_json(adapter.validate_python(notes))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长文本压缩基准测试")
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--notes-per-patient", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"测试数据: {args.patients} 位患者, {args.patients * args.notes_per_patient} 条病程记录")
+    print(f"  {'':<10} {'数据库大小':>10} {'病程记录页数':>12} {'列表耗时':>10}")
+    baseline = None
+    for label, compress, migrate in (("不压缩", False, False), ("无字典压缩", True, False),
+                                     ("字典压缩", False, True)):
+        with temp_database(compress_text=compress) as db:
+            hospital_numbers = seed_database(db, args.patients, args.notes_per_patient, note_text=note_text)
+            if migrate:
+                db.text_codec.enabled = True
+                result = db.compress_text()
+                print(f"  （后台压缩 {sum(result.rows.values())} 行，耗时 {result.duration:.1f}s）")
+            size = file_size(db)
+            pages = table_pages(db, "progress_notes")
+            latency = list_latency(db, hospital_numbers, args.repeat)
+            line = f"  {label:<10} {size:>8.1f}MB {pages:>12} {latency * 1000:>8.0f}ms"
+            if baseline is None:
+                baseline = (size, pages, latency)
+            else:
+                line += (f"   大小 {size / baseline[0]:.0%}  页数 {pages / baseline[1]:.0%}"
+                         f"  耗时 {latency / baseline[2]:.0%}")
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+删除患者基准测试
+
+对比永久删除有大量病程记录的患者时执行的 SQL 语句数和耗时：
+- 改造前：ORM 先加载患者的全部病程记录、提醒、康复计划和进展，再逐条删除子记录
+- 级联删除：ORM 只执行一条 DELETE FROM patients，子表由外键 ON DELETE CASCADE 删除
+
+用法: python -m benchmarks.bench_delete [--patients 20] [--notes-per-patient 3000]
+"""
+import argparse
+import time
+
+from sqlalchemy import event
+
+from benchmarks.common import temp_database, seed_database
+from database.models import Patient
+
+
+def legacy_delete(session, hospital_number):
+    patient = session.query(Patient).filter(Patient.hospital_number == hospital_number).one()
+    # 访问关系即加载全部子记录，flush 时 ORM 逐条删除
+    for collection in (patient.progress_notes, patient.reminders, patient.rehab_progress):
+        len(collection)
+    patient.rehab_plan
+    session.delete(patient)
+
+
+def cascade_delete(session, hospital_number):
+    patient = session.query(Patient).filter(Patient.hospital_number == hospital_number).one()
+    session.delete(patient)
+
+
+def measure(label, db, func, hospital_numbers):
+    deletes = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE"):
+            # executemany 的每组参数都是一次单独的删除
+            deletes.append(len(parameters) if executemany else 1)
+
+    event.listen(db.writer.engine, "before_cursor_execute", count)
+    try:
+        start = time.perf_counter()
+        for hospital_number in hospital_numbers:
+            db.writer.execute(func, hospital_number)
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.writer.engine, "before_cursor_execute", count)
+
+    per_patient = elapsed / len(hospital_numbers) * 1000
+    print(f"  {label:<8} DELETE {sum(deletes) / len(hospital_numbers):>8.1f} 次/人"
+          f"  {per_patient:>8.1f}ms/人")
+    return per_patient
+
+
+def main():
+    parser = argparse.ArgumentParser(description="删除患者基准测试")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--notes-per-patient", type=int, default=3000)
+    args = parser.parse_args()
+
+    print(f"测试数据: {args.patients} 位患者, 每人 {args.notes_per_patient} 条病程记录")
+    results = []
+    for label, func in (("改造前", legacy_delete), ("级联删除", cascade_delete)):
+        with temp_database() as db:
+            hospital_numbers = seed_database(db, args.patients, args.notes_per_patient)
+            results.append(measure(label, db, func, hospital_numbers))
+            with db.engine.connect() as conn:
+                remaining = conn.exec_driver_sql("SELECT count(*) FROM progress_notes").scalar()
+            assert remaining == 0, remaining
+    print(f"级联删除耗时为改造前的 {results[1] / results[0]:.1%}")
+
+
+if __name__ == "__main__":
+    main()
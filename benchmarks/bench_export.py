@@ -0,0 +1,69 @@
+"""
+病历导出基准测试
+
+全病区导出时对比不同患者数下的内存峰值（tracemalloc）和耗时：
+- 一次性拼装：先取出全部患者的病程记录再生成文件（改造前前端的做法，在服务端模拟）
+- 流式导出：database.export 逐位患者产生输出（GET /api/export/ward 使用的生成器）
+
+用法: python -m benchmarks.bench_export [--patients 200 1000 3000] [--notes-per-patient 30]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+from benchmarks.common import seed_database, temp_database
+from database.export import export_records
+from database.models import Patient, ProgressNote
+
+
+def assemble_all(session, fmt):
+    """一次性拼装：所有记录读入内存后再生成整个文件"""
+    notes = {}
+    for note in session.query(ProgressNote).order_by(ProgressNote.patient_id, ProgressNote.record_date):
+        notes.setdefault(note.patient_id, []).append(
+            {"record_date": note.record_date.isoformat(), "generated_content": note.generated_content})
+    lines = [
+        json.dumps({"patient": {"hospital_number": p.hospital_number, "name": p.name},
+                    "notes": notes.get(p.id, [])}, ensure_ascii=False)
+        for p in session.query(Patient).order_by(Patient.id)
+    ]
+    return ["\n".join(lines).encode("utf-8")]
+
+
+def stream(session, fmt):
+    return export_records(session, fmt, include_discharged=True)
+
+
+def measure(db, func, fmt):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = 0
+    with db.ReadSession() as session:
+        for chunk in func(session, fmt):
+            size += len(chunk)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024, size / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="病历导出基准测试")
+    parser.add_argument("--patients", type=int, nargs="+", default=[200, 1000, 3000])
+    parser.add_argument("--notes-per-patient", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"每位患者 {args.notes_per_patient} 条病程记录")
+    print(f"{'患者数':>6} {'方式':<10} {'格式':<6} {'耗时':>8} {'内存峰值':>10} {'文件大小':>10}")
+    for patients in args.patients:
+        with temp_database() as db:
+            seed_database(db, patients, args.notes_per_patient)
+            for label, func, fmt in (("一次性拼装", assemble_all, "jsonl"), ("流式导出", stream, "jsonl"),
+                                     ("流式导出", stream, "docx")):
+                elapsed, peak, size = measure(db, func, fmt)
+                print(f"{patients:>6} {label:<10} {fmt:<6} {elapsed:>7.2f}s {peak:>8.1f}MB {size:>8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
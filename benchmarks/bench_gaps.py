@@ -0,0 +1,90 @@
+"""
+缺失病程记录计算基准测试
+
+病区所有在院患者住院90天，每天写病程记录但随机漏记约10%，对比：
+- 改造前：前端逐个患者下载全部病程记录（GET /api/notes/patient/{hospital_number}），在本地逐日比对
+- 缺失日接口：GET /api/notes/gaps 一条递归 CTE 查询算出全病区的缺失日
+
+通过本地 uvicorn 服务测量，包含 HTTP 往返和序列化。
+
+用法: python -m benchmarks.bench_gaps [--patients 200] [--days 90] [--repeat 5]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.common import SAMPLE_CONDITION, SAMPLE_CONTENT, db_table, running_api, seed_database, temp_database
+from database.stats import is_round_day
+
+
+def seed_notes(db, days: int, skip_ratio: float, seed: int = 7):
+    """所有患者改为 days 天前入院，逐日写入病程记录，按 skip_ratio 随机漏记"""
+    rng = random.Random(seed)
+    today = date.today()
+    admission = today - timedelta(days=days - 1)
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE patients SET admission_date = ?", (admission.isoformat(),))
+        patients = conn.exec_driver_sql("SELECT id, hospital_number FROM patients").fetchall()
+        conn.execute(db_table("progress_notes").insert(), [
+            {"patient_id": pid, "hospital_number": hn, "record_date": admission + timedelta(days=day - 1),
+             "day_number": day, "record_type": "日常病程", "daily_condition": SAMPLE_CONDITION,
+             "generated_content": SAMPLE_CONTENT, "is_edited": False, "created_at": today}
+            for pid, hn in patients for day in range(1, days + 1) if rng.random() >= skip_ratio
+        ])
+
+
+def gaps_client_side(client) -> int:
+    """改造前的做法：下载每位患者的病程记录后逐日比对"""
+    today = date.today()
+    missing = 0
+    for patient in client.get("/api/patients/").json():
+        notes = client.get(f"/api/notes/patient/{patient['hospital_number']}").json()
+        recorded = {n["record_date"] for n in notes}
+        admission = date.fromisoformat(patient["admission_date"])
+        for day in range(1, (today - admission).days + 2):
+            if is_round_day(day) and (admission + timedelta(days=day - 1)).isoformat() not in recorded:
+                missing += 1
+    return missing
+
+
+def gaps_server_side(client) -> int:
+    return client.get("/api/notes/gaps").json()["summary"]["missing_records"]
+
+
+def measure(label, client, func, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        missing = func(client)
+        latencies.append(time.perf_counter() - start)
+    avg = sum(latencies) / len(latencies) * 1000
+    print(f"  {label:<10} 平均 {avg:>9.1f}ms  缺失 {missing} 条")
+    return avg, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缺失病程记录计算基准测试")
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--days", type=int, default=90, help="住院天数")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with temp_database() as db:
+        seed_database(db, args.patients)
+        seed_notes(db, args.days, skip_ratio=0.1)
+        print(f"测试数据: {args.patients} 位在院患者, 住院 {args.days} 天, 约10%的日期漏记")
+
+        with running_api(db) as base_url, httpx.Client(base_url=base_url, timeout=60) as client:
+            # 预热连接和编译缓存
+            gaps_server_side(client)
+            before, expected = measure("逐个下载", client, gaps_client_side, args.repeat)
+            after, missing = measure("缺失日接口", client, gaps_server_side, args.repeat)
+        assert missing == expected, "两种算法结果不一致"
+        print(f"缺失日接口耗时为改造前的 {after / before:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+列表接口响应大小基准测试
+
+对比列表接口改造前后的响应体积和耗时：
+- 改造前：返回全部行的全部列（等同于现在不带分页参数、view=full 的请求）
+- 改造后：view=summary 只返回列表展示需要的列；limit 取第一页，后续页用 X-Next-Cursor 游标
+
+用法: python -m benchmarks.bench_payload [--patients 200] [--notes-per-patient 60] [--templates 430]
+"""
+import argparse
+import time
+
+import httpx
+
+from benchmarks.common import SAMPLE_CONTENT, db_table, running_api, seed_database, temp_database
+
+
+def seed_templates(db, count: int):
+    with db.engine.begin() as conn:
+        conn.execute(db_table("templates").insert(), [
+            {"category": f"分类{i % 12}", "template_name": f"模板{i}", "content": SAMPLE_CONTENT,
+             "is_system": False, "usage_count": i % 17}
+            for i in range(count)
+        ])
+
+
+def measure(client, label, path, params, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, params=params)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    response.raise_for_status()
+    size = len(response.content)
+    print(f"  {label:<18} {len(response.json()):>5} 行  {size / 1024:>9.1f}KB  {best * 1000:>8.1f}ms")
+    return size
+
+
+def compare(client, title, path, variants, repeat):
+    print(title)
+    before = None
+    for label, params in variants:
+        size = measure(client, label, path, params, repeat)
+        if before is None:
+            before = size
+        else:
+            print(f"    体积为改造前的 {size / before:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表接口响应大小基准测试")
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--notes-per-patient", type=int, default=60)
+    parser.add_argument("--templates", type=int, default=430)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with temp_database() as db:
+        print(f"生成测试数据: {args.patients} 位患者, {args.patients * args.notes_per_patient} 条病程记录, "
+              f"{args.templates} 个模板")
+        hospital_numbers = seed_database(db, args.patients, args.notes_per_patient)
+        seed_templates(db, args.templates)
+        page = {"limit": args.page_size}
+
+        with running_api(db) as base_url, httpx.Client(base_url=base_url, timeout=60) as client:
+            compare(client, "GET /api/patients/", "/api/patients/", [
+                ("改造前（全部列）", {}),
+                ("view=summary", {"view": "summary"}),
+            ], args.repeat)
+            compare(client, "GET /api/notes/patient/{hospital_number}",
+                    f"/api/notes/patient/{hospital_numbers[0]}", [
+                        ("改造前（全部列）", {}),
+                        ("view=summary", {"view": "summary"}),
+                        (f"第一页 limit={args.page_size}", page),
+                    ], args.repeat)
+            compare(client, "GET /api/templates/", "/api/templates/", [
+                ("改造前（全部列）", {}),
+                ("view=summary", {"view": "summary"}),
+                (f"summary+第一页", {"view": "summary", **page}),
+            ], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
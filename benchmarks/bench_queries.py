@@ -0,0 +1,84 @@
+"""
+热点查询语句基准测试
+
+对比按住院号查患者、按患者查病程记录两类查询的单次耗时：
+- 改造前：每次调用重新构建查询（session.query(...).filter(...) 或 select(...).where(...)）
+- 注册语句（database.queries）：预先构建的 select()，执行时只传参数
+最后输出各注册语句的编译缓存命中率和平均准备/编译时间。
+
+用法: python -m benchmarks.bench_queries [--patients 2000] [--notes-per-patient 5] [--rounds 3]
+"""
+import argparse
+import time
+
+from sqlalchemy import select
+
+from benchmarks.common import temp_database, seed_database
+from database import queries
+from database.models import Patient, ProgressNote
+
+
+def legacy_patient(session, hospital_number):
+    return session.query(Patient).filter(Patient.hospital_number == hospital_number).first()
+
+
+def legacy_notes(session, patient_id):
+    return session.execute(
+        select(*queries.NOTE_COLUMNS).where(ProgressNote.patient_id == patient_id)
+    ).all()
+
+
+def registered_patient(session, hospital_number):
+    return queries.PATIENT_BY_HOSPITAL_NUMBER.execute(
+        session, {"hospital_number": hospital_number}).scalars().first()
+
+
+def registered_notes(session, patient_id):
+    return queries.NOTES_BY_PATIENT.execute(session, {"patient_id": patient_id}).all()
+
+
+def measure(label, db, func, args_list, rounds):
+    best = None
+    for _ in range(rounds):
+        with db.ReadSession() as session:
+            start = time.perf_counter()
+            for args in args_list:
+                func(session, *args)
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    per_call = best / len(args_list) * 1_000_000
+    print(f"  {label:<10} {len(args_list):>6} 次  {best * 1000:>9.1f}ms  {per_call:>8.1f}µs/次")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="热点查询语句基准测试")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--notes-per-patient", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_database() as db:
+        print(f"生成测试数据: {args.patients} 位患者, {args.patients * args.notes_per_patient} 条病程记录")
+        hospital_numbers = seed_database(db, args.patients, args.notes_per_patient)
+        patient_ids = list(range(1, len(hospital_numbers) + 1))
+
+        cases = [
+            ("按住院号查患者", legacy_patient, registered_patient, [(hn,) for hn in hospital_numbers]),
+            ("按患者查病程记录", legacy_notes, registered_notes, [(pid,) for pid in patient_ids]),
+        ]
+        for title, legacy, registered, args_list in cases:
+            print(title)
+            before = measure("改造前", db, legacy, args_list, args.rounds)
+            after = measure("注册语句", db, registered, args_list, args.rounds)
+            print(f"  单次耗时为改造前的 {after / before:.1%}")
+
+        print("编译缓存统计")
+        for name, stats in queries.query_metrics().items():
+            if stats["executions"]:
+                print(f"  {name:<28} 命中率 {stats['hit_rate']:.2%}  准备 {stats['prepare_ms_avg']:.4f}ms"
+                      f"  编译 {stats['compile_ms_avg']:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+列表接口读取路径基准测试
+
+对比两种读取路径的吞吐量（行/秒）：
+- ORM路径（改造前）：加载完整ORM对象 → 逐字段构建Pydantic模型 → FastAPI再次校验
+- 只读查询层（database.readers）：Core select() 返回元组行 → 字典 → FastAPI校验一次
+
+序列化部分按FastAPI处理 response_model 的方式模拟：
+返回的Pydantic模型先 model_dump，再按 response_model 校验并输出JSON。
+
+用法: python -m benchmarks.bench_read_path [--patients 10000] [--notes-per-patient 10]
+"""
+import argparse
+import time
+from datetime import datetime
+from typing import List
+
+from pydantic import TypeAdapter
+
+from benchmarks.common import temp_database, seed_database
+from database.pagination import PageRequest
+from backend.api.routes.patients import PatientResponse, _query_patients
+from backend.api.routes.notes import NoteResponse, _get_patient_notes
+
+
+def legacy_patients(session):
+    """改造前的 get_patients 实现"""
+    from database.models import Patient
+
+    patients = session.query(Patient).filter(
+        Patient.discharge_date.is_(None)
+    ).order_by(Patient.admission_date.desc()).all()
+
+    result = []
+    for p in patients:
+        if p.discharge_date:
+            days = (p.discharge_date - p.admission_date).days + 1
+        else:
+            days = (datetime.now().date() - p.admission_date).days + 1
+        result.append(PatientResponse(
+            id=p.id,
+            hospital_number=p.hospital_number,
+            name=p.name,
+            gender=p.gender,
+            age=p.age,
+            admission_date=p.admission_date,
+            discharge_date=p.discharge_date,
+            diagnosis=p.diagnosis,
+            chief_complaint=p.chief_complaint,
+            past_history=p.past_history,
+            allergy_history=p.allergy_history,
+            specialist_exam=p.specialist_exam,
+            days_in_hospital=days
+        ))
+    return result
+
+
+def legacy_patient_notes(session, hospital_number, limit):
+    """改造前的 get_patient_notes 实现"""
+    from database.models import ProgressNote, Patient
+
+    patient = session.query(Patient).filter(
+        Patient.hospital_number == hospital_number
+    ).first()
+    notes = session.query(ProgressNote).filter(
+        ProgressNote.patient_id == patient.id
+    ).order_by(ProgressNote.record_date.desc()).limit(limit).all()
+    return [
+        NoteResponse(
+            id=note.id,
+            hospital_number=note.hospital_number,
+            record_date=note.record_date,
+            day_number=note.day_number,
+            record_type=note.record_type,
+            daily_condition=note.daily_condition,
+            generated_content=note.generated_content,
+            is_edited=note.is_edited,
+            created_at=note.created_at
+        )
+        for note in notes
+    ]
+
+
+def serialize(adapter, content):
+    """模拟FastAPI按 response_model 序列化返回值"""
+    content = [item.model_dump() if hasattr(item, "model_dump") else item for item in content]
+    return adapter.dump_json(adapter.validate_python(content))
+
+
+def measure(label, func, repeat):
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<12} {rows:>8} 行  {best * 1000:>9.1f}ms  {rows / best:>12,.0f} 行/秒")
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表接口读取路径基准测试")
+    parser.add_argument("--patients", type=int, default=10000)
+    parser.add_argument("--notes-per-patient", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    patient_adapter = TypeAdapter(List[PatientResponse])
+    note_adapter = TypeAdapter(List[NoteResponse])
+
+    with temp_database() as db:
+        print(f"生成测试数据: {args.patients} 位患者, {args.patients * args.notes_per_patient} 条病程记录")
+        hospital_numbers = seed_database(db, args.patients, args.notes_per_patient)
+
+        def patients_orm():
+            with db.ReadSession() as session:
+                patients = legacy_patients(session)
+                serialize(patient_adapter, patients)
+            return len(patients)
+
+        def patients_rows():
+            with db.ReadSession() as session:
+                patients = _query_patients(session, False, None, PageRequest()).items
+                serialize(patient_adapter, patients)
+            return len(patients)
+
+        def notes_orm():
+            total = 0
+            with db.ReadSession() as session:
+                for hospital_number in hospital_numbers:
+                    notes = legacy_patient_notes(session, hospital_number, 1000)
+                    serialize(note_adapter, notes)
+                    total += len(notes)
+            return total
+
+        def notes_rows():
+            total = 0
+            with db.ReadSession() as session:
+                for hospital_number in hospital_numbers:
+                    notes = _get_patient_notes(session, hospital_number, PageRequest(limit=1000)).items
+                    serialize(note_adapter, notes)
+                    total += len(notes)
+            return total
+
+        print("GET /api/patients/")
+        before = measure("ORM路径", patients_orm, args.repeat)
+        after = measure("只读查询层", patients_rows, args.repeat)
+        print(f"  提升: {after / before:.2f}x")
+
+        print("GET /api/notes/patient/{hospital_number}（遍历全部患者）")
+        before = measure("ORM路径", notes_orm, args.repeat)
+        after = measure("只读查询层", notes_rows, args.repeat)
+        print(f"  提升: {after / before:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
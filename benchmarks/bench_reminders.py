@@ -0,0 +1,89 @@
+"""
+提醒生成基准测试
+
+POST /api/reminders/initialize-all-today 在每次打开患者列表时调用，对比：
+- 逐位患者：查出该患者计算范围内已有的生成提醒，逐天逐条规则判断（ReminderRule.applies_to）后 add 缺失的 Reminder
+- 规则引擎：database.reminders.materialize_reminders，规则 VALUES 表与日历、患者连接，一条 INSERT ... SELECT 写入
+
+分别测量首次调用（全部需要创建）和再次调用（没有变化，患者列表每次打开都会发生），
+horizon 为从今天起预先生成的天数。
+
+用法: python -m benchmarks.bench_reminders [--patients 50 500 5000] [--horizon 1 7] [--repeat 5]
+"""
+import argparse
+import time
+from datetime import date, timedelta
+
+from benchmarks.common import seed_database, temp_database
+from database.models import Patient, Reminder
+from database.reminders import RULES, materialize_reminders
+
+
+def initialize_per_patient(session, horizon_days):
+    """逐位患者的实现"""
+    today = date.today()
+    last = today + timedelta(days=horizon_days - 1)
+    created = 0
+    for patient in session.query(Patient).filter(Patient.discharge_date.is_(None)).all():
+        existing = set(session.query(Reminder.rule_key, Reminder.reminder_date).filter(
+            Reminder.patient_id == patient.id, Reminder.rule_key.is_not(None),
+            Reminder.reminder_date.between(today, last)))
+        for n in range(horizon_days):
+            reminder_date = today + timedelta(days=n)
+            day = (reminder_date - patient.admission_date).days + 1
+            for rule in RULES:
+                if not rule.applies_to(day) or (rule.key, reminder_date) in existing:
+                    continue
+                session.add(Reminder(
+                    patient_id=patient.id, hospital_number=patient.hospital_number, rule_key=rule.key,
+                    reminder_type=rule.reminder_type, reminder_date=reminder_date, day_number=day,
+                    description=rule.describe(patient.name or patient.hospital_number, day),
+                    priority=rule.priority, is_completed=False, created_at=today,
+                ))
+                created += 1
+    session.flush()
+    return created
+
+
+def initialize_set_based(session, horizon_days):
+    return materialize_reminders(session, RULES, horizon_days=horizon_days)["created_count"]
+
+
+def clear_reminders(session):
+    session.query(Reminder).delete()
+
+
+def measure(db, func, horizon_days, repeat):
+    """返回 (首次调用耗时, 再次调用耗时) 的最小值，单位毫秒"""
+    first, again = [], []
+    for _ in range(repeat):
+        db.writer.execute(clear_reminders)
+        start = time.perf_counter()
+        db.writer.execute(func, horizon_days)
+        first.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        db.writer.execute(func, horizon_days)
+        again.append(time.perf_counter() - start)
+    return min(first) * 1000, min(again) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="提醒生成基准测试")
+    parser.add_argument("--patients", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--horizon", type=int, nargs="+", default=[1, 7])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'在院患者':>8} {'天数':>4} {'逐位患者 首次':>14} {'再次':>10} {'规则引擎 首次':>14} {'再次':>10}")
+    for patients in args.patients:
+        with temp_database() as db:
+            seed_database(db, patients)
+            for horizon_days in args.horizon:
+                before = measure(db, initialize_per_patient, horizon_days, args.repeat)
+                after = measure(db, initialize_set_based, horizon_days, args.repeat)
+                print(f"{patients:>10} {horizon_days:>6} {before[0]:>12.1f}ms {before[1]:>8.1f}ms "
+                      f"{after[0]:>12.1f}ms {after[1]:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+病程记录修订历史存储基准测试
+
+模拟真实的90天住院：每天一条 AI 生成的病程记录，医生随后修改1~3次
+（改一处查体结果、补一句医嘱、删掉一句、整句替换），对比：
+- 全文版本：每个版本都保存一份压缩后的全文（与 progress_notes 相同的压缩方式）
+- 修订表：第1版全文 + 之后各版相对上一版的差异（note_revisions，由触发器写入）
+
+两者都不含 progress_notes 中的当前内容。
+
+同时测量还原最后一版（从第1版依次应用全部差异）的耗时。
+
+用法: python -m benchmarks.bench_revisions [--patients 20] [--days 90]
+"""
+import argparse
+import random
+import time
+
+from benchmarks.bench_compression import PHRASES, note_text
+from benchmarks.common import seed_database, temp_database
+from database.models import ProgressNote
+from database.revisions import read_revision, revision_storage
+
+
+def edit(rng, content: str) -> str:
+    """医生常见的修改：改一处数值、补一句、删一句或替换一句"""
+    sentences = [s + "。" for s in content.split("。") if s]
+    action = rng.choice(("number", "append", "delete", "replace"))
+    if action == "number":
+        return content.replace("3级", "4级", 1) if "3级" in content else content.replace("4级", "5-级", 1)
+    if action == "append":
+        return content + rng.choice(PHRASES)
+    index = rng.randrange(len(sentences))
+    if action == "delete" and len(sentences) > 1:
+        del sentences[index]
+    else:
+        sentences[index] = rng.choice(PHRASES)
+    return "".join(sentences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="病程记录修订历史存储基准测试")
+    parser.add_argument("--patients", type=int, default=20)
+    parser.add_argument("--days", type=int, default=90, help="住院天数（每天一条病程记录）")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    with temp_database() as db:
+        seed_database(db, args.patients, args.days, note_text=note_text)
+        codec = db.text_codec
+        with db.ReadSession() as session:
+            notes = [(note.id, note.generated_content) for note in session.query(ProgressNote)]
+
+        full_copy_bytes = 0
+        edits = 0
+
+        def apply_edits(session, batch):
+            for note_id, content in batch:
+                session.get(ProgressNote, note_id).generated_content = content
+
+        batch = []
+        for note_id, content in notes:
+            full_copy_bytes += len(codec.compress(content))
+            for _ in range(rng.randint(1, 3)):
+                content = edit(rng, content)
+                full_copy_bytes += len(codec.compress(content))
+                batch.append((note_id, content))
+                edits += 1
+            if len(batch) >= 500:
+                db.writer.execute(apply_edits, batch)
+                batch = []
+        if batch:
+            db.writer.execute(apply_edits, batch)
+
+        with db.engine.connect() as conn:
+            storage = revision_storage(conn)
+        revision_bytes = storage["base_bytes"] + storage["delta_bytes"]
+
+        with db.ReadSession() as session:
+            rows = session.connection().exec_driver_sql(
+                "SELECT note_id, MAX(revision) FROM note_revisions GROUP BY note_id").fetchall()
+            start = time.perf_counter()
+            for note_id, revision in rows:
+                read_revision(session, note_id, revision)
+            restore_ms = (time.perf_counter() - start) / len(rows) * 1000
+
+        print(f"测试数据: {args.patients} 位患者 × {args.days} 天 = {len(notes)} 条病程记录, 共修改 {edits} 次")
+        print(f"  全文版本  {full_copy_bytes / 1024:>8.1f} KB  （原稿及每次修改各一份压缩全文）")
+        print(f"  修订表    {revision_bytes / 1024:>8.1f} KB  （原稿 {storage['base_bytes'] / 1024:.1f} KB + "
+              f"差异 {storage['delta_bytes'] / 1024:.1f} KB）")
+        print(f"修订表为全文版本的 {revision_bytes / full_copy_bytes:.1%}，"
+              f"平均每个差异 {storage['delta_bytes'] / edits:.0f} 字节；还原最后一版平均 {restore_ms:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+全文检索基准测试
+
+对比病程记录检索的两种实现（返回前20条）：
+- LIKE（改造前的方式）：daily_condition / generated_content LIKE '%词%'，全表扫描
+- FTS5（database.search）：trigram 索引 MATCH，按 bm25 排序
+
+病程记录由常用短语随机拼接，另有少量记录包含罕见词，分别测试罕见词、常见词和多词检索。
+
+用法: python -m benchmarks.bench_search [--patients 20000] [--notes-per-patient 50]
+"""
+import argparse
+import time
+
+from sqlalchemy import text
+
+from benchmarks.common import temp_database, seed_database
+from database.search import search
+
+PHRASES = [
+    "患者神志清，精神可", "饮食睡眠尚可，二便正常", "右侧肢体肌力较前改善", "左侧肢体活动不利",
+    "肌张力略高", "继续目前康复治疗方案", "加强平衡及步行训练", "注意防跌倒",
+    "言语含糊，吞咽功能可", "坐位平衡2级", "站立平衡1级", "Brunnstrom分期上肢III期",
+    "血压控制平稳", "血糖控制可", "今日查房", "家属陪护", "佩戴踝足矫形器", "完成作业治疗",
+    "肩关节半脱位", "疼痛评分3分",
+]
+RARE_TERM = "深静脉血栓形成"
+
+
+def make_note_text(rng):
+    condition = "，".join(rng.sample(PHRASES, 3))
+    content = "。".join(rng.sample(PHRASES, 8))
+    if rng.random() < 0.001:
+        content += f"。复查超声提示{RARE_TERM}"
+    return condition, content
+
+
+def like_search(session, query: str, limit: int = 20):
+    """改造前的方式：LIKE 全表扫描，多个词时每个词都必须出现"""
+    params = {"limit": limit}
+    conditions = []
+    for i, term in enumerate(query.split()):
+        params[f"p{i}"] = f"%{term}%"
+        conditions.append(f"(daily_condition LIKE :p{i} OR generated_content LIKE :p{i})")
+    return session.execute(text(
+        f"SELECT id FROM progress_notes WHERE {' AND '.join(conditions)} "
+        f"ORDER BY id DESC LIMIT :limit"
+    ), params).all()
+
+
+def measure(label, func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {label:<8} {count:>4} 条  {best * 1000:>10.1f}ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文检索基准测试")
+    parser.add_argument("--patients", type=int, default=20000)
+    parser.add_argument("--notes-per-patient", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with temp_database() as db:
+        total = args.patients * args.notes_per_patient
+        print(f"生成测试数据: {args.patients} 位患者, {total} 条病程记录（含全文索引）")
+        start = time.perf_counter()
+        seed_database(db, args.patients, args.notes_per_patient, note_text=make_note_text)
+        print(f"  写入耗时 {time.perf_counter() - start:.1f}秒")
+
+        queries = [
+            ("罕见词", RARE_TERM),
+            ("常见词", "肩关节半脱位"),
+            ("多词", "肩关节半脱位 深静脉血栓"),
+        ]
+        with db.ReadSession() as session:
+            for label, term in queries:
+                print(f"{label}「{term}」")
+                like = measure("LIKE", lambda: len(like_search(session, term)), args.repeat)
+                fts = measure("FTS5", lambda: len(search(session, term, ["notes"])["items"]), args.repeat)
+                print(f"  提升: {like / fts:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
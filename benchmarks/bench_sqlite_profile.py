@@ -0,0 +1,105 @@
+"""
+SQLite性能配置基准测试
+
+对比回滚日志（SQLite默认）与 WAL 性能配置下，多个客户端并发访问
+/api/patients 与 /api/notes 时的混合读写吞吐量。
+
+用法: python -m benchmarks.bench_sqlite_profile [--clients 8] [--seconds 10] [--write-ratio 0.2]
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.common import temp_database, seed_database, running_api, SAMPLE_CONDITION, SAMPLE_CONTENT
+from database.performance import DEFAULT_PERFORMANCE_PROFILE, LEGACY_PERFORMANCE_PROFILE
+
+
+def client_worker(base_url, hospital_numbers, deadline, write_ratio, seed, results):
+    """单个客户端：循环发送混合读写请求直到截止时间"""
+    rng = random.Random(seed)
+    latencies = {"read": [], "write": []}
+    errors = 0
+
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        while time.perf_counter() < deadline:
+            hospital_number = rng.choice(hospital_numbers)
+            start = time.perf_counter()
+            if rng.random() < write_ratio:
+                kind = "write"
+                response = client.post("/api/notes/", json={
+                    "hospital_number": hospital_number,
+                    "record_date": str(date.today() - timedelta(days=rng.randint(0, 30))),
+                    "record_type": "日常病程",
+                    "daily_condition": SAMPLE_CONDITION,
+                    "generated_content": SAMPLE_CONTENT,
+                })
+            else:
+                kind = "read"
+                if rng.random() < 0.5:
+                    response = client.get("/api/patients/")
+                else:
+                    response = client.get(f"/api/notes/patient/{hospital_number}")
+            elapsed = time.perf_counter() - start
+            if response.status_code == 200:
+                latencies[kind].append(elapsed)
+            else:
+                errors += 1
+
+    results.append((latencies, errors))
+
+
+def run_profile(name, profile, args):
+    """在指定性能配置下运行一轮混合负载"""
+    with temp_database(profile) as db:
+        hospital_numbers = seed_database(db, args.patients, args.notes_per_patient)
+        with running_api(db) as base_url:
+            results = []
+            deadline = time.perf_counter() + args.seconds
+            threads = [
+                threading.Thread(
+                    target=client_worker,
+                    args=(base_url, hospital_numbers, deadline, args.write_ratio, i, results)
+                )
+                for i in range(args.clients)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+    reads = [lat for latencies, _ in results for lat in latencies["read"]]
+    writes = [lat for latencies, _ in results for lat in latencies["write"]]
+    errors = sum(err for _, err in results)
+
+    def percentile(values, q):
+        if not values:
+            return 0.0
+        return statistics.quantiles(values, n=100)[q - 1] * 1000 if len(values) > 1 else values[0] * 1000
+
+    total = len(reads) + len(writes)
+    print(f"[{name}] journal_mode={profile['journal_mode']} synchronous={profile['synchronous']}")
+    print(f"  吞吐量: {total / args.seconds:.1f} req/s  (读 {len(reads)}，写 {len(writes)}，失败 {errors})")
+    print(f"  读延迟 p50={percentile(reads, 50):.1f}ms p95={percentile(reads, 95):.1f}ms")
+    print(f"  写延迟 p50={percentile(writes, 50):.1f}ms p95={percentile(writes, 95):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite性能配置并发读写基准测试")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端数量")
+    parser.add_argument("--seconds", type=float, default=10, help="每种配置的运行时长（秒）")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="写请求比例")
+    parser.add_argument("--patients", type=int, default=60, help="测试患者数量")
+    parser.add_argument("--notes-per-patient", type=int, default=30, help="每位患者的病程记录数")
+    args = parser.parse_args()
+
+    run_profile("默认回滚日志", LEGACY_PERFORMANCE_PROFILE, args)
+    run_profile("WAL性能配置", DEFAULT_PERFORMANCE_PROFILE, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+基准测试公共工具：临时数据库、测试数据生成、本地API服务
+"""
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import uvicorn
+
+from database import DBManager
+
+
+SAMPLE_CONDITION = "患者神志清，精神可，右侧肢体肌力较前改善，继续康复训练。"
+SAMPLE_CONTENT = (
+    "今日查房，患者一般情况可，饮食睡眠尚可，二便正常。查体：右上肢肌力3+级，"
+    "右下肢肌力4级，肌张力略高，Brunnstrom分期上肢III期、下肢IV期。"
+    "继续目前康复治疗方案，加强平衡及步行训练，注意防跌倒。"
+) * 4
+
+
+@contextmanager
+def temp_database(performance: dict = None, **kwargs):
+    """创建临时数据库，退出时删除；kwargs 传给 DBManager"""
+    directory = tempfile.mkdtemp(prefix="rehab_bench_")
+    db_path = os.path.join(directory, "bench.db")
+    db = DBManager(db_path, performance, **kwargs)
+    try:
+        yield db
+    finally:
+        db.close()
+        for name in os.listdir(directory):
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+        try:
+            os.rmdir(directory)
+        except OSError:
+            pass
+
+
+def seed_database(db: DBManager, patients: int, notes_per_patient: int = 0,
+                  discharged_ratio: float = 0.0, seed: int = 42,
+                  note_text=None) -> list[str]:
+    """批量写入测试患者和病程记录，返回住院号列表
+
+    note_text(rng) 返回 (daily_condition, generated_content)，默认所有记录内容相同
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    hospital_numbers = []
+
+    with db.engine.begin() as conn:
+        patient_rows = []
+        for i in range(patients):
+            admission = today - timedelta(days=rng.randint(notes_per_patient, notes_per_patient + 60))
+            discharged = rng.random() < discharged_ratio
+            hospital_number = f"B{i:07d}"
+            hospital_numbers.append(hospital_number)
+            patient_rows.append({
+                "hospital_number": hospital_number,
+                "name": f"患者{i}",
+                "gender": "男" if i % 2 else "女",
+                "age": rng.randint(30, 90),
+                "admission_date": admission,
+                "discharge_date": today - timedelta(days=1) if discharged else None,
+                "chief_complaint": "右侧肢体活动不利",
+                "diagnosis": rng.choice(["脑梗死恢复期", "脑出血恢复期", "脊髓损伤", "骨折术后"]),
+                "past_history": "高血压病史10年",
+                "allergy_history": "否认",
+                "specialist_exam": SAMPLE_CONTENT,
+                "initial_note": SAMPLE_CONTENT,
+                "created_at": today,
+                "updated_at": today,
+            })
+        conn.execute(db_table("patients").insert(), patient_rows)
+
+        if notes_per_patient:
+            ids = conn.exec_driver_sql(
+                "SELECT id, hospital_number, admission_date FROM patients"
+            ).fetchall()
+            note_rows = []
+            for patient_id, hospital_number, admission in ids:
+                admission = date.fromisoformat(admission)
+                for day in range(notes_per_patient):
+                    condition, content = note_text(rng) if note_text else (SAMPLE_CONDITION, SAMPLE_CONTENT)
+                    note_rows.append({
+                        "patient_id": patient_id,
+                        "hospital_number": hospital_number,
+                        "record_date": admission + timedelta(days=day),
+                        "day_number": day + 1,
+                        "record_type": "日常病程",
+                        "daily_condition": condition,
+                        "generated_content": content,
+                        "is_edited": False,
+                        "created_at": today,
+                    })
+                if len(note_rows) >= 20000:
+                    conn.execute(db_table("progress_notes").insert(), note_rows)
+                    note_rows = []
+            if note_rows:
+                conn.execute(db_table("progress_notes").insert(), note_rows)
+
+    return hospital_numbers
+
+
+def db_table(name: str):
+    """按表名获取 SQLAlchemy Table 对象"""
+    from database.models import Base
+    return Base.metadata.tables[name]
+
+
+def free_port() -> int:
+    """获取一个空闲的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def running_api(db: DBManager):
+    """在后台线程启动API服务（不执行lifespan，直接注入db_manager）"""
+    from backend.api_main import app
+
+    app.state.db_manager = db
+    app.state.ai_manager = None
+    app.state.kb_manager = None
+
+    port = free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
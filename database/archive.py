@@ -0,0 +1,319 @@
+"""
+出院患者归档
+
+出院已久的患者连同病程记录、提醒、康复计划和康复进展一起移入独立的归档库文件，
+主库只保留在院及近期出院患者，病区日常查询不再随历史数据增长而变慢。
+
+归档库以 ATTACH DATABASE ... AS archive 挂载到每条连接上：
+- 搬移在写入队列中执行，INSERT INTO archive.* SELECT ... 与 DELETE FROM main.*
+  在同一个事务中完成，列名按模型显式列出
+- 归档库中的ID由归档库重新分配，子表通过住院号对应到归档后的患者ID，
+  病程记录修订历史通过 (患者, 记录日期) 对应到归档后的病程记录ID
+- 包含出院患者的列表查询通过 UNION ALL 同时读取两个文件（见 database.readers）
+
+注意：主库为WAL模式时，SQLite只保证每个文件各自的原子性。搬移顺序是先写归档库、
+再删主库，中途故障最多留下两边都有的副本；再次归档时发现归档库中已有相同住院号、
+相同入院日期的患者，只删除主库中的副本。
+
+命令行用法:
+    python -m database.archive --db ./rehab_assistant.db --archive ./rehab_archive.db --days 365
+"""
+import argparse
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import MetaData, bindparam, create_engine, event, text
+from sqlalchemy.engine import Engine
+
+from database.models import Base, NoteRevision, Patient, ProgressNote, Reminder, RehabPlan, RehabProgress
+from database.migrations import HOT_QUERY_INDEXES
+from database.identity_cache import CACHE_INFO_KEY
+
+ARCHIVE_SCHEMA = "archive"
+ARCHIVE_INFO_KEY = "archive_attached"
+# 自动归档的出院天数（config.json 的 database.archive.discharged_days），未配置时为 None
+ARCHIVE_WINDOW_INFO_KEY = "archive_after_days"
+
+# 子表在前：删除时先删子表
+CHILD_TABLES = [
+    ProgressNote.__table__,
+    Reminder.__table__,
+    RehabPlan.__table__,
+    RehabProgress.__table__,
+]
+# 病程记录的子表：复制时在病程记录之后，删除时在病程记录之前
+NOTE_CHILD_TABLES = [NoteRevision.__table__]
+ARCHIVE_TABLES = [Patient.__table__] + CHILD_TABLES + NOTE_CHILD_TABLES
+
+# 归档库中的表（schema 为 archive），供 Core 查询使用
+archive_metadata = MetaData()
+archived = {
+    table.name: table.to_metadata(archive_metadata, schema=ARCHIVE_SCHEMA)
+    for table in ARCHIVE_TABLES
+}
+
+DEFAULT_BATCH_SIZE = 200
+
+
+@dataclass
+class ArchiveResult:
+    """归档结果"""
+    patients: int = 0
+    rows: dict = field(default_factory=dict)
+    conflicts: list = field(default_factory=list)
+    hospital_numbers: list = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "patients": self.patients,
+            "rows": self.rows,
+            "conflicts": self.conflicts,
+        }
+
+
+def ensure_archive_database(archive_path: str):
+    """创建归档库文件及表结构，并补齐模型新增的列"""
+    engine = create_engine(f"sqlite:///{archive_path}")
+    try:
+        Base.metadata.create_all(engine, tables=ARCHIVE_TABLES)
+        with engine.begin() as conn:
+            for table in ARCHIVE_TABLES:
+                existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table.name})")}
+                for column in table.columns:
+                    if column.name not in existing:
+                        column_type = column.type.compile(dialect=engine.dialect)
+                        conn.exec_driver_sql(
+                            f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                        )
+            table_names = {table.name for table in ARCHIVE_TABLES}
+            for name, table, columns in HOT_QUERY_INDEXES:
+                if table in table_names:
+                    conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    finally:
+        engine.dispose()
+
+
+def attach_archive(engine: Engine, archive_path: str, read_only: bool = False):
+    """在引擎上注册 connect 事件，把归档库挂载为 archive
+
+    只读引擎使用URI方式以只读模式挂载（引擎本身需以 uri=true 打开）。
+    """
+    path = Path(archive_path).resolve().as_posix()
+    target = f"file:{path}?mode=ro" if read_only else path
+
+    @event.listens_for(engine, "connect")
+    def _attach_archive(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (target,))
+        finally:
+            cursor.close()
+
+
+def _column_names(table) -> list:
+    """除自增ID外的所有列"""
+    return [c.name for c in table.columns if c.name != "id"]
+
+
+def _copy_patients(session, source: str, target: str, where: str, params: dict) -> dict:
+    """复制患者及其子表记录，返回各表复制的行数
+
+    子表的 patient_id 通过住院号对应到目标库中的新ID。
+    """
+    columns = ", ".join(_column_names(Patient.__table__))
+    patients = session.execute(text(
+        f"INSERT INTO {target}.patients ({columns}) "
+        f"SELECT {columns} FROM {source}.patients p WHERE {where}"
+    ).bindparams(*_expanding(params)), params).rowcount
+    counts = {"patients": patients}
+
+    for table in CHILD_TABLES:
+        names = _column_names(table)
+        select_list = ", ".join("tp.id" if name == "patient_id" else f"t.{name}" for name in names)
+        counts[table.name] = session.execute(text(
+            f"INSERT INTO {target}.{table.name} ({', '.join(names)}) "
+            f"SELECT {select_list} FROM {source}.{table.name} t "
+            f"JOIN {source}.patients p ON p.id = t.patient_id "
+            f"JOIN {target}.patients tp ON tp.hospital_number = p.hospital_number "
+            f"WHERE {where}"
+        ).bindparams(*_expanding(params)), params).rowcount
+
+    # 同一患者同一天只有一条病程记录（ux_progress_notes_patient_date），据此对应到目标库中的新ID
+    for table in NOTE_CHILD_TABLES:
+        names = _column_names(table)
+        select_list = ", ".join("tn.id" if name == "note_id" else f"t.{name}" for name in names)
+        counts[table.name] = session.execute(text(
+            f"INSERT INTO {target}.{table.name} ({', '.join(names)}) "
+            f"SELECT {select_list} FROM {source}.{table.name} t "
+            f"JOIN {source}.progress_notes n ON n.id = t.note_id "
+            f"JOIN {source}.patients p ON p.id = n.patient_id "
+            f"JOIN {target}.patients tp ON tp.hospital_number = p.hospital_number "
+            f"JOIN {target}.progress_notes tn ON tn.patient_id = tp.id AND tn.record_date = n.record_date "
+            f"WHERE {where}"
+        ).bindparams(*_expanding(params)), params).rowcount
+    return counts
+
+
+def _delete_patients(session, schema: str, where: str, params: dict):
+    """删除患者及其子表记录（归档库没有外键级联，逐表删除）"""
+    for table in NOTE_CHILD_TABLES:
+        session.execute(text(
+            f"DELETE FROM {schema}.{table.name} WHERE note_id IN "
+            f"(SELECT n.id FROM {schema}.progress_notes n JOIN {schema}.patients p ON p.id = n.patient_id "
+            f"WHERE {where})"
+        ).bindparams(*_expanding(params)), params)
+    for table in CHILD_TABLES:
+        session.execute(text(
+            f"DELETE FROM {schema}.{table.name} WHERE patient_id IN "
+            f"(SELECT p.id FROM {schema}.patients p WHERE {where})"
+        ).bindparams(*_expanding(params)), params)
+    session.execute(text(
+        f"DELETE FROM {schema}.patients WHERE id IN (SELECT p.id FROM {schema}.patients p WHERE {where})"
+    ).bindparams(*_expanding(params)), params)
+
+
+def _expanding(params: dict) -> list:
+    return [bindparam(name, expanding=True) for name, value in params.items() if isinstance(value, list)]
+
+
+def _archive_batch(session, patient_ids: list, cutoff: date) -> dict:
+    """写入队列中执行：归档一批患者"""
+    candidates = session.execute(text(
+        "SELECT p.id, p.hospital_number, p.admission_date, a.admission_date "
+        "FROM main.patients p "
+        "LEFT JOIN archive.patients a ON a.hospital_number = p.hospital_number "
+        "WHERE p.id IN :ids AND p.discharge_date IS NOT NULL AND p.discharge_date < :cutoff"
+    ).bindparams(bindparam("ids", expanding=True)), {"ids": patient_ids, "cutoff": cutoff.isoformat()}).all()
+
+    to_move, already_archived, conflicts = [], [], []
+    for patient_id, hospital_number, admission_date, archived_admission in candidates:
+        if archived_admission is None:
+            to_move.append((patient_id, hospital_number))
+        elif archived_admission == admission_date:
+            already_archived.append((patient_id, hospital_number))
+        else:
+            conflicts.append(hospital_number)
+
+    counts = {}
+    if to_move:
+        params = {"ids": [patient_id for patient_id, _ in to_move]}
+        counts = _copy_patients(session, "main", "archive", "p.id IN :ids", params)
+    moved = to_move + already_archived
+    if moved:
+        _delete_patients(session, "main", "p.id IN :ids", {"ids": [patient_id for patient_id, _ in moved]})
+
+    return {
+        "counts": counts,
+        "hospital_numbers": [hospital_number for _, hospital_number in moved],
+        "conflicts": conflicts,
+    }
+
+
+def archive_discharged_patients(db, older_than_days: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                                today: Optional[date] = None) -> ArchiveResult:
+    """把出院超过 older_than_days 天的患者移入归档库
+
+    每批患者作为一个写操作提交，避免长时间占用写入队列。
+    """
+    if not db.archive_path:
+        raise RuntimeError("未配置归档库")
+    cutoff = (today or date.today()) - timedelta(days=older_than_days)
+
+    with db.ReadSession() as session:
+        patient_ids = session.execute(
+            text("SELECT id FROM main.patients WHERE discharge_date IS NOT NULL AND discharge_date < :cutoff"),
+            {"cutoff": cutoff.isoformat()},
+        ).scalars().all()
+
+    result = ArchiveResult()
+    for start in range(0, len(patient_ids), batch_size):
+        outcome = db.writer.execute(_archive_batch, patient_ids[start:start + batch_size], cutoff)
+        # Core 写入不经过ORM会话事件，需要手动使患者缓存失效
+        db.patient_cache.invalidate(outcome["hospital_numbers"])
+        result.patients += len(outcome["hospital_numbers"])
+        result.hospital_numbers.extend(outcome["hospital_numbers"])
+        result.conflicts.extend(outcome["conflicts"])
+        for table, count in outcome["counts"].items():
+            if table != "patients":
+                result.rows[table] = result.rows.get(table, 0) + count
+    return result
+
+
+def belongs_in_main(session, discharge_date: Optional[date], today: Optional[date] = None) -> bool:
+    """出院日期为该值的患者是否应在主库：未出院，或出院未超过自动归档天数
+
+    未配置自动归档时只有未出院的患者需要移回主库。
+    """
+    if discharge_date is None:
+        return True
+    older_than_days = session.info.get(ARCHIVE_WINDOW_INFO_KEY)
+    if older_than_days is None:
+        return False
+    return discharge_date >= (today or date.today()) - timedelta(days=older_than_days)
+
+
+def update_archived_patient(session, hospital_number: str, values: dict) -> bool:
+    """原地修改归档库中的患者信息（在写会话中调用），归档库中不存在时返回 False"""
+    if not session.info.get(ARCHIVE_INFO_KEY):
+        return False
+    patients = archived["patients"]
+    result = session.execute(
+        patients.update().where(patients.c.hospital_number == hospital_number).values(**values))
+    return result.rowcount > 0
+
+
+def restore_patient(session, hospital_number: str) -> bool:
+    """把归档患者移回主库（在写会话中调用），归档库中不存在时返回 False
+
+    Raises:
+        ValueError: 主库中已有相同住院号的患者
+    """
+    if not session.info.get(ARCHIVE_INFO_KEY):
+        return False
+    found = session.execute(
+        text("SELECT 1 FROM archive.patients WHERE hospital_number = :hn"), {"hn": hospital_number}
+    ).first()
+    if not found:
+        return False
+    if session.execute(
+        text("SELECT 1 FROM main.patients WHERE hospital_number = :hn"), {"hn": hospital_number}
+    ).first():
+        raise ValueError(f"住院号 {hospital_number} 在主库和归档库中同时存在")
+
+    params = {"hn": hospital_number}
+    _copy_patients(session, "archive", "main", "p.hospital_number = :hn", params)
+    _delete_patients(session, "archive", "p.hospital_number = :hn", params)
+    # 主库患者通过 Core 写入，失效缓存中该住院号的条目
+    cache = session.info.get(CACHE_INFO_KEY)
+    if cache is not None:
+        cache.invalidate([hospital_number])
+    return True
+
+
+def main():
+    from database import DBManager
+
+    parser = argparse.ArgumentParser(description="把出院已久的患者移入归档库")
+    parser.add_argument("--db", default="./rehab_assistant.db", help="主库文件路径")
+    parser.add_argument("--archive", default="./rehab_archive.db", help="归档库文件路径")
+    parser.add_argument("--days", type=int, default=365, help="出院超过多少天的患者归档")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    db = DBManager(args.db, archive_path=args.archive)
+    try:
+        result = archive_discharged_patients(db, args.days, args.batch_size)
+    finally:
+        db.close()
+
+    print(f"已归档 {result.patients} 位患者")
+    for table, count in result.rows.items():
+        print(f"  {table}: {count} 行")
+    if result.conflicts:
+        print(f"  住院号冲突未归档: {', '.join(result.conflicts)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+异步数据库会话
+
+FastAPI路由都是 async def，直接调用同步的 session.query 会阻塞事件循环，
+导致健康检查、AI请求等无关接口一起卡住。AsyncDBSession 把同步ORM操作
+放到专用的数据库线程池中执行，路由只需 await。
+
+读操作通过 run() 在只读会话上执行；写操作通过 write() 提交到单写入者队列，
+写函数只 flush 不 commit，由写入队列统一提交。
+"""
+import asyncio
+import functools
+from concurrent.futures import Executor
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from database.write_queue import WriteQueue
+
+
+class AsyncDBSession:
+    """在数据库线程池中执行同步ORM操作的会话包装
+
+    同一个会话上的操作按 await 顺序依次执行，不会并发访问底层 Session。
+    """
+
+    def __init__(self, session: Session, executor: Executor, writer: WriteQueue):
+        self.session = session
+        self._executor = executor
+        self._writer = writer
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """在数据库线程中执行 func(session, *args, **kwargs)"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, self.session, *args, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    async def write(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """把写操作 func(write_session, *args, **kwargs) 提交到写入队列，提交成功后返回结果"""
+        return await asyncio.wrap_future(self._writer.submit(func, *args, **kwargs))
+
+    async def close(self):
+        """关闭会话并归还连接"""
+        await self.run(Session.close)
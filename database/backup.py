@@ -0,0 +1,199 @@
+"""
+在线数据库备份
+
+服务运行时直接复制 rehab_assistant.db 可能得到写了一半的文件。这里使用 SQLite 在线备份API
+（sqlite3.Connection.backup），得到与某一时刻一致的快照，不需要停止服务：
+- 每步只复制 pages_per_step 页，步与步之间暂停 step_pause 秒
+- WAL模式（默认）：备份连接先开启读事务固定一个快照，各步都从这个快照复制。
+  WAL模式下读事务不阻塞写入，备份期间的写入进入WAL，不会导致重新复制
+- 非WAL模式：每一步只在复制期间持有源库的共享锁，写入最多等待一步的时间；
+  两步之间源库被写入时 SQLite 从头重新复制（restarts 计数），
+  超过 MAX_RESTARTS 次后改为一步复制完，保证备份能结束
+- 先写入 .partial 临时文件，PRAGMA integrity_check 通过后才改名为正式快照，
+  校验失败的快照删除并抛出 BackupError
+- 每个数据库文件保留最近 keep 个快照，更早的自动删除
+
+结果中 duration 为备份总耗时，held 为各步持有源库的时间之和，max_step 为单步最长持有时间。
+
+命令行用法:
+    python -m database.backup --db ./rehab_assistant.db --dir ./backups --keep 7
+"""
+import argparse
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_PAGES_PER_STEP = 256
+DEFAULT_STEP_PAUSE = 0.005
+DEFAULT_KEEP = 7
+MAX_RESTARTS = 3
+
+SNAPSHOT_SUFFIX = ".db"
+PARTIAL_SUFFIX = ".partial"
+
+
+class BackupError(Exception):
+    """快照未通过完整性校验"""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+@dataclass
+class BackupResult:
+    """一次备份的结果"""
+    source: str
+    path: str
+    pages: int = 0
+    steps: int = 0
+    restarts: int = 0
+    # 是否固定了读快照（WAL模式）
+    snapshot: bool = False
+    duration: float = 0.0
+    held: float = 0.0
+    max_step: float = 0.0
+    integrity: str = ""
+    removed: list = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "path": self.path,
+            "pages": self.pages,
+            "steps": self.steps,
+            "restarts": self.restarts,
+            "snapshot": self.snapshot,
+            "duration_ms": round(self.duration * 1000, 1),
+            "held_ms": round(self.held * 1000, 1),
+            "max_step_ms": round(self.max_step * 1000, 2),
+            "integrity": self.integrity,
+            "removed": self.removed,
+        }
+
+
+def snapshot_path(source: str, directory: str, now: Optional[datetime] = None) -> Path:
+    """快照文件名：<源文件名>-<年月日-时分秒>.db"""
+    now = now or datetime.now()
+    return Path(directory) / f"{Path(source).stem}-{now:%Y%m%d-%H%M%S}{SNAPSHOT_SUFFIX}"
+
+
+def list_snapshots(source: str, directory: str) -> list:
+    """源库已有的快照，按时间从新到旧排列"""
+    pattern = f"{Path(source).stem}-*{SNAPSHOT_SUFFIX}"
+    return sorted(Path(directory).glob(pattern), reverse=True)
+
+
+def rotate_snapshots(source: str, directory: str, keep: int) -> list:
+    """只保留最近 keep 个快照，返回删除的文件"""
+    removed = []
+    for path in list_snapshots(source, directory)[keep:]:
+        path.unlink()
+        removed.append(str(path))
+    return removed
+
+
+def check_integrity(path: str) -> str:
+    """PRAGMA integrity_check，通过时返回 ok"""
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return "; ".join(row[0] for row in rows)
+
+
+def backup_database(source: str, directory: str, keep: int = DEFAULT_KEEP,
+                    pages_per_step: int = DEFAULT_PAGES_PER_STEP,
+                    step_pause: float = DEFAULT_STEP_PAUSE,
+                    now: Optional[datetime] = None) -> BackupResult:
+    """把 source 在线备份到 directory，校验后轮换旧快照
+
+    Args:
+        pages_per_step: 每步复制的页数，越小单步持有源库的时间越短，总耗时越长
+        step_pause: 步与步之间的暂停（秒），让出时间给写入
+        now: 快照时间（测试用），默认当前时间
+    """
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    target = snapshot_path(source, directory, now)
+    partial = target.with_name(target.name + PARTIAL_SUFFIX)
+    result = BackupResult(source=str(source), path=str(target))
+
+    state = {"step_start": 0.0, "remaining": None}
+
+    def progress(status, remaining, total):
+        held = time.perf_counter() - state["step_start"]
+        result.steps += 1
+        result.held += held
+        result.max_step = max(result.max_step, held)
+        result.pages = total
+        # 剩余页数变多说明源库被写入，SQLite 从头重新复制
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            result.restarts += 1
+            if result.restarts > MAX_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        if remaining and step_pause:
+            time.sleep(step_pause)
+        state["step_start"] = time.perf_counter()
+
+    def copy(pages):
+        state["remaining"] = None
+        state["step_start"] = time.perf_counter()
+        dst = sqlite3.connect(str(partial))
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=max(step_pause, 0.001))
+        finally:
+            dst.close()
+
+    started = time.perf_counter()
+    src = sqlite3.connect(f"file:{Path(source).resolve().as_posix()}?mode=ro", uri=True,
+                          isolation_level=None)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # 开启读事务并读一页，固定快照直到备份结束
+            src.execute("BEGIN")
+            src.execute("SELECT count(*) FROM sqlite_master").fetchone()
+            result.snapshot = True
+        try:
+            copy(pages_per_step)
+        except _TooManyRestarts:
+            copy(-1)
+    except Exception:
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        src.close()
+    result.duration = time.perf_counter() - started
+
+    result.integrity = check_integrity(str(partial))
+    if result.integrity != "ok":
+        partial.unlink(missing_ok=True)
+        raise BackupError(f"快照完整性校验失败: {result.integrity}")
+    partial.replace(target)
+    result.removed = rotate_snapshots(source, directory, keep)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在线备份数据库（不需要停止服务）")
+    parser.add_argument("--db", default="./rehab_assistant.db", help="数据库文件路径")
+    parser.add_argument("--dir", default="./backups", help="快照目录")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="保留最近几个快照")
+    parser.add_argument("--pages-per-step", type=int, default=DEFAULT_PAGES_PER_STEP)
+    args = parser.parse_args()
+
+    result = backup_database(args.db, args.dir, args.keep, args.pages_per_step)
+    print(f"已备份到 {result.path}")
+    print(f"  {result.pages} 页, {result.steps} 步, 重新复制 {result.restarts} 次")
+    print(f"  耗时 {result.duration * 1000:.1f}ms, 持有源库 {result.held * 1000:.1f}ms"
+          f"（单步最长 {result.max_step * 1000:.2f}ms）")
+    for path in result.removed:
+        print(f"  已删除旧快照 {path}")
+
+
+if __name__ == "__main__":
+    main()
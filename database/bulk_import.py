@@ -0,0 +1,384 @@
+"""
+患者与病程记录批量导入
+
+从HIS导出的 CSV / JSONL 文件流式读取，按块校验后批量写入：
+- 患者按住院号 upsert（INSERT ... ON CONFLICT(hospital_number) DO UPDATE），
+  入院/出院日期或姓名有变化的已有患者随后刷新已生成的提醒
+- 病程记录按 (患者, 记录日期) upsert（INSERT ... ON CONFLICT(patient_id, record_date) DO UPDATE），
+  依赖唯一索引 ux_progress_notes_patient_date
+
+每块作为一个写操作提交到写入队列，解析下一块与写入上一块同时进行。
+单行校验失败或写入失败只记录该行错误，不影响同块其他行。
+
+命令行用法:
+    python -m database.bulk_import patients patients.csv [--db ./rehab_assistant.db]
+    python -m database.bulk_import notes notes.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import IO, Iterator, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database.models import Patient, ProgressNote
+from database.reminders import REFRESH_FIELDS, refresh_reminders
+from database.write_queue import WriteQueueFullError
+
+IMPORT_KINDS = ("patients", "notes")
+IMPORT_FORMATS = ("csv", "jsonl")
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_MAX_ERRORS = 1000
+# 同时在写入队列中等待的块数上限
+MAX_IN_FLIGHT_CHUNKS = 4
+
+
+class PatientImportRow(BaseModel):
+    hospital_number: str
+    name: Optional[str] = None
+    gender: Optional[str] = None
+    age: Optional[int] = None
+    admission_date: date
+    discharge_date: Optional[date] = None
+    chief_complaint: Optional[str] = None
+    diagnosis: Optional[str] = None
+    past_history: Optional[str] = None
+    allergy_history: Optional[str] = None
+    specialist_exam: Optional[str] = None
+    initial_note: Optional[str] = None
+
+
+class NoteImportRow(BaseModel):
+    hospital_number: str
+    record_date: date
+    record_type: str
+    daily_condition: Optional[str] = None
+    generated_content: Optional[str] = None
+    day_number: Optional[int] = None
+    is_edited: Optional[bool] = None
+
+
+ROW_MODELS = {
+    "patients": PatientImportRow,
+    "notes": NoteImportRow,
+}
+
+
+@dataclass
+class ImportResult:
+    """导入结果"""
+    kind: str
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    max_errors: int = DEFAULT_MAX_ERRORS
+
+    def add_error(self, line: int, hospital_number: Optional[str], message: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "hospital_number": hospital_number, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "kind": self.kind,
+            "total": self.total,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def detect_format(filename: str) -> str:
+    """根据文件扩展名判断格式"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"不支持的文件格式: {ext or filename}（支持 .csv / .jsonl）")
+
+
+def iter_records(stream: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """逐行读取记录，返回 (行号, 记录)；无法解析的行返回 (行号, 异常)"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            # CSV 中的空单元格视为未填写
+            yield reader.line_num, {k: v for k, v in record.items() if k and v != ""}
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, e
+                continue
+            if not isinstance(record, dict):
+                yield line_no, ValueError("每行必须是一个JSON对象")
+                continue
+            yield line_no, record
+    else:
+        raise ValueError(f"不支持的文件格式: {fmt}")
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or '记录'}: {e['msg']}" for e in error.errors()
+    )
+
+
+def _validate_chunk(kind: str, records: list, result: ImportResult) -> list:
+    """校验一块记录，返回 [(行号, 字段字典)]，失败的行记入 result"""
+    model = ROW_MODELS[kind]
+    rows = []
+    for line_no, record in records:
+        if isinstance(record, Exception):
+            result.add_error(line_no, None, f"无法解析: {record}")
+            continue
+        try:
+            row = model.model_validate(record)
+        except ValidationError as e:
+            result.add_error(line_no, record.get("hospital_number"), _format_validation_error(e))
+            continue
+        rows.append((line_no, row.model_dump(exclude_unset=True)))
+    return rows
+
+
+def _dedupe(rows: list, key) -> list:
+    """块内重复的记录只保留最后一条"""
+    latest = {}
+    for line_no, row in rows:
+        latest.pop(key(row), None)
+        latest[key(row)] = (line_no, row)
+    return list(latest.values())
+
+
+def _write_rows(session, write, rows: list) -> Tuple[int, int, list]:
+    """先整块批量写入；失败时逐行重试，找出出错的行"""
+    savepoint = session.begin_nested()
+    try:
+        inserted, updated = write(session, [row for _, row in rows])
+        savepoint.commit()
+        return inserted, updated, []
+    except Exception:
+        savepoint.rollback()
+
+    inserted = updated = 0
+    errors = []
+    for line_no, row in rows:
+        savepoint = session.begin_nested()
+        try:
+            row_inserted, row_updated = write(session, [row])
+            savepoint.commit()
+            inserted += row_inserted
+            updated += row_updated
+        except Exception as e:
+            savepoint.rollback()
+            errors.append((line_no, row.get("hospital_number"), str(e)))
+    return inserted, updated, errors
+
+
+def _upsert_patients(session, rows: list) -> Tuple[int, int]:
+    hospital_numbers = [row["hospital_number"] for row in rows]
+    existing = set(session.execute(
+        select(Patient.hospital_number).where(Patient.hospital_number.in_(hospital_numbers))
+    ).scalars())
+
+    # executemany 要求每组参数的字段相同；只更新文件中提供的字段
+    groups = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    now = datetime.now()
+    for columns, group in groups.items():
+        stmt = sqlite_insert(Patient)
+        update_columns = {
+            name: stmt.excluded[name] for name in columns if name != "hospital_number"
+        }
+        update_columns["updated_at"] = now
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Patient.hospital_number], set_=update_columns
+        )
+        session.execute(stmt, group)
+
+    # 已有患者的入院/出院日期或姓名变化后重新计算已生成的提醒
+    refresh_reminders(session, [row["hospital_number"] for row in rows
+                                if row["hospital_number"] in existing and REFRESH_FIELDS & row.keys()])
+    return len(rows) - len(existing), len(existing)
+
+
+def _write_patient_chunk(session, rows: list):
+    rows = _dedupe(rows, lambda row: row["hospital_number"])
+    return _write_rows(session, _upsert_patients, rows)
+
+
+def _upsert_notes(session, rows: list) -> Tuple[int, int]:
+    """rows 中已包含 patient_id 和 day_number"""
+    keys = [(row["patient_id"], row["record_date"]) for row in rows]
+    existing = session.execute(
+        select(func.count()).select_from(ProgressNote)
+        .where(tuple_(ProgressNote.patient_id, ProgressNote.record_date).in_(keys))
+    ).scalar()
+
+    # 与 POST /api/notes/ 一致：同一天已有记录时覆盖原内容（只覆盖文件中提供的字段）
+    groups = {}
+    for row in rows:
+        groups.setdefault(frozenset(row), []).append(row)
+    for columns, group in groups.items():
+        stmt = sqlite_insert(ProgressNote)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ProgressNote.patient_id, ProgressNote.record_date],
+            set_={name: stmt.excluded[name] for name in columns if name not in ("patient_id", "record_date")},
+        )
+        session.execute(stmt, [dict(row, is_edited=row.get("is_edited", False)) for row in group])
+    return len(rows) - existing, existing
+
+
+def _write_note_chunk(session, rows: list):
+    rows = _dedupe(rows, lambda row: (row["hospital_number"], row["record_date"]))
+    patients = {
+        hn: (patient_id, admission_date)
+        for patient_id, hn, admission_date in session.execute(
+            select(Patient.id, Patient.hospital_number, Patient.admission_date)
+            .where(Patient.hospital_number.in_({row["hospital_number"] for _, row in rows}))
+        )
+    }
+
+    resolved = []
+    missing = []
+    for line_no, row in rows:
+        patient = patients.get(row["hospital_number"])
+        if patient is None:
+            missing.append((line_no, row["hospital_number"], "患者不存在"))
+            continue
+        patient_id, admission_date = patient
+        values = dict(row, patient_id=patient_id)
+        values.setdefault("day_number", (row["record_date"] - admission_date).days + 1)
+        resolved.append((line_no, values))
+
+    inserted, updated, errors = _write_rows(session, _upsert_notes, resolved)
+    return inserted, updated, missing + errors
+
+
+CHUNK_WRITERS = {
+    "patients": _write_patient_chunk,
+    "notes": _write_note_chunk,
+}
+
+
+def import_records(db, kind: str, stream: IO[str], fmt: str,
+                   chunk_size: int = DEFAULT_CHUNK_SIZE,
+                   max_errors: int = DEFAULT_MAX_ERRORS) -> ImportResult:
+    """从文本流批量导入患者或病程记录
+
+    Args:
+        db: DBManager
+        kind: "patients" 或 "notes"
+        stream: 文本流（CSV 需带表头，JSONL 每行一个对象）
+        fmt: "csv" 或 "jsonl"
+        chunk_size: 每块行数，每块作为一个写操作提交
+        max_errors: 结果中最多保留的错误明细数
+    """
+    if kind not in IMPORT_KINDS:
+        raise ValueError(f"不支持的导入类型: {kind}")
+    writer = CHUNK_WRITERS[kind]
+    result = ImportResult(kind=kind, max_errors=max_errors)
+    in_flight = deque()
+
+    def finish_oldest():
+        future, rows = in_flight.popleft()
+        try:
+            inserted, updated, errors = future.result()
+        except Exception as e:
+            for line_no, row in rows:
+                result.add_error(line_no, row.get("hospital_number"), str(e))
+            return
+        result.inserted += inserted
+        result.updated += updated
+        for line_no, hospital_number, message in errors:
+            result.add_error(line_no, hospital_number, message)
+        if kind == "patients":
+            # Core upsert 不经过ORM会话事件，需要手动使患者缓存失效
+            db.patient_cache.invalidate(row["hospital_number"] for _, row in rows)
+
+    def submit(records):
+        rows = _validate_chunk(kind, records, result)
+        if not rows:
+            return
+        while True:
+            try:
+                future = db.writer.submit(writer, rows)
+                break
+            except WriteQueueFullError:
+                if not in_flight:
+                    raise
+                finish_oldest()
+        in_flight.append((future, rows))
+        while len(in_flight) >= MAX_IN_FLIGHT_CHUNKS:
+            finish_oldest()
+
+    chunk = []
+    for line_no, record in iter_records(stream, fmt):
+        result.total += 1
+        chunk.append((line_no, record))
+        if len(chunk) >= chunk_size:
+            submit(chunk)
+            chunk = []
+    if chunk:
+        submit(chunk)
+    while in_flight:
+        finish_oldest()
+    return result
+
+
+def import_file(db, kind: str, path: str, fmt: Optional[str] = None, **kwargs) -> ImportResult:
+    """从文件批量导入，格式默认按扩展名判断"""
+    fmt = fmt or detect_format(path)
+    # utf-8-sig 兼容Excel导出的带BOM的CSV
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        return import_records(db, kind, f, fmt, **kwargs)
+
+
+def main():
+    import time
+    from database import DBManager
+
+    parser = argparse.ArgumentParser(description="批量导入患者或病程记录（CSV / JSONL）")
+    parser.add_argument("kind", choices=IMPORT_KINDS, help="导入类型")
+    parser.add_argument("path", help="CSV 或 JSONL 文件路径")
+    parser.add_argument("--db", default="./rehab_assistant.db", help="数据库文件路径")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="文件格式（默认按扩展名判断）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--max-errors", type=int, default=DEFAULT_MAX_ERRORS)
+    args = parser.parse_args()
+
+    db = DBManager(args.db)
+    try:
+        start = time.perf_counter()
+        result = import_file(db, args.kind, args.path, args.format,
+                             chunk_size=args.chunk_size, max_errors=args.max_errors)
+        elapsed = time.perf_counter() - start
+    finally:
+        db.close()
+
+    print(f"共 {result.total} 行：新增 {result.inserted}，更新 {result.updated}，"
+          f"失败 {result.failed}（{elapsed:.2f}秒）")
+    for error in result.errors:
+        print(f"  第{error['line']}行 [{error['hospital_number'] or '-'}] {error['error']}")
+    if result.failed > len(result.errors):
+        print(f"  ……另有 {result.failed - len(result.errors)} 条错误未显示")
+
+
+if __name__ == "__main__":
+    main()
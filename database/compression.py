@@ -0,0 +1,439 @@
+"""
+长文本透明压缩
+
+患者的专科查体、首次病程记录，病程记录的病情记录、生成内容每条都有几KB，
+内容是高度重复的中文病历文本，占了数据库文件和页缓存的大部分。
+这几列使用 CompressedText 类型：写入时压缩为 BLOB，读取时自动解压，调用方看到的仍是 str。
+
+存储格式（列声明仍为 TEXT，SQLite 按实际值区分 TEXT / BLOB）：
+- TEXT：未压缩（短于 MIN_LENGTH 字节、压缩后反而更大、压缩迁移之前写入的旧数据）
+- BLOB 0x01 + deflate：无字典压缩
+- BLOB 0x02 + 4字节字典ID + deflate：使用预置字典压缩
+
+预置字典从已有记录中统计高频短句训练得到（train_dictionary），保存在 text_dictionaries 表中，
+字典ID为内容的哈希；旧字典永不删除，使用旧字典压缩的记录始终可以解压。
+每个 DBManager 的引擎方言上绑定一个 TextCodec，决定新写入是否压缩、使用哪个字典。
+
+全文检索触发器和 notes_fts 的内容视图通过 SQL 函数 decompress_text() 读取原文，
+病程记录修订触发器（database.revisions）通过 text_delta() 计算两版之间的差异，
+因此写入 progress_notes 的连接都需要注册这两个函数（install_text_compression）。
+sqlite3 命令行、数据库浏览器等外部工具没有这两个函数，不能直接修改病程记录
+（报 "no such function: decompress_text"），维护脚本改用 connect() 打开的连接。
+
+已有数据由 compress_existing 在后台分批压缩（见 DBManager.compress_text）。
+
+命令行用法:
+    python -m database.compression --db ./rehab_assistant.db
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Text, bindparam, event, select, text, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.types import TypeDecorator
+
+FORMAT_DEFLATE = 0x01
+FORMAT_DEFLATE_DICT = 0x02
+DICTIONARY_ID_SIZE = 4
+
+# 短于该字节数的文本不压缩
+MIN_LENGTH = 128
+COMPRESSION_LEVEL = 6
+# deflate 窗口为32KB，更长的字典只有末尾部分生效
+DICTIONARY_SIZE = 32 * 1024
+TRAINING_SAMPLE_ROWS = 2000
+MIN_TRAINING_ROWS = 50
+
+CODEC_ATTRIBUTE = "text_codec"
+SQL_FUNCTION = "decompress_text"
+DELTA_SQL_FUNCTION = "text_delta"
+DICTIONARY_TABLE = "text_dictionaries"
+
+# 已加载的字典：字典ID → 内容。ID 为内容哈希，多个数据库共用不会冲突
+_dictionaries: dict = {}
+
+
+class CompressionError(ValueError):
+    """压缩数据无法解压（未知格式或字典）"""
+
+
+def dictionary_id(data: bytes) -> bytes:
+    return hashlib.sha256(data).digest()[:DICTIONARY_ID_SIZE]
+
+
+def register_dictionary(data: bytes) -> bytes:
+    """登记字典以便解压，返回字典ID"""
+    key = dictionary_id(data)
+    _dictionaries[key] = data
+    return key
+
+
+def decompress_value(value):
+    """把列中存储的值还原为文本，未压缩的值原样返回"""
+    if not isinstance(value, (bytes, memoryview)):
+        return value
+    value = bytes(value)
+    if not value:
+        return ""
+    try:
+        if value[0] == FORMAT_DEFLATE:
+            return zlib.decompress(value[1:], -zlib.MAX_WBITS).decode("utf-8")
+        if value[0] == FORMAT_DEFLATE_DICT:
+            key = value[1:1 + DICTIONARY_ID_SIZE]
+            zdict = _dictionaries.get(key)
+            if zdict is None:
+                raise CompressionError(f"未知的压缩字典 {key.hex()}")
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=zdict)
+            raw = decompressor.decompress(value[1 + DICTIONARY_ID_SIZE:]) + decompressor.flush()
+            return raw.decode("utf-8")
+    except zlib.error as e:
+        raise CompressionError(f"压缩数据损坏: {e}") from e
+    raise CompressionError(f"未知的压缩格式 0x{value[0]:02x}")
+
+
+class TextCodec:
+    """新写入的压缩方式：是否压缩、使用哪个字典"""
+
+    def __init__(self, enabled: bool = True, min_length: int = MIN_LENGTH,
+                 level: int = COMPRESSION_LEVEL):
+        self.enabled = enabled
+        self.min_length = min_length
+        self.level = level
+        self.dictionary_id: Optional[bytes] = None
+        self._zdict: Optional[bytes] = None
+
+    def use_dictionary(self, data: Optional[bytes]):
+        """之后的写入使用该字典（None 表示不用字典）"""
+        if data is None:
+            self.dictionary_id, self._zdict = None, None
+            return
+        self.dictionary_id = register_dictionary(data)
+        self._zdict = data
+
+    def compress(self, value: str):
+        """压缩后更小时返回 BLOB，否则返回原文本"""
+        if not self.enabled:
+            return value
+        raw = value.encode("utf-8")
+        if len(raw) < self.min_length:
+            return value
+        if self._zdict is not None:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=self._zdict)
+            header = bytes([FORMAT_DEFLATE_DICT]) + self.dictionary_id
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -zlib.MAX_WBITS)
+            header = bytes([FORMAT_DEFLATE])
+        data = header + compressor.compress(raw) + compressor.flush()
+        return data if len(data) < len(raw) else value
+
+
+# 没有绑定 TextCodec 的引擎（如单独创建的引擎）按无字典压缩写入
+_default_codec = TextCodec()
+
+
+class CompressedText(TypeDecorator):
+    """透明压缩的长文本列"""
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if not isinstance(value, str):
+            return value
+        return getattr(dialect, CODEC_ATTRIBUTE, _default_codec).compress(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_value(value)
+
+
+# 差异按短句比对：以句读、换行结尾的片段为单位，避免逐字比对长文本
+_DELTA_TOKEN = re.compile(r"[^。，；：！？、,;:!?\n]*[。，；：！？、,;:!?\n]|[^。，；：！？、,;:!?\n]+")
+
+
+def _token_offsets(value: str) -> tuple:
+    """按短句切分，返回 (片段列表, 各片段起点及末尾位置)"""
+    tokens = _DELTA_TOKEN.findall(value)
+    offsets = [0]
+    for token in tokens:
+        offsets.append(offsets[-1] + len(token))
+    return tokens, offsets
+
+
+def encode_delta(old: Optional[str], new: Optional[str]) -> bytes:
+    """new 相对 old 的差异：按短句比对，JSON 列表中 [起点, 长度] 表示沿用 old 的片段，
+    字符串表示新写入的文字，整体 deflate 压缩。None 按空文本处理"""
+    old, new = old or "", new or ""
+    old_tokens, old_offsets = _token_offsets(old)
+    new_tokens, new_offsets = _token_offsets(new)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_tokens, new_tokens, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([old_offsets[i1], old_offsets[i2] - old_offsets[i1]])
+        elif j2 > j1:
+            ops.append(new[new_offsets[j1]:new_offsets[j2]])
+    raw = json.dumps(ops, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(raw) + compressor.flush()
+
+
+def apply_delta(old: Optional[str], delta: bytes) -> str:
+    """把 encode_delta 的结果应用到 old 上，还原出新的文本"""
+    old = old or ""
+    try:
+        ops = json.loads(zlib.decompress(bytes(delta), -zlib.MAX_WBITS).decode("utf-8"))
+    except (zlib.error, ValueError) as e:
+        raise CompressionError(f"差异数据损坏: {e}") from e
+    return "".join(op if isinstance(op, str) else old[op[0]:op[0] + op[1]] for op in ops)
+
+
+def register_sql_functions(dbapi_connection):
+    """在 sqlite3 连接上注册 decompress_text() 和 text_delta()"""
+    dbapi_connection.create_function(SQL_FUNCTION, 1, decompress_value, deterministic=True)
+    dbapi_connection.create_function(DELTA_SQL_FUNCTION, 2, encode_delta, deterministic=True)
+
+
+def install_text_compression(engine: Engine, codec: TextCodec):
+    """把 codec 绑定到引擎，并在每个新连接上注册 decompress_text() 和 text_delta()"""
+    setattr(engine.dialect, CODEC_ATTRIBUTE, codec)
+    event.listen(engine, "connect", lambda dbapi_connection, record: register_sql_functions(dbapi_connection))
+
+
+def ensure_sql_function(conn: Connection):
+    """在当前连接上注册 decompress_text() 和 text_delta()（迁移可能在未安装压缩的引擎上执行）"""
+    register_sql_functions(conn.connection.driver_connection)
+
+
+def create_dictionary_table(conn: Connection):
+    conn.exec_driver_sql(
+        f"CREATE TABLE IF NOT EXISTS {DICTIONARY_TABLE} ("
+        "id TEXT PRIMARY KEY, "
+        "data BLOB NOT NULL, "
+        "sample_rows INTEGER NOT NULL, "
+        "created_at TEXT NOT NULL)"
+    )
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """打开注册了 SQL 函数、登记了压缩字典的 sqlite3 连接
+
+    progress_notes 上的触发器和 progress_notes_text 视图调用 decompress_text() / text_delta()，
+    sqlite3 命令行、数据库浏览器等外部工具的连接没有这两个函数，写入病程记录时报
+    "no such function"。维护脚本需要直接读写数据库文件时用这里打开的连接。
+    """
+    conn = sqlite3.connect(db_path)
+    register_sql_functions(conn)
+    for (data,) in conn.execute(f"SELECT data FROM {DICTIONARY_TABLE}"):
+        register_dictionary(data)
+    return conn
+
+
+def load_dictionaries(conn: Connection) -> Optional[bytes]:
+    """登记数据库中的全部字典，返回最新的字典内容（没有时返回 None）"""
+    rows = conn.exec_driver_sql(
+        f"SELECT data FROM {DICTIONARY_TABLE} ORDER BY created_at, rowid"
+    ).fetchall()
+    for (data,) in rows:
+        register_dictionary(data)
+    return rows[-1][0] if rows else None
+
+
+def save_dictionary(conn: Connection, data: bytes, sample_rows: int) -> str:
+    key = register_dictionary(data).hex()
+    conn.exec_driver_sql(
+        f"INSERT OR IGNORE INTO {DICTIONARY_TABLE} (id, data, sample_rows, created_at) VALUES (?, ?, ?, ?)",
+        (key, data, sample_rows, datetime.now().isoformat(timespec="microseconds")),
+    )
+    return key
+
+
+# 按句读切分：常用短句（查体描述、康复医嘱等）在病历中反复出现
+_FRAGMENT_PATTERN = re.compile(r"[^。；;，,\n]+[。；;，,\n]?")
+
+
+def train_dictionary(texts: list, size: int = DICTIONARY_SIZE) -> bytes:
+    """从样本文本中选出高频短句作为预置字典
+
+    每个短句按 出现次数 × 字节数 打分，取得分最高的若干句直到字典写满；
+    deflate 优先匹配距离近的内容，得分高的放在字典末尾。
+    """
+    counts = Counter()
+    for value in texts:
+        if value:
+            counts.update(fragment for fragment in _FRAGMENT_PATTERN.findall(value) if len(fragment) > 1)
+    scored = sorted(
+        ((count * len(fragment.encode("utf-8")), fragment) for fragment, count in counts.items() if count > 1),
+        reverse=True,
+    )
+    chosen, total = [], 0
+    for _, fragment in scored:
+        encoded = fragment.encode("utf-8")
+        if total + len(encoded) > size:
+            continue
+        chosen.append(encoded)
+        total += len(encoded)
+    return b"".join(reversed(chosen))
+
+
+@dataclass
+class CompressionResult:
+    """一次后台压缩的结果"""
+    dictionary: Optional[str] = None
+    trained: bool = False
+    rows: dict = field(default_factory=dict)
+    batches: int = 0
+    duration: float = 0.0
+    stopped: bool = False
+
+    def to_dict(self) -> dict:
+        return {
+            "dictionary": self.dictionary,
+            "trained": self.trained,
+            "rows": self.rows,
+            "batches": self.batches,
+            "duration_ms": round(self.duration * 1000, 1),
+            "stopped": self.stopped,
+        }
+
+
+def compressed_columns() -> dict:
+    """各表使用 CompressedText 的列"""
+    from database.models import Base
+    columns = {}
+    for table in Base.metadata.sorted_tables:
+        names = [c.name for c in table.columns if isinstance(c.type, CompressedText)]
+        if names:
+            columns[table] = names
+    return columns
+
+
+def _training_sample(session, limit: int) -> list:
+    texts = []
+    for table, names in compressed_columns().items():
+        stmt = select(*(table.c[name] for name in names)).order_by(table.c.id.desc()).limit(limit)
+        for row in session.execute(stmt):
+            texts.extend(row)
+    return texts
+
+
+def _pending_condition(table, names: list, codec: TextCodec) -> str:
+    """需要（重新）压缩的行：足够长的未压缩文本；有字典时还包括无字典压缩的行"""
+    conditions = []
+    for name in names:
+        conditions.append(f"(typeof({name}) = 'text' AND length(CAST({name} AS BLOB)) >= {codec.min_length})")
+        if codec.dictionary_id is not None:
+            conditions.append(f"(typeof({name}) = 'blob' AND substr({name}, 1, 1) = x'{FORMAT_DEFLATE:02x}')")
+    return " OR ".join(conditions)
+
+
+def compress_existing(db, batch_size: int = 500, train: bool = True,
+                      stop: Optional[threading.Event] = None) -> CompressionResult:
+    """分批压缩已有的长文本
+
+    还没有字典且样本足够时先训练字典。每批在只读连接上取出待压缩的行，
+    再作为一个写操作进入写入队列，批与批之间让出写入队列给其他请求。
+
+    Args:
+        db: DBManager
+        batch_size: 每批行数
+        train: 没有字典时是否先训练
+        stop: 设置后在当前批结束时停止
+    """
+    started = time.perf_counter()
+    codec: TextCodec = db.text_codec
+    result = CompressionResult()
+    if not codec.enabled:
+        return result
+
+    if train and codec.dictionary_id is None:
+        with db.ReadSession() as session:
+            sample = [t for t in _training_sample(session, TRAINING_SAMPLE_ROWS) if t]
+        if len(sample) >= MIN_TRAINING_ROWS:
+            data = train_dictionary(sample)
+            if data:
+                db.writer.execute(lambda session: save_dictionary(session.connection(), data, len(sample)))
+                codec.use_dictionary(data)
+                result.trained = True
+    if codec.dictionary_id is not None:
+        result.dictionary = codec.dictionary_id.hex()
+
+    for table, names in compressed_columns().items():
+        condition = _pending_condition(table, names, codec)
+        values = {name: bindparam(name) for name in names}
+        # 只是换一种存储方式，保留 updated_at 等自动更新的列
+        values.update({c.name: c for c in table.columns if c.onupdate is not None})
+        stmt = update(table).where(table.c.id == bindparam("_id")).values(values)
+        last_id, done = 0, 0
+        while not (stop is not None and stop.is_set()):
+            with db.ReadSession() as session:
+                rows = session.execute(
+                    select(table.c.id, *(table.c[name] for name in names))
+                    .where(table.c.id > last_id)
+                    .where(text(condition))
+                    .order_by(table.c.id)
+                    .limit(batch_size)
+                ).all()
+            if not rows:
+                break
+            params = [{"_id": row.id, **{name: row._mapping[name] for name in names}} for row in rows]
+            db.writer.execute(lambda session: session.execute(stmt, params))
+            last_id = rows[-1].id
+            done += len(rows)
+            result.batches += 1
+        result.rows[table.name] = done
+        if stop is not None and stop.is_set():
+            result.stopped = True
+            break
+
+    result.duration = time.perf_counter() - started
+    return result
+
+
+def storage_stats(conn: Connection) -> dict:
+    """各压缩列中 TEXT / BLOB 的行数和存储字节数"""
+    stats = {}
+    for table, names in compressed_columns().items():
+        for name in names:
+            rows = conn.exec_driver_sql(
+                f"SELECT typeof({name}), count(*), coalesce(sum(length(CAST({name} AS BLOB))), 0) "
+                f"FROM {table.name} WHERE {name} IS NOT NULL GROUP BY 1"
+            ).fetchall()
+            stats[f"{table.name}.{name}"] = {kind: {"rows": count, "bytes": size} for kind, count, size in rows}
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="压缩已有的长文本列")
+    parser.add_argument("--db", default="./rehab_assistant.db", help="数据库文件路径")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from database import DBManager
+
+    db = DBManager(args.db)
+    try:
+        result = db.compress_text(args.batch_size)
+        print(f"字典 {result.dictionary or '无'}{'（新训练）' if result.trained else ''}，"
+              f"{result.batches} 批，耗时 {result.duration:.1f}s")
+        for table, rows in result.rows.items():
+            print(f"  {table}: {rows} 行")
+        with db.engine.connect() as conn:
+            for column, kinds in storage_stats(conn).items():
+                summary = ", ".join(f"{kind} {v['rows']} 行 {v['bytes'] / 1024:.0f}KB" for kind, v in kinds.items())
+                print(f"  {column}: {summary}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,49 +3,221 @@
 """
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 import json
+import sqlite3
+import threading
 
 from database.models import Base, Patient, ProgressNote, Reminder, Template, Doctor
+from database.performance import build_performance_profile, apply_performance_profile
+from database.migrations import run_migrations
+from database.async_session import AsyncDBSession
+from database.write_queue import WriteQueue
+from database.identity_cache import CACHE_INFO_KEY, PatientIdentity, PatientIdentityCache, lookup_patient
+from database.archive import ARCHIVE_INFO_KEY, ARCHIVE_WINDOW_INFO_KEY, attach_archive, ensure_archive_database
+from database.usage_buffer import USAGE_INFO_KEY, UsageCounterBuffer
+from database.queries import query_metrics
+from database.compression import TextCodec, install_text_compression, load_dictionaries
+from database.versions import VERSIONS_INFO_KEY, DataVersions, track_data_versions
+
+# 提醒规则引擎使用 UPDATE ... FROM 和 RETURNING（见 database.reminders）
+MIN_SQLITE_VERSION = (3, 35, 0)
 
 
 class DBManager:
-    """数据库管理器"""
+    """数据库管理器
+
+    连接分为四类：
+    - engine: 建表、迁移及旧接口 get_session() 使用的读写连接
+    - read_engine: 只读连接池，供异步会话读取
+    - export_engine: 病历导出专用的只读连接池
+    - writer: 单写入者队列（见 database.write_queue），所有写操作串行提交
+
+    各类连接的会话共享同一个患者身份缓存（见 database.identity_cache）。
+    指定 archive_path 时，归档库挂载到所有连接上（见 database.archive）。
+    """
 
-    def __init__(self, db_path: str = "./rehab_assistant.db"):
-        """初始化数据库连接"""
+    def __init__(self, db_path: str = "./rehab_assistant.db", performance: Optional[dict] = None,
+                 db_threads: int = 8, write_queue_size: int = 1000, patient_cache_size: int = 2048,
+                 archive_path: Optional[str] = None, usage_flush_threshold: int = 100,
+                 compress_text: bool = True, archive_after_days: Optional[int] = None,
+                 max_exports: int = 2):
+        """初始化数据库连接
+
+        Args:
+            db_path: 数据库文件路径
+            performance: SQLite性能配置（config.json 中的 database.performance），
+                未指定的项使用默认值
+            db_threads: 异步会话使用的数据库线程数，也是只读连接池大小
+            write_queue_size: 写入队列容量
+            patient_cache_size: 患者身份缓存容量
+            archive_path: 出院患者归档库文件路径，不指定时不挂载归档库
+            usage_flush_threshold: 模板使用次数缓冲累计多少次点击后立即写入
+            compress_text: 新写入的长文本是否压缩（已压缩的数据总能读取），见 database.compression
+            archive_after_days: 自动归档的出院天数，修改归档患者的出院日期时据此判断是否移回主库
+            max_exports: 同时进行的病历导出数，也是导出专用只读连接池大小
+        """
+        if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+            raise RuntimeError(f"需要 SQLite {'.'.join(map(str, MIN_SQLITE_VERSION))} 及以上，"
+                               f"当前为 {sqlite3.sqlite_version}")
+        self.db_path = db_path
+        self.archive_path = archive_path
+        self.last_backup = None
+        self.last_compression = None
+        self.text_codec = TextCodec(enabled=compress_text)
+        self._stopping = threading.Event()
+        self.performance_profile = build_performance_profile(performance)
+        self.patient_cache = PatientIdentityCache(patient_cache_size)
+        self.template_usage = UsageCounterBuffer(usage_flush_threshold)
+        self.data_versions = DataVersions()
+        session_info = {CACHE_INFO_KEY: self.patient_cache, USAGE_INFO_KEY: self.template_usage,
+                        VERSIONS_INFO_KEY: self.data_versions}
+        if archive_path:
+            ensure_archive_database(archive_path)
+            session_info[ARCHIVE_INFO_KEY] = True
+            session_info[ARCHIVE_WINDOW_INFO_KEY] = archive_after_days
         self.engine = create_engine(
             f'sqlite:///{db_path}',
             echo=False,
-            pool_size=20,          # 增加连接池大小
-            max_overflow=40,       # 增加最大溢出连接数
+            pool_size=5,
+            max_overflow=5,
             pool_timeout=30,       # 连接超时时间
             pool_recycle=3600,     # 连接回收时间（1小时）
             connect_args={
                 "check_same_thread": False  # SQLite 特有配置
             }
         )
-        self.SessionLocal = sessionmaker(bind=self.engine)
+        apply_performance_profile(self.engine, self.performance_profile)
+        install_text_compression(self.engine, self.text_codec)
+        track_data_versions(self.engine, self.data_versions)
+        if archive_path:
+            attach_archive(self.engine, archive_path)
+        self.SessionLocal = sessionmaker(bind=self.engine, info=session_info)
         self.create_tables()
+        with self.engine.connect() as conn:
+            self.text_codec.use_dictionary(load_dictionaries(conn))
+
+        # 只读连接池：数据库文件必须已存在，所以在建表之后创建
+        self.read_engine = self._create_read_engine(db_threads)
+        self.ReadSession = sessionmaker(bind=self.read_engine, info=session_info)
+
+        # 病历导出专用的只读连接：导出在客户端下载完成前一直占用连接，不能占用上面的连接池；
+        # 同时进行的导出不超过 max_exports 个（见 backend.api.routes.exports）
+        self.export_engine = self._create_read_engine(max_exports)
+        self.ExportSession = sessionmaker(bind=self.export_engine, info=session_info)
+        self.export_slots = threading.BoundedSemaphore(max_exports)
+
+        # 写入专用连接：连接池只有一条连接
+        write_engine = create_engine(
+            f'sqlite:///{db_path}',
+            echo=False,
+            pool_size=1,
+            max_overflow=0,
+            connect_args={"check_same_thread": False}
+        )
+        apply_performance_profile(write_engine, self.performance_profile)
+        install_text_compression(write_engine, self.text_codec)
+        track_data_versions(write_engine, self.data_versions)
+        if archive_path:
+            attach_archive(write_engine, archive_path)
+        self.writer = WriteQueue(write_engine, max_queue_size=write_queue_size,
+                                 session_info=session_info)
+        self.template_usage.writer = self.writer
+
+        self.executor = ThreadPoolExecutor(max_workers=db_threads, thread_name_prefix="db")
+
+    def _create_read_engine(self, pool_size: int):
+        """只读连接池（uri mode=ro），连接数固定为 pool_size"""
+        engine = create_engine(
+            f'sqlite:///file:{Path(self.db_path).resolve().as_posix()}?mode=ro&uri=true',
+            echo=False,
+            pool_size=pool_size,
+            max_overflow=0,
+            pool_timeout=30,
+            connect_args={"check_same_thread": False}
+        )
+        apply_performance_profile(engine, self.performance_profile, read_only=True)
+        install_text_compression(engine, self.text_codec)
+        if self.archive_path:
+            attach_archive(engine, self.archive_path, read_only=True)
+        return engine
 
     def create_tables(self):
-        """创建所有表"""
+        """创建所有表，并把已有数据库升级到最新结构版本"""
         Base.metadata.create_all(self.engine)
+        run_migrations(self.engine)
 
     def get_session(self) -> Session:
         """获取数据库会话"""
         return self.SessionLocal()
 
+    def get_async_session(self) -> AsyncDBSession:
+        """获取异步数据库会话：读操作使用只读连接池，写操作进入写入队列"""
+        return AsyncDBSession(self.ReadSession(), self.executor, self.writer)
+
+    def archive_discharged(self, older_than_days: int):
+        """把出院超过指定天数的患者移入归档库，返回 ArchiveResult"""
+        from database.archive import archive_discharged_patients
+        return archive_discharged_patients(self, older_than_days)
+
+    def check_stats(self, rebuild: bool = False):
+        """校验患者统计表（见 database.stats），rebuild 时重建不一致的统计表，返回 StatsCheckResult"""
+        from database.stats import check_patient_stats
+        return self.writer.execute(lambda session: check_patient_stats(session.connection(), rebuild))
+
+    def backup(self, directory: str, keep: int = 7, pages_per_step: int = 256,
+               step_pause: float = 0.005) -> list:
+        """在线备份主库和归档库（见 database.backup），返回各文件的 BackupResult"""
+        from database.backup import backup_database
+
+        sources = [self.db_path] + ([self.archive_path] if self.archive_path else [])
+        results = [backup_database(source, directory, keep, pages_per_step, step_pause)
+                   for source in sources]
+        self.last_backup = [result.to_dict() for result in results]
+        return results
+
+    def compress_text(self, batch_size: int = 500):
+        """后台压缩已有的长文本（见 database.compression），返回 CompressionResult"""
+        from database.compression import compress_existing
+
+        result = compress_existing(self, batch_size, stop=self._stopping)
+        self.last_compression = result.to_dict()
+        return result
+
+    def get_metrics(self) -> dict:
+        """数据库运行指标"""
+        return {
+            "write_queue": self.writer.metrics(),
+            "patient_cache": self.patient_cache.stats(),
+            "template_usage": self.template_usage.stats(),
+            "queries": query_metrics(),
+            "last_backup": self.last_backup,
+            "last_compression": self.last_compression,
+            "data_versions": self.data_versions.stats(),
+        }
+
+    def close(self):
+        """写入缓冲的模板使用次数，停止写入队列、关闭数据库线程池并释放所有连接"""
+        self._stopping.set()
+        self.template_usage.flush()
+        self.writer.stop()
+        self.executor.shutdown(wait=True)
+        self.writer.engine.dispose()
+        self.read_engine.dispose()
+        self.export_engine.dispose()
+        self.engine.dispose()
+
     # 患者相关操作
     def add_patient(self, patient_data: dict) -> int:
         """添加患者，返回患者ID"""
-        with self.get_session() as session:
+        def _add(session):
             patient = Patient(**patient_data)
             session.add(patient)
-            session.commit()
-            session.refresh(patient)
+            session.flush()
             return patient.id
+        return self.writer.execute(_add)
 
     def get_patient_by_hospital_number(self, hospital_number: str) -> Optional[Patient]:
         """根据住院号获取患者"""
@@ -54,6 +226,11 @@ class DBManager:
                 Patient.hospital_number == hospital_number
             ).first()
 
+    def lookup_patient(self, hospital_number: str) -> Optional[PatientIdentity]:
+        """根据住院号获取患者身份信息（优先读缓存）"""
+        with self.ReadSession() as session:
+            return lookup_patient(session, hospital_number)
+
     def get_all_patients(self, include_discharged: bool = False) -> list[Patient]:
         """获取所有患者"""
         with self.get_session() as session:
@@ -64,26 +241,38 @@ class DBManager:
 
     def update_patient(self, hospital_number: str, update_data: dict) -> bool:
         """更新患者信息"""
-        with self.get_session() as session:
+        def _update(session):
             patient = session.query(Patient).filter(
                 Patient.hospital_number == hospital_number
             ).first()
             if patient:
                 for key, value in update_data.items():
                     setattr(patient, key, value)
-                session.commit()
                 return True
             return False
+        return self.writer.execute(_update)
+
+    def delete_patient(self, hospital_number: str) -> bool:
+        """永久删除患者，病程记录、提醒、康复计划和进展由外键级联删除"""
+        def _delete(session):
+            patient = session.query(Patient).filter(
+                Patient.hospital_number == hospital_number
+            ).first()
+            if patient:
+                session.delete(patient)
+                return True
+            return False
+        return self.writer.execute(_delete)
 
     # 病程记录相关操作
     def add_progress_note(self, note_data: dict) -> int:
         """添加病程记录"""
-        with self.get_session() as session:
+        def _add(session):
             note = ProgressNote(**note_data)
             session.add(note)
-            session.commit()
-            session.refresh(note)
+            session.flush()
             return note.id
+        return self.writer.execute(_add)
 
     def get_patient_notes(self, patient_id: int, limit: int = 5) -> list[ProgressNote]:
         """获取患者的最近病程记录"""
@@ -95,12 +284,12 @@ class DBManager:
     # 提醒相关操作
     def add_reminder(self, reminder_data: dict) -> int:
         """添加提醒"""
-        with self.get_session() as session:
+        def _add(session):
             reminder = Reminder(**reminder_data)
             session.add(reminder)
-            session.commit()
-            session.refresh(reminder)
+            session.flush()
             return reminder.id
+        return self.writer.execute(_add)
 
     def get_today_reminders(self, priority_filter: str = None) -> list[Reminder]:
         """获取今日待完成提醒"""
@@ -117,24 +306,24 @@ class DBManager:
     def mark_reminder_completed(self, reminder_id: int) -> bool:
         """标记提醒为已完成"""
         from datetime import date
-        with self.get_session() as session:
+        def _mark(session):
             reminder = session.query(Reminder).filter(Reminder.id == reminder_id).first()
             if reminder:
                 reminder.is_completed = True
                 reminder.completed_at = date.today()
-                session.commit()
                 return True
             return False
+        return self.writer.execute(_mark)
 
     # 模板相关操作
     def add_template(self, template_data: dict) -> int:
         """添加模板"""
-        with self.get_session() as session:
+        def _add(session):
             template = Template(**template_data)
             session.add(template)
-            session.commit()
-            session.refresh(template)
+            session.flush()
             return template.id
+        return self.writer.execute(_add)
 
     def get_templates_by_category(self, category: str) -> list[Template]:
         """按分类获取模板"""
@@ -144,9 +333,5 @@ class DBManager:
             ).order_by(Template.usage_count.desc()).all()
 
     def increment_template_usage(self, template_id: int):
-        """增加模板使用次数"""
-        with self.get_session() as session:
-            template = session.query(Template).filter(Template.id == template_id).first()
-            if template:
-                template.usage_count += 1
-                session.commit()
+        """增加模板使用次数（先进入写缓冲，见 database.usage_buffer）"""
+        self.template_usage.add(template_id)
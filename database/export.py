@@ -0,0 +1,303 @@
+"""
+病历导出
+
+把一位患者或全病区的病程记录、提醒和康复计划导出为 TXT（打印出院病历）、DOCX 或 JSONL（归档），
+原来只能由前端分页拉取 /api/notes/patient/{hospital_number} 后自己拼装。
+
+导出是生成器，边查询边输出，内存占用与患者数无关：
+- 患者、病程记录、提醒、康复计划各用一条按患者ID排序的查询，yield_per 分批从游标读取，
+  按患者ID归并，任何时候只在内存中保留一位患者的记录
+- DOCX 直接写 WordprocessingML，document.xml 以流的方式写入 ZIP（写入不可 seek 的输出时
+  zipfile 使用数据描述符），每写完一位患者就把已压缩的字节交给调用方
+- 整个导出在一个只读事务中完成，内容是同一时刻的快照；挂载了归档库时同时读取归档患者
+  （见 iter_patient_records）
+"""
+import io
+import json
+import zipfile
+from datetime import date, datetime
+from typing import Iterator, Optional
+from xml.sax.saxutils import escape
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database.archive import ARCHIVE_INFO_KEY, archived
+from database.models import Patient, ProgressNote, RehabPlan, Reminder
+
+EXPORT_FORMATS = ("txt", "docx", "jsonl")
+MEDIA_TYPES = {
+    "txt": "text/plain; charset=utf-8",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "jsonl": "application/x-ndjson",
+}
+# 游标每批读取的行数
+YIELD_PER = 500
+
+PATIENT_COLUMNS = (
+    Patient.id,
+    Patient.hospital_number,
+    Patient.name,
+    Patient.gender,
+    Patient.age,
+    Patient.admission_date,
+    Patient.discharge_date,
+    Patient.diagnosis,
+    Patient.chief_complaint,
+)
+NOTE_COLUMNS = (
+    ProgressNote.patient_id,
+    ProgressNote.record_date,
+    ProgressNote.day_number,
+    ProgressNote.record_type,
+    ProgressNote.daily_condition,
+    ProgressNote.generated_content,
+    ProgressNote.is_edited,
+)
+REMINDER_COLUMNS = (
+    Reminder.patient_id,
+    Reminder.reminder_date,
+    Reminder.reminder_type,
+    Reminder.description,
+    Reminder.priority,
+    Reminder.is_completed,
+)
+PLAN_COLUMNS = (
+    RehabPlan.patient_id,
+    RehabPlan.short_term_goals,
+    RehabPlan.long_term_goals,
+    RehabPlan.training_plan,
+)
+
+
+class _Grouped:
+    """按 patient_id 排序的行流，依次取出每位患者的行"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._next = next(self._rows, None)
+
+    def take(self, patient_id: int) -> list:
+        items = []
+        while self._next is not None and self._next.patient_id <= patient_id:
+            if self._next.patient_id == patient_id:
+                items.append(self._next._asdict())
+            self._next = next(self._rows, None)
+        return items
+
+
+MAIN_TABLES = {table.name: table for table in (Patient.__table__, ProgressNote.__table__,
+                                                Reminder.__table__, RehabPlan.__table__)}
+
+
+def _iter_schema(session: Session, tables: dict, hospital_number: Optional[str],
+                 include_discharged: bool) -> Iterator[dict]:
+    """按患者ID顺序逐位产生一个库（主库或归档库）中患者的记录"""
+    patients_table = tables["patients"]
+    if hospital_number is not None:
+        condition = patients_table.c.hospital_number == hospital_number
+    elif include_discharged:
+        condition = None
+    else:
+        condition = patients_table.c.discharge_date.is_(None)
+    patient_ids = select(patients_table.c.id)
+    if condition is not None:
+        patient_ids = patient_ids.where(condition)
+
+    def stream(columns, table_name, *order_by):
+        table = tables[table_name]
+        stmt = (select(*(table.c[col.key] for col in columns))
+                .order_by(table.c.patient_id, *(table.c[key] for key in order_by)))
+        if condition is not None:
+            stmt = stmt.where(table.c.patient_id.in_(patient_ids))
+        return session.execute(stmt, execution_options={"yield_per": YIELD_PER})
+
+    patients_stmt = (select(*(patients_table.c[col.key] for col in PATIENT_COLUMNS))
+                     .order_by(patients_table.c.id))
+    if condition is not None:
+        patients_stmt = patients_stmt.where(condition)
+    patients = session.execute(patients_stmt, execution_options={"yield_per": YIELD_PER})
+    notes = _Grouped(stream(NOTE_COLUMNS, "progress_notes", "record_date"))
+    reminders = _Grouped(stream(REMINDER_COLUMNS, "reminders", "reminder_date", "id"))
+    plans = _Grouped(stream(PLAN_COLUMNS, "rehab_plans", "id"))
+
+    for patient in patients:
+        plan = plans.take(patient.id)
+        yield {
+            "patient": patient._asdict(),
+            "rehab_plan": plan[-1] if plan else None,
+            "reminders": reminders.take(patient.id),
+            "notes": notes.take(patient.id),
+        }
+
+
+def iter_patient_records(session: Session, hospital_number: Optional[str] = None,
+                         include_discharged: bool = False) -> Iterator[dict]:
+    """逐位患者产生 {"patient", "rehab_plan", "reminders", "notes"}
+
+    指定住院号时只导出该患者（不论是否出院），否则导出在院患者，include_discharged 时包含出院患者。
+    挂载了归档库时，主库中没有的指定患者、以及 include_discharged 时的全部归档患者从归档库读取，
+    排在主库患者之后。
+    """
+    found = False
+    for record in _iter_schema(session, MAIN_TABLES, hospital_number, include_discharged):
+        found = True
+        yield record
+    if not session.info.get(ARCHIVE_INFO_KEY):
+        return
+    if include_discharged if hospital_number is None else not found:
+        yield from _iter_schema(session, archived, hospital_number, include_discharged=True)
+
+
+def _clean(record: dict) -> dict:
+    """去掉内部ID，日期转为字符串"""
+    return {
+        key: value.isoformat() if isinstance(value, (date, datetime)) else value
+        for key, value in record.items() if key not in ("id", "patient_id")
+    }
+
+
+def _text_sections(record: dict) -> Iterator[tuple]:
+    """一位患者的内容，产生 (样式, 文本)：样式为 title / heading / subheading / text"""
+    patient = record["patient"]
+    yield "title", f"{patient['name'] or ''}（住院号 {patient['hospital_number']}）"
+    discharge = patient["discharge_date"].isoformat() if patient["discharge_date"] else "在院"
+    yield "text", (f"性别：{patient['gender'] or ''}  年龄：{patient['age'] or ''}  "
+                   f"入院日期：{patient['admission_date'].isoformat()}  出院日期：{discharge}")
+    if patient["diagnosis"]:
+        yield "text", f"诊断：{patient['diagnosis']}"
+    if patient["chief_complaint"]:
+        yield "text", f"主诉：{patient['chief_complaint']}"
+
+    plan = record["rehab_plan"]
+    if plan:
+        yield "heading", "康复计划"
+        for label, key in (("短期目标", "short_term_goals"), ("长期目标", "long_term_goals"),
+                           ("训练计划", "training_plan")):
+            if plan[key]:
+                yield "text", f"{label}：{plan[key]}"
+
+    if record["reminders"]:
+        yield "heading", "提醒事项"
+        for reminder in record["reminders"]:
+            status = "已完成" if reminder["is_completed"] else "未完成"
+            yield "text", (f"{reminder['reminder_date'].isoformat()} [{reminder['priority']}] "
+                           f"{reminder['reminder_type']}：{reminder['description']}（{status}）")
+
+    yield "heading", "病程记录"
+    for note in record["notes"]:
+        yield "subheading", f"{note['record_date'].isoformat()}  住院第{note['day_number']}天  {note['record_type']}"
+        for line in (note["generated_content"] or note["daily_condition"] or "").splitlines():
+            yield "text", line
+
+
+def export_jsonl(records: Iterator[dict]) -> Iterator[bytes]:
+    for record in records:
+        item = {
+            "patient": _clean(record["patient"]),
+            "rehab_plan": _clean(record["rehab_plan"]) if record["rehab_plan"] else None,
+            "reminders": [_clean(r) for r in record["reminders"]],
+            "notes": [_clean(n) for n in record["notes"]],
+        }
+        yield (json.dumps(item, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def export_txt(records: Iterator[dict]) -> Iterator[bytes]:
+    for index, record in enumerate(records):
+        lines = ["\f"] if index else []
+        for style, text in _text_sections(record):
+            if style == "title":
+                lines += ["=" * 40, text, "=" * 40]
+            elif style == "heading":
+                lines += ["", f"【{text}】"]
+            elif style == "subheading":
+                lines += ["", text]
+            else:
+                lines.append(text)
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_RELATIONSHIPS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCUMENT_START = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+)
+_DOCUMENT_END = '<w:sectPr/></w:body></w:document>'
+# 各样式的字号（半磅）和是否加粗
+_DOCX_STYLES = {"title": (32, True), "heading": (28, True), "subheading": (24, True), "text": (21, False)}
+
+
+def _docx_paragraph(style: str, text: str, page_break: bool = False) -> str:
+    size, bold = _DOCX_STYLES[style]
+    properties = f"{'<w:b/>' if bold else ''}<w:sz w:val=\"{size}\"/>"
+    breaks = '<w:r><w:br w:type="page"/></w:r>' if page_break else ""
+    return (f'<w:p>{breaks}<w:r><w:rPr>{properties}</w:rPr>'
+            f'<w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>')
+
+
+class _ChunkSink(io.RawIOBase):
+    """不可 seek 的输出，收集 zipfile 写出的字节，由生成器分批取走"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def export_docx(records: Iterator[dict]) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        package.writestr("_rels/.rels", _RELATIONSHIPS)
+        with package.open("word/document.xml", "w") as document:
+            document.write(_DOCUMENT_START.encode("utf-8"))
+            for index, record in enumerate(records):
+                paragraphs = [
+                    _docx_paragraph(style, text, page_break=index > 0 and style == "title")
+                    for style, text in _text_sections(record)
+                ]
+                document.write("".join(paragraphs).encode("utf-8"))
+                yield sink.drain()
+            document.write(_DOCUMENT_END.encode("utf-8"))
+    yield sink.drain()
+
+
+EXPORTERS = {
+    "txt": export_txt,
+    "docx": export_docx,
+    "jsonl": export_jsonl,
+}
+
+
+def export_records(session: Session, fmt: str, hospital_number: Optional[str] = None,
+                   include_discharged: bool = False) -> Iterator[bytes]:
+    """按格式逐块产生导出文件内容"""
+    if fmt not in EXPORTERS:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+    return EXPORTERS[fmt](iter_patient_records(session, hospital_number, include_discharged))
@@ -0,0 +1,115 @@
+"""
+按日补记录：缺失病程记录的日期
+
+"按日补记录"时间轴需要知道入院以来哪些应记录日（查房日，见 database.stats.is_round_day）
+还没有病程记录。原来由前端下载患者最多1000条病程记录后逐日比对；这里在数据库中
+用递归 CTE 生成日历，一条查询算出一位患者或全病区的缺失日期：
+
+- 日历从住院第1天到今天（出院患者到出院日），只保留应记录日
+- 用 (patient_id, record_date) 索引判断当天是否有记录，不读取病程内容
+- 只计算主库中的患者，已归档的出院患者不在范围内
+"""
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from database.stats import expected_round_days, round_day_condition
+
+_GAPS_SQL = """
+    WITH RECURSIVE
+    ward AS (
+        SELECT id, hospital_number, name, admission_date, discharge_date,
+               CAST(julianday(MIN(COALESCE(discharge_date, :today), :today))
+                    - julianday(admission_date) AS INTEGER) + 1 AS last_day
+        FROM patients
+        WHERE {where}
+    ),
+    calendar(day) AS (
+        SELECT 1
+        UNION ALL
+        SELECT day + 1 FROM calendar WHERE day < (SELECT MAX(last_day) FROM ward)
+    ),
+    missing AS (
+        SELECT w.id AS patient_id, c.day
+        FROM ward w JOIN calendar c ON c.day <= w.last_day
+        WHERE {round_day}
+          AND NOT EXISTS (
+              SELECT 1 FROM progress_notes n
+              WHERE n.patient_id = w.id
+                AND n.record_date = date(w.admission_date, '+' || (c.day - 1) || ' days')
+          )
+    )
+    SELECT w.id, w.hospital_number, w.name, w.admission_date, w.discharge_date, w.last_day, m.day
+    FROM ward w LEFT JOIN missing m ON m.patient_id = w.id
+    ORDER BY w.admission_date DESC, w.id DESC, m.day
+"""
+
+
+def expected_record_type(day: int) -> str:
+    """住院第 day 天应有的记录类型（与前端时间轴一致：每30天阶段小结，其余查房三级医师轮换）"""
+    if day % 30 == 0:
+        return "阶段小结"
+    if day == 2:
+        return "主治医师查房"
+    if day == 3:
+        return "主任医师查房"
+    return ("住院医师查房", "主治医师查房", "主任医师查房")[(day - 6) // 3 % 3]
+
+
+def find_missing_records(session: Session, hospital_number: Optional[str] = None,
+                         include_discharged: bool = False, today: Optional[date] = None) -> dict:
+    """计算缺失病程记录的应记录日
+
+    Args:
+        hospital_number: 只计算一位患者（不论是否出院）；不指定时计算全病区
+        include_discharged: 全病区时是否包含已出院患者（截至出院日）
+
+    Returns:
+        {"summary": 汇总, "patients": 每位患者的应记录、缺失天数和缺失日期列表}
+    """
+    today = today or date.today()
+    if hospital_number is not None:
+        where = "hospital_number = :hospital_number"
+    else:
+        where = "1" if include_discharged else "discharge_date IS NULL"
+    sql = _GAPS_SQL.format(where=where, round_day=round_day_condition("c.day"))
+    rows = session.execute(text(sql), {"today": today.isoformat(), "hospital_number": hospital_number})
+
+    patients = {}
+    for row in rows:
+        item = patients.get(row.id)
+        if item is None:
+            days = max(0, row.last_day)
+            item = patients[row.id] = {
+                "patient_id": row.id,
+                "hospital_number": row.hospital_number,
+                "name": row.name,
+                "admission_date": row.admission_date,
+                "discharge_date": row.discharge_date,
+                "days_in_hospital": days,
+                "expected_records": expected_round_days(days),
+                "missing_records": 0,
+                "missing": [],
+            }
+        if row.day is not None:
+            admission = date.fromisoformat(row.admission_date)
+            item["missing"].append({
+                "date": (admission + timedelta(days=row.day - 1)).isoformat(),
+                "day_number": row.day,
+                "expected_type": expected_record_type(row.day),
+            })
+            item["missing_records"] += 1
+
+    items = list(patients.values())
+    expected_total = sum(item["expected_records"] for item in items)
+    missing_total = sum(item["missing_records"] for item in items)
+    summary = {
+        "patient_count": len(items),
+        "patients_with_gaps": sum(1 for item in items if item["missing_records"]),
+        "expected_records": expected_total,
+        "missing_records": missing_total,
+        "completion_rate": round(1 - missing_total / expected_total, 4) if expected_total else 1.0,
+    }
+    return {"summary": summary, "patients": items}
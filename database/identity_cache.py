@@ -0,0 +1,146 @@
+"""
+患者身份缓存
+
+几乎所有路由都要先用住院号查患者，再做真正的工作。PatientIdentityCache
+在进程内缓存 住院号 → 患者ID及常用基本信息，容量有限，按LRU淘汰。
+
+缓存对象放在 sessionmaker 的 info 中，路由通过 lookup_patient(session, ...)
+使用；ORM写入患者时由会话事件在提交后自动失效对应条目（写穿失效）。
+不经过ORM的批量写入（Core UPDATE/DELETE）需要自行调用 invalidate/clear。
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from database.models import Patient
+from database.queries import PATIENT_IDENTITY
+
+
+class PatientIdentity(NamedTuple):
+    """缓存的患者身份信息"""
+    id: int
+    hospital_number: str
+    name: Optional[str]
+    admission_date: date
+    discharge_date: Optional[date]
+
+
+CACHE_INFO_KEY = "patient_cache"
+_TOUCHED_INFO_KEY = "_patient_cache_touched"
+
+
+class PatientIdentityCache:
+    """线程安全的LRU患者身份缓存"""
+
+    def __init__(self, max_size: int = 2048):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, PatientIdentity] = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效都递增；查询前记录代数，写回时代数变化说明期间有写入，放弃写回
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, hospital_number: str) -> Optional[PatientIdentity]:
+        with self._lock:
+            identity = self._entries.get(hospital_number)
+            if identity is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(hospital_number)
+            self.hits += 1
+            return identity
+
+    def put(self, identity: PatientIdentity, generation: int):
+        """写入缓存；generation 为查询前读取的代数，期间发生过失效则忽略"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[identity.hospital_number] = identity
+            self._entries.move_to_end(identity.hospital_number)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, hospital_numbers: Iterable[str]):
+        with self._lock:
+            self._generation += 1
+            for hospital_number in hospital_numbers:
+                self._entries.pop(hospital_number, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "capacity": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def lookup_patient(session: Session, hospital_number: str) -> Optional[PatientIdentity]:
+    """根据住院号获取患者身份信息，优先使用会话绑定的缓存"""
+    cache: Optional[PatientIdentityCache] = session.info.get(CACHE_INFO_KEY)
+    if cache is not None:
+        identity = cache.get(hospital_number)
+        if identity is not None:
+            return identity
+        generation = cache.generation
+
+    row = PATIENT_IDENTITY.execute(session, {"hospital_number": hospital_number}).first()
+    if row is None:
+        return None
+
+    identity = PatientIdentity(*row)
+    if cache is not None:
+        cache.put(identity, generation)
+    return identity
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_touched_patients(session, flush_context, instances):
+    """记录本事务中新增、修改、删除的患者住院号，并立即使其失效"""
+    cache = session.info.get(CACHE_INFO_KEY)
+    if cache is None:
+        return
+    touched = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Patient):
+            # 住院号被修改时，旧住院号对应的条目也要失效
+            history = inspect(obj).attrs.hospital_number.history
+            touched.update(history.deleted)
+            touched.add(obj.hospital_number)
+    touched.discard(None)
+    if touched:
+        session.info.setdefault(_TOUCHED_INFO_KEY, set()).update(touched)
+        cache.invalidate(touched)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session):
+    """提交后再次失效，清除提交前并发读取写回的旧数据"""
+    touched = session.info.pop(_TOUCHED_INFO_KEY, None)
+    if touched:
+        session.info[CACHE_INFO_KEY].invalidate(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_touched(session):
+    session.info.pop(_TOUCHED_INFO_KEY, None)
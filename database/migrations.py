@@ -0,0 +1,224 @@
+"""
+数据库结构迁移
+
+Base.metadata.create_all 只会创建缺失的表，不会修改已部署的数据库文件。
+这里维护一组按版本号递增的迁移，当前版本记录在 PRAGMA user_version 中，
+DBManager 启动时自动把数据库升级到最新版本。每个迁移都必须可重复执行。
+"""
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import MetaData
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+
+
+@dataclass(frozen=True)
+class Migration:
+    """单个结构迁移"""
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, description: str):
+    """注册迁移的装饰器，版本号必须连续递增"""
+    def decorator(func: Callable[[Connection], None]):
+        expected = len(MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"迁移版本号必须连续，期望 {expected}，实际 {version}")
+        MIGRATIONS.append(Migration(version, description, func))
+        return func
+    return decorator
+
+
+def latest_version() -> int:
+    """代码中定义的最新结构版本"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def get_schema_version(conn: Connection) -> int:
+    """读取数据库当前的结构版本"""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def run_migrations(engine: Engine) -> list[int]:
+    """把数据库升级到最新版本
+
+    每个迁移在独立事务中执行并同时更新 user_version，
+    中途失败时已完成的迁移保留，失败的迁移整体回滚。
+
+    Returns:
+        本次执行的迁移版本号列表
+    """
+    applied = []
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+
+    for item in MIGRATIONS:
+        if item.version <= current:
+            continue
+        with engine.begin() as conn:
+            item.upgrade(conn)
+            conn.exec_driver_sql(f"PRAGMA user_version = {item.version}")
+        applied.append(item.version)
+
+    return applied
+
+
+# 热点查询需要的二级索引（名称, 表, 列）
+HOT_QUERY_INDEXES = [
+    # /api/reminders/today: is_completed = 0 AND reminder_date >= today
+    ("ix_reminders_pending_date", "reminders", "is_completed, reminder_date"),
+    # 患者提醒列表、每日提醒初始化: patient_id = ? [AND reminder_date = ?] ORDER BY reminder_date
+    ("ix_reminders_patient_date", "reminders", "patient_id, reminder_date"),
+    # 病程记录 patient_id = ? ORDER BY record_date 使用模型中的唯一索引 ux_progress_notes_patient_date（迁移6）
+    # 在院患者列表: discharge_date IS NULL ORDER BY admission_date
+    ("ix_patients_discharge_admission", "patients", "discharge_date, admission_date"),
+    # 模板列表: category = ? ORDER BY usage_count
+    ("ix_templates_category_usage", "templates", "category, usage_count"),
+    # 康复计划、康复进展: patient_id = ? ORDER BY record_date
+    ("ix_rehab_plans_patient", "rehab_plans", "patient_id"),
+    ("ix_rehab_progress_patient_date", "rehab_progress", "patient_id, record_date"),
+]
+
+
+def create_hot_query_indexes(conn: Connection):
+    """创建热点查询索引（表重建后也需要调用）"""
+    for name, table, columns in HOT_QUERY_INDEXES:
+        conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+@migration(1, "为热点查询添加二级索引")
+def _add_hot_query_indexes(conn: Connection):
+    create_hot_query_indexes(conn)
+
+
+@migration(2, "患者、病程记录、模板全文检索（FTS5 trigram）")
+def _add_search_index(conn: Connection):
+    from database.search import create_search_index
+    create_search_index(conn)
+
+
+@migration(3, "触发器维护的患者统计表 patient_stats")
+def _add_patient_stats(conn: Connection):
+    from database.stats import create_stats_table
+    create_stats_table(conn)
+
+
+@migration(4, "长文本压缩：压缩字典表，notes_fts 改为从解压视图读取")
+def _add_text_compression(conn: Connection):
+    from database.compression import create_dictionary_table
+    from database.search import recreate_search_index
+    create_dictionary_table(conn)
+    recreate_search_index(conn, "notes")
+
+
+# 引用 patients.id 的子表，删除患者时由外键级联删除
+CASCADE_TABLES = ("progress_notes", "reminders", "rehab_plans", "rehab_progress")
+
+
+def _has_cascade(conn: Connection, table: str) -> bool:
+    rows = conn.exec_driver_sql(f"PRAGMA foreign_key_list({table})").fetchall()
+    return any(row[2] == "patients" and row[6] == "CASCADE" for row in rows)
+
+
+def _rebuild_with_cascade(conn: Connection, table_name: str):
+    """按模型定义重建子表（SQLite 不支持修改外键，只能建新表、复制、改名）"""
+    from database.models import Base
+
+    metadata = MetaData()
+    Base.metadata.tables["patients"].to_metadata(metadata)
+    new_table = Base.metadata.tables[table_name].to_metadata(metadata, name=f"_new_{table_name}")
+
+    existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+    columns = ", ".join(c.name for c in new_table.columns if c.name in existing)
+
+    # 旧库没有外键约束，可能残留已删除患者的子记录，复制前先清理
+    conn.exec_driver_sql(f"DELETE FROM {table_name} WHERE patient_id NOT IN (SELECT id FROM patients)")
+    conn.execute(CreateTable(new_table))
+    conn.exec_driver_sql(f"INSERT INTO {new_table.name} ({columns}) SELECT {columns} FROM {table_name}")
+    conn.exec_driver_sql(f"DROP TABLE {table_name}")
+    conn.exec_driver_sql(f"ALTER TABLE {new_table.name} RENAME TO {table_name}")
+
+
+@migration(5, "子表外键改为 ON DELETE CASCADE（重建表）")
+def _add_cascade_deletes(conn: Connection):
+    from database.compression import ensure_sql_function
+    from database.search import create_search_triggers
+    from database.stats import create_stats_triggers
+
+    tables = [t for t in CASCADE_TABLES if not _has_cascade(conn, t)]
+    if not tables:
+        return
+    # 旧式改名：不检查引用旧表名的视图（progress_notes_text），改名后视图照常指向新表
+    conn.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+    try:
+        for table in tables:
+            _rebuild_with_cascade(conn, table)
+    finally:
+        conn.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+
+    # 删除旧表时其索引和触发器一并删除，需要重新创建
+    ensure_sql_function(conn)
+    create_hot_query_indexes(conn)
+    create_search_triggers(conn)
+    create_stats_triggers(conn)
+    problems = conn.exec_driver_sql("PRAGMA foreign_key_check").fetchall()
+    if problems:
+        raise RuntimeError(f"重建后外键检查失败: {problems[:5]}")
+
+
+@migration(6, "病程记录 (patient_id, record_date) 唯一索引（合并同一天的重复记录）")
+def _add_unique_note_date(conn: Connection):
+    from database.compression import ensure_sql_function
+
+    # 删除重复记录会触发全文索引触发器，触发器中用到解压函数
+    ensure_sql_function(conn)
+    # 同一天有多条记录时保留最后保存的一条（ID最大），删除触发器同步更新统计表和全文索引
+    conn.exec_driver_sql(
+        "DELETE FROM progress_notes WHERE id NOT IN "
+        "(SELECT MAX(id) FROM progress_notes GROUP BY patient_id, record_date)"
+    )
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_progress_notes_patient_date")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_progress_notes_patient_date "
+        "ON progress_notes (patient_id, record_date)"
+    )
+
+
+@migration(7, "病程记录修订历史：note_revisions 表（create_all 创建）及修订触发器")
+def _add_note_revisions(conn: Connection):
+    from database.compression import ensure_sql_function
+    from database.revisions import create_revision_triggers
+
+    ensure_sql_function(conn)
+    create_revision_triggers(conn)
+
+
+@migration(8, "提醒规则引擎：reminders.rule_key 列及 (patient_id, rule_key, reminder_date) 唯一索引")
+def _add_reminder_rule_key(conn: Connection):
+    from database.reminders import adopt_legacy_reminders
+
+    existing = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(reminders)")}
+    if "rule_key" not in existing:
+        conn.exec_driver_sql("ALTER TABLE reminders ADD COLUMN rule_key VARCHAR(50)")
+    conn.exec_driver_sql(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_reminders_patient_rule_date "
+        "ON reminders (patient_id, rule_key, reminder_date) WHERE rule_key IS NOT NULL"
+    )
+    # 原来按固定规则生成的提醒补上规则标识，之后的刷新不会重复生成
+    adopt_legacy_reminders(conn)
+
+
+@migration(9, "病程记录修订改为按短句比对，差异不比全文小时保存全文；第1版时间统一为日期时间")
+def _rebuild_revision_triggers(conn: Connection):
+    from database.compression import ensure_sql_function
+    from database.revisions import REVISION_TABLE, recreate_revision_triggers
+
+    ensure_sql_function(conn)
+    recreate_revision_triggers(conn)
+    conn.exec_driver_sql(f"UPDATE {REVISION_TABLE} SET created_at = datetime(created_at) WHERE revision = 1")
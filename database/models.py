@@ -3,9 +3,11 @@ SQLAlchemy数据模型定义
 """
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import String, Integer, Text, Boolean, Date, ForeignKey
+from sqlalchemy import String, Integer, Text, Boolean, Date, DateTime, ForeignKey, Index, LargeBinary, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship, declarative_base
 
+from database.compression import CompressedText
+
 Base = declarative_base()
 
 class Patient(Base):
@@ -23,16 +25,16 @@ class Patient(Base):
     diagnosis: Mapped[Optional[str]] = mapped_column(Text)
     past_history: Mapped[Optional[str]] = mapped_column(Text)
     allergy_history: Mapped[Optional[str]] = mapped_column(Text)
-    specialist_exam: Mapped[Optional[str]] = mapped_column(Text)
-    initial_note: Mapped[Optional[str]] = mapped_column(Text)
+    specialist_exam: Mapped[Optional[str]] = mapped_column(CompressedText)
+    initial_note: Mapped[Optional[str]] = mapped_column(CompressedText)
     created_at: Mapped[datetime] = mapped_column(Date, default=datetime.now)
     updated_at: Mapped[datetime] = mapped_column(Date, default=datetime.now, onupdate=datetime.now)
 
-    # 关系
-    progress_notes: Mapped[list["ProgressNote"]] = relationship("ProgressNote", back_populates="patient", cascade="all, delete-orphan")
-    reminders: Mapped[list["Reminder"]] = relationship("Reminder", back_populates="patient", cascade="all, delete-orphan")
-    rehab_plan: Mapped[Optional["RehabPlan"]] = relationship("RehabPlan", back_populates="patient", uselist=False, cascade="all, delete-orphan")
-    rehab_progress: Mapped[list["RehabProgress"]] = relationship("RehabProgress", back_populates="patient", cascade="all, delete-orphan")
+    # 关系（删除患者时由数据库外键 ON DELETE CASCADE 删除子表记录，ORM不加载子表）
+    progress_notes: Mapped[list["ProgressNote"]] = relationship("ProgressNote", back_populates="patient", cascade="all, delete-orphan", passive_deletes=True)
+    reminders: Mapped[list["Reminder"]] = relationship("Reminder", back_populates="patient", cascade="all, delete-orphan", passive_deletes=True)
+    rehab_plan: Mapped[Optional["RehabPlan"]] = relationship("RehabPlan", back_populates="patient", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    rehab_progress: Mapped[list["RehabProgress"]] = relationship("RehabProgress", back_populates="patient", cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"<Patient(hospital_number={self.hospital_number}, name={self.name})>"
@@ -41,15 +43,17 @@ class Patient(Base):
 class ProgressNote(Base):
     """病程记录表"""
     __tablename__ = 'progress_notes'
+    # 每位患者每天只有一条病程记录，保存时按此索引 upsert；同时用于按患者、日期查询
+    __table_args__ = (Index('ux_progress_notes_patient_date', 'patient_id', 'record_date', unique=True),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id'), nullable=False)
+    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id', ondelete='CASCADE'), nullable=False)
     hospital_number: Mapped[str] = mapped_column(String(50), nullable=False)
     record_date: Mapped[datetime] = mapped_column(Date, nullable=False)
     day_number: Mapped[int] = mapped_column(Integer, nullable=False)
     record_type: Mapped[str] = mapped_column(String(50), nullable=False)
-    daily_condition: Mapped[Optional[str]] = mapped_column(Text)
-    generated_content: Mapped[Optional[str]] = mapped_column(Text)
+    daily_condition: Mapped[Optional[str]] = mapped_column(CompressedText)
+    generated_content: Mapped[Optional[str]] = mapped_column(CompressedText)
     is_edited: Mapped[bool] = mapped_column(Boolean, default=False)
     created_at: Mapped[datetime] = mapped_column(Date, default=datetime.now)
 
@@ -60,13 +64,33 @@ class ProgressNote(Base):
         return f"<ProgressNote(date={self.record_date}, type={self.record_type})>"
 
 
+class NoteRevision(Base):
+    """病程记录修订表：第1版保存原稿全文，之后每版保存相对上一版的差异（由触发器写入，见 database.revisions）"""
+    __tablename__ = 'note_revisions'
+    __table_args__ = (Index('ux_note_revisions_note_revision', 'note_id', 'revision', unique=True),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    note_id: Mapped[int] = mapped_column(Integer, ForeignKey('progress_notes.id', ondelete='CASCADE'), nullable=False)
+    revision: Mapped[int] = mapped_column(Integer, nullable=False)
+    content: Mapped[Optional[str]] = mapped_column(CompressedText)  # 第1版全文
+    delta: Mapped[Optional[bytes]] = mapped_column(LargeBinary)  # 之后各版的差异
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
+
+    def __repr__(self):
+        return f"<NoteRevision(note_id={self.note_id}, revision={self.revision})>"
+
+
 class Reminder(Base):
     """提醒表"""
     __tablename__ = 'reminders'
+    # 规则生成的提醒每位患者每条规则每天一条（见 database.reminders）
+    __table_args__ = (Index('ux_reminders_patient_rule_date', 'patient_id', 'rule_key', 'reminder_date',
+                            unique=True, sqlite_where=text('rule_key IS NOT NULL')),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id'), nullable=False)
+    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id', ondelete='CASCADE'), nullable=False)
     hospital_number: Mapped[str] = mapped_column(String(50), nullable=False)
+    rule_key: Mapped[Optional[str]] = mapped_column(String(50))  # 生成该提醒的规则，手动创建的提醒为空
     reminder_type: Mapped[str] = mapped_column(String(50), nullable=False)
     reminder_date: Mapped[datetime] = mapped_column(Date, nullable=False)
     day_number: Mapped[Optional[int]] = mapped_column(Integer)
@@ -118,7 +142,7 @@ class RehabPlan(Base):
     __tablename__ = 'rehab_plans'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id'), nullable=False)
+    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id', ondelete='CASCADE'), nullable=False)
     hospital_number: Mapped[str] = mapped_column(String(50), nullable=False)
     short_term_goals: Mapped[Optional[str]] = mapped_column(Text)  # 短期目标（1-2周）
     long_term_goals: Mapped[Optional[str]] = mapped_column(Text)  # 长期目标（1-3个月）
@@ -138,7 +162,7 @@ class RehabProgress(Base):
     __tablename__ = 'rehab_progress'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id'), nullable=False)
+    patient_id: Mapped[int] = mapped_column(Integer, ForeignKey('patients.id', ondelete='CASCADE'), nullable=False)
     hospital_number: Mapped[str] = mapped_column(String(50), nullable=False)
     record_date: Mapped[datetime] = mapped_column(Date, nullable=False)
     content: Mapped[str] = mapped_column(Text, nullable=False)
@@ -0,0 +1,172 @@
+"""
+列表分页与列投影
+
+列表接口统一使用游标分页（keyset pagination）：按排序键（如 record_date, id）排序，
+游标记录上一页最后一行的排序键，下一页用 (键...) < (游标值...) 接着取，
+不使用 OFFSET，翻到后面的页也只需从索引定位，不会越翻越慢，也不会因中途插入而重复或漏行。
+
+列投影：view=summary 只返回列表展示需要的列，fields=a,b,c 只返回指定的列，
+病程记录内容、专科查体等长文本只在需要时读取和传输。
+
+每个列表在 database.readers 中定义一个 ListSpec 和一个不带排序的 select()，
+由 paginate 负责投影、排序、取页和生成下一页游标。
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import Select, select, tuple_
+from sqlalchemy.orm import Session
+
+from database.queries import NamedQuery
+
+
+class PaginationError(ValueError):
+    """分页参数（游标、字段名）无效"""
+
+
+@dataclass(frozen=True)
+class ListSpec:
+    """一个列表接口的分页定义"""
+    # 可返回的列（select 中以 _ 开头的列只用于排序，不返回）
+    columns: tuple
+    # 排序键，最后一个必须唯一（通常是 id）
+    keys: tuple
+    descending: bool
+    # view=summary 时返回的列
+    summary: tuple
+
+    def output_columns(self, view: str = "full", fields: Optional[Sequence[str]] = None) -> tuple:
+        """按 view / fields 确定返回的列，id 总是返回"""
+        if fields:
+            unknown = [f for f in fields if f not in self.columns]
+            if unknown:
+                raise PaginationError(f"不支持的字段: {', '.join(unknown)}")
+            wanted = set(fields) | {"id"}
+        elif view == "summary":
+            wanted = set(self.summary) | {"id"}
+        elif view == "full":
+            return self.columns
+        else:
+            raise PaginationError(f"不支持的视图: {view}")
+        return tuple(c for c in self.columns if c in wanted)
+
+
+@dataclass(frozen=True)
+class PageRequest:
+    """分页及投影参数，limit 为 None 时返回全部"""
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    view: str = "full"
+    fields: Optional[tuple] = None
+
+
+@dataclass
+class Page:
+    """一页结果"""
+    items: list
+    # 没有下一页时为 None
+    next_cursor: Optional[str]
+    # 是否只返回了部分列
+    projected: bool
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"t": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "t" in value:
+            return datetime.fromisoformat(value["t"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise ValueError(value)
+    if value is not None and not isinstance(value, (int, float, str)):
+        raise ValueError(value)
+    return value
+
+
+def encode_cursor(values: Sequence) -> str:
+    """把排序键的值编码为游标（URL安全的base64）"""
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, spec: ListSpec) -> tuple:
+    """解码游标，格式不对时抛出 PaginationError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(spec.keys):
+            raise ValueError(values)
+        return tuple(_decode_value(v) for v in values)
+    except (ValueError, TypeError) as e:
+        raise PaginationError("无效的分页游标") from e
+
+
+def validate_page_request(request: PageRequest, spec: ListSpec):
+    """提前校验参数，使无效的请求在查询之前就被拒绝"""
+    spec.output_columns(request.view, request.fields)
+    if request.cursor:
+        decode_cursor(request.cursor, spec)
+
+
+def _position(stmt) -> tuple:
+    """返回 (查询, 按列名取列的函数)
+
+    普通 select() 直接替换查询列，保留原来的 FROM 和 WHERE；
+    UNION 等复合查询包一层子查询再按列名取列。
+    """
+    if isinstance(stmt, Select):
+        columns = stmt.selected_columns
+        return stmt, lambda names: [columns[name] for name in names]
+    source = stmt.subquery()
+    return select(source), lambda names: [source.c[name] for name in names]
+
+
+def paginate(session: Session, stmt, spec: ListSpec, request: PageRequest,
+             params: Optional[dict] = None) -> Page:
+    """按 spec 对 stmt 投影、排序并取一页
+
+    stmt 为不带排序的 select()（或 union_all() 等复合查询），
+    必须包含 spec.columns 和 spec.keys 中的全部列。多取一行用来判断是否还有下一页。
+    stmt 也可以是 database.queries 中注册的语句，params 为其绑定参数，执行统计记在该语句下。
+    """
+    named = stmt if isinstance(stmt, NamedQuery) else None
+    if named is not None:
+        stmt = named.statement
+    output = spec.output_columns(request.view, request.fields)
+    query, columns = _position(stmt)
+    extra = [k for k in spec.keys if k not in output]
+    query = query.with_only_columns(*columns(list(output) + extra), maintain_column_froms=True)
+
+    keys = columns(spec.keys)
+    if request.cursor:
+        after = decode_cursor(request.cursor, spec)
+        position = tuple_(*keys)
+        query = query.where(position < tuple_(*after) if spec.descending else position > tuple_(*after))
+    query = query.order_by(*(k.desc() if spec.descending else k.asc() for k in keys))
+    if request.limit is not None:
+        query = query.limit(request.limit + 1)
+
+    rows = (named.execute(session, params, query) if named is not None
+            else session.execute(query, params)).all()
+    next_cursor = None
+    if request.limit is not None and len(rows) > request.limit:
+        rows = rows[:request.limit]
+        last = rows[-1]._mapping
+        next_cursor = encode_cursor([last[name] for name in spec.keys])
+
+    items = [row._asdict() for row in rows]
+    if extra:
+        for item in items:
+            for name in extra:
+                del item[name]
+    return Page(items=items, next_cursor=next_cursor, projected=output != spec.columns)
@@ -0,0 +1,102 @@
+"""
+SQLite性能配置
+
+通过引擎的 connect 事件在每个新连接上执行 PRAGMA，
+配置项来自 config.json 的 database.performance 段。
+外键约束（删除患者时级联删除子表记录依赖它）总是开启，不可配置。
+"""
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# 默认性能配置：WAL模式下读写互不阻塞，适合多窗口同时访问
+DEFAULT_PERFORMANCE_PROFILE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,       # 负数表示以KB为单位，约64MB
+    "mmap_size": 268435456,     # 256MB
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,       # 毫秒
+}
+
+# SQLite默认行为（回滚日志），用于对比测试
+LEGACY_PERFORMANCE_PROFILE = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "cache_size": -2000,
+    "mmap_size": 0,
+    "temp_store": "DEFAULT",
+    "busy_timeout": 5000,
+}
+
+_ALLOWED_VALUES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+_INTEGER_PRAGMAS = ("cache_size", "mmap_size", "busy_timeout")
+
+
+def build_performance_profile(overrides: Optional[dict] = None) -> dict:
+    """合并默认配置与用户配置，并校验取值
+
+    Args:
+        overrides: config.json 中的 database.performance 配置
+
+    Returns:
+        完整的性能配置字典
+
+    Raises:
+        ValueError: 配置项名称或取值不合法
+    """
+    profile = dict(DEFAULT_PERFORMANCE_PROFILE)
+    for key, value in (overrides or {}).items():
+        if key not in profile:
+            raise ValueError(f"未知的数据库性能配置项: {key}")
+        profile[key] = value
+
+    for key, allowed in _ALLOWED_VALUES.items():
+        value = str(profile[key]).upper()
+        if value not in allowed:
+            raise ValueError(f"{key} 取值不合法: {profile[key]}")
+        profile[key] = value
+
+    for key in _INTEGER_PRAGMAS:
+        profile[key] = int(profile[key])
+
+    return profile
+
+
+def profile_statements(profile: dict, read_only: bool = False) -> list[str]:
+    """生成需要在每个连接上执行的 PRAGMA 语句
+
+    journal_mode 会写入数据库文件头，只读连接跳过该项（由读写连接设置）。
+    """
+    # busy_timeout 放在最前，后续 PRAGMA 遇到锁时也能等待
+    statements = [f"PRAGMA busy_timeout = {profile['busy_timeout']}"]
+    if not read_only:
+        statements.append(f"PRAGMA journal_mode = {profile['journal_mode']}")
+    return statements + [
+        f"PRAGMA synchronous = {profile['synchronous']}",
+        f"PRAGMA cache_size = {profile['cache_size']}",
+        f"PRAGMA mmap_size = {profile['mmap_size']}",
+        f"PRAGMA temp_store = {profile['temp_store']}",
+        "PRAGMA foreign_keys = ON",
+    ]
+
+
+def apply_performance_profile(engine: Engine, profile: dict, read_only: bool = False):
+    """在引擎上注册 connect 事件，为每个新连接应用性能配置"""
+    statements = profile_statements(profile, read_only)
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
@@ -0,0 +1,212 @@
+"""
+热点查询语句注册表
+
+按住院号查患者、按患者查病程记录、按日期查提醒这几类查询每天执行上千次，原来每个请求
+都用 session.query(...).filter(...) 重新构建查询。这里在模块加载时构建好 select()，
+条件值用 bindparam 占位，执行时只传参数：
+- 语句对象只构建一次；缓存键不含参数值，SQLAlchemy 编译缓存（每个 Engine 一份）命中后直接复用编译结果
+- 分页（database.pagination）在注册的语句上加投影、排序和游标条件，仍按同一名称统计
+
+每条语句统计执行次数、编译缓存命中率、准备时间（从调用到游标执行之前，包括生成缓存键和查找缓存）
+和编译时间（未命中缓存时的准备时间），通过 query_metrics() 或 DBManager.get_metrics()["queries"] 查看。
+"""
+import threading
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import bindparam, case, event, select
+from sqlalchemy.engine import Engine, Result
+from sqlalchemy.engine.default import CACHE_HIT
+from sqlalchemy.orm import Session
+
+from database.models import Patient, ProgressNote, Reminder
+
+
+IDENTITY_COLUMNS = (
+    Patient.id,
+    Patient.hospital_number,
+    Patient.name,
+    Patient.admission_date,
+    Patient.discharge_date,
+)
+
+NOTE_COLUMNS = (
+    ProgressNote.id,
+    ProgressNote.hospital_number,
+    ProgressNote.record_date,
+    ProgressNote.day_number,
+    ProgressNote.record_type,
+    ProgressNote.daily_condition,
+    ProgressNote.generated_content,
+    ProgressNote.is_edited,
+    ProgressNote.created_at,
+)
+
+REMINDER_COLUMNS = (
+    Reminder.id,
+    Reminder.patient_id,
+    Reminder.hospital_number,
+    Reminder.reminder_type,
+    Reminder.reminder_date,
+    Reminder.day_number,
+    Reminder.description,
+    Reminder.priority,
+    Reminder.is_completed,
+    Reminder.completed_at,
+)
+
+# 提醒优先级排序：紧急 > 高 > 中 > 低 > 其他
+PRIORITY_ORDER = {"紧急": 0, "高": 1, "中": 2, "低": 3}
+
+# 当前线程最近一次游标执行的 (时间, 编译缓存状态)，由 before_cursor_execute 事件记录
+_last_cursor_execute = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _mark_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _last_cursor_execute.value = (perf_counter(), context.cache_hit if context is not None else None)
+
+
+class NamedQuery:
+    """注册的语句及其执行统计"""
+
+    def __init__(self, name: str, statement, description: str = ""):
+        self.name = name
+        self.statement = statement
+        self.description = description
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.executions = 0
+        self.cache_hits = 0
+        self.prepare_seconds = 0.0
+        self.compile_seconds = 0.0
+        self.compile_seconds_max = 0.0
+
+    def execute(self, session: Session, params: Optional[dict] = None, statement=None) -> Result:
+        """执行注册的语句；statement 为在其基础上派生的语句（如分页），统计仍记在本语句下"""
+        _last_cursor_execute.value = None
+        started = perf_counter()
+        result = session.execute(self.statement if statement is None else statement, params)
+        marked = _last_cursor_execute.value
+        if marked is not None:
+            self._record(marked[0] - started, marked[1] == CACHE_HIT)
+        return result
+
+    def _record(self, prepare: float, cache_hit: bool):
+        with self._lock:
+            self.executions += 1
+            if cache_hit:
+                self.cache_hits += 1
+                self.prepare_seconds += prepare
+            else:
+                self.compile_seconds += prepare
+                self.compile_seconds_max = max(self.compile_seconds_max, prepare)
+
+    def stats(self) -> dict:
+        with self._lock:
+            executions, hits = self.executions, self.cache_hits
+            misses = executions - hits
+            return {
+                "executions": executions,
+                "cache_hits": hits,
+                "cache_misses": misses,
+                "hit_rate": round(hits / executions, 4) if executions else 0.0,
+                "prepare_ms_avg": round(self.prepare_seconds / hits * 1000, 4) if hits else 0.0,
+                "compile_ms_avg": round(self.compile_seconds / misses * 1000, 4) if misses else 0.0,
+                "compile_ms_max": round(self.compile_seconds_max * 1000, 4),
+            }
+
+
+REGISTRY: dict = {}
+
+
+def register(name: str, statement, description: str = "") -> NamedQuery:
+    """注册语句，名称不能重复"""
+    if name in REGISTRY:
+        raise ValueError(f"查询 {name} 已注册")
+    query = NamedQuery(name, statement, description)
+    REGISTRY[name] = query
+    return query
+
+
+def query_metrics() -> dict:
+    """各注册语句的执行统计"""
+    return {name: query.stats() for name, query in REGISTRY.items()}
+
+
+def reset_query_metrics():
+    for query in REGISTRY.values():
+        with query._lock:
+            query._reset()
+
+
+PATIENT_IDENTITY = register(
+    "patient_identity",
+    select(*IDENTITY_COLUMNS).where(Patient.hospital_number == bindparam("hospital_number")),
+    "按住院号查患者身份（身份缓存未命中时）",
+)
+
+PATIENT_BY_HOSPITAL_NUMBER = register(
+    "patient_by_hospital_number",
+    select(Patient).where(Patient.hospital_number == bindparam("hospital_number")),
+    "按住院号取患者ORM对象（详情、修改、出院）",
+)
+
+NOTES_BY_PATIENT = register(
+    "notes_by_patient",
+    select(*NOTE_COLUMNS).where(ProgressNote.patient_id == bindparam("patient_id")),
+    "患者的病程记录",
+)
+
+_upcoming_reminders = (
+    select(*REMINDER_COLUMNS,
+           case(PRIORITY_ORDER, value=Reminder.priority,
+                else_=len(PRIORITY_ORDER)).label("_priority_rank"))
+    .join(Patient, Reminder.patient_id == Patient.id)
+    .where(Reminder.reminder_date >= bindparam("today"), Reminder.is_completed == False)
+)
+
+UPCOMING_REMINDERS = register(
+    "upcoming_reminders",
+    _upcoming_reminders,
+    "今日及未来的未完成提醒",
+)
+
+UPCOMING_REMINDERS_BY_PRIORITY = register(
+    "upcoming_reminders_by_priority",
+    _upcoming_reminders.where(Reminder.priority == bindparam("priority")),
+    "今日及未来的未完成提醒（按优先级筛选）",
+)
+
+NOTE_ON_DATE = register(
+    "note_on_date",
+    select(ProgressNote).where(
+        ProgressNote.patient_id == bindparam("patient_id"),
+        ProgressNote.record_date == bindparam("record_date"),
+    ),
+    "患者某日的病程记录（保存时判断新增还是更新）",
+)
+
+REMINDERS_DUE_ON = register(
+    "reminders_due_on",
+    select(Reminder).where(Reminder.reminder_date == bindparam("day"), Reminder.is_completed == False),
+    "某日的未完成提醒",
+)
+
+REMINDERS_BY_PATIENT = register(
+    "reminders_by_patient",
+    select(*REMINDER_COLUMNS).where(Reminder.patient_id == bindparam("patient_id")),
+    "患者的全部提醒",
+)
+
+UPCOMING_REMINDERS_BY_PATIENT = register(
+    "upcoming_reminders_by_patient",
+    select(*REMINDER_COLUMNS).where(
+        Reminder.patient_id == bindparam("patient_id"),
+        Reminder.is_completed == False,
+        Reminder.reminder_date >= bindparam("today"),
+    ),
+    "患者今日及以后的未完成提醒",
+)
@@ -0,0 +1,204 @@
+"""
+只读查询层
+
+列表接口只需要把数据库行转换成JSON，不需要完整的ORM对象。
+这里用 Core select() 只取需要的列，返回元组结构的 Row（支持按列名访问），
+跳过ORM对象构建、身份映射和属性插桩，由路由直接转换为响应字典。
+列表接口的分页和列投影见 database.pagination，按患者、按日期的热点查询语句见 database.queries。
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import false, or_, select, true, union_all
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+
+from database.models import Patient, RehabProgress, Template
+from database.archive import ARCHIVE_INFO_KEY, archived
+from database.pagination import ListSpec, Page, PageRequest, paginate
+from database import queries
+from database.queries import NOTE_COLUMNS, REMINDER_COLUMNS
+
+
+PATIENT_COLUMNS = (
+    Patient.id,
+    Patient.hospital_number,
+    Patient.name,
+    Patient.gender,
+    Patient.age,
+    Patient.admission_date,
+    Patient.discharge_date,
+    Patient.diagnosis,
+    Patient.chief_complaint,
+    Patient.past_history,
+    Patient.allergy_history,
+    Patient.specialist_exam,
+)
+
+TEMPLATE_COLUMNS = (
+    Template.id,
+    Template.category,
+    Template.template_name,
+    Template.content,
+    Template.is_system,
+    Template.usage_count,
+)
+
+REHAB_PROGRESS_COLUMNS = (
+    RehabProgress.id,
+    RehabProgress.patient_id,
+    RehabProgress.hospital_number,
+    RehabProgress.record_date,
+    RehabProgress.content,
+    RehabProgress.score,
+    RehabProgress.created_at,
+)
+
+
+def _names(columns) -> tuple:
+    return tuple(col.key for col in columns)
+
+
+# 各列表的分页定义（见 database.pagination）
+# 主库和归档库各自分配患者ID，UNION ALL 后 id 可能重复，排序键中加上来源 archived 才唯一
+PATIENT_LIST = ListSpec(
+    columns=_names(PATIENT_COLUMNS) + ("archived",),
+    keys=("admission_date", "id", "archived"),
+    descending=True,
+    summary=("hospital_number", "name", "gender", "age", "admission_date", "discharge_date",
+             "diagnosis", "archived"),
+)
+
+NOTE_LIST = ListSpec(
+    columns=_names(NOTE_COLUMNS),
+    keys=("record_date", "id"),
+    descending=True,
+    summary=("hospital_number", "record_date", "day_number", "record_type", "is_edited", "created_at"),
+)
+
+TEMPLATE_LIST = ListSpec(
+    columns=_names(TEMPLATE_COLUMNS),
+    keys=("usage_count", "id"),
+    descending=True,
+    summary=("category", "template_name", "is_system", "usage_count"),
+)
+
+_REMINDER_SUMMARY = ("patient_id", "hospital_number", "reminder_type", "reminder_date",
+                     "day_number", "priority", "is_completed")
+
+# 今日提醒按日期、优先级排序，_priority_rank 只用于排序
+UPCOMING_REMINDER_LIST = ListSpec(
+    columns=_names(REMINDER_COLUMNS),
+    keys=("reminder_date", "_priority_rank", "id"),
+    descending=False,
+    summary=_REMINDER_SUMMARY,
+)
+
+PATIENT_REMINDER_LIST = ListSpec(
+    columns=_names(REMINDER_COLUMNS),
+    keys=("reminder_date", "id"),
+    descending=False,
+    summary=_REMINDER_SUMMARY,
+)
+
+REHAB_PROGRESS_LIST = ListSpec(
+    columns=_names(REHAB_PROGRESS_COLUMNS),
+    keys=("record_date", "id"),
+    descending=True,
+    summary=("patient_id", "hospital_number", "record_date", "score", "created_at"),
+)
+
+
+def _patient_filters(table, include_discharged: bool, search: Optional[str]) -> list:
+    conditions = []
+    if not include_discharged:
+        conditions.append(table.c.discharge_date.is_(None))
+    if search:
+        search_pattern = f"%{search}%"
+        conditions.append(or_(
+            table.c.name.like(search_pattern),
+            table.c.hospital_number.like(search_pattern),
+            table.c.diagnosis.like(search_pattern),
+        ))
+    return conditions
+
+
+def _patients_select(session: Session, include_discharged: bool, search: Optional[str]):
+    """患者列表的查询（不排序）
+
+    包含出院患者且挂载了归档库时，同时读取归档库（archived 列为 True）。
+    """
+    main = (
+        select(*PATIENT_COLUMNS, false().label("archived"))
+        .where(*_patient_filters(Patient.__table__, include_discharged, search))
+    )
+    if not (include_discharged and session.info.get(ARCHIVE_INFO_KEY)):
+        return main
+
+    archived_patients = archived["patients"]
+    return union_all(
+        main,
+        select(*(archived_patients.c[col.key] for col in PATIENT_COLUMNS), true().label("archived"))
+        .where(*_patient_filters(archived_patients, True, search)),
+    )
+
+
+def page_patients(session: Session, page: PageRequest, include_discharged: bool = False,
+                  search: Optional[str] = None) -> Page:
+    """患者列表分页，按入院日期倒序"""
+    return paginate(session, _patients_select(session, include_discharged, search), PATIENT_LIST, page)
+
+
+def find_archived_patient(session: Session, hospital_number: str) -> Optional[Row]:
+    """在归档库中按住院号查找患者，未挂载归档库时返回 None"""
+    if not session.info.get(ARCHIVE_INFO_KEY):
+        return None
+    archived_patients = archived["patients"]
+    stmt = (
+        select(*(archived_patients.c[col.key] for col in PATIENT_COLUMNS), true().label("archived"))
+        .where(archived_patients.c.hospital_number == hospital_number)
+    )
+    return session.execute(stmt).first()
+
+
+def page_patient_notes(session: Session, patient_id: int, page: PageRequest) -> Page:
+    """患者病程记录分页，按记录日期倒序"""
+    return paginate(session, queries.NOTES_BY_PATIENT, NOTE_LIST, page, {"patient_id": patient_id})
+
+
+def page_templates(session: Session, page: PageRequest, category: Optional[str] = None) -> Page:
+    """模板列表分页，按使用次数倒序"""
+    stmt = select(*TEMPLATE_COLUMNS)
+    if category:
+        stmt = stmt.where(Template.category == category)
+    return paginate(session, stmt, TEMPLATE_LIST, page)
+
+
+def _upcoming_reminders(today: date, priority: Optional[str]) -> tuple:
+    """今日及未来的未完成提醒：(注册的语句, 参数)"""
+    if priority:
+        return queries.UPCOMING_REMINDERS_BY_PRIORITY, {"today": today, "priority": priority}
+    return queries.UPCOMING_REMINDERS, {"today": today}
+
+
+def page_upcoming_reminders(session: Session, today: date, page: PageRequest,
+                            priority: Optional[str] = None) -> Page:
+    """今日及未来的未完成提醒分页，按日期、优先级排序"""
+    query, params = _upcoming_reminders(today, priority)
+    return paginate(session, query, UPCOMING_REMINDER_LIST, page, params)
+
+
+def page_patient_reminders(session: Session, patient_id: int, page: PageRequest,
+                           upcoming_from: Optional[date] = None) -> Page:
+    """患者提醒分页，按提醒日期排序；指定 upcoming_from 时只取该日及以后的未完成提醒"""
+    if upcoming_from is not None:
+        return paginate(session, queries.UPCOMING_REMINDERS_BY_PATIENT, PATIENT_REMINDER_LIST, page,
+                        {"patient_id": patient_id, "today": upcoming_from})
+    return paginate(session, queries.REMINDERS_BY_PATIENT, PATIENT_REMINDER_LIST, page,
+                    {"patient_id": patient_id})
+
+
+def page_rehab_progress(session: Session, patient_id: int, page: PageRequest) -> Page:
+    """康复进展分页，按记录日期倒序"""
+    stmt = select(*REHAB_PROGRESS_COLUMNS).where(RehabProgress.patient_id == patient_id)
+    return paginate(session, stmt, REHAB_PROGRESS_LIST, page)
@@ -0,0 +1,287 @@
+"""
+提醒规则引擎
+
+提醒规则原来写死在 initialize_patient_reminders 的条件分支中（归档代码 PatientManager._generate_reminders、
+DateCalculator 又各有一套不同的写法）。这里规则是数据：从住院第 offset 天开始、每 period 天一次、
+到第 until 天为止，加上类型、优先级和说明模板。
+
+规则的计算在数据库中一次完成：
+- 规则作为 VALUES 表、未来若干天（horizon）作为递归 CTE 日历，与范围内的患者连接，
+  算出全部患者、全部规则、整个时间范围内应有的提醒，住院天数由入院日期计算，出院日之后不再生成
+- 生成的提醒带 rule_key（规则标识），(patient_id, rule_key, reminder_date) 唯一；
+  materialize_reminders（每次打开患者列表时调用）只用一条 INSERT ... SELECT 补入缺失的提醒
+
+入院日期、出院日期或姓名修改后（患者修改、出院、批量导入）调用 refresh_reminders，
+只重新计算该患者已经生成过提醒的时间范围，只改动变化的行：今天及以后未完成的生成提醒中，
+住院天数或说明变化的原地更新，不再相符的删除，缺失的补入；已完成的提醒、今天以前的提醒和
+手动创建的提醒（rule_key 为空）不受影响。
+
+UPDATE ... FROM 和 RETURNING 需要 SQLite 3.35 及以上（DBManager 启动时检查）。
+"""
+from dataclasses import dataclass
+from datetime import date
+from typing import Optional, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+# 一次最多预先生成的天数
+MAX_HORIZON_DAYS = 90
+# 这些患者字段变化后需要刷新已生成的提醒（说明模板中用到姓名）
+REFRESH_FIELDS = frozenset({"admission_date", "discharge_date", "name"})
+
+
+@dataclass(frozen=True)
+class ReminderRule:
+    """提醒规则：住院第 offset 天开始，每 period 天一次（period 为 None 时只在第 offset 天），
+    到第 until 天为止（None 为不限）；template 中 {name} 为患者姓名（无姓名时为住院号）、{day} 为住院天数"""
+    key: str
+    reminder_type: str
+    priority: str
+    template: str
+    offset: int = 1
+    period: Optional[int] = None
+    until: Optional[int] = None
+
+    def __post_init__(self):
+        if self.offset < 1:
+            raise ValueError(f"规则 {self.key} 的 offset 必须从第1天开始")
+        if self.period is not None and self.period < 1:
+            raise ValueError(f"规则 {self.key} 的 period 必须为正数")
+        if self.until is not None and self.until < self.offset:
+            raise ValueError(f"规则 {self.key} 的 until 不能早于 offset")
+
+    def applies_to(self, day: int) -> bool:
+        """住院第 day 天是否有该提醒（与 SQL 中的条件一致）"""
+        if day < self.offset or (self.until is not None and day > self.until):
+            return False
+        if self.period is None:
+            return day == self.offset
+        return (day - self.offset) % self.period == 0
+
+    def describe(self, name: str, day: int) -> str:
+        """住院第 day 天的提醒说明"""
+        return self.template.replace("{name}", name).replace("{day}", str(day))
+
+
+# 顺序与原来逐条创建的顺序一致
+RULES = (
+    ReminderRule("long_stay_review", "复查", "紧急", "{name} 住院已超过85天，建议安排复查评估",
+                 offset=86, period=1),
+    ReminderRule("initial_assessment", "评估", "高", "{name} 入院第{day}天，完成初次康复评估",
+                 offset=1, period=1, until=4),
+    ReminderRule("lab_review", "检查", "高", "{name} 入院第2天，查看实验室检查和放射线检查结果",
+                 offset=2),
+    ReminderRule("cycle_assessment", "评估", "高", "{name} 入院第{day}天（15天周期），评估恢复情况",
+                 offset=15, period=15),
+    ReminderRule("daily_note", "病程记录", "中", "完成{name}的病程记录", offset=1, period=1),
+)
+RULES_BY_KEY = {rule.key: rule for rule in RULES}
+
+
+def select_rules(keys: Sequence[str]) -> tuple:
+    """按规则标识选出规则（保持 RULES 中的顺序），未知标识抛出 ValueError"""
+    if not keys:
+        raise ValueError("至少指定一条提醒规则")
+    unknown = sorted(set(keys) - RULES_BY_KEY.keys())
+    if unknown:
+        raise ValueError(f"未知的提醒规则: {', '.join(unknown)}")
+    return tuple(rule for rule in RULES if rule.key in keys)
+
+# 范围内的患者：{where} 为患者范围，{window_end} 为每位患者计算到的最后日期
+_WARD_SQL = """
+    SELECT * FROM (
+        SELECT id, hospital_number, COALESCE(name, hospital_number) AS label,
+               CAST(julianday(:today) - julianday(admission_date) AS INTEGER) + 1 AS today_day,
+               CAST(julianday(discharge_date) - julianday(admission_date) AS INTEGER) + 1 AS last_day,
+               {window_end} AS window_end
+        FROM patients p
+        WHERE {where}
+    ) WHERE window_end >= :today
+"""
+
+# 应有的提醒：{rules} 为规则 VALUES，{ward} 为范围内的患者
+_EXPECTED_CTE = """
+    WITH RECURSIVE
+    rules(rule_key, reminder_type, priority, template, start_day, period, until_day) AS (VALUES {rules}),
+    ward AS ({ward}),
+    horizon(n, reminder_date) AS (
+        SELECT 0, :today
+        UNION ALL
+        SELECT n + 1, date(:today, '+' || (n + 1) || ' days') FROM horizon
+        WHERE date(:today, '+' || (n + 1) || ' days') <= (SELECT MAX(window_end) FROM ward)
+    ),
+    days AS (
+        SELECT w.id, w.hospital_number, w.label, w.today_day + h.n AS day, h.reminder_date
+        FROM ward w JOIN horizon h ON h.reminder_date <= w.window_end
+        WHERE w.today_day + h.n >= 1 AND (w.last_day IS NULL OR w.today_day + h.n <= w.last_day)
+    ),
+    expected AS (
+        SELECT d.id AS patient_id, d.hospital_number, r.rule_key, r.reminder_type, r.priority,
+               d.reminder_date, d.day,
+               replace(replace(r.template, '{{name}}', d.label), '{{day}}', d.day) AS description
+        FROM days d JOIN rules r
+          ON d.day >= r.start_day
+         AND (r.until_day IS NULL OR d.day <= r.until_day)
+         AND CASE WHEN r.period IS NULL THEN d.day = r.start_day
+                  ELSE (d.day - r.start_day) % r.period = 0 END
+    )
+"""
+
+# 补入缺失的提醒：{expected} 为 WITH 子句（生成）或空（刷新时 expected 为临时表）
+_INSERT_SQL = """
+    INSERT INTO reminders (patient_id, hospital_number, rule_key, reminder_type, reminder_date, day_number,
+                           description, priority, is_completed, created_at)
+    {expected}
+    SELECT patient_id, hospital_number, rule_key, reminder_type, reminder_date, day, description, priority, 0, :today
+    FROM expected e
+    WHERE NOT EXISTS (SELECT 1 FROM reminders r WHERE r.patient_id = e.patient_id
+                      AND r.rule_key = e.rule_key AND r.reminder_date = e.reminder_date)
+    RETURNING patient_id
+"""
+
+# 刷新时范围内的患者和应有的提醒各计算一次，存入临时表，供下面三条语句使用
+_REFRESH_TABLES = ("temp.ward", "temp.expected")
+
+# 住院天数或说明变化（入院日期、姓名修改）的提醒原地更新
+_UPDATE_SQL = """
+    UPDATE reminders
+    SET reminder_type = e.reminder_type, priority = e.priority, day_number = e.day, description = e.description
+    FROM expected AS e
+    WHERE reminders.patient_id = e.patient_id AND reminders.rule_key = e.rule_key
+      AND reminders.reminder_date = e.reminder_date AND reminders.is_completed = 0
+      AND (reminders.day_number IS NOT e.day OR reminders.description IS NOT e.description
+           OR reminders.reminder_type IS NOT e.reminder_type OR reminders.priority IS NOT e.priority)
+    RETURNING reminders.patient_id
+"""
+
+# 只删除计算范围内的提醒；最后执行：刷新时的计算范围取决于已生成的提醒，先删除会缩小范围
+_DELETE_SQL = """
+    DELETE FROM reminders
+    WHERE id IN (
+        SELECT r.id FROM reminders r
+        JOIN ward w ON r.patient_id = w.id AND r.reminder_date <= w.window_end
+        LEFT JOIN expected e
+          ON e.patient_id = r.patient_id AND e.rule_key = r.rule_key AND e.reminder_date = r.reminder_date
+        WHERE r.rule_key IS NOT NULL AND r.is_completed = 0 AND r.reminder_date >= :today
+          AND e.patient_id IS NULL
+    )
+    RETURNING patient_id
+"""
+
+# 刷新时每位患者只计算到已生成的最后一条提醒
+_MATERIALIZED_END = """(SELECT MAX(reminder_date) FROM reminders r
+                        WHERE r.patient_id = p.id AND r.rule_key IS NOT NULL AND r.reminder_date >= :today)"""
+
+
+def _rule_params(rules: Sequence[ReminderRule]) -> tuple:
+    """规则的 VALUES 子句和绑定参数"""
+    if len({rule.key for rule in rules}) != len(rules):
+        raise ValueError("规则标识不能重复")
+    values, params = [], {}
+    for i, rule in enumerate(rules):
+        values.append(f"(:key_{i}, :type_{i}, :priority_{i}, :template_{i}, :offset_{i}, :period_{i}, :until_{i})")
+        params.update({
+            f"key_{i}": rule.key, f"type_{i}": rule.reminder_type, f"priority_{i}": rule.priority,
+            f"template_{i}": rule.template, f"offset_{i}": rule.offset, f"period_{i}": rule.period,
+            f"until_{i}": rule.until,
+        })
+    return ", ".join(values), params
+
+
+def _patient_filter(hospital_numbers: Optional[Sequence[str]]) -> str:
+    """指定住院号时为这些患者，否则为在院患者（包括出院日期在今天之后的患者）"""
+    if hospital_numbers is not None:
+        return "hospital_number IN :hospital_numbers"
+    return "(discharge_date IS NULL OR discharge_date > :today)"
+
+
+def _statement(sql: str, hospital_numbers: Optional[Sequence[str]]):
+    stmt = text(sql)
+    if hospital_numbers is not None:
+        stmt = stmt.bindparams(bindparam("hospital_numbers", expanding=True))
+    return stmt
+
+
+def _prepare(rules: Sequence[ReminderRule], hospital_numbers: Optional[Sequence[str]], window_end: str,
+             params: dict) -> tuple:
+    """范围内患者的查询、规则 VALUES 子句和全部绑定参数"""
+    ward = _WARD_SQL.format(where=_patient_filter(hospital_numbers), window_end=window_end)
+    values, rule_params = _rule_params(rules)
+    return ward, values, {**params, **rule_params, "hospital_numbers": list(hospital_numbers or ())}
+
+
+def materialize_reminders(session: Session, rules: Sequence[ReminderRule] = RULES, horizon_days: int = 1,
+                          hospital_numbers: Optional[Sequence[str]] = None,
+                          today: Optional[date] = None) -> dict:
+    """按规则补入今天起 horizon_days 天内缺失的提醒（一条 INSERT ... SELECT）
+
+    指定住院号时只处理这些患者（不论是否出院），否则处理全部在院患者；出院日之后不生成提醒。
+    已生成的提醒不改动，入院日期等变化后由 refresh_reminders 更新。
+
+    Returns:
+        {"patient_count": 范围内患者数, "changed_patients": 新建了提醒的患者数, "created_count": 新建提醒数}
+    """
+    if not 1 <= horizon_days <= MAX_HORIZON_DAYS:
+        raise ValueError(f"horizon_days 应在 1 到 {MAX_HORIZON_DAYS} 之间")
+    today = today or date.today()
+    ward, values, params = _prepare(rules, hospital_numbers, "date(:today, '+' || (:horizon_days - 1) || ' days')",
+                                    {"today": today.isoformat(), "horizon_days": horizon_days})
+    patient_count = session.execute(
+        _statement(f"SELECT COUNT(*) FROM patients WHERE {_patient_filter(hospital_numbers)}", hospital_numbers),
+        params).scalar()
+
+    expected = _EXPECTED_CTE.format(rules=values, ward=ward)
+    created = session.execute(
+        _statement(_INSERT_SQL.format(expected=expected), hospital_numbers), params).scalars().all()
+    return {"patient_count": patient_count, "changed_patients": len(set(created)), "created_count": len(created)}
+
+
+def refresh_reminders(session: Session, hospital_numbers: Sequence[str], rules: Sequence[ReminderRule] = RULES,
+                      today: Optional[date] = None) -> dict:
+    """患者入院/出院日期或姓名变化后，重新计算已生成的提醒
+
+    每位患者只计算到已生成的最后一条提醒的日期；从今天起没有生成过提醒的患者不处理。
+    范围内的患者和应有的提醒各计算一次存入临时表，再依次更新住院天数或说明变化的提醒、
+    补入缺失的提醒、删除不再相符的提醒。
+
+    Returns:
+        {"created_count", "updated_count", "removed_count", "changed_patients": 提醒有变化的患者数}
+    """
+    if not hospital_numbers:
+        return {"created_count": 0, "updated_count": 0, "removed_count": 0, "changed_patients": 0}
+    today = today or date.today()
+    ward, values, params = _prepare(rules, hospital_numbers, _MATERIALIZED_END, {"today": today.isoformat()})
+
+    def run(sql):
+        return session.execute(text(sql), params).scalars().all()
+
+    for table in _REFRESH_TABLES:
+        session.execute(text(f"DROP TABLE IF EXISTS {table}"))
+    session.execute(_statement(f"CREATE TEMP TABLE ward AS {ward}", hospital_numbers), params)
+    session.execute(text(
+        f"CREATE TEMP TABLE expected AS {_EXPECTED_CTE.format(rules=values, ward='SELECT * FROM temp.ward')} "
+        f"SELECT * FROM expected"), params)
+    updated = run(_UPDATE_SQL)
+    created = run(_INSERT_SQL.format(expected=""))
+    removed = run(_DELETE_SQL)
+    # 出错时临时表随事务回滚
+    for table in _REFRESH_TABLES:
+        session.execute(text(f"DROP TABLE {table}"))
+    return {
+        "created_count": len(created),
+        "updated_count": len(updated),
+        "removed_count": len(removed),
+        "changed_patients": len(set(created) | set(updated) | set(removed)),
+    }
+
+
+def adopt_legacy_reminders(conn: Connection, rules: Sequence[ReminderRule] = RULES):
+    """为规则引擎之前生成的提醒补上 rule_key（按类型和说明模板匹配），避免刷新时重复生成"""
+    for rule in rules:
+        pattern = rule.template.replace("{name}", "%").replace("{day}", "%")
+        conn.execute(text(
+            "UPDATE OR IGNORE reminders SET rule_key = :key "
+            "WHERE rule_key IS NULL AND reminder_type = :reminder_type AND description LIKE :pattern"
+        ), {"key": rule.key, "reminder_type": rule.reminder_type, "pattern": pattern})
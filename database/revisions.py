@@ -0,0 +1,132 @@
+"""
+病程记录修订历史
+
+保存和修改病程记录都是原地覆盖 generated_content，医生修改之后 AI 生成的原稿就找不到了；
+每次修改都保存一份全文又会让数据库成倍增长。修订表 note_revisions 只保存：
+- 第1版：第一次修改之前的原稿全文（与病程记录相同的压缩格式，直接复制原值）
+- 之后每版：相对上一版的差异（按短句比对，见 database.compression.encode_delta）；
+  差异不比全文小时（例如整篇重写）改为保存该版全文，作为还原的起点
+
+由 progress_notes 上的触发器维护，单条保存、批量保存、批量导入等所有写入路径都会记录：
+- 从未修改过的记录没有修订行，不额外占用空间，当前内容即第1版
+- 只在内容实际变化时记录；后台压缩只改变存储格式，解压后相同，不产生新版本
+- 删除病程记录时修订行由外键级联删除；归档和移回主库时修订历史随病程记录一起搬移（见 database.archive）
+
+任意版本按需还原：从该版之前最近的一份全文开始依次应用差异（read_revision）。
+"""
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database.compression import DELTA_SQL_FUNCTION, SQL_FUNCTION, apply_delta, decompress_value
+
+REVISION_TABLE = "note_revisions"
+
+_TRIGGERS = {
+    "note_revisions_au": f"""
+        AFTER UPDATE OF generated_content ON progress_notes
+        WHEN {SQL_FUNCTION}(old.generated_content) IS NOT {SQL_FUNCTION}(new.generated_content)
+        BEGIN
+            INSERT INTO {REVISION_TABLE} (note_id, revision, content, created_at)
+            SELECT old.id, 1, old.generated_content, datetime(old.created_at)
+            WHERE NOT EXISTS (SELECT 1 FROM {REVISION_TABLE} WHERE note_id = old.id);
+            INSERT INTO {REVISION_TABLE} (note_id, revision, content, delta, created_at)
+            SELECT new.id,
+                   (SELECT MAX(revision) + 1 FROM {REVISION_TABLE} WHERE note_id = new.id),
+                   CASE WHEN LENGTH(d.delta) < LENGTH(CAST(new.generated_content AS BLOB))
+                        THEN NULL ELSE new.generated_content END,
+                   CASE WHEN LENGTH(d.delta) < LENGTH(CAST(new.generated_content AS BLOB))
+                        THEN d.delta END,
+                   datetime('now', 'localtime')
+            FROM (SELECT {DELTA_SQL_FUNCTION}({SQL_FUNCTION}(old.generated_content),
+                                             {SQL_FUNCTION}(new.generated_content)) AS delta) AS d;
+        END
+    """,
+}
+
+
+def create_revision_triggers(conn: Connection):
+    """创建修订触发器（progress_notes 重建后也需要调用）"""
+    for name, body in _TRIGGERS.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def recreate_revision_triggers(conn: Connection):
+    """删除并重新创建修订触发器（触发器定义变化时使用）"""
+    for name in _TRIGGERS:
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    create_revision_triggers(conn)
+
+
+def _revision_rows(session: Session, note_id: int, up_to: Optional[int] = None) -> list:
+    """各版修订行；指定 up_to 时只取该版及之前最近一份全文以来的行"""
+    sql = (f"SELECT revision, content, delta, LENGTH(CAST(content AS BLOB)) AS content_bytes, "
+           f"LENGTH(delta) AS delta_bytes, created_at FROM {REVISION_TABLE} WHERE note_id = :note_id")
+    if up_to is not None:
+        sql += (f" AND revision <= :up_to AND revision >= (SELECT MAX(revision) FROM {REVISION_TABLE} "
+                f"WHERE note_id = :note_id AND revision <= :up_to AND delta IS NULL)")
+    return session.execute(text(sql + " ORDER BY revision"), {"note_id": note_id, "up_to": up_to}).all()
+
+
+def _current_note(session: Session, note_id: int):
+    return session.execute(
+        text("SELECT generated_content, datetime(created_at) AS created_at FROM progress_notes WHERE id = :id"),
+        {"id": note_id}
+    ).first()
+
+
+def _apply_row(content: Optional[str], row) -> str:
+    """在上一版内容上应用一行修订：没有差异的行保存的是该版全文"""
+    if row.delta is None:
+        return decompress_value(row.content) or ""
+    return apply_delta(content, row.delta)
+
+
+def list_revisions(session: Session, note_id: int) -> Optional[list]:
+    """病程记录的各版本（版本号、时间、存储字节数），记录不存在时返回 None"""
+    note = _current_note(session, note_id)
+    if note is None:
+        return None
+    rows = _revision_rows(session, note_id)
+    if not rows:
+        content = decompress_value(note.generated_content) or ""
+        return [{"revision": 1, "created_at": note.created_at, "length": len(content),
+                 "stored_bytes": 0}]
+    items = []
+    content = None
+    for row in rows:
+        content = _apply_row(content, row)
+        items.append({
+            "revision": row.revision,
+            "created_at": row.created_at,
+            "length": len(content or ""),
+            "stored_bytes": (row.content_bytes or 0) + (row.delta_bytes or 0),
+        })
+    return items
+
+
+def read_revision(session: Session, note_id: int, revision: int) -> Optional[str]:
+    """还原指定版本的内容，版本不存在时返回 None"""
+    if revision < 1:
+        return None
+    rows = _revision_rows(session, note_id, revision)
+    if not rows:
+        note = _current_note(session, note_id) if revision == 1 else None
+        return None if note is None else decompress_value(note.generated_content) or ""
+    if rows[-1].revision != revision:
+        return None
+    content = None
+    for row in rows:
+        content = _apply_row(content, row)
+    return content
+
+
+def revision_storage(conn: Connection) -> dict:
+    """修订表的行数和存储字节数"""
+    row = conn.exec_driver_sql(
+        f"SELECT COUNT(DISTINCT note_id), COUNT(*), "
+        f"COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0), COALESCE(SUM(LENGTH(delta)), 0) FROM {REVISION_TABLE}"
+    ).one()
+    return {"notes": row[0], "revisions": row[1], "base_bytes": row[2], "delta_bytes": row[3]}
@@ -0,0 +1,320 @@
+"""
+全文检索
+
+患者、病程记录、模板各有一张 FTS5 外部内容表（external content），
+使用 trigram 分词器，中文任意3个字以上的子串都能命中：
+- patients_fts:  住院号、姓名、诊断、主诉
+- notes_fts:     病情记录、生成内容
+- templates_fts: 模板名称、模板内容
+
+索引由源表上的触发器同步维护。病程记录的两列是压缩存储的（见 database.compression），
+notes_fts 的内容表改为解压视图 progress_notes_text，触发器也通过 decompress_text() 取原文。
+
+排序：每类在 FTS 查询中按 rank（bm25）对全部命中排序，相关度相同时较新的在前，
+游标记录 (类别, rank, rowid)，下一页从游标之后接着取。不同 FTS 表的 bm25 取决于各自的
+文档数和长度，不能直接比较，所以结果按类别分组（患者、病程记录、模板），每组内按相关度排序。
+
+trigram 无法匹配不足3个字的词（如两个字的姓名），这类词改用 LIKE 过滤：
+与长词同时出现时作为 MATCH 结果的附加条件；单独出现时只在未压缩的源表（患者、模板）上
+LIKE 查询，病程记录需要逐行解压，全表扫描代价太大，不参与这类检索。
+"""
+import html
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database.compression import SQL_FUNCTION, ensure_sql_function
+from database.pagination import ListSpec, PaginationError, decode_cursor, encode_cursor
+
+TRIGRAM_MIN_LENGTH = 3
+SNIPPET_RADIUS = 40
+HIGHLIGHT_OPEN = "<mark>"
+HIGHLIGHT_CLOSE = "</mark>"
+
+
+@dataclass(frozen=True)
+class SearchSource:
+    """一张被索引的源表"""
+    kind: str
+    fts: str
+    table: str
+    columns: tuple
+    # 压缩存储的列：FTS 从内容视图读取原文（视图名为 <table>_text）
+    compressed: tuple = ()
+
+    @property
+    def content(self) -> str:
+        """FTS 的内容表（有压缩列时为解压视图）"""
+        return f"{self.table}_text" if self.compressed else self.table
+
+    def value(self, row: str, column: str) -> str:
+        """触发器中取列原文的表达式"""
+        if column in self.compressed:
+            return f"{SQL_FUNCTION}({row}.{column})"
+        return f"{row}.{column}"
+
+
+SEARCH_SOURCES = {
+    "patients": SearchSource("patients", "patients_fts", "patients",
+                             ("hospital_number", "name", "diagnosis", "chief_complaint")),
+    "notes": SearchSource("notes", "notes_fts", "progress_notes",
+                          ("daily_condition", "generated_content"),
+                          compressed=("daily_condition", "generated_content")),
+    "templates": SearchSource("templates", "templates_fts", "templates",
+                              ("template_name", "content")),
+}
+
+
+def _trigger_statements(source: SearchSource) -> list:
+    columns = ", ".join(source.columns)
+    new_values = ", ".join(source.value("new", c) for c in source.columns)
+    old_values = ", ".join(source.value("old", c) for c in source.columns)
+    delete_old = (
+        f"INSERT INTO {source.fts}({source.fts}, rowid, {columns}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = f"INSERT INTO {source.fts}(rowid, {columns}) VALUES (new.id, {new_values});"
+    # 压缩列只是换了存储方式（如后台压缩已有数据）时原文不变，不需要重建索引
+    changed = ""
+    if source.compressed:
+        changed = "WHEN " + " OR ".join(
+            f"{source.value('old', c)} IS NOT {source.value('new', c)}" for c in source.columns
+        ) + " "
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {source.fts}_ai AFTER INSERT ON {source.table} "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {source.fts}_ad AFTER DELETE ON {source.table} "
+        f"BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {source.fts}_au AFTER UPDATE OF {columns} ON {source.table} "
+        f"{changed}BEGIN {delete_old} {insert_new} END",
+    ]
+
+
+def create_search_triggers(conn: Connection):
+    """创建同步全文索引的触发器（表重建后也需要调用）"""
+    for source in SEARCH_SOURCES.values():
+        for statement in _trigger_statements(source):
+            conn.exec_driver_sql(statement)
+
+
+def _create_source_index(conn: Connection, source: SearchSource):
+    if source.compressed:
+        values = ", ".join(f"{source.value(source.table, c)} AS {c}" for c in source.columns)
+        conn.exec_driver_sql(
+            f"CREATE VIEW IF NOT EXISTS {source.content} AS SELECT id, {values} FROM {source.table}"
+        )
+    conn.exec_driver_sql(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {source.fts} USING fts5("
+        f"{', '.join(source.columns)}, content='{source.content}', content_rowid='id', "
+        f"tokenize='trigram')"
+    )
+
+
+def create_search_index(conn: Connection):
+    """创建全文索引表和触发器，并从源表重建索引内容"""
+    ensure_sql_function(conn)
+    for source in SEARCH_SOURCES.values():
+        _create_source_index(conn, source)
+    create_search_triggers(conn)
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn: Connection, kinds: Optional[list] = None):
+    """按源表内容重建全文索引（默认全部）"""
+    for kind in kinds or SEARCH_SOURCES:
+        source = SEARCH_SOURCES[kind]
+        conn.exec_driver_sql(f"INSERT INTO {source.fts}({source.fts}) VALUES ('rebuild')")
+
+
+def recreate_search_index(conn: Connection, kind: str):
+    """删除并重新创建一类全文索引（索引定义变化时使用）"""
+    source = SEARCH_SOURCES[kind]
+    ensure_sql_function(conn)
+    for suffix in ("ai", "ad", "au"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {source.fts}_{suffix}")
+    conn.exec_driver_sql(f"DROP TABLE IF EXISTS {source.fts}")
+    if source.compressed:
+        conn.exec_driver_sql(f"DROP VIEW IF EXISTS {source.content}")
+    _create_source_index(conn, source)
+    for statement in _trigger_statements(source):
+        conn.exec_driver_sql(statement)
+    rebuild_search_index(conn, [kind])
+
+
+def split_terms(query: str) -> tuple:
+    """拆分检索词，返回 (可用 MATCH 的长词, 需用 LIKE 的短词)"""
+    terms = list(dict.fromkeys(query.split()))
+    long_terms = [t for t in terms if len(t) >= TRIGRAM_MIN_LENGTH]
+    short_terms = [t for t in terms if len(t) < TRIGRAM_MIN_LENGTH]
+    return long_terms, short_terms
+
+
+def _match_expression(terms: list) -> str:
+    """每个词作为一个短语，多个词之间为 AND"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def _like_pattern(term: str) -> str:
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _like_conditions(columns: tuple, terms: list, prefix: str, params: dict) -> list:
+    """每个短词至少出现在一列中"""
+    conditions = []
+    for i, term in enumerate(terms):
+        name = f"t{i}"
+        params[name] = _like_pattern(term)
+        conditions.append(
+            "(" + " OR ".join(f"{prefix}{c} LIKE :{name} ESCAPE '\\'" for c in columns) + ")"
+        )
+    return conditions
+
+
+def _candidates(session: Session, source: SearchSource, long_terms: list, short_terms: list,
+                limit: int, after: Optional[tuple] = None) -> list:
+    """按相关度返回 (rank, rowid) 在 after 之后的 limit 条命中 [(rank, id)]，rank 越小越相关"""
+    params = {"limit": limit}
+    if long_terms:
+        params["q"] = _match_expression(long_terms)
+        conditions = [f"{source.fts} MATCH :q"]
+        conditions += _like_conditions(source.columns, short_terms, f"{source.fts}.", params)
+        rank, row_id, table = "rank", "rowid", source.fts
+    else:
+        conditions = _like_conditions(source.columns, short_terms, "", params)
+        rank, row_id, table = "0.0", "id", source.table
+    if after is not None:
+        params["after_rank"], params["after_id"] = after
+        conditions.append(f"({rank} > :after_rank OR ({rank} = :after_rank AND {row_id} < :after_id))")
+    sql = (
+        f"SELECT {rank}, {row_id} FROM {table} WHERE {' AND '.join(conditions)} "
+        f"ORDER BY {rank}, {row_id} DESC LIMIT :limit"
+    )
+    return [(rank, row_id) for rank, row_id in session.execute(text(sql), params)]
+
+
+# 前5列固定，其余列用于生成摘要
+_DETAIL_QUERIES = {
+    "patients": (
+        "SELECT p.id, p.hospital_number, p.name AS patient_name, p.admission_date AS record_date, "
+        "p.name AS title, p.diagnosis, p.chief_complaint "
+        "FROM patients p WHERE p.id IN :ids"
+    ),
+    "notes": (
+        "SELECT n.id, n.hospital_number, p.name AS patient_name, n.record_date, "
+        "n.record_type AS title, decompress_text(n.daily_condition), decompress_text(n.generated_content) "
+        "FROM progress_notes n LEFT JOIN patients p ON p.id = n.patient_id WHERE n.id IN :ids"
+    ),
+    "templates": (
+        "SELECT t.id, NULL AS hospital_number, NULL AS patient_name, NULL AS record_date, "
+        "t.template_name AS title, t.content "
+        "FROM templates t WHERE t.id IN :ids"
+    ),
+}
+
+
+def highlight(value: str, pattern: re.Pattern) -> str:
+    """转义HTML并用 <mark> 标记命中的词"""
+    parts = []
+    position = 0
+    for match in pattern.finditer(value):
+        parts.append(html.escape(value[position:match.start()]))
+        parts.append(HIGHLIGHT_OPEN + html.escape(match.group()) + HIGHLIGHT_CLOSE)
+        position = match.end()
+    parts.append(html.escape(value[position:]))
+    return "".join(parts)
+
+
+def make_snippet(texts: list, pattern: re.Pattern, radius: int = SNIPPET_RADIUS) -> str:
+    """取第一处命中前后 radius 个字作为摘要并高亮"""
+    for value in texts:
+        if not value:
+            continue
+        match = pattern.search(value)
+        if match is None:
+            continue
+        start = max(0, match.start() - radius)
+        end = min(len(value), match.end() + radius)
+        snippet = highlight(value[start:end], pattern)
+        return ("…" if start > 0 else "") + snippet + ("…" if end < len(value) else "")
+    first = next((value for value in texts if value), "")
+    return html.escape(first[:radius * 2]) + ("…" if len(first) > radius * 2 else "")
+
+
+# 检索结果的游标：(类别, rank, rowid)
+SEARCH_LIST = ListSpec(columns=("kind", "rank", "id"), keys=("kind", "rank", "id"),
+                       descending=False, summary=())
+
+
+def search(session: Session, query: str, kinds: Optional[list] = None,
+           limit: int = 20, cursor: Optional[str] = None) -> dict:
+    """全文检索
+
+    Args:
+        query: 检索词，空格分隔的多个词之间为 AND
+        kinds: 检索范围（patients / notes / templates），默认全部；结果按此顺序分组
+        limit, cursor: 分页，cursor 为上一页返回的 next_cursor
+
+    Returns:
+        {"items": [...], "next_cursor": 下一页游标或 None}，每组内按相关度排序
+
+    Raises:
+        PaginationError: 游标无效
+    """
+    after = decode_cursor(cursor, SEARCH_LIST) if cursor else None
+    long_terms, short_terms = split_terms(query)
+    sources = [SEARCH_SOURCES[kind] for kind in (kinds or SEARCH_SOURCES)]
+    if not long_terms:
+        # 只有短词时不扫描压缩存储的病程记录
+        sources = [source for source in sources if not source.compressed]
+    if not sources or (not long_terms and not short_terms):
+        return {"items": [], "next_cursor": None}
+
+    # 从游标所在的类别接着取，多取一条判断是否还有下一页
+    if after is not None:
+        kinds_in_order = [source.kind for source in sources]
+        if after[0] not in kinds_in_order:
+            raise PaginationError("无效的分页游标")
+        sources = sources[kinds_in_order.index(after[0]):]
+    ranked = []
+    for source in sources:
+        source_after = after[1:] if after is not None and after[0] == source.kind else None
+        ranked.extend((rank, source.kind, row_id) for rank, row_id in _candidates(
+            session, source, long_terms, short_terms, limit + 1 - len(ranked), source_after))
+        if len(ranked) > limit:
+            break
+    page = ranked[:limit]
+    next_cursor = None
+    if len(ranked) > limit:
+        rank, kind, row_id = page[-1]
+        next_cursor = encode_cursor([kind, rank, row_id])
+
+    terms = sorted(long_terms + short_terms, key=len, reverse=True)
+    pattern = re.compile("|".join(re.escape(term) for term in terms), re.IGNORECASE)
+    details = {}
+    for kind in {kind for _, kind, _ in page}:
+        ids = [row_id for _, k, row_id in page if k == kind]
+        stmt = text(_DETAIL_QUERIES[kind]).bindparams(bindparam("ids", expanding=True))
+        for row in session.execute(stmt, {"ids": ids}):
+            details[(kind, row.id)] = row
+
+    items = []
+    for rank, kind, row_id in page:
+        row = details.get((kind, row_id))
+        if row is None:
+            continue
+        texts = [row[i] for i in range(5, len(row))]
+        items.append({
+            "kind": kind,
+            "id": row.id,
+            "hospital_number": row.hospital_number,
+            "patient_name": row.patient_name,
+            "record_date": row.record_date,
+            "title": highlight(row.title or "", pattern),
+            "snippet": make_snippet(texts, pattern),
+            "rank": rank,
+        })
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,314 @@
+"""
+患者统计表
+
+patient_stats 为每位患者保存一行汇总数据，由 patients / progress_notes / reminders
+上的触发器增量维护，数据统计页和患者卡片读取时只需按患者扫描，不再聚合子表：
+- note_count:        病程记录条数
+- note_days:         有病程记录的天数（同一天多条记录算一天）
+- round_days:        应记录日（查房日，见 is_round_day）中已有记录的天数
+- first_note_date / last_note_date: 最早、最近一条病程记录的日期
+- pending_reminders: 未完成的提醒数（包括预先生成的今天以后的提醒，读取时减去，见 read_patient_stats）
+
+触发器只做加减；删除记录后的最早、最近日期通过 (patient_id, record_date) 索引重新取得。
+修改入院日期时应记录日全部变化，此时按该患者的记录重新计算一行。
+触发器之外的写入（如直接修改数据库文件）可能使统计表失准，
+用 check_patient_stats 校验，必要时重建。
+
+用法: python -m database.stats [--db ./rehab_assistant.db] [--rebuild]
+"""
+import argparse
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+STATS_TABLE = "patient_stats"
+
+STATS_COLUMNS = ("patient_id", "note_count", "note_days", "round_days",
+                 "first_note_date", "last_note_date", "pending_reminders")
+
+
+def is_round_day(day: int) -> bool:
+    """住院第 day 天是否应有查房记录
+
+    与前端时间轴的规则一致：第2、3天，从第6天起每3天一次（每30天的阶段小结也在其中）
+    """
+    return day in (2, 3) or (day >= 6 and day % 3 == 0)
+
+
+def expected_round_days(days_in_hospital: int) -> int:
+    """住院 days_in_hospital 天内应有查房记录的天数"""
+    return int(days_in_hospital >= 2) + int(days_in_hospital >= 3) + max(0, days_in_hospital // 3 - 1)
+
+
+def _day_number(record_date: str, admission_date: str) -> str:
+    return f"(CAST(julianday({record_date}) - julianday({admission_date}) AS INTEGER) + 1)"
+
+
+def round_day_condition(day: str) -> str:
+    """is_round_day 的 SQL 版本，day 为住院第几天的 SQL 表达式"""
+    return f"({day} IN (2, 3) OR ({day} >= 6 AND {day} % 3 = 0))"
+
+
+def _flag(condition: str) -> str:
+    # 条件中的值可能为 NULL，统一转成 0/1 以免加减结果变成 NULL
+    return f"(CASE WHEN {condition} THEN 1 ELSE 0 END)"
+
+
+# 按子表重新计算统计行，{where} 为 patients p 上的过滤条件
+_AGGREGATE_SQL = f"""
+    SELECT p.id AS patient_id,
+           (SELECT count(*) FROM progress_notes n WHERE n.patient_id = p.id) AS note_count,
+           (SELECT count(DISTINCT n.record_date) FROM progress_notes n
+             WHERE n.patient_id = p.id) AS note_days,
+           (SELECT count(DISTINCT n.record_date) FROM progress_notes n
+             WHERE n.patient_id = p.id
+               AND {round_day_condition(_day_number('n.record_date', 'p.admission_date'))}) AS round_days,
+           (SELECT min(n.record_date) FROM progress_notes n WHERE n.patient_id = p.id) AS first_note_date,
+           (SELECT max(n.record_date) FROM progress_notes n WHERE n.patient_id = p.id) AS last_note_date,
+           (SELECT count(*) FROM reminders r
+             WHERE r.patient_id = p.id AND COALESCE(r.is_completed, 0) = 0) AS pending_reminders
+    FROM patients p WHERE {{where}}
+"""
+
+
+def _refresh_patient(patient_id: str) -> str:
+    return (f"INSERT OR REPLACE INTO {STATS_TABLE} ({', '.join(STATS_COLUMNS)}) "
+            + _AGGREGATE_SQL.format(where=f"p.id = {patient_id}") + ";")
+
+
+def _note_added(ref: str) -> str:
+    """ref 行加入后更新统计（ref 为 new）"""
+    first_of_day = (f"NOT EXISTS (SELECT 1 FROM progress_notes WHERE patient_id = {ref}.patient_id "
+                    f"AND record_date = {ref}.record_date AND id != {ref}.id)")
+    admission = f"(SELECT admission_date FROM patients WHERE id = {ref}.patient_id)"
+    round_day = round_day_condition(_day_number(f"{ref}.record_date", admission))
+    return f"""
+        UPDATE {STATS_TABLE} SET
+            note_count = note_count + 1,
+            note_days = note_days + {_flag(first_of_day)},
+            round_days = round_days + {_flag(f'{first_of_day} AND {round_day}')},
+            first_note_date = CASE WHEN first_note_date IS NULL OR {ref}.record_date < first_note_date
+                                   THEN {ref}.record_date ELSE first_note_date END,
+            last_note_date = CASE WHEN last_note_date IS NULL OR {ref}.record_date > last_note_date
+                                  THEN {ref}.record_date ELSE last_note_date END
+        WHERE patient_id = {ref}.patient_id;
+    """
+
+
+def _note_removed(ref: str) -> str:
+    """ref 行移除后更新统计（ref 为 old）"""
+    last_of_day = (f"NOT EXISTS (SELECT 1 FROM progress_notes WHERE patient_id = {ref}.patient_id "
+                   f"AND record_date = {ref}.record_date)")
+    admission = f"(SELECT admission_date FROM patients WHERE id = {ref}.patient_id)"
+    round_day = round_day_condition(_day_number(f"{ref}.record_date", admission))
+    return f"""
+        UPDATE {STATS_TABLE} SET
+            note_count = note_count - 1,
+            note_days = note_days - {_flag(last_of_day)},
+            round_days = round_days - {_flag(f'{last_of_day} AND {round_day}')},
+            first_note_date = (SELECT min(record_date) FROM progress_notes WHERE patient_id = {ref}.patient_id),
+            last_note_date = (SELECT max(record_date) FROM progress_notes WHERE patient_id = {ref}.patient_id)
+        WHERE patient_id = {ref}.patient_id;
+    """
+
+
+def _pending(ref: str) -> str:
+    return _flag(f"COALESCE({ref}.is_completed, 0) = 0")
+
+
+_TRIGGERS = {
+    "patient_stats_patient_ai": f"AFTER INSERT ON patients BEGIN {_refresh_patient('new.id')} END",
+    "patient_stats_patient_ad": (
+        f"AFTER DELETE ON patients BEGIN DELETE FROM {STATS_TABLE} WHERE patient_id = old.id; END"
+    ),
+    "patient_stats_patient_au": (
+        f"AFTER UPDATE OF id, admission_date ON patients BEGIN "
+        f"DELETE FROM {STATS_TABLE} WHERE patient_id = old.id; {_refresh_patient('new.id')} END"
+    ),
+    "patient_stats_note_ai": f"AFTER INSERT ON progress_notes BEGIN {_note_added('new')} END",
+    "patient_stats_note_ad": f"AFTER DELETE ON progress_notes BEGIN {_note_removed('old')} END",
+    "patient_stats_note_au": (
+        "AFTER UPDATE OF patient_id, record_date ON progress_notes "
+        "WHEN old.patient_id IS NOT new.patient_id OR old.record_date IS NOT new.record_date "
+        f"BEGIN {_note_removed('old')} {_note_added('new')} END"
+    ),
+    "patient_stats_reminder_ai": (
+        f"AFTER INSERT ON reminders BEGIN UPDATE {STATS_TABLE} "
+        f"SET pending_reminders = pending_reminders + {_pending('new')} WHERE patient_id = new.patient_id; END"
+    ),
+    "patient_stats_reminder_ad": (
+        f"AFTER DELETE ON reminders BEGIN UPDATE {STATS_TABLE} "
+        f"SET pending_reminders = pending_reminders - {_pending('old')} WHERE patient_id = old.patient_id; END"
+    ),
+    "patient_stats_reminder_au": (
+        f"AFTER UPDATE OF patient_id, is_completed ON reminders BEGIN "
+        f"UPDATE {STATS_TABLE} SET pending_reminders = pending_reminders - {_pending('old')} "
+        f"WHERE patient_id = old.patient_id; "
+        f"UPDATE {STATS_TABLE} SET pending_reminders = pending_reminders + {_pending('new')} "
+        f"WHERE patient_id = new.patient_id; END"
+    ),
+}
+
+
+def create_stats_triggers(conn: Connection):
+    """创建维护统计表的触发器（表重建后也需要调用）"""
+    for name, body in _TRIGGERS.items():
+        conn.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def create_stats_table(conn: Connection):
+    """创建统计表和触发器，并按现有数据填充"""
+    conn.exec_driver_sql(f"""
+        CREATE TABLE IF NOT EXISTS {STATS_TABLE} (
+            patient_id INTEGER PRIMARY KEY,
+            note_count INTEGER NOT NULL DEFAULT 0,
+            note_days INTEGER NOT NULL DEFAULT 0,
+            round_days INTEGER NOT NULL DEFAULT 0,
+            first_note_date DATE,
+            last_note_date DATE,
+            pending_reminders INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    create_stats_triggers(conn)
+    rebuild_patient_stats(conn)
+
+
+def rebuild_patient_stats(conn: Connection):
+    """按子表重新计算全部统计行"""
+    conn.exec_driver_sql(f"DELETE FROM {STATS_TABLE}")
+    conn.exec_driver_sql(
+        f"INSERT INTO {STATS_TABLE} ({', '.join(STATS_COLUMNS)}) " + _AGGREGATE_SQL.format(where="1")
+    )
+
+
+@dataclass
+class StatsCheckResult:
+    """统计表校验结果"""
+    checked: int = 0
+    # 统计行与子表实际数据不一致的患者ID（含缺失、多余的行）
+    mismatched: list = field(default_factory=list)
+    rebuilt: bool = False
+
+    def to_dict(self) -> dict:
+        return {"checked": self.checked, "mismatched": self.mismatched, "rebuilt": self.rebuilt}
+
+
+def check_patient_stats(conn: Connection, rebuild: bool = False) -> StatsCheckResult:
+    """对比统计表与子表的实际聚合结果
+
+    Args:
+        rebuild: 发现不一致时重建整张统计表
+    """
+    columns = ", ".join(STATS_COLUMNS)
+    live = _AGGREGATE_SQL.format(where="1")
+    stored = f"SELECT {columns} FROM {STATS_TABLE}"
+    mismatched = conn.exec_driver_sql(f"""
+        SELECT patient_id FROM ({live} EXCEPT {stored})
+        UNION
+        SELECT patient_id FROM ({stored} EXCEPT {live})
+        ORDER BY patient_id
+    """).scalars().all()
+    result = StatsCheckResult(
+        checked=conn.exec_driver_sql("SELECT count(*) FROM patients").scalar(),
+        mismatched=list(mismatched),
+    )
+    if mismatched and rebuild:
+        rebuild_patient_stats(conn)
+        result.rebuilt = True
+    return result
+
+
+def _days_in_hospital(admission_date: date, discharge_date: Optional[date], today: date) -> int:
+    end = discharge_date or today
+    return max(0, (end - admission_date).days + 1)
+
+
+def read_patient_stats(session: Session, include_discharged: bool = False,
+                       today: Optional[date] = None) -> dict:
+    """读取数据统计页的汇总数据和每位患者的统计
+
+    只读取 patients 和 patient_stats 两张表，耗时与患者数成正比，与病程记录数无关。
+    应记录天数按住院天数计算（出院患者截至出院日），缺失天数 = 应记录 - 已记录。
+    待办提醒只计到今天：统计表中的未完成数减去预先生成的今天以后的提醒
+    （按 (is_completed, reminder_date) 索引只读取今天以后的部分）。
+    """
+    today = today or date.today()
+    sql = f"""
+        SELECT p.id, p.hospital_number, p.name, p.admission_date, p.discharge_date,
+               COALESCE(s.note_count, 0) AS note_count, COALESCE(s.round_days, 0) AS round_days,
+               s.last_note_date,
+               COALESCE(s.pending_reminders, 0) - COALESCE(f.upcoming, 0) AS pending_reminders
+        FROM patients p LEFT JOIN {STATS_TABLE} s ON s.patient_id = p.id
+        LEFT JOIN (
+            SELECT patient_id, COUNT(*) AS upcoming FROM reminders
+            WHERE is_completed = 0 AND reminder_date > :today GROUP BY patient_id
+        ) f ON f.patient_id = p.id
+    """
+    if not include_discharged:
+        sql += " WHERE p.discharge_date IS NULL"
+    sql += " ORDER BY p.admission_date DESC, p.id DESC"
+
+    patients = []
+    for row in session.execute(text(sql), {"today": today.isoformat()}):
+        admission = date.fromisoformat(row.admission_date)
+        discharge = date.fromisoformat(row.discharge_date) if row.discharge_date else None
+        days = _days_in_hospital(admission, discharge, today)
+        expected = expected_round_days(days)
+        recorded = min(row.round_days, expected)
+        patients.append({
+            "patient_id": row.id,
+            "hospital_number": row.hospital_number,
+            "name": row.name,
+            "admission_date": row.admission_date,
+            "discharge_date": row.discharge_date,
+            "days_in_hospital": days,
+            "note_count": row.note_count,
+            "last_note_date": row.last_note_date,
+            "expected_records": expected,
+            "recorded_records": recorded,
+            "missing_records": expected - recorded,
+            "pending_reminders": row.pending_reminders,
+        })
+
+    expected_total = sum(item["expected_records"] for item in patients)
+    recorded_total = sum(item["recorded_records"] for item in patients)
+    summary = {
+        "patient_count": len(patients),
+        "in_hospital_count": sum(1 for item in patients if item["discharge_date"] is None),
+        "note_count": sum(item["note_count"] for item in patients),
+        "expected_records": expected_total,
+        "recorded_records": recorded_total,
+        "missing_records": expected_total - recorded_total,
+        "completion_rate": round(recorded_total / expected_total, 4) if expected_total else 1.0,
+        "pending_reminders": sum(item["pending_reminders"] for item in patients),
+    }
+    return {"summary": summary, "patients": patients}
+
+
+def main():
+    from database import DBManager
+
+    parser = argparse.ArgumentParser(description="校验患者统计表，必要时重建")
+    parser.add_argument("--db", default="./rehab_assistant.db", help="数据库文件路径")
+    parser.add_argument("--rebuild", action="store_true", help="发现不一致时重建统计表")
+    args = parser.parse_args()
+
+    db = DBManager(args.db)
+    try:
+        result = db.check_stats(rebuild=args.rebuild)
+    finally:
+        db.close()
+
+    print(f"已校验 {result.checked} 位患者，不一致 {len(result.mismatched)} 位")
+    if result.mismatched:
+        print(f"  患者ID: {', '.join(str(i) for i in result.mismatched)}")
+    if result.rebuilt:
+        print("  统计表已重建")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+模板使用次数写缓冲
+
+每次点击快捷语句都会调用 POST /api/templates/{id}/use，原来每次点击都是一个完整的写事务。
+这里先在内存中累加各模板的使用次数，再用一个事务批量写入：
+- 定时写入：后端启动后每 flush_interval_seconds 秒 flush 一次（见 backend.api_main）
+- 达到阈值：累计的点击数达到 flush_threshold 时立即提交到写入队列，不等待结果
+- 关闭时写入：DBManager.close() 在停止写入队列之前 flush
+
+写入失败时这批计数放回缓冲区，下次 flush 时重试。进程异常退出时最多丢失一个间隔内的计数。
+缓冲区对象放在会话的 info 中（键为 USAGE_INFO_KEY），路由通过 session.info 取得。
+"""
+import threading
+from collections import Counter
+from typing import Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session
+
+from database.models import Template
+
+USAGE_INFO_KEY = "template_usage"
+
+DEFAULT_FLUSH_THRESHOLD = 100
+
+
+def _apply_increments(session: Session, increments: dict):
+    """一条 UPDATE 语句按模板ID批量累加（executemany）"""
+    stmt = (
+        update(Template.__table__)
+        .where(Template.__table__.c.id == bindparam("template_id"))
+        .values(usage_count=Template.__table__.c.usage_count + bindparam("increment"))
+    )
+    session.execute(stmt, [{"template_id": template_id, "increment": count}
+                           for template_id, count in increments.items()])
+
+
+class UsageCounterBuffer:
+    """按模板ID累加使用次数，批量写入数据库
+
+    writer 在 DBManager 创建写入队列后赋值。
+    """
+
+    def __init__(self, flush_threshold: int = DEFAULT_FLUSH_THRESHOLD):
+        self.flush_threshold = flush_threshold
+        self.writer = None
+        self._pending = Counter()
+        self._total = 0
+        self._lock = threading.Lock()
+        self._stats = {"increments": 0, "flushes": 0, "flushed_rows": 0, "failed_flushes": 0}
+
+    def add(self, template_id: int, count: int = 1) -> int:
+        """累加使用次数，返回该模板尚未写入的次数"""
+        with self._lock:
+            self._pending[template_id] += count
+            self._total += count
+            self._stats["increments"] += count
+            pending = self._pending[template_id]
+            reached = self._total >= self.flush_threshold
+        if reached:
+            self.flush(wait=False)
+        return pending
+
+    def pending(self, template_id: int) -> int:
+        """该模板尚未写入数据库的次数"""
+        with self._lock:
+            return self._pending.get(template_id, 0)
+
+    def flush(self, wait: bool = True) -> int:
+        """把累计的次数提交到写入队列，返回涉及的模板数
+
+        Args:
+            wait: 是否等待写入完成（定时任务和关闭时为 True，达到阈值时为 False）
+        """
+        with self._lock:
+            if not self._pending:
+                return 0
+            increments = dict(self._pending)
+            self._pending.clear()
+            self._total = 0
+
+        try:
+            future = self.writer.submit(_apply_increments, increments)
+        except Exception:
+            self._restore(increments)
+            raise
+        future.add_done_callback(lambda f: self._finished(f, increments))
+        if wait:
+            future.result()
+        return len(increments)
+
+    def _finished(self, future, increments: dict):
+        if future.exception() is not None:
+            self._restore(increments)
+            return
+        with self._lock:
+            self._stats["flushes"] += 1
+            self._stats["flushed_rows"] += len(increments)
+
+    def _restore(self, increments: dict):
+        """写入失败，把计数放回缓冲区"""
+        with self._lock:
+            self._pending.update(increments)
+            self._total += sum(increments.values())
+            self._stats["failed_flushes"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "pending": self._total}
+
+
+def record_template_use(session: Session, template_id: int) -> Optional[int]:
+    """记录一次模板使用，返回包含未写入部分的使用次数；模板不存在时返回 None"""
+    stored = session.execute(
+        Template.__table__.select().with_only_columns(Template.__table__.c.usage_count)
+        .where(Template.__table__.c.id == template_id)
+    ).scalar_one_or_none()
+    if stored is None:
+        return None
+    buffer: UsageCounterBuffer = session.info[USAGE_INFO_KEY]
+    return (stored or 0) + buffer.add(template_id)
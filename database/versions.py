@@ -0,0 +1,91 @@
+"""
+数据版本号
+
+每张表一个进程内的版本计数器，事务提交后递增被写入的表，供条件 GET
+（backend.api.conditional）生成 ETag：版本号不变说明数据没有变化，
+可以不查询数据库直接返回 304。
+
+写入的表从实际执行的 SQL 中识别（INSERT/UPDATE/DELETE/REPLACE 的目标表），
+因此 ORM 写入、Core DML 和 exec_driver_sql 都会被计入；归档库中的同名表
+（archive.patients 等）计入同一张表。触发器、外键级联间接修改的表不会计入，
+依赖这些表的接口需要同时依赖触发源表（例如病程记录接口同时依赖 patients）。
+
+递增发生在提交之后：提交前递增的话，并发读取可能用新版本号缓存旧数据。
+SQLAlchemy 没有连接提交之后的事件，提交时先把写入的表记在连接上，连接归还连接池时
+（提交已完成）再递增。会话提交（写入队列）和直接在 Connection 上提交
+（engine.begin()、迁移、维护脚本）走同一条路径；连接提交后继续使用时，
+递增推迟到归还连接池时。
+"""
+import re
+import threading
+import uuid
+from typing import Iterable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+VERSIONS_INFO_KEY = "data_versions"
+_PENDING_INFO_KEY = "_data_versions_pending"
+_COMMITTED_INFO_KEY = "_data_versions_committed"
+
+_DML_TABLE = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)"
+    r"\s+(?:[\"`]?\w+[\"`]?\.)?[\"`]?(\w+)",
+    re.IGNORECASE,
+)
+
+
+def written_table(statement: str):
+    """SQL 语句写入的表名，不是写语句时返回 None"""
+    match = _DML_TABLE.match(statement)
+    return match.group(1).lower() if match else None
+
+
+class DataVersions:
+    """线程安全的按表版本计数器"""
+
+    def __init__(self):
+        # 进程重启后计数器归零，ETag 中带上实例标识，避免和重启前的 ETag 相同
+        self.epoch = uuid.uuid4().hex[:8]
+        self._versions: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def bump(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def get(self, tables: Iterable[str]) -> tuple:
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"epoch": self.epoch, "tables": dict(self._versions)}
+
+
+def track_data_versions(engine: Engine, versions: DataVersions):
+    """在引擎上记录每个事务写入的表，提交后递增 versions"""
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_written_table(conn, cursor, statement, parameters, context, executemany):
+        table = written_table(statement)
+        if table is not None:
+            conn.info.setdefault(_PENDING_INFO_KEY, set()).add(table)
+
+    @event.listens_for(engine, "commit")
+    def _mark_committed(conn):
+        tables = conn.info.pop(_PENDING_INFO_KEY, None)
+        if tables:
+            conn.info.setdefault(_COMMITTED_INFO_KEY, set()).update(tables)
+
+    @event.listens_for(engine, "rollback")
+    def _discard_on_rollback(conn):
+        conn.info.pop(_PENDING_INFO_KEY, None)
+
+    # conn.info 即连接池记录的 info，归还时提交已经完成
+    @event.listens_for(engine, "checkin")
+    def _bump_on_checkin(dbapi_connection, connection_record):
+        tables = connection_record.info.pop(_COMMITTED_INFO_KEY, None)
+        if tables:
+            versions.bump(tables)
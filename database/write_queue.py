@@ -0,0 +1,200 @@
+"""
+单写入者队列
+
+SQLite同一时间只允许一个写事务，多个连接同时提交只会互相争抢文件锁，
+最终抛出 "database is locked"。WriteQueue 用一个专用线程和一条专用连接
+串行执行所有写操作：调用方把写函数放入有界队列，写线程每次取出一批，
+每个写函数在各自的 SAVEPOINT 中执行，整批只提交一次（group commit）。
+
+写函数的签名为 func(session, *args, **kwargs)，只能 flush，不能 commit；
+整批提交成功后才会把返回值交给调用方。
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+
+class WriteQueueFullError(RuntimeError):
+    """写入队列已满"""
+
+
+_STOP = object()
+
+
+class WriteQueue:
+    """单写入者队列，串行执行写操作并批量提交"""
+
+    def __init__(self, engine: Engine, max_queue_size: int = 1000, max_batch_size: int = 64,
+                 session_info: Optional[dict] = None):
+        """
+        Args:
+            engine: 写入专用引擎（连接池大小应为1）
+            max_queue_size: 队列容量，队列满时新的写请求立即失败
+            max_batch_size: 每次提交最多合并的写操作数
+            session_info: 写入会话的 info 字典初始内容
+        """
+        self.engine = engine
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._session_factory = sessionmaker(bind=engine, expire_on_commit=False, info=session_info)
+
+        # pysqlite 不会在 SAVEPOINT 之前自动开启事务，这里显式 BEGIN IMMEDIATE，
+        # 既保证 SAVEPOINT 语义正确，又在事务开始时就拿到写锁
+        @event.listens_for(engine, "connect")
+        def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+            dbapi_connection.isolation_level = None
+
+        @event.listens_for(engine, "begin")
+        def _begin_immediate(conn):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+        self._lock = threading.Lock()
+        self._stats = {
+            "submitted": 0,
+            "rejected": 0,
+            "completed": 0,
+            "failed": 0,
+            "batches": 0,
+            "commit_seconds_total": 0.0,
+            "commit_seconds_max": 0.0,
+            "commit_seconds_last": 0.0,
+        }
+
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> Future:
+        """提交写操作，返回在整批提交后完成的 Future
+
+        Raises:
+            WriteQueueFullError: 队列已满
+            RuntimeError: 写入队列已停止
+        """
+        if self._stopped:
+            raise RuntimeError("写入队列已停止")
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((func, args, kwargs, future))
+        except queue.Full:
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise WriteQueueFullError(f"写入队列已满（容量 {self.max_queue_size}）")
+        with self._lock:
+            self._stats["submitted"] += 1
+        return future
+
+    def execute(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """同步执行写操作并等待结果"""
+        return self.submit(func, *args, **kwargs).result()
+
+    def stop(self):
+        """处理完已入队的写操作后停止写线程"""
+        self._stopped = True
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def metrics(self) -> dict:
+        """队列深度与提交延迟统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self.max_queue_size,
+            "submitted": stats["submitted"],
+            "rejected": stats["rejected"],
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "batches": batches,
+            "avg_batch_size": round(stats["completed"] / batches, 2) if batches else 0.0,
+            "commit_latency_ms": {
+                "avg": round(stats["commit_seconds_total"] / batches * 1000, 3) if batches else 0.0,
+                "max": round(stats["commit_seconds_max"] * 1000, 3),
+                "last": round(stats["commit_seconds_last"] * 1000, 3),
+            },
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            stop_after_batch = False
+            while len(batch) < self.max_batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop_after_batch = True
+                    break
+                batch.append(item)
+
+            self._execute_batch(batch)
+            if stop_after_batch:
+                return
+
+    def _execute_batch(self, batch: list):
+        outcomes = []
+        session = self._session_factory()
+        try:
+            for func, args, kwargs, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                savepoint = session.begin_nested()
+                try:
+                    result = func(session, *args, **kwargs)
+                    session.flush()
+                    savepoint.commit()
+                    outcomes.append((future, result, None))
+                except BaseException as exc:
+                    savepoint.rollback()
+                    outcomes.append((future, None, exc))
+
+            start = time.perf_counter()
+            session.commit()
+            elapsed = time.perf_counter() - start
+        except BaseException as exc:
+            session.rollback()
+            # 整批提交失败：所有尚未失败的写操作都以该异常结束
+            handled = {future for future, _, _ in outcomes}
+            outcomes = [
+                (future, None, error if error is not None else exc)
+                for future, _, error in outcomes
+            ] + [
+                (future, None, exc)
+                for _, _, _, future in batch
+                if future not in handled and not future.done()
+            ]
+            elapsed = None
+        finally:
+            session.close()
+
+        with self._lock:
+            if elapsed is not None:
+                self._stats["batches"] += 1
+                self._stats["commit_seconds_total"] += elapsed
+                self._stats["commit_seconds_max"] = max(self._stats["commit_seconds_max"], elapsed)
+                self._stats["commit_seconds_last"] = elapsed
+            for _, _, error in outcomes:
+                if error is None:
+                    self._stats["completed"] += 1
+                else:
+                    self._stats["failed"] += 1
+
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
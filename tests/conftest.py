@@ -0,0 +1,71 @@
+"""
+测试公共夹具
+
+- make_db_manager：在 tmp_path 中创建临时数据库的工厂，测试结束后关闭（目录由 pytest 清理）
+- db_manager：空的临时数据库；各测试文件用同名夹具覆盖，只写入自己的测试数据
+- api：通过 httpx.ASGITransport 直接调用 FastAPI 应用（不启动服务器），数据库为 db_manager
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from database import DBManager
+
+
+@pytest.fixture
+def make_db_manager(tmp_path):
+    """make_db_manager(archive=False, **kwargs)：创建 tmp_path/test.db，archive 为 True 时挂载 tmp_path/archive.db"""
+    created = []
+
+    def make(archive: bool = False, **kwargs) -> DBManager:
+        if archive:
+            kwargs.setdefault("archive_path", str(tmp_path / "archive.db"))
+        db = DBManager(str(tmp_path / "test.db"), **kwargs)
+        created.append(db)
+        return db
+
+    yield make
+    for db in created:
+        db.close()
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    return make_db_manager()
+
+
+class ApiClient:
+    """在测试数据库上调用接口"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def run(self, scenario):
+        """运行 async scenario(client) 并返回其结果"""
+        from backend.api_main import app
+
+        app.state.db_manager = self.db
+
+        async def main():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await scenario(client)
+
+        return asyncio.run(main())
+
+    def request_all(self, requests) -> list:
+        """依次发出 (方法, 路径, httpx 参数) 请求，返回响应列表"""
+        async def scenario(client):
+            return [await client.request(method, path, **kwargs) for method, path, kwargs in requests]
+
+        return self.run(scenario)
+
+    def get_all(self, paths) -> list:
+        """依次 GET 各路径，返回响应列表"""
+        return self.request_all([("GET", path, {}) for path in paths])
+
+
+@pytest.fixture
+def api(db_manager):
+    return ApiClient(db_manager)
@@ -0,0 +1,171 @@
+"""
+出院患者归档测试
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from database import readers
+from database.archive import restore_patient
+from database.pagination import PageRequest
+from database.revisions import list_revisions, read_revision
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """带归档库的临时数据库：一位在院患者、一位近期出院、一位一年前出院"""
+    db = make_db_manager(archive=True, archive_after_days=365)
+    today = date.today()
+    for hospital_number, admitted, discharged in [
+        ("ARC001", today - timedelta(days=5), None),
+        ("ARC002", today - timedelta(days=40), today - timedelta(days=10)),
+        ("ARC003", today - timedelta(days=500), today - timedelta(days=400)),
+    ]:
+        patient_id = db.add_patient({"hospital_number": hospital_number, "name": hospital_number,
+                                     "admission_date": admitted, "discharge_date": discharged})
+        for day in range(3):
+            db.add_progress_note({"patient_id": patient_id, "hospital_number": hospital_number,
+                                  "record_date": admitted + timedelta(days=day), "day_number": day + 1,
+                                  "record_type": "日常病程"})
+        db.add_reminder({"patient_id": patient_id, "hospital_number": hospital_number,
+                         "reminder_type": "复查", "reminder_date": admitted,
+                         "description": "复查", "priority": "中"})
+    return db
+
+
+def count(db, sql):
+    with db.ReadSession() as session:
+        return session.execute(text(sql)).scalar()
+
+
+def test_archive_moves_old_discharged_patients_with_children(db_manager):
+    """测试归档只移动出院超过期限的患者，并连同子表记录一起移动"""
+    assert db_manager.lookup_patient("ARC003") is not None
+
+    result = db_manager.archive_discharged(365)
+
+    assert result.patients == 1
+    assert result.rows == {"progress_notes": 3, "reminders": 1, "rehab_plans": 0, "rehab_progress": 0,
+                           "note_revisions": 0}
+    assert count(db_manager, "SELECT count(*) FROM main.patients") == 2
+    assert count(db_manager, "SELECT count(*) FROM main.progress_notes") == 6
+    assert count(db_manager, "SELECT count(*) FROM archive.patients") == 1
+    # 归档库中的子表指向归档后的患者ID
+    assert count(db_manager, """
+        SELECT count(*) FROM archive.progress_notes n
+        JOIN archive.patients p ON p.id = n.patient_id WHERE p.hospital_number = 'ARC003'
+    """) == 3
+    assert db_manager.lookup_patient("ARC003") is None
+
+    # 再次执行不会重复归档
+    assert db_manager.archive_discharged(365).patients == 0
+
+
+def test_patient_list_reads_across_both_files(db_manager):
+    """测试包含出院患者的列表同时读取主库和归档库"""
+    db_manager.archive_discharged(365)
+
+    with db_manager.ReadSession() as session:
+        active = readers.page_patients(session, PageRequest()).items
+        everyone = readers.page_patients(session, PageRequest(), include_discharged=True).items
+        searched = readers.page_patients(session, PageRequest(), include_discharged=True, search="ARC003").items
+
+    assert [row["hospital_number"] for row in active] == ["ARC001"]
+    assert [(row["hospital_number"], row["archived"]) for row in everyone] == [
+        ("ARC001", False), ("ARC002", False), ("ARC003", True)
+    ]
+    assert [row["hospital_number"] for row in searched] == ["ARC003"]
+
+
+def test_patient_pages_with_colliding_ids(db_manager):
+    """测试主库和归档库中入院日期、ID都相同的患者分页时既不漏行也不重复"""
+    db_manager.archive_discharged(365)
+    with db_manager.ReadSession() as session:
+        archived_row = readers.find_archived_patient(session, "ARC003")
+    # 主库中ID相同的患者改为同一天入院
+    with db_manager.engine.begin() as conn:
+        conn.execute(text("UPDATE main.patients SET admission_date = :day WHERE id = :id"),
+                     {"day": archived_row.admission_date.isoformat(), "id": archived_row.id})
+
+    seen, cursor = [], None
+    with db_manager.ReadSession() as session:
+        while True:
+            page = readers.page_patients(session, PageRequest(limit=1, cursor=cursor), include_discharged=True)
+            seen += [(item["hospital_number"], item["archived"]) for item in page.items]
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+    assert sorted(seen) == [("ARC001", False), ("ARC002", False), ("ARC003", True)]
+
+
+def test_routes_with_archived_patient(db_manager, api):
+    """测试归档患者的查询、撤销出院（移回主库）接口"""
+    db_manager.archive_discharged(365)
+
+    async def scenario(client):
+        listing = await client.get("/api/patients/", params={"include_discharged": True})
+        detail = await client.get("/api/patients/ARC003")
+        # 其他字段和仍超过归档期限的出院日期在归档库中原地修改
+        edited = [await client.put("/api/patients/ARC003", json=body) for body in (
+            {"diagnosis": "脑梗死后遗症"}, {"discharge_date": (date.today() - timedelta(days=380)).isoformat()})]
+        restored = await client.put("/api/patients/ARC003", json={"discharge_date": None})
+        return listing, detail, edited, restored
+
+    listing, detail, edited, restored = api.run(scenario)
+    assert len(listing.json()) == 3
+    assert detail.json()["archived"] is True
+    assert [(r.status_code, r.json()["archived"]) for r in edited] == [(200, True), (200, True)]
+    assert edited[1].json()["diagnosis"] == "脑梗死后遗症"
+    assert edited[1].json()["discharge_date"] == (date.today() - timedelta(days=380)).isoformat()
+    assert restored.status_code == 200
+    assert restored.json()["discharge_date"] is None
+    assert restored.json()["archived"] is False
+    assert count(db_manager, "SELECT count(*) FROM archive.patients") == 0
+    assert count(db_manager, "SELECT count(*) FROM main.progress_notes") == 9
+    assert db_manager.lookup_patient("ARC003").discharge_date is None
+
+    # 出院日期改到归档期限内时也移回主库
+    db_manager.writer.execute(lambda session: session.execute(text(
+        "UPDATE patients SET discharge_date = :day WHERE hospital_number = 'ARC003'"),
+        {"day": (date.today() - timedelta(days=400)).isoformat()}))
+    assert db_manager.archive_discharged(365).patients == 1
+
+    async def move_inside_window(client):
+        return await client.put("/api/patients/ARC003",
+                                json={"discharge_date": (date.today() - timedelta(days=30)).isoformat()})
+
+    assert api.run(move_inside_window).json()["archived"] is False
+    assert count(db_manager, "SELECT count(*) FROM archive.patients") == 0
+
+
+def test_revisions_survive_archive_and_restore(db_manager):
+    """测试归档和移回主库时修订历史随病程记录一起搬移，原稿仍可还原"""
+    patient = db_manager.lookup_patient("ARC003")
+    db_manager.add_progress_note({"patient_id": patient.id, "hospital_number": "ARC003",
+                                  "record_date": patient.admission_date + timedelta(days=3), "day_number": 4,
+                                  "record_type": "日常病程", "generated_content": "AI原稿：患者头晕，继续康复训练。"})
+
+    def revise(session):
+        for content in ("患者今日诉头晕减轻，继续康复训练。", "患者今日诉头晕明显减轻，继续平衡训练。"):
+            session.execute(text(
+                "UPDATE progress_notes SET generated_content = :content WHERE hospital_number = 'ARC003' "
+                "AND day_number = 4"), {"content": content})
+
+    db_manager.writer.execute(revise)
+    result = db_manager.archive_discharged(365)
+    assert result.rows["note_revisions"] == 3
+    assert count(db_manager, "SELECT count(*) FROM main.note_revisions") == 0
+    assert count(db_manager, """
+        SELECT count(*) FROM archive.note_revisions r
+        JOIN archive.progress_notes n ON n.id = r.note_id WHERE n.day_number = 4
+    """) == 3
+
+    assert db_manager.writer.execute(restore_patient, "ARC003") is True
+    assert count(db_manager, "SELECT count(*) FROM archive.note_revisions") == 0
+    note_id = count(db_manager, "SELECT id FROM main.progress_notes WHERE hospital_number = 'ARC003' "
+                                "AND day_number = 4")
+    with db_manager.ReadSession() as session:
+        assert [item["revision"] for item in list_revisions(session, note_id)] == [1, 2, 3]
+        assert read_revision(session, note_id, 1) == "AI原稿：患者头晕，继续康复训练。"
+        assert read_revision(session, note_id, 2) == "患者今日诉头晕减轻，继续康复训练。"
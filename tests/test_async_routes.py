@@ -0,0 +1,73 @@
+"""
+异步数据库访问测试 - 慢查询不应阻塞事件循环
+"""
+import asyncio
+import time
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+SLOW_QUERY_SECONDS = 0.5
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：一位入院第4天的患者"""
+    db = make_db_manager()
+    db.add_patient({
+        "hospital_number": "ASYNC001",
+        "name": "测试患者",
+        "admission_date": date.today() - timedelta(days=3),
+    })
+    return db
+
+
+def test_health_stays_fast_during_slow_reminders_query(db_manager, api):
+    """测试提醒慢查询执行期间 /health 仍能快速响应"""
+    # 让提醒查询人为变慢，模拟大表扫描
+    @event.listens_for(db_manager.read_engine, "before_cursor_execute")
+    def slow_reminders(conn, cursor, statement, parameters, context, executemany):
+        if "FROM reminders" in statement:
+            time.sleep(SLOW_QUERY_SECONDS)
+
+    async def scenario(client):
+        async def timed(path):
+            start = time.perf_counter()
+            response = await client.get(path)
+            return response, time.perf_counter() - start
+
+        reminders_task = asyncio.create_task(timed("/api/reminders/today"))
+        await asyncio.sleep(0.05)
+        health, health_latency = await timed("/health")
+        reminders, reminders_latency = await reminders_task
+        return health, health_latency, reminders, reminders_latency
+
+    health, health_latency, reminders, reminders_latency = api.run(scenario)
+
+    assert reminders.status_code == 200
+    assert health.status_code == 200
+    assert reminders_latency >= SLOW_QUERY_SECONDS
+    assert health_latency < SLOW_QUERY_SECONDS / 5
+
+
+def test_routes_use_async_session(api):
+    """测试迁移后的路由通过异步会话正常读写"""
+    async def scenario(client):
+        created = await client.post("/api/notes/", json={
+            "hospital_number": "ASYNC001",
+            "record_date": str(date.today()),
+            "record_type": "日常病程",
+            "daily_condition": "病情平稳",
+            "generated_content": "今日查房，患者病情平稳。",
+        })
+        notes = await client.get("/api/notes/patient/ASYNC001")
+        missing = await client.get("/api/patients/NOPE")
+        return created, notes, missing
+
+    created, notes, missing = api.run(scenario)
+
+    assert created.status_code == 200
+    assert created.json()["day_number"] == 4
+    assert [n["id"] for n in notes.json()] == [created.json()["id"]]
+    assert missing.status_code == 404
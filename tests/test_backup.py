@@ -0,0 +1,94 @@
+"""
+在线数据库备份测试
+"""
+import os
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from database.backup import backup_database, list_snapshots
+
+
+@pytest.fixture
+def db_manager(make_db_manager, tmp_path):
+    """临时数据库：一位患者、200条较长的病程记录（约几百页）"""
+    db = make_db_manager()
+    patient_id = db.add_patient({"hospital_number": "B001", "name": "张三", "admission_date": date(2024, 5, 1)})
+
+    def add_notes(session):
+        from database.models import ProgressNote
+        session.add_all(ProgressNote(patient_id=patient_id, hospital_number="B001",
+                                     record_date=date(2024, 5, 1) + timedelta(days=i), day_number=i + 1,
+                                     record_type="日常病程", generated_content="病程内容" * 500)
+                        for i in range(200))
+    db.writer.execute(add_notes)
+    db.backup_dir = str(tmp_path / "backups")
+    return db
+
+
+def count_notes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT count(*) FROM progress_notes").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_copies_in_steps_and_verifies(db_manager):
+    """测试分步复制、完整性校验和耗时统计"""
+    result = backup_database(db_manager.db_path, db_manager.backup_dir, pages_per_step=16, step_pause=0)
+
+    assert result.integrity == "ok"
+    assert result.steps >= result.pages // 16 > 1
+    assert 0 < result.max_step <= result.held <= result.duration
+    assert count_notes(result.path) == 200
+    assert not any(name.endswith(".partial") for name in os.listdir(db_manager.backup_dir))
+
+
+def test_snapshots_rotate(db_manager):
+    """测试只保留最近 keep 个快照"""
+    start = datetime(2024, 6, 1, 8, 0, 0)
+    for hour in range(4):
+        result = backup_database(db_manager.db_path, db_manager.backup_dir, keep=2,
+                                 now=start + timedelta(hours=hour))
+    snapshots = list_snapshots(db_manager.db_path, db_manager.backup_dir)
+    assert [path.name for path in snapshots] == ["test-20240601-110000.db", "test-20240601-100000.db"]
+    assert len(result.removed) == 1
+
+
+def test_backup_while_writing(db_manager, api):
+    """测试备份期间写入不受影响，快照为一致的某一时刻"""
+    from backend.api_main import app
+
+    stop = threading.Event()
+    written = []
+
+    def writer():
+        while not stop.is_set():
+            written.append(db_manager.add_reminder({
+                "patient_id": 1, "hospital_number": "B001", "reminder_type": "复查",
+                "reminder_date": date(2024, 6, 1), "description": "复查", "priority": "中"}))
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        results = db_manager.backup(db_manager.backup_dir, pages_per_step=8, step_pause=0.001)
+    finally:
+        stop.set()
+        thread.join()
+
+    assert written and results[0].integrity == "ok"
+    assert count_notes(results[0].path) == 200
+    assert db_manager.get_metrics()["last_backup"][0]["path"] == results[0].path
+
+    app.state.backup_dir = db_manager.backup_dir
+
+    async def scenario(client):
+        return await client.post("/api/backup/run", params={"keep": 1})
+
+    response = api.run(scenario)
+    assert response.status_code == 200
+    assert response.json()[0]["integrity"] == "ok"
+    assert len(list_snapshots(db_manager.db_path, db_manager.backup_dir)) == 1
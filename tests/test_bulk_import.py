@@ -0,0 +1,91 @@
+"""
+批量导入测试
+"""
+import io
+import json
+from datetime import date
+
+from database.bulk_import import import_records
+from database.models import Patient, ProgressNote
+
+
+PATIENTS_CSV = """hospital_number,name,age,admission_date,diagnosis
+IMP001,张三,60,2024-01-01,脑梗死
+IMP002,李四,,2024-01-02,
+IMP003,王五,abc,2024-01-03,骨折
+IMP004,赵六,50,,腰椎间盘突出
+"""
+
+
+def jsonl(*records):
+    return io.StringIO("\n".join(
+        record if isinstance(record, str) else json.dumps(record, ensure_ascii=False)
+        for record in records
+    ))
+
+
+def test_import_patients_csv_upserts_and_reports_errors(db_manager):
+    """测试患者导入：按住院号upsert，错误行不影响其他行"""
+    db_manager.add_patient({"hospital_number": "IMP002", "name": "旧名字",
+                            "diagnosis": "原诊断", "admission_date": date(2023, 12, 1)})
+    assert db_manager.lookup_patient("IMP002").name == "旧名字"
+
+    result = import_records(db_manager, "patients", io.StringIO(PATIENTS_CSV), "csv", chunk_size=2)
+
+    assert (result.total, result.inserted, result.updated, result.failed) == (4, 1, 1, 2)
+    assert sorted(error["line"] for error in result.errors) == [4, 5]
+    assert result.errors[0]["hospital_number"] == "IMP003"
+
+    with db_manager.get_session() as session:
+        updated = session.query(Patient).filter(Patient.hospital_number == "IMP002").one()
+        assert updated.name == "李四"
+        assert updated.admission_date == date(2024, 1, 2)
+        assert updated.diagnosis == "原诊断"  # 空单元格不覆盖原值
+        assert session.query(Patient).count() == 2
+    # 患者缓存已失效
+    assert db_manager.lookup_patient("IMP002").name == "李四"
+
+
+def test_import_notes_jsonl_upserts_by_patient_and_date(db_manager):
+    """测试病程记录导入：按 (患者, 记录日期) upsert"""
+    db_manager.add_patient({"hospital_number": "IMP010", "admission_date": date(2024, 3, 1)})
+    stream = jsonl(
+        {"hospital_number": "IMP010", "record_date": "2024-03-01", "record_type": "首次病程", "daily_condition": "入院"},
+        {"hospital_number": "IMP010", "record_date": "2024-03-05", "record_type": "日常病程", "daily_condition": "第一版"},
+        "{broken json",
+        {"hospital_number": "NOPE", "record_date": "2024-03-05", "record_type": "日常病程"},
+        {"hospital_number": "IMP010", "record_date": "2024-03-05", "record_type": "日常病程", "daily_condition": "第二版"},
+    )
+    result = import_records(db_manager, "notes", stream, "jsonl")
+    assert (result.total, result.inserted, result.updated, result.failed) == (5, 2, 0, 2)
+    assert {error["line"] for error in result.errors} == {3, 4}
+
+    # 再次导入同一天的记录：更新而不是新增
+    stream = jsonl({"hospital_number": "IMP010", "record_date": "2024-03-05",
+                    "record_type": "日常病程", "daily_condition": "第三版"})
+    result = import_records(db_manager, "notes", stream, "jsonl")
+    assert (result.inserted, result.updated) == (0, 1)
+
+    with db_manager.get_session() as session:
+        notes = session.query(ProgressNote).order_by(ProgressNote.record_date).all()
+    assert [(n.day_number, n.daily_condition) for n in notes] == [(1, "入院"), (5, "第三版")]
+
+
+def test_import_api(api):
+    """测试上传文件导入接口"""
+    async def scenario(client):
+        ok = await client.post(
+            "/api/import/patients",
+            files={"file": ("patients.csv", PATIENTS_CSV.encode("utf-8-sig"), "text/csv")},
+        )
+        bad_format = await client.post(
+            "/api/import/patients",
+            files={"file": ("patients.xlsx", b"", "application/octet-stream")},
+        )
+        return ok, bad_format
+
+    ok, bad_format = api.run(scenario)
+    assert ok.status_code == 200
+    body = ok.json()
+    assert (body["inserted"], body["failed"]) == (2, 2)
+    assert bad_format.status_code == 400
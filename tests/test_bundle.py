@@ -0,0 +1,71 @@
+"""
+患者工作区合并接口测试
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from database.models import RehabPlan, RehabProgress
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：一位患者，3条病程记录、2条提醒、康复计划和2条康复进展"""
+    db = make_db_manager()
+    admitted = date(2024, 5, 1)
+    patient_id = db.add_patient({"hospital_number": "W001", "name": "张三", "admission_date": admitted})
+    for day in range(3):
+        db.add_progress_note({"patient_id": patient_id, "hospital_number": "W001",
+                              "record_date": admitted + timedelta(days=day), "day_number": day + 1,
+                              "record_type": "日常病程", "daily_condition": "平稳",
+                              "generated_content": f"第{day + 1}天查房"})
+    for offset in (5, 2):
+        db.add_reminder({"patient_id": patient_id, "hospital_number": "W001", "reminder_type": "复查",
+                         "reminder_date": admitted + timedelta(days=offset), "description": "复查",
+                         "priority": "中"})
+
+    def add_rehab(session):
+        session.add(RehabPlan(patient_id=patient_id, hospital_number="W001", short_term_goals="独立坐位"))
+        for day in (1, 3):
+            session.add(RehabProgress(patient_id=patient_id, hospital_number="W001",
+                                      record_date=admitted + timedelta(days=day), content="好转", score=40 + day))
+    db.writer.execute(add_rehab)
+    return db
+
+
+def test_bundle_matches_separate_endpoints(db_manager, api):
+    """测试合并接口的内容和排序与各自的接口一致，且只用一个会话的少量查询"""
+    statements = []
+    event.listen(db_manager.read_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    (bundle,) = api.get_all(["/api/patients/W001/bundle"])
+    assert bundle.status_code == 200
+    # 患者一条，四个关系各一条 IN 查询
+    assert len(statements) == 5
+
+    patient, notes, reminders, plan, progress = api.get_all([
+        "/api/patients/W001", "/api/notes/patient/W001", "/api/reminders/patient/W001",
+        "/api/rehab-plan/patient/W001", "/api/rehab-plan/W001/progress",
+    ])
+    data = bundle.json()
+    assert data["patient"] == patient.json()
+    assert data["notes"] == notes.json()
+    assert data["reminders"] == reminders.json()
+    assert data["rehab_plan"] == plan.json()
+    assert data["rehab_progress"] == progress.json()
+    assert [n["day_number"] for n in data["notes"]] == [3, 2, 1]
+
+
+def test_bundle_sections(db_manager, api):
+    """测试 include 只返回指定内容，未知内容返回400，患者不存在返回404"""
+    selected, unknown, missing = api.get_all([
+        "/api/patients/W001/bundle?include=notes,rehab_plan",
+        "/api/patients/W001/bundle?include=notes,orders",
+        "/api/patients/X999/bundle",
+    ])
+    data = selected.json()
+    assert len(data["notes"]) == 3 and data["rehab_plan"]["short_term_goals"] == "独立坐位"
+    assert data["reminders"] is None and data["rehab_progress"] is None
+    assert unknown.status_code == 400 and "orders" in unknown.json()["detail"]
+    assert missing.status_code == 404
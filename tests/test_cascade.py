@@ -0,0 +1,124 @@
+"""
+删除患者时数据库级联删除测试
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import MetaData, create_engine, event, text
+
+from database import DBManager
+from database.migrations import CASCADE_TABLES, run_migrations
+from database.models import Base
+from database.search import search
+
+CHILD_TABLES = CASCADE_TABLES + ("patient_stats",)
+
+
+def add_patient(db, hospital_number, notes, start=date(2024, 5, 1)):
+    patient_id = db.add_patient({"hospital_number": hospital_number, "name": "张三", "admission_date": start})
+    for i in range(notes):
+        db.add_progress_note({"patient_id": patient_id, "hospital_number": hospital_number,
+                              "record_date": start + timedelta(days=i), "day_number": i + 1,
+                              "record_type": "日常病程", "daily_condition": "平稳",
+                              "generated_content": f"{hospital_number}第{i}次查房"})
+        db.add_reminder({"patient_id": patient_id, "hospital_number": hospital_number,
+                         "reminder_type": "复查", "reminder_date": start + timedelta(days=i),
+                         "description": "复查", "priority": "中"})
+    return patient_id
+
+
+def row_counts(db, patient_id):
+    with db.engine.connect() as conn:
+        return {table: conn.exec_driver_sql(f"SELECT count(*) FROM {table} WHERE patient_id = ?",
+                                            (patient_id,)).scalar()
+                for table in CHILD_TABLES}
+
+
+def count_statements(engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+
+def test_delete_patient_is_single_statement(db_manager):
+    """测试删除有多条记录的患者只执行一条 DELETE，子表、全文索引和统计行一并删除"""
+    removed = add_patient(db_manager, "C001", 50)
+    kept = add_patient(db_manager, "C002", 3)
+    assert db_manager.lookup_patient("C001") is not None
+
+    statements = count_statements(db_manager.writer.engine)
+    assert db_manager.delete_patient("C001") is True
+    assert [s for s in statements if s.startswith("DELETE")] == ["DELETE FROM patients WHERE patients.id = ?"]
+
+    assert set(row_counts(db_manager, removed).values()) == {0}
+    assert row_counts(db_manager, kept) == {"progress_notes": 3, "reminders": 3, "rehab_plans": 0,
+                                            "rehab_progress": 0, "patient_stats": 1}
+    assert db_manager.lookup_patient("C001") is None
+    with db_manager.ReadSession() as session:
+        assert search(session, "C001第1次", ["notes"])["items"] == []
+        assert len(search(session, "C002第1次", ["notes"])["items"]) == 1
+    assert db_manager.delete_patient("C001") is False
+
+
+def test_delete_api_permanent(db_manager, api):
+    """测试 DELETE /api/patients/{住院号} 默认出院，permanent=true 时永久删除"""
+    patient_id = add_patient(db_manager, "C001", 5)
+
+    async def scenario(client):
+        return [await client.delete("/api/patients/C001"),
+                await client.delete("/api/patients/C001", params={"permanent": True}),
+                await client.delete("/api/patients/C001", params={"permanent": True})]
+
+    discharged, deleted, missing = api.run(scenario)
+    assert discharged.json()["message"] == "患者已出院"
+    assert deleted.status_code == 200 and deleted.json()["message"] == "患者已删除"
+    assert missing.status_code == 404
+    assert set(row_counts(db_manager, patient_id).values()) == {0}
+
+
+def test_legacy_tables_rebuilt_with_cascade(tmp_path):
+    """测试没有级联外键的旧数据库被重建：数据保留、孤儿记录清理、索引触发器恢复"""
+    path = str(tmp_path / "legacy.db")
+    legacy = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(legacy)
+    for table_name in CASCADE_TABLES:
+        for fk in legacy.tables[table_name].foreign_keys:
+            fk.constraint.ondelete = None
+    engine = create_engine(f"sqlite:///{path}")
+    legacy.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(legacy.tables["patients"].insert(),
+                     [{"hospital_number": "L001", "name": "张三", "admission_date": date(2024, 5, 1)}])
+        conn.execute(legacy.tables["progress_notes"].insert(), [
+            {"patient_id": patient_id, "hospital_number": "L001", "record_date": date(2024, 5, 1),
+             "day_number": 1, "record_type": "日常病程", "generated_content": "旧库查房记录"}
+            for patient_id in (1, 99)
+        ])
+    engine.dispose()
+
+    db = DBManager(path)
+    try:
+        with db.engine.connect() as conn:
+            for table in CASCADE_TABLES:
+                on_delete = {row[2]: row[6] for row in conn.exec_driver_sql(f"PRAGMA foreign_key_list({table})")}
+                assert on_delete == {"patients": "CASCADE"}
+            assert conn.exec_driver_sql("SELECT patient_id FROM progress_notes").scalars().all() == [1]
+            indexes = {row[1] for row in conn.exec_driver_sql("PRAGMA index_list(progress_notes)")}
+            assert "ux_progress_notes_patient_date" in indexes
+        assert run_migrations(db.engine) == []
+
+        with db.ReadSession() as session:
+            assert len(search(session, "查房记录", ["notes"])["items"]) == 1
+        db.add_progress_note({"patient_id": 1, "hospital_number": "L001", "record_date": date(2024, 5, 2),
+                              "day_number": 2, "record_type": "日常病程", "generated_content": "升级后新记录"})
+        with db.ReadSession() as session:
+            assert len(search(session, "升级后新", ["notes"])["items"]) == 1
+            assert session.execute(text("SELECT note_count FROM patient_stats")).scalar() == 2
+
+        assert db.delete_patient("L001") is True
+        assert set(row_counts(db, 1).values()) == {0}
+    finally:
+        db.close()
@@ -0,0 +1,137 @@
+"""
+变更事件总线和 SSE 推送测试
+"""
+import asyncio
+import json
+from datetime import date
+
+import pytest
+
+from backend.api import change_feed
+from backend.api.change_feed import RESYNC, ChangeBus, change_bus
+from backend.api.routes.events import _event_stream
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    db = make_db_manager()
+    patient_id = db.add_patient({"hospital_number": "F001", "name": "张三", "admission_date": date(2024, 5, 1)})
+    db.add_reminder({"patient_id": patient_id, "hospital_number": "F001", "reminder_type": "复查",
+                     "reminder_date": date(2024, 5, 3), "description": "复查", "priority": "中"})
+    return db
+
+
+async def drain(subscription):
+    events = []
+    while (event := await subscription.next(0.01)) is not None:
+        events.append(event)
+    return events
+
+
+def test_bus_topics_backpressure_and_replay():
+    """测试按主题过滤、队列满时改为 resync、按 Last-Event-ID 补发"""
+    async def scenario():
+        bus = ChangeBus(history=5, max_queue=3)
+        notes = bus.subscribe(["note"])
+        everything = bus.subscribe()
+        bus.publish("note.saved", id=1, hospital_number="F001")
+        bus.publish("patient.updated", hospital_number="F001")
+        with pytest.raises(ValueError):
+            bus.publish("note.unknown")
+        assert [e.type for e in await drain(notes)] == ["note.saved"]
+        assert [e.type for e in await drain(everything)] == ["note.saved", "patient.updated"]
+
+        # 消费跟不上：积压的事件被丢弃，换成一条 resync（编号为触发溢出的事件），之后的事件照常送达
+        for i in range(5):
+            bus.publish("note.saved", id=i)
+        backlog = await drain(notes)
+        assert [(e.type, e.id) for e in backlog] == [(RESYNC, 6), ("note.saved", 7)]
+        assert notes.dropped == 3
+
+        # 重连补发：缓冲中有 3 之后的全部事件
+        replay = bus.subscribe(["note"], last_event_id=4)
+        assert [e.id for e in await drain(replay)] == [5, 6, 7]
+        # 缺口超出缓冲或编号来自重启之前
+        assert [e.type for e in await drain(bus.subscribe(last_event_id=1))] == [RESYNC]
+        assert [e.type for e in await drain(bus.subscribe(last_event_id=99))] == [RESYNC]
+        assert await drain(bus.subscribe(last_event_id=7)) == []
+
+        bus.close()
+        assert [e.type for e in await drain(everything)] == [RESYNC, "note.saved"]
+        assert everything.closed
+        assert bus.stats()["subscribers"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_routes_publish_after_commit(api):
+    """测试写接口提交后发布事件，事件中带住院号"""
+    async def scenario(client):
+        subscription = change_bus.subscribe()
+        try:
+            note = await client.post("/api/notes/", json={
+                "hospital_number": "F001", "record_date": "2024-05-02", "record_type": "日常病程",
+                "daily_condition": "平稳", "generated_content": "今日查房"})
+            assert note.status_code == 200
+            await client.put("/api/reminders/1/complete")
+            await client.put("/api/patients/F001", json={"name": "张三丰"})
+            # 失败的写操作不发布事件
+            assert (await client.put("/api/reminders/99/complete")).status_code == 404
+            return await drain(subscription)
+        finally:
+            change_bus.unsubscribe(subscription)
+
+    events = api.run(scenario)
+    assert [(e.type, e.data["hospital_number"]) for e in events] == [
+        ("note.saved", "F001"), ("reminder.completed", "F001"), ("patient.updated", "F001")]
+    assert events[0].data["record_date"] == "2024-05-02"
+
+
+def test_bulk_writes_publish_resync(api):
+    """测试批量导入后发布一条 resync，按主题订阅的客户端也能收到，没有写入时不发布"""
+    csv_text = "hospital_number,name,admission_date\nF002,李四,2024-05-03\nF001,张三丰,2024-05-01\n"
+
+    async def scenario(client):
+        subscription = change_bus.subscribe(["note"])
+        try:
+            for content in (csv_text, "hospital_number,name,admission_date\n"):
+                response = await client.post("/api/import/patients",
+                                             files={"file": ("patients.csv", content.encode(), "text/csv")})
+                assert response.status_code == 200
+            return await drain(subscription)
+        finally:
+            change_bus.unsubscribe(subscription)
+
+    events = api.run(scenario)
+    assert [(e.type, e.data) for e in events] == [(RESYNC, {"reason": "import"})]
+
+
+def test_event_stream_format(monkeypatch):
+    """测试 SSE 输出：重连间隔、事件、心跳，总线关闭时结束"""
+    monkeypatch.setattr(change_feed, "HEARTBEAT_SECONDS", 0.05)
+
+    class ConnectedRequest:
+        async def is_disconnected(self):
+            return False
+
+    async def scenario():
+        bus = ChangeBus()
+        monkeypatch.setattr("backend.api.routes.events.change_bus", bus)
+        stream = _event_stream(ConnectedRequest(), bus.subscribe(["reminder"]))
+        chunks = [await stream.__anext__()]
+        bus.publish("reminder.completed", id=3, hospital_number="F001")
+        bus.publish("note.saved", id=1)
+        chunks.append(await stream.__anext__())
+        chunks.append(await stream.__anext__())
+        bus.close()
+        chunks.extend([chunk async for chunk in stream])
+        return chunks, bus.stats()
+
+    chunks, stats = asyncio.run(scenario())
+    assert chunks[0] == "retry: 3000\n\n"
+    lines = chunks[1].strip().split("\n")
+    assert lines[:2] == ["id: 1", "event: reminder.completed"]
+    data = json.loads(lines[2].removeprefix("data: "))
+    assert (data["type"], data["id"], data["hospital_number"]) == ("reminder.completed", 3, "F001")
+    assert chunks[2:] == [": ping\n\n"]
+    assert stats["subscribers"] == 0
@@ -0,0 +1,146 @@
+"""
+长文本透明压缩测试
+"""
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+from database import DBManager
+from database.compression import FORMAT_DEFLATE, FORMAT_DEFLATE_DICT, connect, storage_stats
+from database.models import Patient, ProgressNote
+from database.search import search
+
+PHRASES = [
+    "患者神志清，精神可，饮食睡眠尚可，二便正常。",
+    "查体：右上肢肌力3级，右下肢肌力4级，肌张力略高。",
+    "Brunnstrom分期上肢III期、下肢IV期。",
+    "继续目前康复治疗方案，加强平衡及步行训练，注意防跌倒。",
+    "今日查房，患者诉右肩疼痛较前减轻。",
+    "予以运动疗法、作业疗法、针灸及低频电刺激治疗。",
+]
+
+
+def note_text(i):
+    return "".join(PHRASES[(i + k) % len(PHRASES)] for k in range(8)) + f"第{i}次查房。"
+
+
+def add_notes(db, count, start=date(2024, 5, 1)):
+    patient_id = db.add_patient({"hospital_number": "B001", "name": "张三", "admission_date": start,
+                                 "specialist_exam": note_text(0) * 2, "updated_at": start})
+    for i in range(count):
+        db.add_progress_note({"patient_id": patient_id, "hospital_number": "B001",
+                              "record_date": start + timedelta(days=i), "day_number": i + 1,
+                              "record_type": "日常病程", "daily_condition": "平稳",
+                              "generated_content": note_text(i)})
+    return patient_id
+
+
+def raw_values(path, column="generated_content"):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute(f"SELECT {column} FROM progress_notes ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_round_trip_and_search(tmp_path):
+    """测试新写入的长文本压缩存储、读取和全文检索不受影响"""
+    db = DBManager(str(tmp_path / "test.db"))
+    try:
+        add_notes(db, 3)
+        stored = raw_values(db.db_path)
+        assert all(isinstance(v, bytes) and v[0] == FORMAT_DEFLATE for v in stored)
+        assert raw_values(db.db_path, "daily_condition") == ["平稳"] * 3
+
+        with db.get_session() as session:
+            notes = session.query(ProgressNote).order_by(ProgressNote.id).all()
+            assert [n.generated_content for n in notes] == [note_text(i) for i in range(3)]
+
+        with db.ReadSession() as session:
+            found = search(session, "第1次查房", ["notes"])["items"]
+            assert len(found) == 1 and "<mark>第1次查房</mark>" in found[0]["snippet"]
+            # 不足3个字的词与长词同时出现时在解压视图上 LIKE 过滤，单独出现时不扫描病程记录
+            assert len(search(session, "第1次查房 肩疼", ["notes"])["items"]) == 1
+            assert search(session, "肩疼", ["notes"])["items"] == []
+
+        def edit(session):
+            note = session.get(ProgressNote, 1)
+            note.generated_content = "改为复查头颅CT，结果待回报。" * 10
+        db.writer.execute(edit)
+        with db.ReadSession() as session:
+            assert search(session, "第0次查房", ["notes"])["items"] == []
+            assert len(search(session, "头颅CT", ["notes"])["items"]) == 1
+    finally:
+        db.close()
+
+
+def test_background_compression_with_dictionary(tmp_path):
+    """测试后台压缩已有数据：训练字典、原文和检索不变、重新打开后可读"""
+    path = str(tmp_path / "test.db")
+    db = DBManager(path, compress_text=False)
+    add_notes(db, 80)
+    db.close()
+    assert all(isinstance(v, str) for v in raw_values(path))
+    plain_size = sum(len(v.encode()) for v in raw_values(path))
+
+    db = DBManager(path)
+    try:
+        result = db.compress_text(batch_size=30)
+        assert result.trained and result.dictionary
+        assert result.rows == {"patients": 1, "progress_notes": 80, "note_revisions": 0}
+        assert result.batches == 1 + 3
+        assert db.get_metrics()["last_compression"]["rows"]["progress_notes"] == 80
+        # 再次执行没有需要压缩的行
+        assert db.compress_text().rows == {"patients": 0, "progress_notes": 0, "note_revisions": 0}
+
+        with db.engine.connect() as conn:
+            stats = storage_stats(conn)["progress_notes.generated_content"]
+        assert set(stats) == {"blob"} and stats["blob"]["bytes"] < plain_size / 3
+    finally:
+        db.close()
+
+    assert all(v[0] == FORMAT_DEFLATE_DICT for v in raw_values(path))
+
+    db = DBManager(path)
+    try:
+        with db.get_session() as session:
+            notes = session.query(ProgressNote).order_by(ProgressNote.id).all()
+            assert [n.generated_content for n in notes] == [note_text(i) for i in range(80)]
+            patient = session.query(Patient).one()
+            assert patient.specialist_exam == note_text(0) * 2
+            assert patient.updated_at == date(2024, 5, 1)
+        with db.ReadSession() as session:
+            assert len(search(session, "第42次查房", ["notes"])["items"]) == 1
+    finally:
+        db.close()
+
+
+def test_external_connections_need_sql_functions(tmp_path):
+    """测试未注册 SQL 函数的外部连接不能修改病程记录，connect() 打开的连接可以，且索引和修订同步"""
+    path = str(tmp_path / "test.db")
+    db = DBManager(path)
+    add_notes(db, 3)
+    db.close()
+
+    plain = sqlite3.connect(path)
+    try:
+        with pytest.raises(sqlite3.OperationalError, match="no such function"):
+            plain.execute("UPDATE progress_notes SET generated_content = '患者今日出院。' WHERE id = 1")
+    finally:
+        plain.close()
+
+    conn = connect(path)
+    try:
+        with conn:
+            conn.execute("UPDATE progress_notes SET generated_content = '患者今日出院。' WHERE id = 1")
+        assert conn.execute("SELECT count(*) FROM note_revisions WHERE note_id = 1").fetchone() == (2,)
+    finally:
+        conn.close()
+
+    db = DBManager(path)
+    try:
+        with db.ReadSession() as session:
+            assert [item["id"] for item in search(session, "患者今日出院", ["notes"])["items"]] == [1]
+    finally:
+        db.close()
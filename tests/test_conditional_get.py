@@ -0,0 +1,100 @@
+"""
+条件 GET（ETag / If-None-Match）测试
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from database.versions import written_table
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    db = make_db_manager()
+    db.add_patient({"hospital_number": "E001", "name": "张三", "admission_date": date(2024, 5, 1)})
+    return db
+
+
+def request_all(api, requests):
+    """依次发出 (路径, If-None-Match) 请求，同时统计只读连接执行的语句数"""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(api.db.read_engine, "before_cursor_execute", count)
+    try:
+        return api.request_all([("GET", path, {"headers": {"If-None-Match": etag} if etag else {}})
+                                for path, etag in requests]), statements
+    finally:
+        event.remove(api.db.read_engine, "before_cursor_execute", count)
+
+
+def test_written_table():
+    """测试从 SQL 中识别写入的表"""
+    assert written_table("INSERT INTO patients (name) VALUES (?)") == "patients"
+    assert written_table("INSERT OR REPLACE INTO archive.progress_notes SELECT * FROM main.progress_notes") == "progress_notes"
+    assert written_table('UPDATE "templates" SET usage_count=(templates.usage_count + ?)') == "templates"
+    assert written_table("DELETE FROM reminders WHERE id = ?") == "reminders"
+    assert written_table("SELECT * FROM patients") is None
+
+
+def test_not_modified_skips_database(db_manager, api):
+    """测试 If-None-Match 命中时返回 304 且不查询数据库"""
+    (first,), _ = request_all(api, [("/api/patients/", None)])
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    (second, other), statements = request_all(api, [("/api/patients/", etag), ("/api/patients/", '"other"')])
+    assert second.status_code == 304 and second.headers["ETag"] == etag and second.content == b""
+    assert other.status_code == 200
+    # 只有未命中的那次请求查询了数据库
+    (_,), single = request_all(api, [("/api/patients/", None)])
+    assert len(statements) == len(single)
+
+    # 未覆盖的接口不加 ETag
+    (search,), _ = request_all(api, [("/api/search/?q=张三", None)])
+    assert "ETag" not in search.headers
+
+
+def test_writes_change_dependent_etags(db_manager, api):
+    """测试写入后依赖该表的接口 ETag 变化，不相关的接口仍返回 304"""
+    paths = ["/api/patients/", "/api/notes/patient/E001", "/api/reminders/patient/E001", "/api/templates/"]
+    responses, _ = request_all(api, [(path, None) for path in paths])
+    etags = dict(zip(paths, (r.headers["ETag"] for r in responses)))
+
+    db_manager.add_progress_note({"patient_id": 1, "hospital_number": "E001", "record_date": date(2024, 5, 2),
+                                  "day_number": 2, "record_type": "日常病程", "daily_condition": "平稳",
+                                  "generated_content": "今日查房"})
+    responses, _ = request_all(api, [(path, etags[path]) for path in paths])
+    assert [r.status_code for r in responses] == [304, 200, 304, 304]
+    assert len(responses[1].json()) == 1
+
+    # 写入失败回滚时版本号不变
+    with pytest.raises(Exception):
+        db_manager.add_reminder({"patient_id": 1, "hospital_number": "E001"})
+    responses, _ = request_all(api, [("/api/reminders/patient/E001", etags["/api/reminders/patient/E001"])])
+    assert responses[0].status_code == 304
+
+    # 更新患者影响所有依赖 patients 的接口
+    db_manager.update_patient("E001", {"name": "张三丰"})
+    responses, _ = request_all(api, [(path, etags[path]) for path in paths])
+    assert [r.status_code for r in responses] == [200, 200, 200, 304]
+    assert responses[0].json()[0]["name"] == "张三丰"
+
+
+def test_connection_commits_bump_versions(db_manager):
+    """测试直接在 Connection 上提交的写入（迁移、维护脚本）也递增版本号，回滚不递增"""
+    versions = db_manager.data_versions
+    before = versions.get(["patients", "templates"])
+
+    with db_manager.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE patients SET name = '张三丰' WHERE hospital_number = 'E001'")
+    with db_manager.engine.connect() as conn:
+        conn.exec_driver_sql("UPDATE templates SET usage_count = 1")
+        conn.rollback()
+
+    after = versions.get(["patients", "templates"])
+    assert (after[0] - before[0], after[1] - before[1]) == (1, 0)
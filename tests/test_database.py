@@ -6,6 +6,7 @@ import tempfile
 import os
 from datetime import date
 from database import DBManager, Patient
+from database.pagination import PageRequest
 
 
 def test_add_patient(db_manager):
@@ -29,6 +30,48 @@ def test_add_patient(db_manager):
     assert patient.name == "测试患者"
 
 
+def test_upcoming_reminders_sorted_by_date_and_priority(db_manager):
+    """测试只读查询层按日期和优先级排序提醒"""
+    from datetime import timedelta
+    from database import readers
+
+    patient = db_manager.get_patient_by_hospital_number("TEST001")
+    today = date.today()
+    for offset, priority in [(1, "紧急"), (0, "低"), (0, "紧急"), (0, "中"), (-1, "高")]:
+        db_manager.add_reminder({
+            "patient_id": patient.id,
+            "hospital_number": patient.hospital_number,
+            "reminder_type": "评估",
+            "reminder_date": today + timedelta(days=offset),
+            "description": f"{priority}提醒",
+            "priority": priority,
+        })
+
+    with db_manager.ReadSession() as session:
+        rows = readers.page_upcoming_reminders(session, today, PageRequest()).items
+
+    assert [(row["reminder_date"] - today).days for row in rows] == [0, 0, 0, 1]
+    assert [row["priority"] for row in rows] == ["紧急", "中", "低", "紧急"]
+
+
+def test_performance_profile_applied(db_manager):
+    """测试每个连接都应用了性能配置"""
+    with db_manager.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA journal_mode").scalar().lower() == "wal"
+        assert conn.exec_driver_sql("PRAGMA busy_timeout").scalar() == 5000
+        assert conn.exec_driver_sql("PRAGMA temp_store").scalar() == 2  # MEMORY
+
+
+def test_performance_profile_rejects_invalid_value():
+    """测试非法性能配置被拒绝"""
+    from database.performance import build_performance_profile
+
+    with pytest.raises(ValueError):
+        build_performance_profile({"journal_mode": "WAL; DROP TABLE patients"})
+    with pytest.raises(ValueError):
+        build_performance_profile({"page_size": 4096})
+
+
 @pytest.fixture(scope="module")
 def db_manager():
     """数据库管理器fixture"""
@@ -0,0 +1,114 @@
+"""
+病历导出测试
+"""
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from database.export import export_records
+from database.models import RehabPlan
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """带归档库的临时数据库：在院患者E001（3条病程记录、2条提醒、康复计划）、E002（1条病程记录），已出院患者E003"""
+    db = make_db_manager(archive=True)
+    admitted = date(2024, 5, 1)
+    for hospital_number, notes, discharged in (("E001", 3, None), ("E002", 1, None), ("E003", 2, date(2024, 5, 20))):
+        patient_id = db.add_patient({"hospital_number": hospital_number, "name": f"患者{hospital_number}",
+                                     "admission_date": admitted, "discharge_date": discharged,
+                                     "diagnosis": "脑梗死恢复期"})
+        for day in range(notes, 0, -1):
+            db.add_progress_note({"patient_id": patient_id, "hospital_number": hospital_number,
+                                  "record_date": admitted + timedelta(days=day - 1), "day_number": day,
+                                  "record_type": "日常病程", "daily_condition": "平稳",
+                                  "generated_content": f"{hospital_number}第{day}天查房\n继续康复训练<加强平衡>"})
+    for offset in (4, 2):
+        db.add_reminder({"patient_id": 1, "hospital_number": "E001", "reminder_type": "复查",
+                         "reminder_date": admitted + timedelta(days=offset), "description": "复查血常规",
+                         "priority": "中"})
+    db.writer.execute(lambda session: session.add(
+        RehabPlan(patient_id=1, hospital_number="E001", short_term_goals="独立坐位")))
+    return db
+
+
+def test_ward_jsonl_groups_records_by_patient(db_manager, api):
+    """测试 JSONL 每位患者一行，子记录归到各自患者下并按日期排序，默认不含出院患者"""
+    ward, everyone = api.get_all(["/api/export/ward", "/api/export/ward?include_discharged=true"])
+    assert ward.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in ward.text.splitlines()]
+    assert [line["patient"]["hospital_number"] for line in lines] == ["E001", "E002"]
+    first = lines[0]
+    assert [n["day_number"] for n in first["notes"]] == [1, 2, 3]
+    assert [r["reminder_date"] for r in first["reminders"]] == ["2024-05-03", "2024-05-05"]
+    assert first["rehab_plan"]["short_term_goals"] == "独立坐位"
+    assert "id" not in first["patient"] and "patient_id" not in first["notes"][0]
+    assert lines[1]["rehab_plan"] is None and len(lines[1]["notes"]) == 1
+    assert len(everyone.text.splitlines()) == 3
+
+
+def test_patient_txt_and_docx(db_manager, api):
+    """测试单个患者导出 TXT 和 DOCX，患者不存在返回404，未知格式返回400"""
+    from docx import Document
+
+    txt, docx, missing, unknown = api.get_all([
+        "/api/export/patient/E001", "/api/export/patient/E001?format=docx",
+        "/api/export/patient/X999", "/api/export/patient/E001?format=pdf",
+    ])
+    assert txt.headers["content-type"].startswith("text/plain")
+    assert "attachment" in txt.headers["content-disposition"]
+    text = txt.text
+    assert "患者E001（住院号 E001）" in text and "【康复计划】" in text and "复查血常规" in text
+    assert text.index("E001第1天查房") < text.index("E001第3天查房")
+    assert "E002" not in text
+
+    paragraphs = [p.text for p in Document(io.BytesIO(docx.content)).paragraphs]
+    assert paragraphs[0] == "患者E001（住院号 E001）"
+    assert "继续康复训练<加强平衡>" in paragraphs
+    assert missing.status_code == 404 and unknown.status_code == 400
+
+
+def test_export_streams_one_chunk_per_patient(db_manager):
+    """测试导出按患者逐块产生，DOCX 多位患者之间分页"""
+    from docx import Document
+
+    with db_manager.ReadSession() as session:
+        chunks = list(export_records(session, "jsonl", include_discharged=True))
+        docx_chunks = list(export_records(session, "docx", include_discharged=True))
+    assert len(chunks) == 3
+    assert len(docx_chunks) == 4
+    document = Document(io.BytesIO(b"".join(docx_chunks)))
+    titles = [p.text for p in document.paragraphs if p.text.startswith("患者")]
+    assert titles == ["患者E001（住院号 E001）", "患者E002（住院号 E002）", "患者E003（住院号 E003）"]
+
+
+def test_archived_patients_are_exported(db_manager, api):
+    """测试已归档的患者可以单独导出，包含出院患者的病区导出也读取归档库"""
+    assert db_manager.archive_discharged(30).patients == 1
+    patient, ward, everyone = api.get_all([
+        "/api/export/patient/E003?format=jsonl", "/api/export/ward", "/api/export/ward?include_discharged=true",
+    ])
+    assert patient.status_code == 200
+    record = json.loads(patient.text)
+    assert record["patient"]["discharge_date"] == "2024-05-20"
+    assert [n["day_number"] for n in record["notes"]] == [1, 2]
+    assert [json.loads(line)["patient"]["hospital_number"] for line in ward.text.splitlines()] == ["E001", "E002"]
+    assert [json.loads(line)["patient"]["hospital_number"] for line in everyone.text.splitlines()] == [
+        "E001", "E002", "E003"]
+
+
+def test_concurrent_exports_are_capped(db_manager, api):
+    """测试同时进行的导出达到上限时返回503，导出结束后归还名额；导出不占用只读连接池"""
+    held = [db_manager.export_slots.acquire(blocking=False) for _ in range(2)]
+    assert held == [True, True]
+    busy, = api.get_all(["/api/export/ward"])
+    assert busy.status_code == 503 and busy.headers["retry-after"] == "30"
+
+    for _ in held:
+        db_manager.export_slots.release()
+    done = api.get_all(["/api/export/ward", "/api/export/patient/E001"])
+    assert [r.status_code for r in done] == [200, 200]
+    assert [db_manager.export_slots.acquire(blocking=False) for _ in range(2)] == [True, True]
+    assert db_manager.read_engine.pool.checkedout() == 0
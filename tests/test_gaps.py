@@ -0,0 +1,79 @@
+"""
+缺失病程记录计算测试
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from database.gaps import expected_record_type, find_missing_records
+from database.stats import is_round_day
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：在院患者G001住院第10天（第2、3、9天有记录），已出院患者G002，在院患者G003无缺失"""
+    db = make_db_manager()
+
+    def add(hospital_number, admitted, days, discharged=None):
+        patient_id = db.add_patient({"hospital_number": hospital_number, "name": hospital_number,
+                                     "admission_date": admitted, "discharge_date": discharged})
+        for day in days:
+            db.add_progress_note({"patient_id": patient_id, "hospital_number": hospital_number,
+                                  "record_date": admitted + timedelta(days=day - 1), "day_number": day,
+                                  "record_type": "日常病程", "daily_condition": "平稳",
+                                  "generated_content": "查房"})
+
+    add("G001", TODAY - timedelta(days=9), [1, 2, 3, 9])
+    add("G002", TODAY - timedelta(days=40), [2], discharged=TODAY - timedelta(days=35))
+    add("G003", TODAY - timedelta(days=3), [2, 3])
+    return db
+
+
+def test_expected_record_type():
+    """测试记录类型与前端时间轴一致"""
+    assert [expected_record_type(d) for d in (2, 3, 6, 9, 12, 15, 30)] == [
+        "主治医师查房", "主任医师查房", "住院医师查房", "主治医师查房", "主任医师查房", "住院医师查房", "阶段小结"]
+
+
+def test_missing_days_match_python_calendar(db_manager):
+    """测试缺失日与逐日比对的结果一致，出院患者截至出院日"""
+    with db_manager.get_session() as session:
+        ward = find_missing_records(session)
+        everyone = find_missing_records(session, include_discharged=True)
+        single = find_missing_records(session, "G002")
+
+    assert [p["hospital_number"] for p in ward["patients"]] == ["G003", "G001"]
+    g001 = ward["patients"][1]
+    assert g001["days_in_hospital"] == 10
+    assert [(m["day_number"], m["expected_type"]) for m in g001["missing"]] == [(6, "住院医师查房")]
+    assert g001["missing"][0]["date"] == (TODAY - timedelta(days=4)).isoformat()
+    assert ward["summary"] == {"patient_count": 2, "patients_with_gaps": 1, "expected_records": 6,
+                               "missing_records": 1, "completion_rate": 0.8333}
+
+    (g002,) = single["patients"]
+    assert g002["days_in_hospital"] == 6
+    assert [m["day_number"] for m in g002["missing"]] == [d for d in range(3, 7) if is_round_day(d)]
+    assert everyone["summary"]["patient_count"] == 3
+    assert everyone["summary"]["missing_records"] == 3
+
+
+def test_gaps_route(db_manager, api):
+    """测试 /api/notes/gaps 接口，补记录后缺失日消失，患者不存在返回404"""
+
+    async def scenario(client):
+        before = await client.get("/api/notes/gaps", params={"hospital_number": "G001"})
+        await client.post("/api/notes/", json={
+            "hospital_number": "G001", "record_date": (TODAY - timedelta(days=4)).isoformat(),
+            "record_type": "日常病程", "daily_condition": "平稳", "generated_content": "补记"})
+        after = await client.get("/api/notes/gaps")
+        missing = await client.get("/api/notes/gaps", params={"hospital_number": "X999"})
+        return before, after, missing
+
+    before, after, missing = api.run(scenario)
+    assert before.status_code == 200
+    assert before.json()["patients"][0]["missing"] == [
+        {"date": (TODAY - timedelta(days=4)).isoformat(), "day_number": 6, "expected_type": "住院医师查房"}]
+    assert after.json()["summary"]["missing_records"] == 0
+    assert missing.status_code == 404
@@ -0,0 +1,71 @@
+"""
+患者身份缓存测试
+"""
+from datetime import date
+
+import pytest
+
+from database.identity_cache import PatientIdentity, PatientIdentityCache
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库"""
+    return make_db_manager(patient_cache_size=2)
+
+
+def identity(hospital_number):
+    return PatientIdentity(1, hospital_number, "张三", date(2024, 1, 1), None)
+
+
+def test_lru_eviction_and_counters():
+    """测试容量上限、LRU淘汰及命中统计"""
+    cache = PatientIdentityCache(max_size=2)
+    for hospital_number in ("A", "B"):
+        cache.put(identity(hospital_number), cache.generation)
+    assert cache.get("A") is not None   # A 变为最近使用
+    cache.put(identity("C"), cache.generation)
+
+    assert cache.get("B") is None
+    assert cache.get("A") is not None
+    assert cache.get("C") is not None
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_stale_put_is_discarded():
+    """测试查询期间发生失效时，查询结果不写回缓存"""
+    cache = PatientIdentityCache()
+    generation = cache.generation
+    cache.invalidate(["A"])
+    cache.put(identity("A"), generation)
+    assert cache.get("A") is None
+
+
+def test_lookup_uses_cache(db_manager):
+    """测试重复查询同一患者只访问一次数据库"""
+    db_manager.add_patient({"hospital_number": "C001", "name": "李四", "admission_date": date.today()})
+
+    first = db_manager.lookup_patient("C001")
+    second = db_manager.lookup_patient("C001")
+
+    assert first == second
+    assert first.name == "李四"
+    assert db_manager.lookup_patient("NOPE") is None
+    stats = db_manager.get_metrics()["patient_cache"]
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+
+
+def test_patient_writes_invalidate_cache(db_manager):
+    """测试患者写入后缓存条目失效（包括住院号变更）"""
+    db_manager.add_patient({"hospital_number": "C002", "name": "王五", "admission_date": date.today()})
+    assert db_manager.lookup_patient("C002").name == "王五"
+
+    db_manager.update_patient("C002", {"name": "王六"})
+    assert db_manager.lookup_patient("C002").name == "王六"
+
+    db_manager.update_patient("C002", {"hospital_number": "C003"})
+    assert db_manager.lookup_patient("C002") is None
+    assert db_manager.lookup_patient("C003").name == "王六"
@@ -0,0 +1,90 @@
+"""
+数据库迁移测试
+"""
+import pytest
+from sqlalchemy import create_engine
+
+from database import DBManager
+from database.models import Base
+from database.migrations import latest_version, run_migrations, HOT_QUERY_INDEXES
+
+
+# 热点查询及其应使用的索引
+HOT_QUERIES = [
+    (
+        "SELECT reminders.*, patients.name FROM reminders "
+        "JOIN patients ON reminders.patient_id = patients.id "
+        "WHERE reminders.reminder_date >= '2025-01-23' AND reminders.is_completed = 0",
+        "ix_reminders_pending_date",
+    ),
+    (
+        "SELECT * FROM reminders WHERE patient_id = 1 AND reminder_date = '2025-01-23'",
+        "ix_reminders_patient_date",
+    ),
+    (
+        "SELECT * FROM progress_notes WHERE patient_id = 1 ORDER BY record_date DESC LIMIT 1000",
+        "ux_progress_notes_patient_date",
+    ),
+    (
+        "SELECT * FROM patients WHERE discharge_date IS NULL ORDER BY admission_date DESC",
+        "ix_patients_discharge_admission",
+    ),
+    (
+        "SELECT * FROM templates WHERE category = '查体' ORDER BY usage_count DESC",
+        "ix_templates_category_usage",
+    ),
+]
+
+
+@pytest.fixture
+def legacy_db_path(tmp_path):
+    """模拟已部署的旧数据库：只有表，没有二级索引，版本号为0"""
+    path = str(tmp_path / "legacy.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return path
+
+
+def query_plan(conn, sql):
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    return " | ".join(row[-1] for row in rows)
+
+
+def test_legacy_database_upgraded_in_place(legacy_db_path):
+    """测试旧数据库启动时被原地升级"""
+    db = DBManager(legacy_db_path)
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == latest_version()
+        index_names = {
+            row[0] for row in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        }
+    for name, _, _ in HOT_QUERY_INDEXES:
+        assert name in index_names
+    db.engine.dispose()
+
+
+def test_migrations_are_idempotent(legacy_db_path):
+    """测试重复执行迁移不会报错也不会重复应用"""
+    db = DBManager(legacy_db_path)
+    assert run_migrations(db.engine) == []
+
+    # 版本号被重置时，迁移仍可安全重复执行
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA user_version = 0")
+    assert run_migrations(db.engine) == list(range(1, latest_version() + 1))
+    db.engine.dispose()
+
+
+@pytest.mark.parametrize("sql,index_name", HOT_QUERIES)
+def test_hot_queries_use_indexes(legacy_db_path, sql, index_name):
+    """用 EXPLAIN QUERY PLAN 验证热点查询走索引且无需额外排序"""
+    db = DBManager(legacy_db_path)
+    with db.engine.connect() as conn:
+        plan = query_plan(conn, sql)
+    db.engine.dispose()
+
+    assert f"USING INDEX {index_name}" in plan or f"USING COVERING INDEX {index_name}" in plan, plan
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
@@ -0,0 +1,105 @@
+"""
+病程记录唯一索引与批量保存测试
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.exc import IntegrityError
+
+from database import DBManager
+from database.models import Base
+from database.search import search
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：患者N001，5月2日已有一条病程记录"""
+    db = make_db_manager()
+    patient_id = db.add_patient({"hospital_number": "N001", "name": "张三", "admission_date": date(2024, 5, 1)})
+    db.add_progress_note({"patient_id": patient_id, "hospital_number": "N001", "record_date": date(2024, 5, 2),
+                          "day_number": 2, "record_type": "日常病程", "daily_condition": "平稳",
+                          "generated_content": "原记录"})
+    return db
+
+
+def note_rows(db):
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT record_date, day_number, is_edited, created_at IS NOT NULL FROM progress_notes ORDER BY record_date"
+        ).fetchall()
+
+
+def test_batch_upserts_in_one_request(db_manager, api):
+    """测试批量保存：新增、覆盖同一天的记录、患者不存在的条目单独报错"""
+
+    def note(hospital_number, day, content):
+        return {"hospital_number": hospital_number, "record_date": f"2024-05-0{day}", "record_type": "日常病程",
+                "daily_condition": "平稳", "generated_content": content}
+
+    async def scenario(client):
+        batch = await client.post("/api/notes/batch", json={"notes": [
+            note("N001", 2, "补记覆盖"), note("N001", 3, "补记"), note("X999", 3, "无此患者"), note("N001", 4, "补记")]})
+        empty = await client.post("/api/notes/batch", json={"notes": []})
+        notes = await client.get("/api/notes/patient/N001")
+        return batch, empty, notes
+
+    batch, empty, notes = api.run(scenario)
+    assert batch.status_code == 200
+    data = batch.json()
+    assert (data["created"], data["updated"], data["failed"]) == (2, 1, 1)
+    assert [(r["index"], r["status"]) for r in data["results"]] == [
+        (0, "updated"), (1, "created"), (2, "error"), (3, "created")]
+    assert data["results"][2]["detail"] == "患者不存在" and data["results"][2]["id"] is None
+    assert empty.status_code == 422
+
+    by_date = {n["record_date"]: n for n in notes.json()}
+    assert by_date["2024-05-02"]["generated_content"] == "补记覆盖"
+    assert by_date["2024-05-02"]["id"] == data["results"][0]["id"]
+    assert note_rows(db_manager) == [("2024-05-02", 2, 1, 1), ("2024-05-03", 3, 0, 1), ("2024-05-04", 4, 0, 1)]
+    with db_manager.ReadSession() as session:
+        assert len(search(session, "补记覆盖", ["notes"])["items"]) == 1
+
+
+def test_unique_note_per_day(db_manager):
+    """测试同一患者同一天不能插入第二条记录"""
+    with pytest.raises(IntegrityError):
+        db_manager.add_progress_note({"patient_id": 1, "hospital_number": "N001", "record_date": date(2024, 5, 2),
+                                      "day_number": 2, "record_type": "日常病程", "generated_content": "重复"})
+
+
+def test_migration_merges_duplicate_notes(tmp_path):
+    """测试旧库升级时同一天的重复记录只保留最后保存的一条"""
+    path = str(tmp_path / "legacy.db")
+    legacy = MetaData()
+    for table in Base.metadata.sorted_tables:
+        table.to_metadata(legacy)
+    notes = legacy.tables["progress_notes"]
+    notes.indexes.clear()
+    engine = create_engine(f"sqlite:///{path}")
+    legacy.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(legacy.tables["patients"].insert(),
+                     [{"hospital_number": "L001", "name": "张三", "admission_date": date(2024, 5, 1)}])
+        conn.execute(notes.insert(), [
+            {"patient_id": 1, "hospital_number": "L001", "record_date": date(2024, 5, day),
+             "day_number": day, "record_type": "日常病程", "generated_content": content}
+            for day, content in ((2, "先保存"), (2, "后保存"), (3, "第三天"))
+        ])
+    engine.dispose()
+
+    db = DBManager(path)
+    try:
+        with db.engine.connect() as conn:
+            rows = conn.exec_driver_sql(
+                "SELECT id, record_date FROM progress_notes ORDER BY record_date").fetchall()
+            assert rows == [(2, "2024-05-02"), (3, "2024-05-03")]
+            unique = {row[1]: row[2] for row in conn.exec_driver_sql("PRAGMA index_list(progress_notes)")}
+            assert unique["ux_progress_notes_patient_date"] == 1
+            assert "ix_progress_notes_patient_date" not in unique
+            assert conn.exec_driver_sql("SELECT note_count FROM patient_stats").scalar() == 2
+        with db.ReadSession() as session:
+            assert search(session, "先保存", ["notes"])["items"] == []
+            assert len(search(session, "后保存", ["notes"])["items"]) == 1
+    finally:
+        db.close()
@@ -0,0 +1,112 @@
+"""
+列表分页与列投影测试
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from database import readers
+from database.pagination import PageRequest, PaginationError, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：一位患者，每天一条，共6条病程记录；5个模板"""
+    db = make_db_manager()
+    admitted = date(2024, 5, 1)
+    patient_id = db.add_patient({"hospital_number": "P001", "name": "张三", "admission_date": admitted,
+                                 "specialist_exam": "专科查体" * 100})
+    for day in (1, 2, 3, 4, 5, 6):
+        db.add_progress_note({"patient_id": patient_id, "hospital_number": "P001",
+                              "record_date": admitted + timedelta(days=day - 1), "day_number": day,
+                              "record_type": "日常病程", "daily_condition": "一般情况可",
+                              "generated_content": "病程内容" * 200})
+    for i in range(5):
+        db.add_template({"category": "查体", "template_name": f"模板{i}", "content": "内容" * 50})
+    return db
+
+
+def test_cursor_round_trip():
+    """测试游标编码、解码及格式校验"""
+    spec = readers.NOTE_LIST
+    cursor = encode_cursor([date(2024, 5, 2), 3])
+    assert decode_cursor(cursor, spec) == (date(2024, 5, 2), 3)
+    for bad in ("not-a-cursor", encode_cursor([1]), encode_cursor([[1], 2])):
+        with pytest.raises(PaginationError):
+            decode_cursor(bad, spec)
+    with pytest.raises(PaginationError):
+        spec.output_columns(fields=["password"])
+
+
+def test_keyset_pages_cover_all_rows_once(db_manager):
+    """测试逐页读取覆盖全部记录且不重复"""
+    seen = []
+    cursor = None
+    with db_manager.ReadSession() as session:
+        while True:
+            page = readers.page_patient_notes(session, 1, PageRequest(limit=4, cursor=cursor))
+            seen.extend(item["id"] for item in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+        everything = readers.page_patient_notes(session, 1, PageRequest())
+
+    assert seen == [item["id"] for item in everything.items] == [6, 5, 4, 3, 2, 1]
+    assert everything.next_cursor is None and everything.projected is False
+
+
+def test_list_routes_paginate_and_project(db_manager, api):
+    """测试列表接口的 X-Next-Cursor 响应头、view=summary、fields= 及参数校验"""
+
+    async def scenario(client):
+        first = await client.get("/api/notes/patient/P001", params={"limit": 5})
+        second = await client.get("/api/notes/patient/P001",
+                                  params={"limit": 5, "cursor": first.headers["X-Next-Cursor"]})
+        summary = await client.get("/api/notes/patient/P001", params={"view": "summary"})
+        fields = await client.get("/api/templates/", params={"fields": "template_name", "limit": 2})
+        patients = await client.get("/api/patients/", params={"view": "summary"})
+        bad_cursor = await client.get("/api/templates/", params={"cursor": "xyz"})
+        bad_field = await client.get("/api/patients/", params={"fields": "name,password"})
+        return first, second, summary, fields, patients, bad_cursor, bad_field
+
+    first, second, summary, fields, patients, bad_cursor, bad_field = api.run(scenario)
+    assert [note["id"] for note in first.json()] == [6, 5, 4, 3, 2]
+    assert [note["id"] for note in second.json()] == [1]
+    assert "X-Next-Cursor" not in second.headers
+
+    assert "generated_content" not in summary.json()[0]
+    assert summary.json()[0]["record_date"] == "2024-05-06"
+    assert len(summary.content) * 10 < len(first.content)
+
+    assert fields.json() == [{"id": 5, "template_name": "模板4"}, {"id": 4, "template_name": "模板3"}]
+    assert "X-Next-Cursor" in fields.headers
+
+    patient = patients.json()[0]
+    assert "specialist_exam" not in patient and patient["days_in_hospital"] > 0
+    assert bad_cursor.status_code == 400
+    assert bad_field.status_code == 400
+
+
+def test_debug_reminders_endpoint_pages(db_manager, api):
+    """测试提醒调试接口只返回计数和今日及未来提醒的一页"""
+    today = date.today()
+    for offset in (-3, 0, 0, 1):
+        db_manager.add_reminder({"patient_id": 1, "hospital_number": "P001", "reminder_type": "复查",
+                                 "reminder_date": today + timedelta(days=offset), "description": f"复查{offset}",
+                                 "priority": "中"})
+
+    async def scenario(client):
+        first = await client.get("/api/reminders/debug", params={"limit": 2})
+        second = await client.get("/api/reminders/debug",
+                                  params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+        bad_cursor = await client.get("/api/reminders/debug", params={"cursor": "xyz"})
+        return first, second, bad_cursor
+
+    first, second, bad_cursor = api.run(scenario)
+    body = first.json()
+    assert (body["all_incomplete_count"], body["filtered_count"]) == (4, 3)
+    assert "all_incomplete" not in body
+    assert [r["date"] for r in body["filtered"] + second.json()["filtered"]] == [
+        today.isoformat(), today.isoformat(), (today + timedelta(days=1)).isoformat()]
+    assert "X-Next-Cursor" not in second.headers
+    assert bad_cursor.status_code == 400
@@ -0,0 +1,83 @@
+"""
+热点查询语句注册表测试
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from database.queries import PATIENT_BY_HOSPITAL_NUMBER, REGISTRY, register, reset_query_metrics
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：一位患者、3条病程记录、2条提醒"""
+    db = make_db_manager()
+    today = date.today()
+    patient_id = db.add_patient({"hospital_number": "B001", "name": "张三",
+                                 "admission_date": today - timedelta(days=5)})
+    for i in range(3):
+        db.add_progress_note({"patient_id": patient_id, "hospital_number": "B001",
+                              "record_date": today - timedelta(days=i), "day_number": 6 - i,
+                              "record_type": "日常病程", "daily_condition": "平稳",
+                              "generated_content": f"病程{i}"})
+    for priority in ("高", "低"):
+        db.add_reminder({"patient_id": patient_id, "hospital_number": "B001", "reminder_type": "复查",
+                         "reminder_date": today, "description": "复查", "priority": priority})
+    reset_query_metrics()
+    return db
+
+
+def get_all(api, requests):
+    responses = api.request_all([("GET", path, {"params": params}) for path, params in requests])
+    assert all(response.status_code == 200 for response in responses)
+    return responses
+
+
+def test_routes_reuse_compiled_statements(db_manager, api):
+    """测试重复请求复用编译结果，统计按语句名称记录"""
+    responses = get_all(api, [("/api/notes/patient/B001", {})] * 5
+                        + [("/api/reminders/today", {})] * 5
+                        + [("/api/reminders/today", {"priority": "高"})] * 2
+                        + [("/api/patients/B001", {})] * 5)
+
+    assert len(responses[0].json()) == 3
+    assert len(responses[5].json()) == 2
+    assert [r["priority"] for r in responses[10].json()] == ["高"]
+    assert responses[-1].json()["name"] == "张三"
+
+    metrics = db_manager.get_metrics()["queries"]
+    for name, executions in (("notes_by_patient", 5), ("upcoming_reminders", 5),
+                             ("upcoming_reminders_by_priority", 2), ("patient_by_hospital_number", 5)):
+        stats = metrics[name]
+        assert stats["executions"] == executions
+        # 只读连接池的 Engine 只在第一次执行时编译
+        assert stats["cache_misses"] == 1
+        assert stats["hit_rate"] == round((executions - 1) / executions, 4)
+        assert stats["compile_ms_avg"] > 0
+    # 患者身份只在第一次查询时读库，之后命中身份缓存
+    assert metrics["patient_identity"]["executions"] == 1
+
+
+def test_pages_count_under_registered_statement(db_manager, api):
+    """测试分页派生的语句记在注册语句下，且结果与不分页时一致"""
+    first = get_all(api, [("/api/notes/patient/B001", {"limit": 2})])[0]
+    cursor = first.headers["X-Next-Cursor"]
+    second = get_all(api, [("/api/notes/patient/B001", {"limit": 2, "cursor": cursor})])[0]
+
+    dates = [note["record_date"] for note in first.json() + second.json()]
+    assert dates == sorted(dates, reverse=True) and len(set(dates)) == 3
+    assert db_manager.get_metrics()["queries"]["notes_by_patient"]["executions"] == 2
+
+
+def test_write_helpers_use_registry(db_manager, api):
+    """测试写入会话中使用注册语句（ORM实体查询）"""
+    def rename(session):
+        patient = PATIENT_BY_HOSPITAL_NUMBER.execute(session, {"hospital_number": "B001"}).scalars().one()
+        patient.name = "李四"
+    db_manager.writer.execute(rename)
+
+    assert get_all(api, [("/api/patients/B001", {})])[0].json()["name"] == "李四"
+    assert db_manager.get_metrics()["queries"]["patient_by_hospital_number"]["executions"] == 2
+
+    with pytest.raises(ValueError):
+        register("notes_by_patient", REGISTRY["notes_by_patient"].statement)
@@ -0,0 +1,110 @@
+"""
+提醒规则引擎测试
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from database.reminders import RULES, ReminderRule, adopt_legacy_reminders, materialize_reminders
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：今天为住院第2天的R002、住院第80天且14天后出院的R080"""
+    db = make_db_manager()
+    db.add_patient({"hospital_number": "R002", "name": "张三", "admission_date": TODAY - timedelta(days=1)})
+    db.add_patient({"hospital_number": "R080", "name": "李四", "admission_date": TODAY - timedelta(days=79),
+                    "discharge_date": TODAY + timedelta(days=14)})
+    return db
+
+
+def reminders(db, hospital_number):
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT rule_key, reminder_date, day_number, description, is_completed FROM reminders "
+            "WHERE hospital_number = ? ORDER BY reminder_date, id", (hospital_number,)
+        ).fetchall()
+
+
+def test_rules_over_horizon_match_rule_definitions(db_manager):
+    """测试一条语句算出的提醒与逐天逐条规则计算的结果一致，出院日之后不生成"""
+    result = db_manager.writer.execute(lambda session: materialize_reminders(session, RULES, horizon_days=30))
+    expected = {}
+    for hospital_number, admission, last_day in (("R002", TODAY - timedelta(days=1), None),
+                                                 ("R080", TODAY - timedelta(days=79), 94)):
+        name = "张三" if hospital_number == "R002" else "李四"
+        expected[hospital_number] = sorted(
+            (rule.key, (admission + timedelta(days=day - 1)).isoformat(), day, rule.describe(name, day), 0)
+            for day in range((TODAY - admission).days + 1, (TODAY - admission).days + 31)
+            if last_day is None or day <= last_day
+            for rule in RULES if rule.applies_to(day)
+        )
+        assert sorted(reminders(db_manager, hospital_number)) == expected[hospital_number]
+
+    assert result == {"patient_count": 2, "changed_patients": 2,
+                      "created_count": len(expected["R002"]) + len(expected["R080"])}
+    assert {row[0] for row in reminders(db_manager, "R080") if row[2] == 90} == {
+        "long_stay_review", "cycle_assessment", "daily_note"}
+    assert max(row[2] for row in reminders(db_manager, "R080")) == 94
+
+    # 再次计算不重复生成；范围较短时不影响已预先生成的提醒
+    for horizon_days in (30, 1):
+        again = db_manager.writer.execute(
+            lambda session: materialize_reminders(session, RULES, horizon_days=horizon_days))
+        assert (again["created_count"], again["changed_patients"]) == (0, 0)
+
+    with pytest.raises(ValueError):
+        ReminderRule("bad", "评估", "高", "{name}", offset=5, until=3)
+    with pytest.raises(ValueError):
+        materialize_reminders(None, RULES, horizon_days=0)
+
+
+def test_refresh_when_admission_or_discharge_changes(db_manager, api):
+    """测试修改入院日期、姓名或出院后只改动不再相符的未完成提醒，已完成的提醒保留"""
+    initialized, = api.request_all([
+        ("POST", "/api/reminders/patient/R002/initialize", {"params": {"horizon_days": 3}})])
+    # 第2、3、4天：初次评估和病程记录，第2天另有查看检查
+    assert initialized.json()["created_count"] == 7
+    with db_manager.engine.connect() as conn:
+        reminder_id = conn.exec_driver_sql(
+            "SELECT id FROM reminders WHERE rule_key = 'initial_assessment' AND reminder_date = ?",
+            (TODAY.isoformat(),)).scalar()
+    api.request_all([("PUT", f"/api/reminders/{reminder_id}/complete", {})])
+    completed = next(r for r in reminders(db_manager, "R002") if r[4])
+
+    # 入院日期提前到今天为第15天：只计算已生成的三天，初次评估、查看检查删除，第15天周期评估新增
+    api.request_all([("PUT", "/api/patients/R002",
+                      {"json": {"admission_date": (TODAY - timedelta(days=14)).isoformat()}})])
+    rows = reminders(db_manager, "R002")
+    assert completed in rows
+    assert sorted((r[0], r[2]) for r in rows if r != completed) == [
+        ("cycle_assessment", 15), ("daily_note", 15), ("daily_note", 16), ("daily_note", 17)]
+
+    # 改名后说明随之更新，其他字段修改不触发刷新
+    api.request_all([("PUT", "/api/patients/R002", {"json": {"name": "张三丰"}}),
+                     ("PUT", "/api/patients/R002", {"json": {"diagnosis": "脑梗死"}})])
+    assert {r[3] for r in reminders(db_manager, "R002") if r[0] == "daily_note"} == {"完成张三丰的病程记录"}
+
+    # 出院（出院日为今天）后明天起的提醒删除
+    api.request_all([("DELETE", "/api/patients/R002", {})])
+    assert [r[1] for r in reminders(db_manager, "R002") if r[1] > TODAY.isoformat()] == []
+    assert len(reminders(db_manager, "R002")) == 3
+
+
+def test_legacy_reminders_adopted(db_manager, api):
+    """测试规则引擎之前生成的提醒按模板补上规则标识，之后不重复生成"""
+    with db_manager.engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO reminders (patient_id, hospital_number, reminder_type, reminder_date, day_number, "
+            "description, priority, is_completed, created_at) VALUES "
+            "(1, 'R002', '病程记录', ?1, 2, '完成张三的病程记录', '中', 0, ?1), "
+            "(1, 'R002', '检查', ?1, 2, '张三 入院第2天，查看实验室检查和放射线检查结果', '高', 1, ?1), "
+            "(1, 'R002', '提醒', ?1, 2, '联系家属', '高', 0, ?1)", (TODAY.isoformat(),))
+        adopt_legacy_reminders(conn)
+
+    result, = api.request_all([("POST", "/api/reminders/patient/R002/initialize", {})])
+    assert result.json()["created_count"] == 1
+    assert [r[0] for r in reminders(db_manager, "R002")] == [
+        "daily_note", "lab_review", None, "initial_assessment"]
@@ -0,0 +1,110 @@
+"""
+病程记录修订历史测试
+"""
+import random
+from datetime import date
+
+import pytest
+from sqlalchemy import update
+
+from database.models import ProgressNote
+from database.compression import apply_delta, encode_delta
+from database.revisions import revision_storage
+
+DRAFT = (
+    "今日查房，患者神志清，精神可，饮食睡眠尚可，二便正常。查体：右上肢肌力3级，右下肢肌力3+级，"
+    "肌张力略高，Brunnstrom分期上肢III期、下肢IV期，坐位平衡2级，立位平衡1级。"
+    "主治医师查房后指示：患者病情平稳，继续目前康复治疗方案，运动疗法以减重步行训练、"
+    "平衡训练为主，作业疗法加强右手精细动作训练，吞咽功能训练每日一次，注意防跌倒及深静脉血栓。"
+)
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    db = make_db_manager()
+    db.add_patient({"hospital_number": "V001", "name": "张三", "admission_date": date(2024, 5, 1)})
+    return db
+
+
+def test_delta_round_trip():
+    """测试差异编码还原，None 按空文本处理"""
+    edited = DRAFT.replace("3级", "4级", 1) + "注意防跌倒。"
+    for old, new in ((DRAFT, edited), ("", DRAFT), (DRAFT, ""), (None, "新"), (DRAFT, DRAFT)):
+        assert apply_delta(old, encode_delta(old, new)) == (new or "")
+    # 按短句比对，只保存改动的短句
+    assert len(encode_delta(DRAFT, edited)) < 96
+
+
+def test_every_save_path_records_revisions(db_manager, api):
+    """测试单条保存、修改、批量保存都记录修订，任一版本可还原，内容不变时不记录"""
+    versions = [DRAFT, DRAFT.replace("3级", "4级", 1), DRAFT.replace("3级", "4级", 1) + "复查血常规。",
+                "出院前复查头颅CT。" + DRAFT]
+
+    def note(content):
+        return {"hospital_number": "V001", "record_date": "2024-05-02", "record_type": "日常病程",
+                "daily_condition": "平稳", "generated_content": content}
+
+    async def scenario(client):
+        note_id = (await client.post("/api/notes/", json=note(versions[0]))).json()["id"]
+        untouched = await client.get(f"/api/notes/{note_id}/revisions")
+        await client.post("/api/notes/", json=note(versions[1]))
+        await client.put(f"/api/notes/{note_id}", json={"generated_content": versions[2]})
+        await client.put(f"/api/notes/{note_id}", json={"generated_content": versions[2], "is_edited": True})
+        await client.post("/api/notes/batch", json={"notes": [note(versions[3])]})
+        listing = await client.get(f"/api/notes/{note_id}/revisions")
+        contents = [await client.get(f"/api/notes/{note_id}/revisions/{r}") for r in range(1, 6)]
+        missing = await client.get("/api/notes/999/revisions")
+        return untouched, listing, contents, missing
+
+    untouched, listing, contents, missing = api.run(scenario)
+    assert [r["revision"] for r in untouched.json()] == [1] and untouched.json()[0]["stored_bytes"] == 0
+    assert [r["revision"] for r in listing.json()] == [1, 2, 3, 4]
+    assert [r["length"] for r in listing.json()] == [len(v) for v in versions]
+    assert [c.json()["generated_content"] for c in contents[:4]] == versions
+    assert contents[4].status_code == 404 and missing.status_code == 404
+
+    with db_manager.engine.connect() as conn:
+        storage = revision_storage(conn)
+    assert storage["revisions"] == 4
+    # 三个差异合计小于一份全文
+    assert storage["delta_bytes"] < storage["base_bytes"]
+
+
+def test_storage_format_change_and_delete(db_manager):
+    """测试只改变存储格式的更新不产生新版本，删除患者时修订级联删除"""
+    note_id = db_manager.add_progress_note({"patient_id": 1, "hospital_number": "V001",
+                                            "record_date": date(2024, 5, 2), "day_number": 2,
+                                            "record_type": "日常病程", "generated_content": DRAFT})
+    with db_manager.engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE progress_notes SET generated_content = decompress_text(generated_content) || '补充'")
+        conn.exec_driver_sql("UPDATE progress_notes SET generated_content = decompress_text(generated_content)")
+        assert revision_storage(conn)["revisions"] == 2
+    db_manager.delete_patient("V001")
+    with db_manager.engine.connect() as conn:
+        assert revision_storage(conn)["revisions"] == 0
+    assert note_id
+
+
+def test_rewrite_stores_full_text_checkpoint(db_manager):
+    """测试整篇重写时差异不比全文小，改为保存该版全文；之后的版本从全文开始还原，各版时间格式一致"""
+    from database.revisions import list_revisions, read_revision
+
+    note_id = db_manager.add_progress_note({"patient_id": 1, "hospital_number": "V001",
+                                            "record_date": date(2024, 5, 2), "day_number": 2,
+                                            "record_type": "日常病程", "generated_content": DRAFT})
+    rng = random.Random(7)
+    rewritten = "".join(chr(rng.randint(0x4e00, 0x9fa5)) for _ in range(2000)) + "。"
+    versions = [DRAFT, rewritten, rewritten + "复查血常规。"]
+    for content in versions[1:]:
+        db_manager.writer.execute(lambda session, content=content: session.execute(
+            update(ProgressNote).where(ProgressNote.id == note_id).values(generated_content=content)))
+    with db_manager.engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT revision, content IS NOT NULL, delta IS NOT NULL FROM note_revisions ORDER BY revision"
+        ).fetchall()
+    assert rows == [(1, 1, 0), (2, 1, 0), (3, 0, 1)]
+
+    with db_manager.ReadSession() as session:
+        assert [read_revision(session, note_id, r) for r in (1, 2, 3)] == versions
+        stamps = [item["created_at"] for item in list_revisions(session, note_id)]
+    assert all(len(stamp) == len("2024-05-02 00:00:00") for stamp in stamps)
@@ -0,0 +1,106 @@
+"""
+全文检索测试
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import text
+
+from database.models import ProgressNote
+from database.search import search
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：一位患者、两条病程记录、一个模板"""
+    db = make_db_manager()
+    patient_id = db.add_patient({"hospital_number": "S001", "name": "张三",
+                                 "diagnosis": "脑梗死恢复期", "admission_date": date(2024, 5, 1)})
+    for day, content in [(1, "患者右侧肢体肌力3级，<b>肌张力</b>略高。"),
+                         (2, "今日复查超声提示左下肢深静脉血栓形成，暂停下肢训练。")]:
+        db.add_progress_note({"patient_id": patient_id, "hospital_number": "S001",
+                              "record_date": date(2024, 5, day), "day_number": day,
+                              "record_type": "日常病程", "daily_condition": "一般情况可",
+                              "generated_content": content})
+    db.add_template({"category": "查体", "template_name": "肌力检查", "content": "右侧肢体肌力3级"})
+    return db
+
+
+def run_search(db, query, kinds=None, **kwargs):
+    with db.ReadSession() as session:
+        return search(session, query, kinds, **kwargs)
+
+
+def test_search_ranks_and_highlights_across_sources(db_manager):
+    """测试同时检索病程记录和模板，命中的词被高亮且HTML被转义"""
+    result = run_search(db_manager, "肢体肌力")
+    assert {(item["kind"], item["id"]) for item in result["items"]} == {("notes", 1), ("templates", 1)}
+    note = next(item for item in result["items"] if item["kind"] == "notes")
+    assert "<mark>肢体肌力</mark>" in note["snippet"]
+    assert "&lt;b&gt;" in note["snippet"]
+    assert note["hospital_number"] == "S001" and note["patient_name"] == "张三"
+
+    result = run_search(db_manager, "深静脉血栓 下肢", ["notes"])
+    assert [item["id"] for item in result["items"]] == [2]
+
+
+def test_short_terms_fall_back_to_like(db_manager):
+    """测试不足3个字的词（如两个字的姓名）也能检索，但不扫描压缩存储的病程记录"""
+    result = run_search(db_manager, "张三")
+    assert [(item["kind"], item["title"]) for item in result["items"]] == [("patients", "<mark>张三</mark>")]
+    assert [item["kind"] for item in run_search(db_manager, "肌力")["items"]] == ["templates"]
+    assert run_search(db_manager, "肌力", ["notes"])["items"] == []
+    # 与长词同时出现时仍作为病程记录的附加条件
+    assert [item["id"] for item in run_search(db_manager, "肌张力 肌力", ["notes"])["items"]] == [1]
+
+
+def test_search_ranks_all_hits_and_pages_by_rank(db_manager):
+    """测试按全部命中的相关度排序（不只是最新的若干条），按 (rank, rowid) 游标翻页不重复不遗漏"""
+    for day, repeat in [(3, 1), (4, 4), (5, 2), (6, 3)]:
+        db_manager.add_progress_note({"patient_id": 1, "hospital_number": "S001", "record_date": date(2024, 5, day),
+                                      "day_number": day, "record_type": "日常病程",
+                                      "generated_content": "，".join(["平衡训练"] * repeat) + "，继续康复治疗。"})
+    seen, cursor = [], None
+    while True:
+        result = run_search(db_manager, "平衡训练", ["notes"], limit=1, cursor=cursor)
+        seen += [item["id"] for item in result["items"]]
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+    # 病程记录ID 3～6 依次为第3～6天，命中次数越多越相关
+    assert seen == [4, 6, 5, 3]
+
+
+def test_index_follows_updates_and_deletes(db_manager):
+    """测试触发器在更新、删除后同步索引"""
+    db_manager.update_patient("S001", {"diagnosis": "脑出血恢复期"})
+    assert run_search(db_manager, "脑梗死", ["patients"])["items"] == []
+    assert len(run_search(db_manager, "脑出血", ["patients"])["items"]) == 1
+
+    def delete_note(session):
+        session.query(ProgressNote).filter(ProgressNote.id == 2).delete()
+    db_manager.writer.execute(delete_note)
+    assert run_search(db_manager, "深静脉血栓", ["notes"])["items"] == []
+
+    with db_manager.get_session() as session:
+        session.execute(text("INSERT INTO notes_fts(notes_fts) VALUES ('integrity-check')"))
+
+
+def test_search_api_paginates(db_manager, api):
+    """测试 /api/search 分页及参数校验"""
+
+    async def scenario(client):
+        first = await client.get("/api/search/", params={"q": "肢体肌力", "limit": 1})
+        second = await client.get("/api/search/", params={"q": "肢体肌力", "limit": 1,
+                                                          "cursor": first.json()["next_cursor"]})
+        bad = await client.get("/api/search/", params={"q": "肌力", "type": "doctors"})
+        bad_cursor = await client.get("/api/search/", params={"q": "肌力", "cursor": "bad"})
+        return first, second, bad, bad_cursor
+
+    first, second, bad, bad_cursor = api.run(scenario)
+    assert first.json()["has_more"] is True
+    assert second.json()["has_more"] is False and second.json()["next_cursor"] is None
+    # 按类别分组：病程记录在模板之前
+    assert [item["kind"] for item in first.json()["items"] + second.json()["items"]] == ["notes", "templates"]
+    assert bad.status_code == 400
+    assert bad_cursor.status_code == 400
@@ -0,0 +1,117 @@
+"""
+患者统计表测试
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from database.models import Patient, ProgressNote
+from database.stats import expected_round_days, is_round_day, read_patient_stats
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：一位住院第10天的患者，第1、2、3、4天有记录，两条提醒"""
+    db = make_db_manager()
+    admitted = date.today() - timedelta(days=9)
+    patient_id = db.add_patient({"hospital_number": "T001", "name": "张三", "admission_date": admitted})
+    for day in (1, 2, 3, 4):
+        db.add_progress_note({"patient_id": patient_id, "hospital_number": "T001",
+                              "record_date": admitted + timedelta(days=day - 1), "day_number": day,
+                              "record_type": "日常病程"})
+    for offset in (0, 1):
+        db.add_reminder({"patient_id": patient_id, "hospital_number": "T001",
+                         "reminder_type": "复查", "reminder_date": admitted + timedelta(days=offset),
+                         "description": "复查", "priority": "中"})
+    return db
+
+
+def stats_row(db, patient_id=1):
+    with db.ReadSession() as session:
+        return session.execute(text("SELECT * FROM patient_stats WHERE patient_id = :id"),
+                               {"id": patient_id}).mappings().first()
+
+
+def test_round_day_schedule():
+    """测试应记录日规则与逐日判断一致"""
+    assert [day for day in range(1, 13) if is_round_day(day)] == [2, 3, 6, 9, 12]
+    for days in range(0, 100):
+        assert expected_round_days(days) == sum(is_round_day(d) for d in range(1, days + 1))
+
+
+def test_triggers_maintain_stats(db_manager):
+    """测试新增、修改、删除记录和提醒后统计行随之更新，且与实际数据一致"""
+    row = stats_row(db_manager)
+    assert (row["note_count"], row["note_days"], row["round_days"], row["pending_reminders"]) == (4, 4, 2, 2)
+
+    admitted = db_manager.lookup_patient("T001").admission_date
+    db_manager.mark_reminder_completed(1)
+
+    def move_and_delete(session):
+        # 第4天的记录移到第6天，删除第1天的记录
+        notes = session.query(ProgressNote).filter(ProgressNote.patient_id == 1).order_by(ProgressNote.id).all()
+        notes[3].record_date = admitted + timedelta(days=5)
+        session.delete(notes[0])
+    db_manager.writer.execute(move_and_delete)
+
+    row = stats_row(db_manager)
+    assert (row["note_count"], row["note_days"], row["round_days"], row["pending_reminders"]) == (3, 3, 3, 1)
+    assert row["first_note_date"] == str(admitted + timedelta(days=1))
+    assert row["last_note_date"] == str(admitted + timedelta(days=5))
+
+    # 入院日期提前一天，应记录日整体变化，按该患者重新计算
+    db_manager.update_patient("T001", {"admission_date": admitted - timedelta(days=1)})
+    assert stats_row(db_manager)["round_days"] == 1
+
+    def delete_patient(session):
+        session.delete(session.query(Patient).filter(Patient.id == 1).one())
+    db_manager.writer.execute(delete_patient)
+    assert stats_row(db_manager) is None
+    assert db_manager.check_stats().mismatched == []
+
+
+def test_check_detects_and_rebuilds(db_manager):
+    """测试校验发现不一致的统计行并重建"""
+    with db_manager.get_session() as session:
+        session.execute(text("UPDATE patient_stats SET note_count = 99"))
+        session.commit()
+
+    result = db_manager.check_stats()
+    assert result.mismatched == [1] and result.rebuilt is False
+    assert db_manager.check_stats(rebuild=True).rebuilt is True
+    assert stats_row(db_manager)["note_count"] == 4
+    assert db_manager.check_stats().mismatched == []
+
+
+def test_stats_api(db_manager, api):
+    """测试 /api/stats 汇总：住院10天应记录 2、3、6、9 四天，已记录两天"""
+
+    async def scenario(client):
+        return await client.get("/api/stats/"), await client.post("/api/stats/check")
+
+    response, check = api.run(scenario)
+    assert response.status_code == 200
+    summary = response.json()["summary"]
+    assert (summary["expected_records"], summary["recorded_records"], summary["missing_records"]) == (4, 2, 2)
+    assert summary["completion_rate"] == 0.5
+    patient = response.json()["patients"][0]
+    assert (patient["days_in_hospital"], patient["note_count"], patient["pending_reminders"]) == (10, 4, 2)
+    assert check.json() == {"checked": 1, "mismatched": [], "rebuilt": False}
+
+    with db_manager.ReadSession() as session:
+        assert read_patient_stats(session, today=date.today() + timedelta(days=1))["patients"][0]["days_in_hospital"] == 11
+
+
+def test_pending_reminders_exclude_precomputed_days(db_manager):
+    """测试预先生成的今天以后的提醒不计入待办，到期后计入"""
+    today = date.today()
+    db_manager.add_reminder({"patient_id": 1, "hospital_number": "T001", "reminder_type": "病程记录",
+                             "reminder_date": today + timedelta(days=3), "description": "完成张三的病程记录",
+                             "priority": "中"})
+    assert stats_row(db_manager)["pending_reminders"] == 3
+
+    with db_manager.ReadSession() as session:
+        assert read_patient_stats(session)["summary"]["pending_reminders"] == 2
+        later = read_patient_stats(session, today=today + timedelta(days=3))
+        assert later["patients"][0]["pending_reminders"] == 3
@@ -0,0 +1,89 @@
+"""
+模板使用次数写缓冲测试
+"""
+import pytest
+
+from database import DBManager
+from database.models import Template
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库，两个模板"""
+    db = make_db_manager(usage_flush_threshold=1000)
+    db.template_ids = [db.add_template({"category": "查体", "template_name": f"模板{i}", "content": f"内容{i}"})
+                       for i in range(2)]
+    return db
+
+
+def usage_counts(db):
+    with db.get_session() as session:
+        return {t.id: t.usage_count for t in session.query(Template).order_by(Template.id)}
+
+
+def post_uses(api, template_ids):
+    return api.request_all([("POST", f"/api/templates/{template_id}/use", {}) for template_id in template_ids])
+
+
+def test_burst_of_clicks_is_one_transaction(db_manager, api):
+    """测试100次点击在 flush 时合并为一个事务"""
+    first, second = db_manager.template_ids
+    batches = db_manager.writer.metrics()["batches"]
+
+    responses = post_uses(api, [first] * 70 + [second] * 30)
+
+    assert [r.json()["usage_count"] for r in responses[:3]] == [1, 2, 3]
+    assert responses[-1].json()["usage_count"] == 30
+    assert db_manager.writer.metrics()["batches"] == batches
+    assert usage_counts(db_manager) == {first: 0, second: 0}
+
+    assert db_manager.template_usage.flush() == 2
+    assert db_manager.writer.metrics()["batches"] == batches + 1
+    assert usage_counts(db_manager) == {first: 70, second: 30}
+    assert db_manager.template_usage.stats() == {"increments": 100, "flushes": 1, "flushed_rows": 2,
+                                                 "failed_flushes": 0, "pending": 0}
+    # 已写入的次数加上新的点击
+    assert post_uses(api, [first])[0].json()["usage_count"] == 71
+    assert post_uses(api, [999])[0].status_code == 404
+
+
+def test_flush_at_threshold_and_on_close(tmp_path):
+    """测试达到阈值时提交写入，关闭时写入剩余计数"""
+    path = str(tmp_path / "test.db")
+    db = DBManager(path, usage_flush_threshold=10)
+    template_id = db.add_template({"category": "查体", "template_name": "模板", "content": "内容"})
+    for _ in range(10):
+        db.increment_template_usage(template_id)
+    db.writer.execute(lambda session: None)
+    assert usage_counts(db) == {template_id: 10}
+
+    for _ in range(3):
+        db.increment_template_usage(template_id)
+    assert db.template_usage.pending(template_id) == 3
+    db.close()
+
+    db = DBManager(path)
+    try:
+        assert usage_counts(db) == {template_id: 13}
+    finally:
+        db.close()
+
+
+def test_failed_flush_keeps_counts(db_manager):
+    """测试写入失败时计数放回缓冲区"""
+    template_id = db_manager.template_ids[0]
+    db_manager.template_usage.add(template_id, 5)
+    writer = db_manager.template_usage.writer
+
+    class BrokenWriter:
+        def submit(self, func, *args):
+            return writer.submit(lambda session: 1 / 0)
+
+    db_manager.template_usage.writer = BrokenWriter()
+    with pytest.raises(ZeroDivisionError):
+        db_manager.template_usage.flush()
+    db_manager.template_usage.writer = writer
+
+    assert db_manager.template_usage.pending(template_id) == 5
+    db_manager.template_usage.flush()
+    assert usage_counts(db_manager)[template_id] == 5
@@ -0,0 +1,89 @@
+"""
+今日提醒初始化接口测试
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库：在院第2天的R002、第15天的R015（今日已有提醒）、第90天的R090（无姓名），已出院的R010"""
+    db = make_db_manager()
+    for hospital_number, day, name, discharged in (("R002", 2, "张三", None), ("R015", 15, "李四", None),
+                                                   ("R090", 90, None, None), ("R010", 10, "王五", TODAY)):
+        patient_id = db.add_patient({"hospital_number": hospital_number, "name": name,
+                                     "admission_date": TODAY - timedelta(days=day - 1),
+                                     "discharge_date": discharged})
+        if hospital_number == "R015":
+            db.add_reminder({"patient_id": patient_id, "hospital_number": hospital_number, "reminder_type": "复查",
+                             "reminder_date": TODAY, "description": "复查", "priority": "中"})
+    return db
+
+
+def today_reminders(db, hospital_number):
+    with db.engine.connect() as conn:
+        return conn.exec_driver_sql(
+            "SELECT reminder_type, priority, day_number, description, is_completed FROM reminders "
+            "WHERE hospital_number = ? AND reminder_date = ? ORDER BY id", (hospital_number, TODAY.isoformat())
+        ).fetchall()
+
+
+def post_all(api, paths):
+    return [response.json() for response in api.request_all([("POST", path, {}) for path in paths])]
+
+
+def test_ward_initialization_defaults_to_daily_note(db_manager, api):
+    """测试全病区初始化默认只为在院患者创建今日病程记录提醒，已有的患者跳过；未知规则返回400"""
+    first, second, unknown = post_all(api, ["/api/reminders/initialize-all-today"] * 2
+                                      + ["/api/reminders/initialize-all-today?rules=daily_note,nope"])
+
+    assert (first["created_count"], first["skipped_count"]) == (3, 0)
+    assert first["message"] == "为3位患者创建了3条提醒，0位患者提醒已是最新"
+    assert (second["created_count"], second["skipped_count"]) == (0, 3)
+    assert today_reminders(db_manager, "R002") == [("病程记录", "中", 2, "完成张三的病程记录", 0)]
+    assert [r[0] for r in today_reminders(db_manager, "R015")] == ["复查", "病程记录"]
+    assert today_reminders(db_manager, "R010") == []
+    assert unknown["detail"] == "未知的提醒规则: nope"
+
+
+def test_ward_initialization_in_constant_statements(db_manager, api):
+    """测试 rules=all 时按全部规则为在院患者创建今日提醒，已生成的不再重复，语句数与患者数无关"""
+    statements = []
+    event.listen(db_manager.writer.engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    first, second = post_all(api, ["/api/reminders/initialize-all-today?rules=all"] * 2)
+
+    assert (first["created_count"], first["skipped_count"]) == (8, 0)
+    assert first["message"] == "为3位患者创建了8条提醒，0位患者提醒已是最新"
+    assert (second["created_count"], second["skipped_count"]) == (0, 3)
+    assert today_reminders(db_manager, "R002")[-1] == ("病程记录", "中", 2, "完成张三的病程记录", 0)
+    assert today_reminders(db_manager, "R090")[-1] == ("病程记录", "中", 90, "完成R090的病程记录", 0)
+    # 手动创建的提醒不影响规则生成
+    assert [r[0] for r in today_reminders(db_manager, "R015")] == ["复查", "评估", "病程记录"]
+    assert today_reminders(db_manager, "R010") == []
+    assert len([s for s in statements if "reminders" in s]) == 2
+
+
+def test_patient_initialization_applies_all_rules(db_manager, api):
+    """测试单个患者初始化按住院天数创建全部适用的提醒，重复调用不再创建"""
+    day2, day90, again = post_all(api, [
+        "/api/reminders/patient/R002/initialize", "/api/reminders/patient/R090/initialize",
+        "/api/reminders/patient/R002/initialize",
+    ])
+    assert day2 == {"success": True, "message": "成功创建3条提醒", "created_count": 3}
+    assert sorted(today_reminders(db_manager, "R002")) == sorted([
+        ("评估", "高", 2, "张三 入院第2天，完成初次康复评估", 0),
+        ("检查", "高", 2, "张三 入院第2天，查看实验室检查和放射线检查结果", 0),
+        ("病程记录", "中", 2, "完成张三的病程记录", 0),
+    ])
+    assert day90["created_count"] == 3
+    assert sorted(today_reminders(db_manager, "R090")) == sorted([
+        ("复查", "紧急", 90, "R090 住院已超过85天，建议安排复查评估", 0),
+        ("评估", "高", 90, "R090 入院第90天（15天周期），评估恢复情况", 0),
+        ("病程记录", "中", 90, "完成R090的病程记录", 0),
+    ])
+    assert again == {"success": True, "message": "患者提醒已是最新", "created_count": 0}
@@ -0,0 +1,102 @@
+"""
+单写入者队列测试
+"""
+import threading
+import time
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from database.models import Template
+from database.write_queue import WriteQueue, WriteQueueFullError
+
+
+@pytest.fixture
+def db_manager(make_db_manager):
+    """临时数据库"""
+    db = make_db_manager()
+    return db
+
+
+def wait_until_taken(writer):
+    """等待已入队的写操作被写线程取走"""
+    while writer.metrics()["queue_depth"]:
+        time.sleep(0.001)
+
+
+def add_template(session, name):
+    template = Template(category="测试", template_name=name, content=name)
+    session.add(template)
+    session.flush()
+    return template.id
+
+
+def test_group_commit_batches_queued_writes(db_manager):
+    """测试排队中的写操作合并为一次提交"""
+    release = threading.Event()
+    blocker = db_manager.writer.submit(lambda session: release.wait(5))
+    wait_until_taken(db_manager.writer)
+    futures = [db_manager.writer.submit(add_template, f"模板{i}") for i in range(20)]
+    release.set()
+
+    ids = [future.result(timeout=5) for future in futures]
+    blocker.result(timeout=5)
+
+    assert len(set(ids)) == 20
+    metrics = db_manager.writer.metrics()
+    assert metrics["batches"] == 2
+    assert metrics["completed"] == 21
+    assert metrics["queue_depth"] == 0
+    assert metrics["commit_latency_ms"]["max"] >= 0
+
+
+def test_failed_write_does_not_abort_batch(db_manager):
+    """测试同批次中某个写操作失败不影响其他写操作"""
+    def broken(session):
+        add_template(session, "失败模板")
+        raise ValueError("boom")
+
+    release = threading.Event()
+    db_manager.writer.submit(lambda session: release.wait(5))
+    wait_until_taken(db_manager.writer)
+    ok_before = db_manager.writer.submit(add_template, "成功1")
+    failed = db_manager.writer.submit(broken)
+    ok_after = db_manager.writer.submit(add_template, "成功2")
+    release.set()
+
+    assert ok_before.result(timeout=5)
+    assert ok_after.result(timeout=5)
+    with pytest.raises(ValueError):
+        failed.result(timeout=5)
+
+    with db_manager.get_session() as session:
+        names = {t.template_name for t in session.query(Template).all()}
+    assert names == {"成功1", "成功2"}
+    assert db_manager.writer.metrics()["failed"] == 1
+
+
+def test_queue_rejects_when_full(db_manager):
+    """测试队列满时立即拒绝新的写操作"""
+    engine = create_engine(f"sqlite:///{db_manager.db_path}", pool_size=1, max_overflow=0)
+    writer = WriteQueue(engine, max_queue_size=1)
+    release = threading.Event()
+    writer.submit(lambda session: release.wait(5))
+    wait_until_taken(writer)
+    writer.submit(lambda session: None)
+    with pytest.raises(WriteQueueFullError):
+        writer.submit(lambda session: None)
+    release.set()
+    writer.stop()
+    engine.dispose()
+    assert writer.metrics()["rejected"] == 1
+
+
+def test_read_pool_is_read_only(db_manager):
+    """测试只读连接池拒绝写入"""
+    db_manager.add_patient({"hospital_number": "RO001", "admission_date": date.today()})
+    with db_manager.ReadSession() as session:
+        assert session.execute(text("SELECT count(*) FROM patients")).scalar() == 1
+        with pytest.raises(OperationalError):
+            session.execute(text("DELETE FROM patients"))